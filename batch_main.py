@@ -0,0 +1,65 @@
+import json
+import logging
+from typing import List, Tuple
+import azure.functions as func
+from config.settings import BATCH_MAX_ATTEMPTS
+from handlers.claim_processor import get_claim_processor
+from handlers.stage_pipeline import is_staged_mode, get_staged_pipeline
+
+def _parse_message(body: str) -> Tuple[List[str], int]:
+    """
+    解析队列消息中的索赔目录列表和已尝试次数
+    支持 {"directories": [...], "attempt": n}、JSON数组或单个目录字符串
+    
+    Returns:
+        Tuple[List[str], int]: 索赔目录列表，以及包括本次在内的尝试次数
+    """
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        return ([body.strip()] if body.strip() else []), 1
+    
+    attempt = 1
+    if isinstance(payload, dict):
+        attempt = int(payload.get("attempt", 1))
+        payload = payload.get("directories", [])
+    if isinstance(payload, str):
+        payload = [payload]
+    return [directory for directory in payload if directory], attempt
+
+async def main(msg: func.QueueMessage, retry: func.Out[str], failed: func.Out[str]):
+    directories, attempt = _parse_message(msg.get_body().decode("utf-8"))
+    logging.info(f"Python queue trigger function received {len(directories)} claim directories")
+    
+    # 分阶段处理模式下只提交索赔，由各阶段的队列触发器处理
+    if is_staged_mode():
+        pipeline = get_staged_pipeline()
+        for directory in directories:
+            pipeline.submit(directory)
+        return
+    
+    # 获取已预热的索赔处理器实例（每个worker只构建一次）
+    processor = get_claim_processor()
+    warmup_seconds = processor.pop_warmup_seconds()
+    if warmup_seconds is not None:
+        logging.info(f"Claim processor warm-up took {warmup_seconds:.3f}s")
+    
+    # 批量处理索赔
+    items = await processor.process_batch_async(directories)
+    
+    failed_directories = [item.blob_directory for item in items if item.error]
+    for item in items:
+        if item.error:
+            logging.error(f"Claim {item.blob_directory} failed: {item.error}")
+        else:
+            logging.info(f"Claim {item.blob_directory} processed: {item.result.overall_status}")
+    
+    # 只把失败的索赔目录作为新消息重新入队，原消息正常完成，避免重新处理已成功的索赔
+    if not failed_directories:
+        return
+    if attempt < BATCH_MAX_ATTEMPTS:
+        logging.warning(f"{len(failed_directories)} of {len(items)} claims failed, re-enqueued (attempt {attempt + 1})")
+        retry.set(json.dumps({"directories": failed_directories, "attempt": attempt + 1}))
+    else:
+        logging.error(f"{len(failed_directories)} claims failed after {attempt} attempts, moved to claims-batch-failed")
+        failed.set(json.dumps({"directories": failed_directories, "attempt": attempt}))
\ No newline at end of file
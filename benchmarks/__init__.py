@@ -0,0 +1,4 @@
+"""
+离线基准测试工具
+使用合成索赔语料和本地Azure服务替身测量端到端处理性能
+"""
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+文档分类器吞吐量基准测试
+在单个核心上用classify_many批量分类合成语料的页面，报告每秒页数、准确率和置信度分布
+
+用法:
+    python -m benchmarks.classifier_throughput
+    python -m benchmarks.classifier_throughput --claims 500 --page-repeat 10 --check 2000
+    python -m benchmarks.classifier_throughput --classifier cascade --profile realistic
+"""
+import sys
+import time
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from benchmarks.synthetic_claims import generate_corpus
+from benchmarks.fakes import load_profile, build_fake_clients
+from utils.document_classifier_loader import load_document_classifier
+
+class ClassifierThroughputResult(BaseModel):
+    """
+    分类器吞吐量测试结果
+    """
+    classifier: str
+    profile: str
+    page_count: int
+    average_page_chars: float
+    runs: int
+    pages_per_second: float
+    accuracy: float
+    confusion: Dict[str, Dict[str, int]]  # 真实类型 -> 预测类型 -> 页数
+    low_confidence_pages: int  # 置信度低于1的页面数
+    escalated_pages: int = 0  # 级联分类器交给OpenAI分类的页面数
+
+def measure_classifier_throughput(claim_count: int = 200,
+                                  pages_per_document: int = 3,
+                                  page_repeat: int = 1,
+                                  runs: int = 3,
+                                  seed: int = 42,
+                                  classifier_version: Optional[str] = None,
+                                  profile_name: str = "local") -> ClassifierThroughputResult:
+    """
+    测量当前配置的文档分类器的批量分类吞吐量
+    
+    Args:
+        claim_count: 合成索赔数量
+        pages_per_document: 每份文档的最大页数
+        page_repeat: 每个页面文本重复的次数，用于模拟较长的OCR页面
+        runs: 测量次数，取最快一次
+        seed: 随机种子
+        classifier_version: 文档分类器版本，默认使用全局配置
+        profile_name: profiles.yaml中的OpenAI替身配置，级联分类器升级的页面由替身返回真实类型
+    
+    Returns:
+        ClassifierThroughputResult: 测试结果
+    """
+    claims = generate_corpus(claim_count, pages_per_document=pages_per_document, seed=seed)
+    pages = [page for claim in claims for page in claim.expected_pages()]
+    
+    classifier = load_document_classifier(classifier_version)
+    clients = build_fake_clients(claims, load_profile(profile_name), seed)
+    classifier.bind_clients(clients["openai_client"], clients["async_openai_client"])
+    texts = ["\n".join([page.raw_text] * page_repeat) for page in pages]
+    
+    best_seconds = float("inf")
+    results = []
+    for _ in range(max(1, runs)):
+        start = time.perf_counter()
+        results = classifier.classify_many(texts)
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+    
+    confusion: Dict[str, Counter] = {}
+    for page, result in zip(pages, results):
+        confusion.setdefault(page.document_type, Counter())[result.document_type] += 1
+    correct = sum(page.document_type == result.document_type for page, result in zip(pages, results))
+    
+    return ClassifierThroughputResult(
+        classifier=type(classifier).__name__,
+        profile=profile_name,
+        page_count=len(texts),
+        average_page_chars=round(sum(len(text) for text in texts) / max(1, len(texts)), 1),
+        runs=max(1, runs),
+        pages_per_second=round(len(texts) / best_seconds, 1) if best_seconds > 0 else 0.0,
+        accuracy=round(correct / max(1, len(pages)), 4),
+        confusion={actual: dict(predicted) for actual, predicted in confusion.items()},
+        low_confidence_pages=sum(result.confidence < 1.0 for result in results),
+        escalated_pages=sum(result.escalated for result in results)
+    )
+
+def format_result(result: ClassifierThroughputResult) -> str:
+    lines = [
+        f"Classifier:        {result.classifier}",
+        f"Pages:             {result.page_count} (avg {result.average_page_chars:.0f} chars)",
+        f"Throughput:        {result.pages_per_second:,.0f} pages/sec (best of {result.runs})",
+        f"Accuracy:          {result.accuracy:.2%}",
+        f"Confidence < 1:    {result.low_confidence_pages} pages",
+        f"Escalated to LLM:  {result.escalated_pages} pages (profile {result.profile})",
+        "Confusion (actual -> predicted):",
+    ]
+    for actual, predicted in sorted(result.confusion.items()):
+        counts = ", ".join(f"{document_type}={count}" for document_type, count in sorted(predicted.items()))
+        lines.append(f"  {actual:15s} {counts}")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Document classifier throughput benchmark")
+    parser.add_argument("--claims", type=int, default=200, help="number of synthetic claims")
+    parser.add_argument("--pages-per-document", type=int, default=3, help="maximum pages per document")
+    parser.add_argument("--page-repeat", type=int, default=1, help="repeat each page text to simulate longer OCR pages")
+    parser.add_argument("--runs", type=int, default=3, help="measured runs, the fastest is reported")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--classifier", help="document classifier version, defaults to global_versions.yaml")
+    parser.add_argument("--profile", default="local", help="OpenAI latency profile used for cascade escalations")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--check", type=float, metavar="PAGES_PER_SECOND",
+                        help="exit with status 1 when throughput is below this value")
+    args = parser.parse_args(argv)
+    
+    result = measure_classifier_throughput(
+        args.claims, args.pages_per_document, args.page_repeat, args.runs, args.seed, args.classifier, args.profile
+    )
+    print(result.model_dump_json(indent=2) if args.json else format_result(result))
+    
+    if args.check is not None and result.pages_per_second < args.check:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
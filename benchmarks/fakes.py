@@ -0,0 +1,492 @@
+"""
+Azure服务的本地替身
+在不访问Azure的情况下模拟Blob Storage、Document Intelligence和OpenAI的延迟与错误
+"""
+import re
+import json
+import time
+import hashlib
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import yaml
+from pydantic import BaseModel
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError, ServiceResponseError
+from config.settings import OPENAI_MODEL
+from utils.structured_output import NON_EXTRACTED_FIELDS
+from document_processors.loader import load_document_processor
+from utils.openai_client import AzureOpenAIClient, AsyncAzureOpenAIClient
+from utils.blob_storage import AzureBlobStorageClient, AsyncAzureBlobStorageClient, DownloadedBlob
+from benchmarks.synthetic_claims import SyntheticClaim
+
+# 预置的延迟和错误配置
+PROFILES_PATH = Path(__file__).parent / "profiles.yaml"
+
+class ServiceProfile(BaseModel):
+    """
+    单个服务替身的延迟和错误配置（毫秒）
+    """
+    latency_ms: float = 0.0  # 每次调用的基础延迟
+    per_page_ms: float = 0.0  # 每页额外延迟（仅Document Intelligence）
+    jitter_ms: float = 0.0  # 随机抖动上限
+    error_rate: float = 0.0  # 每次调用失败的概率
+    max_concurrency: Optional[int] = None  # 并发调用超过该数时返回429，模拟服务配额
+    retry_after_ms: float = 1000.0  # 429响应中的retry-after-ms
+
+class BenchmarkProfile(BaseModel):
+    """
+    一组服务替身配置
+    """
+    blob: ServiceProfile = ServiceProfile()
+    document_intelligence: ServiceProfile = ServiceProfile()
+    openai: ServiceProfile = ServiceProfile()
+
+def load_profile(name: str, profiles_path: Optional[Path] = None) -> BenchmarkProfile:
+    """
+    从profiles.yaml加载指定名称的配置
+    
+    Args:
+        name: 配置名称
+        profiles_path: 配置文件路径，默认为benchmarks/profiles.yaml
+    
+    Returns:
+        BenchmarkProfile: 替身配置
+    """
+    with open(profiles_path or PROFILES_PATH, 'r') as f:
+        profiles = yaml.safe_load(f) or {}
+    if name not in profiles:
+        raise ValueError(f"Unknown benchmark profile '{name}'. Available: {', '.join(profiles)}")
+    return BenchmarkProfile(**profiles[name])
+
+class SimulatedThrottlingError(Exception):
+    """
+    模拟的429响应，与openai和azure-core的错误一样带有status_code和响应头
+    """
+    
+    def __init__(self, retry_after_ms: float):
+        super().__init__("Simulated 429 Too Many Requests")
+        self.status_code = 429
+        self.response = SimpleNamespace(status_code=429, headers={"retry-after-ms": str(retry_after_ms)})
+
+class _LatencyModel:
+    """
+    根据ServiceProfile生成延迟并决定调用是否失败（线程安全）
+    """
+    
+    def __init__(self, profile: ServiceProfile, seed: int):
+        self.profile = profile
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+    
+    @contextmanager
+    def capacity(self):
+        """
+        占用一个服务端并发配额，超过max_concurrency时立即返回429
+        """
+        with self._lock:
+            throttled = self.profile.max_concurrency is not None and self._in_flight >= self.profile.max_concurrency
+            if not throttled:
+                self._in_flight += 1
+        if throttled:
+            raise SimulatedThrottlingError(self.profile.retry_after_ms)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+    
+    def delay_seconds(self, pages: int = 0) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(0, self.profile.jitter_ms)
+        return (self.profile.latency_ms + self.profile.per_page_ms * pages + jitter) / 1000
+    
+    def should_fail(self) -> bool:
+        if self.profile.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.profile.error_rate
+
+class InMemoryBlobStore:
+    """
+    内存中的Blob存储，同步和异步替身共享同一份数据
+    """
+    
+    def __init__(self):
+        self._blobs: Dict[str, Dict[str, bytes]] = {}
+        self._etags: Dict[str, Dict[str, str]] = {}
+        self._etag_counter = 0
+        self._lock = threading.Lock()
+    
+    def add_claims(self, claims: List[SyntheticClaim]):
+        """
+        将合成索赔的文件写入存储
+        
+        Args:
+            claims: 合成索赔列表
+        """
+        for claim in claims:
+            container_name, _, _ = claim.blob_directory.partition("/")
+            for blob_name, data in claim.blob_files().items():
+                self.put(container_name, blob_name, data)
+    
+    def put(self, container_name: str, blob_name: str, data: bytes, overwrite: bool = True):
+        with self._lock:
+            if not overwrite and blob_name in self._blobs.get(container_name, {}):
+                raise ResourceExistsError(f"Blob {container_name}/{blob_name} already exists")
+            self._blobs.setdefault(container_name, {})[blob_name] = data
+            # 与Azure一致，每次写入都生成新的ETag
+            self._etag_counter += 1
+            self._etags.setdefault(container_name, {})[blob_name] = f'"0x{self._etag_counter:016X}"'
+    
+    def get(self, container_name: str, blob_name: str) -> bytes:
+        with self._lock:
+            try:
+                return self._blobs[container_name][blob_name]
+            except KeyError:
+                raise ResourceNotFoundError(f"Blob not found: {container_name}/{blob_name}")
+    
+    def list(self, container_name: str, prefix: Optional[str] = None) -> List[str]:
+        with self._lock:
+            names = list(self._blobs.get(container_name, {}))
+        return sorted(name for name in names if not prefix or name.startswith(prefix))
+    
+    def list_properties(self, container_name: str, prefix: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            blobs = dict(self._blobs.get(container_name, {}))
+            etags = dict(self._etags.get(container_name, {}))
+        return [
+            {
+                "name": name,
+                "etag": etags.get(name),
+                "size": len(blobs[name]),
+                "content_md5": hashlib.md5(blobs[name]).hexdigest()
+            }
+            for name in sorted(blobs) if not prefix or name.startswith(prefix)
+        ]
+    
+    def exists(self, container_name: str, blob_name: str) -> bool:
+        with self._lock:
+            return blob_name in self._blobs.get(container_name, {})
+    
+    def delete(self, container_name: str, blob_name: str):
+        with self._lock:
+            self._blobs.get(container_name, {}).pop(blob_name, None)
+            self._etags.get(container_name, {}).pop(blob_name, None)
+
+class FakeBlobStorageClient:
+    """
+    AzureBlobStorageClient的本地替身
+    """
+    
+    def __init__(self, store: InMemoryBlobStore, profile: ServiceProfile, seed: int = 0):
+        self.store = store
+        self._latency = _LatencyModel(profile, seed)
+    
+    def _call(self):
+        time.sleep(self._latency.delay_seconds())
+        if self._latency.should_fail():
+            raise ServiceResponseError("Simulated Blob Storage failure")
+    
+    def list_blobs(self, container_name: str, prefix: Optional[str] = None) -> List[str]:
+        self._call()
+        return self.store.list(container_name, prefix)
+    
+    def list_blob_properties(self, container_name: str, prefix: Optional[str] = None) -> List[Dict]:
+        self._call()
+        return self.store.list_properties(container_name, prefix)
+    
+    def iter_blob_properties(self, container_name: str, prefix: Optional[str] = None, page_size: int = 100):
+        self._call()
+        yield from self.store.list_properties(container_name, prefix)
+    
+    def download_blob_to_bytes(self, container_name: str, blob_name: str) -> bytes:
+        self._call()
+        return self.store.get(container_name, blob_name)
+    
+    def download_blob_to_buffer(self, container_name: str, blob_name: str, **kwargs) -> DownloadedBlob:
+        self._call()
+        return DownloadedBlob.from_bytes(blob_name, self.store.get(container_name, blob_name))
+    
+    # 复用真实客户端的并行目录下载逻辑，只替换列举和单个Blob的下载
+    download_directory = AzureBlobStorageClient.download_directory
+    
+    def upload_blob_from_bytes(self, container_name: str, blob_name: str, data: bytes,
+                               content_type: Optional[str] = None, overwrite: bool = True) -> None:
+        self._call()
+        self.store.put(container_name, blob_name, data, overwrite)
+    
+    def blob_exists(self, container_name: str, blob_name: str) -> bool:
+        self._call()
+        return self.store.exists(container_name, blob_name)
+    
+    def get_container_client(self, container_name: str):
+        # 检查点清理只使用delete_blob
+        return SimpleNamespace(delete_blob=lambda blob_name: self.store.delete(container_name, blob_name))
+
+class AsyncFakeBlobStorageClient:
+    """
+    AsyncAzureBlobStorageClient的本地替身
+    """
+    
+    def __init__(self, store: InMemoryBlobStore, profile: ServiceProfile, seed: int = 0):
+        self.store = store
+        self._latency = _LatencyModel(profile, seed)
+    
+    async def _call(self):
+        await asyncio.sleep(self._latency.delay_seconds())
+        if self._latency.should_fail():
+            raise ServiceResponseError("Simulated Blob Storage failure")
+    
+    async def list_blobs(self, container_name: str, prefix: Optional[str] = None) -> List[str]:
+        await self._call()
+        return self.store.list(container_name, prefix)
+    
+    async def list_blob_properties(self, container_name: str, prefix: Optional[str] = None) -> List[Dict]:
+        await self._call()
+        return self.store.list_properties(container_name, prefix)
+    
+    async def iter_blob_properties(self, container_name: str, prefix: Optional[str] = None, page_size: int = 100):
+        await self._call()
+        for blob in self.store.list_properties(container_name, prefix):
+            yield blob
+    
+    async def download_blob_to_bytes(self, container_name: str, blob_name: str) -> bytes:
+        await self._call()
+        return self.store.get(container_name, blob_name)
+    
+    async def download_blob_to_buffer(self, container_name: str, blob_name: str, **kwargs) -> DownloadedBlob:
+        await self._call()
+        return DownloadedBlob.from_bytes(blob_name, self.store.get(container_name, blob_name))
+    
+    download_directory = AsyncAzureBlobStorageClient.download_directory
+    
+    async def upload_blob_from_bytes(self, container_name: str, blob_name: str, data: bytes,
+                                     content_type: Optional[str] = None, overwrite: bool = True) -> None:
+        await self._call()
+        self.store.put(container_name, blob_name, data, overwrite)
+    
+    async def blob_exists(self, container_name: str, blob_name: str) -> bool:
+        await self._call()
+        return self.store.exists(container_name, blob_name)
+    
+    async def close(self):
+        pass
+
+def _read_document(document) -> bytes:
+    """
+    读取以字节数据或二进制流传入的文档
+    """
+    return document.read() if hasattr(document, "read") else bytes(document)
+
+def _analyze_synthetic_document(document_bytes: bytes) -> Dict:
+    """
+    将合成文件（页面文本JSON数组）还原为与_format_analyze_result相同结构的结果
+    """
+    page_texts = json.loads(document_bytes.decode("utf-8"))
+    return {
+        "content": "\n".join(page_texts),
+        "pages": [
+            {
+                "page_number": i + 1,
+                "lines": [{"text": line, "bounding_box": []} for line in text.split("\n")]
+            }
+            for i, text in enumerate(page_texts)
+        ],
+        "tables": [],
+        "key_value_pairs": []
+    }
+
+def _count_pages(document_bytes: bytes) -> int:
+    return len(json.loads(document_bytes.decode("utf-8")))
+
+class FakeDocumentIntelligenceClient:
+    """
+    AzureDocumentIntelligenceClient的本地替身，延迟随页数增加
+    """
+    
+    def __init__(self, profile: ServiceProfile, seed: int = 0):
+        self._latency = _LatencyModel(profile, seed)
+    
+    def analyze_document_from_bytes(self, document_bytes, model_id: str = "prebuilt-document") -> Dict:
+        document_bytes = _read_document(document_bytes)
+        with self._latency.capacity():
+            time.sleep(self._latency.delay_seconds(_count_pages(document_bytes)))
+        if self._latency.should_fail():
+            raise ServiceResponseError("Simulated Document Intelligence failure")
+        return _analyze_synthetic_document(document_bytes)
+
+class AsyncFakeDocumentIntelligenceClient:
+    """
+    AsyncAzureDocumentIntelligenceClient的本地替身
+    """
+    
+    def __init__(self, profile: ServiceProfile, seed: int = 0):
+        self._latency = _LatencyModel(profile, seed)
+    
+    async def analyze_document_from_bytes(self, document_bytes, model_id: str = "prebuilt-document") -> Dict:
+        document_bytes = _read_document(document_bytes)
+        with self._latency.capacity():
+            await asyncio.sleep(self._latency.delay_seconds(_count_pages(document_bytes)))
+        if self._latency.should_fail():
+            raise ServiceResponseError("Simulated Document Intelligence failure")
+        return _analyze_synthetic_document(document_bytes)
+    
+    async def close(self):
+        pass
+
+def _estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    # 粗略估算：约4个字符一个token
+    return max(1, sum(len(message.get("content", "")) for message in messages) // 4)
+
+def _fake_completion(messages: List[Dict[str, str]], content: str):
+    prompt_tokens = _estimate_tokens(messages)
+    completion_tokens = max(1, len(content) // 4)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(
+            message=SimpleNamespace(content=content, role="assistant"),
+            finish_reason="stop"
+        )],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
+    )
+
+# 分类请求中页面文本的标记（见utils/openai_client中的消息构建函数），用页面开头查找真实类型
+_CLASSIFICATION_TEXT_MARKER = "Document text:\n"
+_BATCH_PAGE_PATTERN = re.compile(r'<page id="([^"]+)">\n(.*?)\n</page>', re.DOTALL)
+_PAGE_LABEL_KEY_CHARS = 200
+_CLAIM_DOCUMENT_PATTERN = re.compile(r'<document id="([^"]+)" type="([^"]+)">')
+
+@lru_cache(maxsize=None)
+def _fake_extraction(document_type: str) -> Dict[str, object]:
+    # 与逐个文档提取相同的模拟数据
+    result = load_document_processor(document_type).extract([])
+    return result.model_dump(mode="json", exclude=set(NON_EXTRACTED_FIELDS))
+
+def _response_for(messages: List[Dict[str, str]], response_content: str, page_labels: Dict[str, str]) -> str:
+    """
+    分类请求返回页面的真实文档类型（模拟总能正确分类的模型），批量分类请求返回JSON数组，
+    整个索赔一次提取的请求按文档ID返回处理器的模拟数据，其他请求返回固定内容
+    """
+    content = messages[-1].get("content", "") if messages else ""
+    claim_documents = _CLAIM_DOCUMENT_PATTERN.findall(content)
+    if claim_documents:
+        return json.dumps({doc_id: _fake_extraction(doc_type) for doc_id, doc_type in claim_documents})
+    if page_labels:
+        batch_pages = _BATCH_PAGE_PATTERN.findall(content)
+        if batch_pages:
+            return json.dumps([
+                {"id": page_id, "document_type": page_labels.get(text[:_PAGE_LABEL_KEY_CHARS], "unknown")}
+                for page_id, text in batch_pages
+            ])
+        _, marker, text = content.partition(_CLASSIFICATION_TEXT_MARKER)
+        if marker:
+            return page_labels.get(text[:_PAGE_LABEL_KEY_CHARS], response_content)
+    return response_content
+
+class _FakeRawResponse:
+    """
+    模拟openai SDK的with_raw_response返回值
+    """
+    
+    def __init__(self, completion, retries_taken: int):
+        self._completion = completion
+        self.retries_taken = retries_taken
+    
+    def parse(self):
+        return self._completion
+
+class _FakeChatCompletions:
+    """
+    模拟client.chat.completions.with_raw_response（max_retries=0，重试由自适应并发限制器处理）
+    """
+    
+    def __init__(self, profile: BenchmarkProfile, seed: int, response_content: str, page_labels: Dict[str, str]):
+        self._latency = _LatencyModel(profile.openai, seed)
+        self._response_content = response_content
+        self._page_labels = page_labels
+        self.with_raw_response = self
+    
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs):
+        with self._latency.capacity():
+            time.sleep(self._latency.delay_seconds())
+        if self._latency.should_fail():
+            raise ServiceResponseError("Simulated OpenAI failure")
+        content = _response_for(messages, self._response_content, self._page_labels)
+        return _FakeRawResponse(_fake_completion(messages, content), 0)
+
+class _AsyncFakeChatCompletions(_FakeChatCompletions):
+    
+    async def create(self, model: str, messages: List[Dict[str, str]], **kwargs):
+        with self._latency.capacity():
+            await asyncio.sleep(self._latency.delay_seconds())
+        if self._latency.should_fail():
+            raise ServiceResponseError("Simulated OpenAI failure")
+        content = _response_for(messages, self._response_content, self._page_labels)
+        return _FakeRawResponse(_fake_completion(messages, content), 0)
+
+class FakeOpenAIClient(AzureOpenAIClient):
+    """
+    AzureOpenAIClient的本地替身
+    只替换底层SDK对象，chat_completion和性能记录沿用真实实现
+    提供page_labels（页面文本开头到真实文档类型的映射）时，分类请求返回页面的真实类型
+    """
+    
+    def __init__(self, profile: BenchmarkProfile, seed: int = 0, response_content: str = "{}",
+                 page_labels: Optional[Dict[str, str]] = None):
+        self.client = SimpleNamespace(chat=SimpleNamespace(
+            completions=_FakeChatCompletions(profile, seed, response_content, page_labels or {})
+        ))
+        self.default_deployment = OPENAI_MODEL
+        self.json_schema_supported = True
+
+class AsyncFakeOpenAIClient(AsyncAzureOpenAIClient):
+    """
+    AsyncAzureOpenAIClient的本地替身
+    """
+    
+    def __init__(self, profile: BenchmarkProfile, seed: int = 0, response_content: str = "{}",
+                 page_labels: Optional[Dict[str, str]] = None):
+        self.client = SimpleNamespace(chat=SimpleNamespace(
+            completions=_AsyncFakeChatCompletions(profile, seed, response_content, page_labels or {})
+        ))
+        self.default_deployment = OPENAI_MODEL
+        self.json_schema_supported = True
+    
+    async def close(self):
+        pass
+
+def build_fake_clients(claims: List[SyntheticClaim], profile: BenchmarkProfile, seed: int = 0) -> Dict[str, object]:
+    """
+    创建加载了合成语料的全部替身客户端
+    
+    Args:
+        claims: 合成索赔列表
+        profile: 替身配置
+        seed: 随机种子
+    
+    Returns:
+        可直接作为ClaimProcessor构造参数的客户端字典
+    """
+    store = InMemoryBlobStore()
+    store.add_claims(claims)
+    page_labels = {
+        text[:_PAGE_LABEL_KEY_CHARS]: document.document_type
+        for claim in claims for document in claim.documents for text in document.page_texts
+    }
+    return {
+        "openai_client": FakeOpenAIClient(profile, seed, page_labels=page_labels),
+        "document_intelligence_client": FakeDocumentIntelligenceClient(profile.document_intelligence, seed),
+        "blob_storage_client": FakeBlobStorageClient(store, profile.blob, seed),
+        "async_openai_client": AsyncFakeOpenAIClient(profile, seed, page_labels=page_labels),
+        "async_document_intelligence_client": AsyncFakeDocumentIntelligenceClient(profile.document_intelligence, seed),
+        "async_blob_storage_client": AsyncFakeBlobStorageClient(store, profile.blob, seed)
+    }
\ No newline at end of file
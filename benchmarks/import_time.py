@@ -0,0 +1,219 @@
+"""
+冷启动导入时间基准测试
+在新的Python进程中用-X importtime导入入口模块，报告各模块和各顶层包的导入耗时，并检查导入时间预算
+
+用法:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module handlers.claim_processor --top 30
+    python -m benchmarks.import_time --check
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+import yaml
+from pydantic import BaseModel
+
+# 仓库根目录，子进程在此目录下导入模块
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# 导入时间预算
+BUDGET_PATH = Path(__file__).parent / "import_budget.yaml"
+
+class ModuleImportCost(BaseModel):
+    """
+    单个模块的导入耗时（微秒），与-X importtime的输出一致
+    """
+    module: str
+    self_us: int  # 模块自身的执行时间
+    cumulative_us: int  # 包括其导入的子模块
+    depth: int  # 在导入树中的深度，0表示由-c直接导入
+
+class ImportTimeResult(BaseModel):
+    """
+    单个入口模块的导入时间测量结果
+    """
+    target: str
+    runs: int
+    total_ms: float  # 入口模块累计导入时间的中位数
+    min_ms: float
+    max_ms: float
+    module_count: int  # 导入的模块总数
+    modules: List[ModuleImportCost]  # 中位数那次运行的各模块耗时
+    budget_ms: Optional[float] = None
+    forbidden_loaded: List[str] = []  # 实际被加载的禁止模块
+    
+    @property
+    def within_budget(self) -> bool:
+        return (self.budget_ms is None or self.total_ms <= self.budget_ms) and not self.forbidden_loaded
+
+def parse_importtime(output: str) -> List[ModuleImportCost]:
+    """
+    解析-X importtime写到stderr的输出
+    
+    Args:
+        output: stderr内容
+    
+    Returns:
+        按导入完成顺序排列的模块耗时列表
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # 表头行
+            continue
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        modules.append(ModuleImportCost(
+            module=stripped,
+            self_us=int(fields[0]),
+            cumulative_us=int(fields[1]),
+            depth=(len(name) - len(stripped) - 1) // 2
+        ))
+    return modules
+
+def aggregate_by_package(modules: List[ModuleImportCost]) -> Dict[str, int]:
+    """
+    按顶层包汇总模块自身的导入时间
+    
+    Args:
+        modules: 模块耗时列表
+    
+    Returns:
+        顶层包名到导入时间（微秒）的映射，按耗时降序
+    """
+    totals: Dict[str, int] = {}
+    for cost in modules:
+        package = cost.module.split(".")[0]
+        totals[package] = totals.get(package, 0) + cost.self_us
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+def _run_importtime(target: str) -> List[ModuleImportCost]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr)
+
+def _target_cumulative_us(target: str, modules: List[ModuleImportCost]) -> int:
+    for cost in modules:
+        if cost.module == target and cost.depth == 0:
+            return cost.cumulative_us
+    # 模块已被解释器提前导入时不会出现在输出中
+    return 0
+
+def load_budget() -> Dict[str, Dict]:
+    """
+    读取导入时间预算
+    
+    Returns:
+        入口模块到预算配置（budget_ms、forbidden_modules）的映射
+    """
+    with open(BUDGET_PATH, "r") as f:
+        return (yaml.safe_load(f) or {}).get("targets", {})
+
+def measure_import_time(target: str, runs: int = 5, budget: Optional[Dict] = None) -> ImportTimeResult:
+    """
+    测量入口模块的冷启动导入时间
+    先运行一次生成字节码缓存（与部署后的状态一致），不计入结果
+    
+    Args:
+        target: 入口模块名
+        runs: 计入结果的运行次数
+        budget: 预算配置（budget_ms、forbidden_modules），为None时不检查
+    
+    Returns:
+        ImportTimeResult: 测量结果
+    """
+    _run_importtime(target)
+    samples = []
+    for _ in range(max(1, runs)):
+        modules = _run_importtime(target)
+        samples.append((_target_cumulative_us(target, modules), modules))
+    samples.sort(key=lambda sample: sample[0])
+    totals = [total for total, _ in samples]
+    median_modules = samples[len(samples) // 2][1]
+    
+    budget = budget or {}
+    loaded = {cost.module for cost in median_modules}
+    forbidden_loaded = [
+        name for name in budget.get("forbidden_modules", [])
+        if name in loaded
+    ]
+    return ImportTimeResult(
+        target=target,
+        runs=len(samples),
+        total_ms=statistics.median(totals) / 1000,
+        min_ms=totals[0] / 1000,
+        max_ms=totals[-1] / 1000,
+        module_count=len(median_modules),
+        modules=median_modules,
+        budget_ms=budget.get("budget_ms"),
+        forbidden_loaded=forbidden_loaded
+    )
+
+def format_result(result: ImportTimeResult, top: int = 15) -> str:
+    """
+    将测量结果格式化为文本报告
+    
+    Args:
+        result: 测量结果
+        top: 列出的最慢模块和顶层包数量
+    
+    Returns:
+        报告文本
+    """
+    budget = f" budget={result.budget_ms:.0f}ms" if result.budget_ms is not None else ""
+    status = "OK" if result.within_budget else "OVER BUDGET"
+    lines = [
+        f"{result.target}: median={result.total_ms:.1f}ms min={result.min_ms:.1f}ms "
+        f"max={result.max_ms:.1f}ms modules={result.module_count}{budget} [{status}]"
+    ]
+    if result.forbidden_loaded:
+        lines.append(f"  forbidden modules loaded: {', '.join(result.forbidden_loaded)}")
+    
+    lines.append(f"  {'package':<40} {'self_ms':>10}")
+    for package, self_us in list(aggregate_by_package(result.modules).items())[:top]:
+        lines.append(f"  {package:<40} {self_us / 1000:>10.1f}")
+    
+    lines.append(f"  {'module':<40} {'self_ms':>10} {'cumulative_ms':>14}")
+    slowest = sorted(result.modules, key=lambda cost: cost.cumulative_us, reverse=True)[:top]
+    for cost in slowest:
+        lines.append(f"  {cost.module:<40} {cost.self_us / 1000:>10.1f} {cost.cumulative_us / 1000:>14.1f}")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start import time benchmark")
+    parser.add_argument("--module", action="append", dest="modules",
+                        help="entry module to import (repeatable, defaults to the targets in import_budget.yaml)")
+    parser.add_argument("--runs", type=int, default=5, help="measured runs per module")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest modules and packages to list")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 when a budget is exceeded")
+    args = parser.parse_args(argv)
+    
+    budgets = load_budget()
+    targets = args.modules or list(budgets)
+    results = [measure_import_time(target, args.runs, budgets.get(target)) for target in targets]
+    
+    if args.json:
+        print(json.dumps([result.model_dump() for result in results], indent=2))
+    else:
+        print("\n\n".join(format_result(result, args.top) for result in results))
+    
+    if args.check and not all(result.within_budget for result in results):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
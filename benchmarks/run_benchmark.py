@@ -0,0 +1,424 @@
+"""
+离线端到端基准测试
+使用合成索赔语料和本地Azure服务替身运行ClaimProcessor，报告吞吐量、各阶段延迟分位数和峰值内存
+
+用法:
+    python -m benchmarks.run_benchmark --claims 200 --profile local --save local-200
+    python -m benchmarks.run_benchmark --claims 200 --profile local --compare local-200
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from handlers.claim_processor import ClaimProcessor
+from handlers.stage_pipeline import StagedClaimPipeline, LocalStageRunner
+from utils.checkpoint_store import LocalDiskCheckpointStore
+from utils.work_queue import InMemoryWorkQueue
+from utils.adaptive_concurrency import get_concurrency_limiters
+from utils.document_classifier_loader import load_document_classifier
+from config.settings import DOCUMENT_CLASSIFIER_VERSION
+from benchmarks.synthetic_claims import generate_corpus
+from benchmarks.fakes import load_profile, build_fake_clients
+
+# 基准结果保存目录
+BASELINES_DIR = Path(__file__).parent / "baselines"
+
+# 整个索赔的端到端耗时在报告中使用的阶段名称
+CLAIM_TOTAL_STAGE = "claim_total"
+
+class StageLatency(BaseModel):
+    """
+    单个阶段的延迟分布（毫秒）
+    """
+    stage: str
+    count: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+class BenchmarkResult(BaseModel):
+    """
+    一次基准测试的结果，可保存为基准用于版本间比较
+    """
+    created_at: str
+    git_commit: Optional[str] = None
+    python_version: str
+    mode: str  # "sync"、"async" 或 "staged"
+    profile: str
+    claim_count: int
+    documents_per_claim: int
+    pages_per_document: int
+    page_count: int
+    max_concurrency: int
+    seed: int
+    succeeded: int
+    failed: int
+    wall_time_s: float
+    claims_per_sec: float
+    pages_per_sec: float
+    stages: List[StageLatency]
+    openai_calls: int
+    retries: int
+    extracted_documents: int = 0  # 分组后提取的文档数
+    throttled_calls: int = 0  # 收到429的外部服务调用数
+    classifier: Optional[str] = None  # 文档分类器版本
+    whole_claim: bool = False  # 是否对小索赔使用整个索赔一次提取
+    escalated_pages: int = 0  # 级联分类器交给OpenAI分类的页面数
+    escalation_rate: float = 0.0
+    classification_saved_ms: float = 0.0  # 未升级的页面节省的OpenAI调用时间（估算值）
+    template_hits: int = 0  # 复用模板索引分类结果的页面数
+    extraction_cache_hits: int = 0  # 从提取结果缓存读取的提取数
+    extraction_cache_misses: int = 0
+    structured_outputs: int = 0  # 解析为结果模型的结构化回复数
+    structured_output_repairs: int = 0
+    structured_output_failures: int = 0
+    parse_failure_rate: float = 0.0
+    concurrency_limits: Dict[str, int] = {}  # 运行结束时各服务的自适应并发上限
+    peak_rss_mb: Optional[float] = None
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    线性插值计算分位数
+    
+    Args:
+        values: 样本
+        q: 分位（0-100）
+    
+    Returns:
+        分位数，样本为空时返回0
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    获取当前进程的峰值常驻内存
+    
+    Returns:
+        峰值RSS（MB），平台不支持时返回None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    if sys.platform == "darwin":
+        return round(max_rss / (1024 * 1024), 1)
+    return round(max_rss / 1024, 1)
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _summarize_stages(stage_samples: Dict[str, List[float]]) -> List[StageLatency]:
+    return [
+        StageLatency(
+            stage=stage,
+            count=len(samples),
+            mean_ms=round(sum(samples) / len(samples), 3),
+            p50_ms=round(percentile(samples, 50), 3),
+            p95_ms=round(percentile(samples, 95), 3),
+            p99_ms=round(percentile(samples, 99), 3)
+        )
+        for stage, samples in stage_samples.items() if samples
+    ]
+
+def run_benchmark(claim_count: int = 100,
+                  documents_per_claim: int = 6,
+                  pages_per_document: int = 2,
+                  profile_name: str = "local",
+                  mode: str = "async",
+                  max_concurrency: int = 8,
+                  seed: int = 42,
+                  verbose: bool = False,
+                  classifier_version: Optional[str] = None,
+                  whole_claim: Optional[bool] = None) -> BenchmarkResult:
+    """
+    生成合成语料并运行一次基准测试
+    
+    Args:
+        claim_count: 索赔数量
+        documents_per_claim: 每个索赔的文档数
+        pages_per_document: 每份文档的最大页数
+        profile_name: profiles.yaml中的替身配置名称
+        mode: "sync" 使用process_batch，"async" 使用process_batch_async，
+              "staged" 通过进程内队列运行分阶段流水线
+        max_concurrency: 同时处理的最大索赔数（staged模式下为每个阶段的消费者数）
+        seed: 随机种子（语料和替身共用）
+        verbose: 是否输出处理流程的日志
+        classifier_version: 文档分类器版本，默认使用全局配置
+        whole_claim: 是否对小索赔使用整个索赔一次提取，默认使用whole_claim_extraction.enabled
+    
+    Returns:
+        BenchmarkResult: 基准测试结果
+    """
+    profile = load_profile(profile_name)
+    claims = generate_corpus(claim_count, documents_per_claim, pages_per_document, seed)
+    directories = [claim.blob_directory for claim in claims]
+    page_count = sum(len(document.page_texts) for claim in claims for document in claim.documents)
+    
+    # 处理流程使用print输出日志，非verbose模式下丢弃
+    with open(os.devnull, "w") as devnull, redirect_stdout(sys.stdout if verbose else devnull), \
+            tempfile.TemporaryDirectory() as state_dir:
+        # 分阶段模式的中间结果保存在临时目录中
+        checkpoint_store = LocalDiskCheckpointStore(state_dir) if mode == "staged" else None
+        processor = ClaimProcessor(
+            **build_fake_clients(claims, profile, seed),
+            checkpoint_store=checkpoint_store,
+            classifier=load_document_classifier(classifier_version)
+        )
+        if whole_claim is not None:
+            processor.ocr_service.whole_claim = whole_claim
+        processor.warm_up()
+        
+        start = time.perf_counter()
+        if mode == "sync":
+            items = processor.process_batch(directories, max_concurrency)
+        elif mode == "async":
+            items = asyncio.run(processor.process_batch_async(directories, max_concurrency))
+        elif mode == "staged":
+            pipeline = StagedClaimPipeline(processor, InMemoryWorkQueue())
+            for directory in directories:
+                pipeline.submit(directory)
+            items = LocalStageRunner(pipeline, workers_per_stage=max_concurrency).run_until_idle()
+        else:
+            raise ValueError(f"Unsupported benchmark mode: {mode}")
+        wall_time = time.perf_counter() - start
+    
+    stage_samples: Dict[str, List[float]] = {CLAIM_TOTAL_STAGE: []}
+    openai_calls = 0
+    retries = 0
+    extracted_documents = 0
+    throttled_calls = 0
+    classified_pages = 0
+    escalated_pages = 0
+    classification_saved_ms = 0.0
+    template_hits = 0
+    extraction_cache_hits = 0
+    extraction_cache_misses = 0
+    structured_outputs = 0
+    structured_output_repairs = 0
+    structured_output_failures = 0
+    for item in items:
+        if item.result is None or item.result.performance is None:
+            continue
+        report = item.result.performance
+        stage_samples[CLAIM_TOTAL_STAGE].append(report.total_wall_time_ms)
+        for timing in report.stages:
+            stage_samples.setdefault(timing.stage, []).append(timing.wall_time_ms)
+        openai_calls += len(report.openai_calls)
+        extracted_documents += len(report.documents)
+        retries += report.retries
+        throttled_calls += report.throttled_calls
+        classified_pages += report.classified_pages
+        escalated_pages += report.escalated_pages
+        classification_saved_ms += report.classification_saved_ms
+        template_hits += report.template_hits
+        extraction_cache_hits += report.extraction_cache_hits
+        extraction_cache_misses += report.extraction_cache_misses
+        structured_outputs += report.structured_outputs
+        structured_output_repairs += report.structured_output_repairs
+        structured_output_failures += report.structured_output_failures
+    
+    failed = sum(1 for item in items if item.error is not None)
+    for item in items:
+        if item.error is not None and verbose:
+            print(f"Failed: {item.blob_directory}: {item.error}")
+    
+    return BenchmarkResult(
+        created_at=datetime.utcnow().isoformat(),
+        git_commit=_git_commit(),
+        python_version=platform.python_version(),
+        mode=mode,
+        profile=profile_name,
+        claim_count=claim_count,
+        documents_per_claim=documents_per_claim,
+        pages_per_document=pages_per_document,
+        page_count=page_count,
+        max_concurrency=max_concurrency,
+        seed=seed,
+        succeeded=len(items) - failed,
+        failed=failed,
+        wall_time_s=round(wall_time, 3),
+        claims_per_sec=round(len(items) / wall_time, 3) if wall_time > 0 else 0.0,
+        pages_per_sec=round(page_count / wall_time, 3) if wall_time > 0 else 0.0,
+        stages=_summarize_stages(stage_samples),
+        openai_calls=openai_calls,
+        retries=retries,
+        extracted_documents=extracted_documents,
+        throttled_calls=throttled_calls,
+        classifier=classifier_version or DOCUMENT_CLASSIFIER_VERSION,
+        whole_claim=processor.ocr_service.whole_claim,
+        escalated_pages=escalated_pages,
+        escalation_rate=round(escalated_pages / classified_pages, 4) if classified_pages else 0.0,
+        classification_saved_ms=round(classification_saved_ms, 3),
+        template_hits=template_hits,
+        extraction_cache_hits=extraction_cache_hits,
+        extraction_cache_misses=extraction_cache_misses,
+        structured_outputs=structured_outputs,
+        structured_output_repairs=structured_output_repairs,
+        structured_output_failures=structured_output_failures,
+        parse_failure_rate=round(structured_output_failures / structured_outputs, 4) if structured_outputs else 0.0,
+        concurrency_limits={limiter.service: limiter.limit for limiter in get_concurrency_limiters()},
+        peak_rss_mb=peak_rss_mb()
+    )
+
+def baseline_path(name: str) -> Path:
+    """
+    基准名称对应的文件路径，名称包含路径分隔符或.json后缀时视为文件路径
+    """
+    if name.endswith(".json") or os.sep in name:
+        return Path(name)
+    return BASELINES_DIR / f"{name}.json"
+
+def save_baseline(result: BenchmarkResult, name: str) -> Path:
+    """
+    将结果保存为基准
+    
+    Args:
+        result: 基准测试结果
+        name: 基准名称或文件路径
+    
+    Returns:
+        保存的文件路径
+    """
+    path = baseline_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(result.model_dump_json(indent=2), encoding="utf-8")
+    return path
+
+def load_baseline(name: str) -> BenchmarkResult:
+    """
+    读取已保存的基准
+    
+    Args:
+        name: 基准名称或文件路径
+    
+    Returns:
+        BenchmarkResult: 基准结果
+    """
+    return BenchmarkResult.model_validate_json(baseline_path(name).read_text(encoding="utf-8"))
+
+def _change(current: float, baseline: float) -> str:
+    if not baseline:
+        return "n/a"
+    return f"{(current - baseline) / baseline * 100:+.1f}%"
+
+def format_result(result: BenchmarkResult) -> str:
+    """
+    将结果格式化为便于阅读的文本
+    """
+    lines = [
+        f"mode={result.mode} profile={result.profile} claims={result.claim_count} pages={result.page_count} "
+        f"concurrency={result.max_concurrency} commit={result.git_commit or 'unknown'}",
+        f"succeeded={result.succeeded} failed={result.failed} wall_time={result.wall_time_s:.3f}s",
+        f"throughput: {result.claims_per_sec:.2f} claims/sec, {result.pages_per_sec:.2f} pages/sec",
+        f"documents={result.extracted_documents} whole_claim={result.whole_claim} openai_calls={result.openai_calls} retries={result.retries} "
+        f"throttled={result.throttled_calls} "
+        f"peak_rss={result.peak_rss_mb} MB",
+        f"classifier={result.classifier} escalated_pages={result.escalated_pages} "
+        f"escalation_rate={result.escalation_rate:.2%} classification_saved={result.classification_saved_ms / 1000:.1f}s "
+        f"template_hits={result.template_hits} extraction_cache_hits={result.extraction_cache_hits} "
+        f"extraction_cache_misses={result.extraction_cache_misses}",
+        f"structured_outputs={result.structured_outputs} repaired={result.structured_output_repairs} "
+        f"parse_failures={result.structured_output_failures} parse_failure_rate={result.parse_failure_rate:.2%}",
+        "concurrency_limits: " + (
+            ", ".join(f"{service}={limit}" for service, limit in result.concurrency_limits.items()) or "n/a"
+        ),
+        "",
+        f"{'stage':<20}{'count':>8}{'mean_ms':>12}{'p50_ms':>12}{'p95_ms':>12}{'p99_ms':>12}"
+    ]
+    for stage in result.stages:
+        lines.append(
+            f"{stage.stage:<20}{stage.count:>8}{stage.mean_ms:>12.3f}{stage.p50_ms:>12.3f}"
+            f"{stage.p95_ms:>12.3f}{stage.p99_ms:>12.3f}"
+        )
+    return "\n".join(lines)
+
+def format_comparison(result: BenchmarkResult, baseline: BenchmarkResult) -> str:
+    """
+    将结果与基准对比，吞吐量越高越好，延迟和内存越低越好
+    """
+    lines = [
+        f"compared with baseline from commit {baseline.git_commit or 'unknown'} ({baseline.created_at})",
+        f"claims/sec: {baseline.claims_per_sec:.2f} -> {result.claims_per_sec:.2f} "
+        f"({_change(result.claims_per_sec, baseline.claims_per_sec)})"
+    ]
+    if result.peak_rss_mb is not None and baseline.peak_rss_mb is not None:
+        lines.append(
+            f"peak_rss_mb: {baseline.peak_rss_mb} -> {result.peak_rss_mb} "
+            f"({_change(result.peak_rss_mb, baseline.peak_rss_mb)})"
+        )
+    baseline_stages = {stage.stage: stage for stage in baseline.stages}
+    for stage in result.stages:
+        previous = baseline_stages.get(stage.stage)
+        if previous is None:
+            continue
+        lines.append(
+            f"{stage.stage:<20} p50 {_change(stage.p50_ms, previous.p50_ms):>8}"
+            f"  p95 {_change(stage.p95_ms, previous.p95_ms):>8}"
+            f"  p99 {_change(stage.p99_ms, previous.p99_ms):>8}"
+        )
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark for ClaimProcessor")
+    parser.add_argument("--claims", type=int, default=100, help="number of synthetic claims")
+    parser.add_argument("--documents-per-claim", type=int, default=6, help="documents per claim, including the claim form")
+    parser.add_argument("--pages-per-document", type=int, default=2, help="maximum pages per document")
+    parser.add_argument("--profile", default="local", help="latency/error profile from benchmarks/profiles.yaml")
+    parser.add_argument("--mode", choices=["sync", "async", "staged"], default="async")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum claims in flight")
+    parser.add_argument("--classifier", help="document classifier version, defaults to global_versions.yaml")
+    parser.add_argument("--whole-claim", action="store_true", default=None,
+                        help="extract small claims in one request, defaults to whole_claim_extraction.enabled")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", metavar="NAME", help="save the result as a baseline")
+    parser.add_argument("--compare", metavar="NAME", help="compare the result with a saved baseline")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline logs")
+    args = parser.parse_args(argv)
+    
+    result = run_benchmark(
+        claim_count=args.claims,
+        documents_per_claim=args.documents_per_claim,
+        pages_per_document=args.pages_per_document,
+        profile_name=args.profile,
+        mode=args.mode,
+        max_concurrency=args.concurrency,
+        seed=args.seed,
+        verbose=args.verbose,
+        classifier_version=args.classifier,
+        whole_claim=args.whole_claim
+    )
+    
+    print(result.model_dump_json(indent=2) if args.json else format_result(result))
+    if args.compare:
+        print()
+        print(format_comparison(result, load_baseline(args.compare)))
+    if args.save:
+        print(f"\nBaseline saved to {save_baseline(result, args.save)}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""
+合成索赔语料生成器
+为六种文档类型生成页面文本，每个索赔包含一份理赔表和若干其他文档
+"""
+import json
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from schemas.document_page import DocumentPage
+
+# 与DocumentPage.document_type一致的文档类型
+DOCUMENT_TYPES = ["claim_form", "discharge", "invoice", "receipt", "payment_proof", "id_card"]
+
+# 合成语料使用的容器名称
+SYNTHETIC_CONTAINER = "claims"
+
+PATIENT_NAMES = ["John Doe", "Jane Smith", "Wei Zhang", "Li Na", "Maria Garcia", "Ahmed Khan", "Yuki Tanaka"]
+HOSPITAL_NAMES = ["City General Hospital", "Beijing Union Medical College Hospital", "St. Mary's Hospital"]
+PHYSICIANS = ["Dr. Smith", "Dr. Chen", "Dr. Patel", "Dr. Wang"]
+DIAGNOSIS_CODES = ["I10", "E11.9", "J45.909", "K21.9", "M54.5", "N39.0"]
+PROCEDURE_CODES = ["99213", "85025", "80053", "93000", "71046"]
+SERVICES = ["Consultation", "Laboratory Tests", "Medication", "Imaging", "Follow-up Visit", "Nursing Care"]
+
+class SyntheticDocument(BaseModel):
+    """
+    合成文档：一个文档对应一个Blob文件，可能有多页
+    """
+    document_type: str
+    page_texts: List[str]
+
+class SyntheticClaim(BaseModel):
+    """
+    合成索赔
+    """
+    claim_id: str
+    blob_directory: str  # 以容器名开头的索赔目录，例如 "claims/BENCH-00001"
+    documents: List[SyntheticDocument]
+    
+    def blob_files(self) -> Dict[str, bytes]:
+        """
+        生成索赔目录下的Blob文件内容
+        每个文件保存该文档的页面文本（JSON数组），由本地Document Intelligence替身还原为页面
+        
+        Returns:
+            Blob名称（不含容器名）到文件内容的映射
+        """
+        _, _, prefix = self.blob_directory.partition("/")
+        return {
+            f"{prefix}/{index:03d}_{document.document_type}.pdf": json.dumps(document.page_texts).encode("utf-8")
+            for index, document in enumerate(self.documents)
+        }
+    
+    def expected_pages(self) -> List[DocumentPage]:
+        """
+        按文件顺序返回带有真实文档类型的页面，用于评估分类准确率
+        
+        Returns:
+            页面列表
+        """
+        pages = []
+        for document in self.documents:
+            for text in document.page_texts:
+                pages.append(DocumentPage(
+                    page_number=len(pages) + 1,
+                    raw_text=text,
+                    document_type=document.document_type
+                ))
+        return pages
+
+def _random_date(rng: random.Random) -> date:
+    return date(2025, 1, 1) + timedelta(days=rng.randint(0, 364))
+
+def _amount(rng: random.Random, low: float = 50.0, high: float = 5000.0) -> str:
+    return f"${rng.uniform(low, high):,.2f}"
+
+def _page_marker(page_index: int, page_count: int) -> str:
+    return f"Page {page_index + 1} of {page_count}"
+
+def _claim_form_page(rng: random.Random, patient: str, page_index: int, page_count: int) -> str:
+    if page_index > 0:
+        return "\n".join([
+            "Insurance Claim Form (continued)",
+            f"Policy Number: POL-2025-{rng.randint(1, 999):03d}",
+            "Declaration: I certify that the information provided is true and complete.",
+            f"Signature of Insured: {patient}",
+            _page_marker(page_index, page_count)
+        ])
+    return "\n".join([
+        "Insurance Claim Form",
+        f"Policy Number: POL-2025-{rng.randint(1, 999):03d}",
+        f"Patient: {patient}",
+        f"Claim Amount: {_amount(rng)}",
+        f"Date of Service: {_random_date(rng).isoformat()}",
+        f"Diagnosis: {', '.join(rng.sample(DIAGNOSIS_CODES, 2))}",
+        _page_marker(page_index, page_count)
+    ])
+
+def _discharge_page(rng: random.Random, patient: str, page_index: int, page_count: int) -> str:
+    admission = _random_date(rng)
+    return "\n".join([
+        "Discharge Summary" if page_index == 0 else "Discharge Summary (continued)",
+        f"Hospital: {rng.choice(HOSPITAL_NAMES)}",
+        f"Patient: {patient}",
+        f"Diagnosis: {', '.join(rng.sample(DIAGNOSIS_CODES, 2))}",
+        f"Procedure: {', '.join(rng.sample(PROCEDURE_CODES, 2))}",
+        f"Admission: {admission.isoformat()}",
+        f"Discharge: {(admission + timedelta(days=rng.randint(1, 10))).isoformat()}",
+        f"Treatment: {rng.choice(SERVICES)}",
+        f"Physician: {rng.choice(PHYSICIANS)}",
+        _page_marker(page_index, page_count)
+    ])
+
+def _invoice_page(rng: random.Random, patient: str, page_index: int, page_count: int) -> str:
+    lines = [
+        "Hospital Invoice" if page_index == 0 else "Hospital Invoice (continued)",
+        f"Invoice Number: INV-{rng.randint(10000, 99999)}",
+        f"Patient: {patient}",
+        f"Hospital: {rng.choice(HOSPITAL_NAMES)}",
+        f"Service Date: {_random_date(rng).isoformat()}"
+    ]
+    for service in rng.sample(SERVICES, 3):
+        lines.append(f"{service}: {_amount(rng, 20, 800)}")
+    lines.append(f"Total Amount: {_amount(rng)}")
+    lines.append(_page_marker(page_index, page_count))
+    return "\n".join(lines)
+
+def _receipt_page(rng: random.Random, patient: str, page_index: int, page_count: int) -> str:
+    return "\n".join([
+        "Payment Receipt" if page_index == 0 else "Payment Receipt (continued)",
+        f"Patient: {patient}",
+        f"Amount: {_amount(rng)}",
+        f"Date: {_random_date(rng).isoformat()}",
+        f"Method: {rng.choice(['Credit Card', 'Cash', 'Bank Transfer'])}",
+        f"Reference: TXN-{rng.randint(100000, 999999)}",
+        _page_marker(page_index, page_count)
+    ])
+
+def _payment_proof_page(rng: random.Random, patient: str, page_index: int, page_count: int) -> str:
+    return "\n".join([
+        "Bank Payment Confirmation" if page_index == 0 else "Bank Payment Confirmation (continued)",
+        f"Payer: {patient}",
+        f"Beneficiary: {rng.choice(HOSPITAL_NAMES)}",
+        f"Amount: {_amount(rng)}",
+        f"Value Date: {_random_date(rng).isoformat()}",
+        f"Transaction ID: BANK-{rng.randint(100000, 999999)}",
+        _page_marker(page_index, page_count)
+    ])
+
+def _id_card_page(rng: random.Random, patient: str, page_index: int, page_count: int) -> str:
+    issue_date = _random_date(rng)
+    return "\n".join([
+        "Resident Identity Card" if page_index == 0 else "Resident Identity Card (back)",
+        f"Name: {patient}",
+        f"ID Number: {rng.randint(10**17, 10**18 - 1)}",
+        f"DOB: {date(rng.randint(1950, 2005), rng.randint(1, 12), rng.randint(1, 28)).isoformat()}",
+        f"Address: {rng.randint(1, 999)} Main Street, Beijing, China",
+        f"Issue Date: {issue_date.isoformat()}",
+        f"Expiry Date: {issue_date.replace(year=issue_date.year + 10).isoformat()}",
+        _page_marker(page_index, page_count)
+    ])
+
+PAGE_GENERATORS = {
+    "claim_form": _claim_form_page,
+    "discharge": _discharge_page,
+    "invoice": _invoice_page,
+    "receipt": _receipt_page,
+    "payment_proof": _payment_proof_page,
+    "id_card": _id_card_page
+}
+
+def generate_document(rng: random.Random, document_type: str, patient: str, page_count: int) -> SyntheticDocument:
+    """
+    生成单个合成文档
+    
+    Args:
+        rng: 随机数生成器
+        document_type: 文档类型
+        patient: 患者姓名
+        page_count: 页数
+    
+    Returns:
+        SyntheticDocument: 合成文档
+    """
+    page_generator = PAGE_GENERATORS[document_type]
+    return SyntheticDocument(
+        document_type=document_type,
+        page_texts=[page_generator(rng, patient, i, page_count) for i in range(page_count)]
+    )
+
+def generate_claim(rng: random.Random,
+                   claim_index: int,
+                   documents_per_claim: int = 6,
+                   pages_per_document: int = 2,
+                   document_types: Optional[List[str]] = None) -> SyntheticClaim:
+    """
+    生成单个合成索赔
+    第一份文档总是理赔表，其余文档从其他类型中轮流选取，页数在1到pages_per_document之间随机
+    
+    Args:
+        rng: 随机数生成器
+        claim_index: 索赔序号，用于生成索赔ID
+        documents_per_claim: 每个索赔的文档数（至少1）
+        pages_per_document: 每份文档的最大页数（至少1）
+        document_types: 除理赔表外可选的文档类型，默认为全部其他类型
+    
+    Returns:
+        SyntheticClaim: 合成索赔
+    """
+    claim_id = f"BENCH-{claim_index:05d}"
+    patient = rng.choice(PATIENT_NAMES)
+    other_types = document_types or [t for t in DOCUMENT_TYPES if t != "claim_form"]
+    
+    documents = [generate_document(rng, "claim_form", patient, rng.randint(1, max(1, pages_per_document)))]
+    offset = rng.randrange(len(other_types))
+    for i in range(max(1, documents_per_claim) - 1):
+        document_type = other_types[(offset + i) % len(other_types)]
+        page_count = rng.randint(1, max(1, pages_per_document))
+        documents.append(generate_document(rng, document_type, patient, page_count))
+    
+    return SyntheticClaim(
+        claim_id=claim_id,
+        blob_directory=f"{SYNTHETIC_CONTAINER}/{claim_id}",
+        documents=documents
+    )
+
+def generate_corpus(claim_count: int,
+                    documents_per_claim: int = 6,
+                    pages_per_document: int = 2,
+                    seed: int = 42) -> List[SyntheticClaim]:
+    """
+    生成合成索赔语料，相同参数和种子生成相同语料
+    
+    Args:
+        claim_count: 索赔数量
+        documents_per_claim: 每个索赔的文档数
+        pages_per_document: 每份文档的最大页数
+        seed: 随机种子
+    
+    Returns:
+        合成索赔列表
+    """
+    rng = random.Random(seed)
+    return [
+        generate_claim(rng, i + 1, documents_per_claim, pages_per_document)
+        for i in range(claim_count)
+    ]
\ No newline at end of file
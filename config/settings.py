@@ -1,17 +1,28 @@
+import json
+import hashlib
 import yaml
 from pathlib import Path
 
+# 安装了libyaml时使用C实现的加载器，解析速度比纯Python实现快一个数量级
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 # 加载全局配置
 def load_global_config():
     config_path = Path(__file__).parent / "global_versions.yaml"
     with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=_YAML_LOADER)
 
 # 加载文档版本配置
 def load_document_versions():
     config_path = Path(__file__).parent / "document_versions.yaml"
     with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=_YAML_LOADER)
+
+# 加载性能配置
+def load_performance_config():
+    config_path = Path(__file__).parent / "performance.yaml"
+    with open(config_path, 'r') as f:
+        return yaml.load(f, Loader=_YAML_LOADER) or {}
 
 # 全局配置
 GLOBAL_CONFIG = load_global_config()
@@ -19,12 +30,73 @@ GLOBAL_CONFIG = load_global_config()
 # 文档版本配置
 DOCUMENT_VERSIONS = load_document_versions()
 
+# 性能配置
+PERFORMANCE_CONFIG = load_performance_config()
+
 # 提供便捷访问
 DOCUMENT_CLASSIFIER_VERSION = GLOBAL_CONFIG["document_classifier_version"]
 NER_VERSION = GLOBAL_CONFIG["ner_extractor_version"]
 RULE_ENGINE = GLOBAL_CONFIG["rule_engine"]
 OPENAI_MODEL = GLOBAL_CONFIG["openai_model"]
 ADI_API_VERSION = GLOBAL_CONFIG["azure_document_intelligence_api_version"]
+OCR_MAX_CONCURRENCY = PERFORMANCE_CONFIG.get("ocr", {}).get("max_concurrency", 1)
+BATCH_MAX_CONCURRENT_CLAIMS = PERFORMANCE_CONFIG.get("batch", {}).get("max_concurrent_claims", 1)
+BATCH_MAX_ATTEMPTS = PERFORMANCE_CONFIG.get("batch", {}).get("max_attempts", 3)
+INGESTION_PREFETCH_WINDOW = PERFORMANCE_CONFIG.get("ingestion", {}).get("prefetch_window", 1)
+DEDUP_LEASE_SECONDS = PERFORMANCE_CONFIG.get("dedup", {}).get("lease_seconds", 120)
+DEDUP_POLL_INTERVAL_SECONDS = PERFORMANCE_CONFIG.get("dedup", {}).get("poll_interval_seconds", 2)
+BLOB_DOWNLOAD_MAX_WORKERS = PERFORMANCE_CONFIG.get("blob_download", {}).get("max_workers", 1)
+BLOB_DOWNLOAD_MAX_CONCURRENCY = PERFORMANCE_CONFIG.get("blob_download", {}).get("max_concurrency", 1)
+BLOB_DOWNLOAD_CHUNK_SIZE_BYTES = PERFORMANCE_CONFIG.get("blob_download", {}).get("chunk_size_bytes", 32 * 1024 * 1024)
+BLOB_DOWNLOAD_SPOOL_THRESHOLD_BYTES = PERFORMANCE_CONFIG.get("blob_download", {}).get("spool_threshold_bytes", 32 * 1024 * 1024)
+BLOB_LIST_PAGE_SIZE = PERFORMANCE_CONFIG.get("blob_download", {}).get("list_page_size", 5000)
+RESULT_SINK_FORMATS = PERFORMANCE_CONFIG.get("result_sink", {}).get("formats", ["json"])
+RESULT_SINK_COMPRESSION = PERFORMANCE_CONFIG.get("result_sink", {}).get("compression", "gzip")
+RESULT_SINK_MAX_SEGMENT_BYTES = PERFORMANCE_CONFIG.get("result_sink", {}).get("max_segment_bytes", 8 * 1024 * 1024)
+RESULT_SINK_MAX_SEGMENT_RECORDS = PERFORMANCE_CONFIG.get("result_sink", {}).get("max_segment_records", 1000)
+RESULT_SINK_MAX_SEGMENT_AGE_SECONDS = PERFORMANCE_CONFIG.get("result_sink", {}).get("max_segment_age_seconds", 60)
+RESULT_SINK_MAX_COMMIT_WAIT_SECONDS = PERFORMANCE_CONFIG.get("result_sink", {}).get("max_commit_wait_seconds", 0.2)
+STAGE_QUEUE_NAMES = PERFORMANCE_CONFIG.get("stages", {}).get("queues", {
+    "classify": "claim-stage-classify",
+    "extract": "claim-stage-extract",
+    "fan_in": "claim-stage-fanin",
+    "ner": "claim-stage-ner",
+    "rules": "claim-stage-rules"
+})
+STAGE_MAX_DEQUEUE_COUNT = PERFORMANCE_CONFIG.get("stages", {}).get("max_dequeue_count", 5)
+STAGE_VISIBILITY_TIMEOUT_SECONDS = PERFORMANCE_CONFIG.get("stages", {}).get("visibility_timeout_seconds", 600)
+ADAPTIVE_CONCURRENCY_SERVICES = PERFORMANCE_CONFIG.get("adaptive_concurrency", {}).get("services", {})
+ADAPTIVE_CONCURRENCY_INCREASE_STEP = PERFORMANCE_CONFIG.get("adaptive_concurrency", {}).get("increase_step", 1)
+ADAPTIVE_CONCURRENCY_LATENCY_DECREASE_FACTOR = PERFORMANCE_CONFIG.get("adaptive_concurrency", {}).get("latency_decrease_factor", 0.9)
+ADAPTIVE_CONCURRENCY_THROTTLE_DECREASE_FACTOR = PERFORMANCE_CONFIG.get("adaptive_concurrency", {}).get("throttle_decrease_factor", 0.5)
+ADAPTIVE_CONCURRENCY_MAX_RETRIES = PERFORMANCE_CONFIG.get("adaptive_concurrency", {}).get("max_retries", 3)
+ADAPTIVE_CONCURRENCY_BACKOFF_SECONDS = PERFORMANCE_CONFIG.get("adaptive_concurrency", {}).get("backoff_seconds", 0.5)
+ADAPTIVE_CONCURRENCY_DEFAULT_RETRY_AFTER_SECONDS = PERFORMANCE_CONFIG.get("adaptive_concurrency", {}).get("default_retry_after_seconds", 1)
+CLASSIFIER_CASCADE_LOCAL_VERSION = PERFORMANCE_CONFIG.get("classification", {}).get("cascade_local_version", "v1")
+CLASSIFIER_CASCADE_CONFIDENCE_THRESHOLD = PERFORMANCE_CONFIG.get("classification", {}).get("cascade_confidence_threshold", 0.75)
+CLASSIFIER_CASCADE_MAX_TEXT_CHARS = PERFORMANCE_CONFIG.get("classification", {}).get("cascade_max_text_chars", 4000)
+CLASSIFIER_BATCH_MAX_PAGES = PERFORMANCE_CONFIG.get("classification", {}).get("batch_max_pages", 20)
+CLASSIFIER_BATCH_MAX_PROMPT_TOKENS = PERFORMANCE_CONFIG.get("classification", {}).get("batch_max_prompt_tokens", 6000)
+CLASSIFIER_BATCH_SNIPPET_CHARS = PERFORMANCE_CONFIG.get("classification", {}).get("batch_snippet_chars", 1500)
+CLASSIFIER_V2_WEIGHTS_PATH = PERFORMANCE_CONFIG.get("classification", {}).get("v2_weights_path", "models/document_classifier_v2.npy")
+TEMPLATE_INDEX_ENABLED = PERFORMANCE_CONFIG.get("template_index", {}).get("enabled", DOCUMENT_CLASSIFIER_VERSION == "cascade")
+TEMPLATE_INDEX_MAX_ENTRIES = PERFORMANCE_CONFIG.get("template_index", {}).get("max_entries", 20000)
+TEMPLATE_INDEX_MAX_DISTANCE = PERFORMANCE_CONFIG.get("template_index", {}).get("max_distance", 6)
+TEMPLATE_INDEX_MIN_TOKENS = PERFORMANCE_CONFIG.get("template_index", {}).get("min_tokens", 20)
+TEMPLATE_INDEX_MIN_CONFIDENCE = PERFORMANCE_CONFIG.get("template_index", {}).get("min_confidence", 1.0)
+TEMPLATE_INDEX_PERSIST_EVERY = PERFORMANCE_CONFIG.get("template_index", {}).get("persist_every", 100)
+SEGMENTATION_HEADER_CHARS = PERFORMANCE_CONFIG.get("segmentation", {}).get("header_chars", 120)
+SEGMENTATION_HEADER_SIMILARITY = PERFORMANCE_CONFIG.get("segmentation", {}).get("header_similarity", 0.6)
+SEGMENTATION_MARKER_SCAN_CHARS = PERFORMANCE_CONFIG.get("segmentation", {}).get("marker_scan_chars", 200)
+EXTRACTION_CHUNK_MAX_TOKENS = PERFORMANCE_CONFIG.get("extraction", {}).get("chunk_max_tokens", 6000)
+EXTRACTION_CHUNK_MAX_PARALLEL = PERFORMANCE_CONFIG.get("extraction", {}).get("chunk_max_parallel", 4)
+EXTRACTION_CACHE_MAX_MB = PERFORMANCE_CONFIG.get("extraction_cache", {}).get("max_mb", 512)
+EXTRACTION_CACHE_TTL_HOURS = PERFORMANCE_CONFIG.get("extraction_cache", {}).get("ttl_hours", 720)
+WHOLE_CLAIM_EXTRACTION_ENABLED = PERFORMANCE_CONFIG.get("whole_claim_extraction", {}).get("enabled", False)
+WHOLE_CLAIM_MAX_DOCUMENTS = PERFORMANCE_CONFIG.get("whole_claim_extraction", {}).get("max_documents", 6)
+WHOLE_CLAIM_MAX_TOKENS = PERFORMANCE_CONFIG.get("whole_claim_extraction", {}).get("max_tokens", 3000)
+WHOLE_CLAIM_MAX_COMPLETION_TOKENS = PERFORMANCE_CONFIG.get("whole_claim_extraction", {}).get("max_completion_tokens", 4000)
+STRUCTURED_OUTPUT_MAX_ATTEMPTS = PERFORMANCE_CONFIG.get("structured_output", {}).get("max_attempts", 2)
 
 # 获取特定文档类型的版本
 def get_document_version(document_type: str) -> str:
@@ -32,4 +104,9 @@ def get_document_version(document_type: str) -> str:
 
 # 检查文档类型是否必需
 def is_document_required(document_type: str) -> bool:
-    return DOCUMENT_VERSIONS.get(document_type, {}).get("required", False)
\ No newline at end of file
+    return DOCUMENT_VERSIONS.get(document_type, {}).get("required", False)
+
+# 配置版本指纹：全局版本或文档版本变化时随之变化
+def get_config_version() -> str:
+    payload = json.dumps({"global": GLOBAL_CONFIG, "documents": DOCUMENT_VERSIONS}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
\ No newline at end of file
@@ -1,11 +1,58 @@
 from abc import ABC, abstractmethod
-from typing import Literal
+from typing import Iterable, List, Literal
+from schemas.classification_result import ClassificationResult
 
 DocumentType = Literal["claim_form", "discharge", "invoice", "receipt", "payment_proof", "id_card"]
 
+class ClassificationStream:
+    """
+    一个索赔的流式分类会话：页面随下载按文件加入，全部加入后finish返回与加入顺序一致的结果
+    默认实现在页面加入时立即分类；需要调用外部服务的分类器可以缓冲部分页面以合并请求
+    """
+    
+    def __init__(self, classifier: "BaseDocumentClassifier"):
+        self.classifier = classifier
+        self.results: List[ClassificationResult] = []
+    
+    def add(self, texts: List[str]) -> None:
+        """
+        加入一批页面
+        
+        Args:
+            texts: 页面文本
+        """
+        self.results.extend(self.classifier.classify_many(texts))
+    
+    async def add_async(self, texts: List[str]) -> None:
+        """
+        add的异步版本
+        
+        Args:
+            texts: 页面文本
+        """
+        self.results.extend(await self.classifier.classify_many_async(texts))
+    
+    def finish(self) -> List[ClassificationResult]:
+        """
+        完成所有缓冲中的分类
+        
+        Returns:
+            所有加入页面的分类结果
+        """
+        return self.results
+    
+    async def finish_async(self) -> List[ClassificationResult]:
+        """
+        finish的异步版本
+        
+        Returns:
+            所有加入页面的分类结果
+        """
+        return self.finish()
+
 class BaseDocumentClassifier(ABC):
     @abstractmethod
-    def classify(self, text: str) -> DocumentType:
+    def classify(self, text: str) -> ClassificationResult:
         """
         根据文本内容分类文档类型
         
@@ -13,6 +60,50 @@ class BaseDocumentClassifier(ABC):
             text: 文档页面的文本内容
             
         Returns:
-            DocumentType: 文档类型
+            ClassificationResult: 文档类型和置信度
+        """
+        pass
+    
+    def classify_many(self, texts: Iterable[str]) -> List[ClassificationResult]:
+        """
+        批量分类页面，子类可以覆盖以实现更高效的批处理
+        
+        Args:
+            texts: 文档页面的文本内容
+            
+        Returns:
+            与输入顺序一致的分类结果列表
+        """
+        return [self.classify(text) for text in texts]
+    
+    async def classify_many_async(self, texts: List[str]) -> List[ClassificationResult]:
+        """
+        classify_many的异步版本，默认直接在事件循环中执行本地分类
+        需要调用外部服务的子类应覆盖此方法
+        
+        Args:
+            texts: 文档页面的文本内容
+            
+        Returns:
+            与输入顺序一致的分类结果列表
+        """
+        return self.classify_many(texts)
+    
+    def stream(self) -> ClassificationStream:
+        """
+        开始一个索赔的流式分类，页面下载和识别完成一批就加入一批
+        
+        Returns:
+            ClassificationStream: 流式分类会话
+        """
+        return ClassificationStream(self)
+    
+    def bind_clients(self, openai_client=None, async_openai_client=None):
+        """
+        绑定处理器在预热阶段打开的OpenAI客户端，本地分类器忽略
+        
+        Args:
+            openai_client: Azure OpenAI客户端
+            async_openai_client: 异步Azure OpenAI客户端
         """
         pass
\ No newline at end of file
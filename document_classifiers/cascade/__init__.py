@@ -0,0 +1 @@
+# document classifier cascade package
\ No newline at end of file
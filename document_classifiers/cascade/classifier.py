@@ -0,0 +1,448 @@
+"""
+级联文档分类器
+先用本地分类器分类所有页面，只有置信度低于阈值的页面才交给OpenAI分类
+"""
+import time
+import asyncio
+import threading
+import json
+from typing import Dict, Iterable, List, Optional, Tuple, get_args
+from pydantic import BaseModel
+from document_classifiers.base_classifier import BaseDocumentClassifier, ClassificationStream, DocumentType
+from document_classifiers.cascade.prompt import CLASSIFY_PROMPT, BATCH_CLASSIFY_PROMPT
+from schemas.classification_result import ClassificationResult
+from utils.performance import get_current_recorder
+from utils.tokens import estimate_tokens
+
+DOCUMENT_TYPES = get_args(DocumentType)
+
+# 批量请求中每个页面的page标签和ID占用的token数（估算）
+PAGE_OVERHEAD_TOKENS = 12
+# 批量响应中每个页面的标签对象占用的token数（估算）
+LABEL_TOKENS_PER_PAGE = 15
+
+class CascadeClassifierStats(BaseModel):
+    """
+    级联分类器在当前进程中的累计统计
+    """
+    pages: int
+    escalated_pages: int
+    failed_escalations: int  # OpenAI调用失败或返回无效类型、保留本地结果的页面数
+    batch_requests: int  # 批量分类请求数
+    fallback_pages: int  # 批量结果中缺失或无效、改为逐页分类的页面数
+    escalation_rate: float
+    mean_escalation_ms: float  # 每个成功升级的页面的平均OpenAI耗时，批量请求按页分摊
+    estimated_saved_ms: float  # 未升级的页面数 × 当时每页的平均升级耗时
+
+def page_id(index: int) -> str:
+    """
+    批量请求中的页面ID，由页面在本次分类调用中的位置决定，与分批方式无关
+    """
+    return f"p{index + 1}"
+
+def parse_document_type(response: str) -> Optional[str]:
+    """
+    解析OpenAI返回的文档类型，容忍引号、句号和大小写差异
+    
+    Args:
+        response: OpenAI返回的文本
+    
+    Returns:
+        文档类型，无法识别时返回None
+    """
+    if not isinstance(response, str):
+        return None
+    label = response.strip().strip("\"'`.").strip().lower()
+    return label if label in DOCUMENT_TYPES else None
+
+def parse_batch_labels(response: str) -> Dict[str, str]:
+    """
+    解析批量分类返回的JSON数组，容忍代码块标记和数组前后的说明文字
+    
+    Args:
+        response: OpenAI返回的文本
+    
+    Returns:
+        页面ID到文档类型的映射，只包含ID和类型都有效的元素；无法解析时返回空字典
+    """
+    start, end = response.find("["), response.rfind("]")
+    if start < 0 or end < start:
+        return {}
+    try:
+        items = json.loads(response[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    
+    labels = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        document_type = parse_document_type(item.get("document_type", item.get("label")))
+        if item.get("id") is not None and document_type is not None:
+            labels[str(item["id"])] = document_type
+    return labels
+
+class CascadeDocumentClassifier(BaseDocumentClassifier):
+    """
+    级联分类器：本地分类器的置信度达到阈值时直接采用其结果，否则交给OpenAI分类
+    需要升级的页面按token预算分批，用AzureOpenAIClient.classify_documents在一次请求中分类，
+    批量结果中缺失或无效的页面再用classify_document逐页分类
+    未绑定OpenAI客户端时只使用本地分类器
+    """
+    
+    def __init__(self,
+                 local_classifier: BaseDocumentClassifier,
+                 confidence_threshold: float,
+                 max_text_chars: int,
+                 batch_max_pages: int = 1,
+                 batch_max_prompt_tokens: int = 6000,
+                 batch_snippet_chars: int = 1500,
+                 openai_client=None,
+                 async_openai_client=None):
+        """
+        初始化级联分类器
+        
+        Args:
+            local_classifier: 本地分类器
+            confidence_threshold: 置信度低于此值的页面交给OpenAI分类
+            max_text_chars: 单页分类请求发送的页面文本的最大字符数
+            batch_max_pages: 每个批量分类请求的最大页数，为1时每页单独请求
+            batch_max_prompt_tokens: 每个批量分类请求的提示词token预算（估算）
+            batch_snippet_chars: 批量分类请求中每页发送的最大字符数
+            openai_client: Azure OpenAI客户端（可选，也可在预热阶段通过bind_clients绑定）
+            async_openai_client: 异步Azure OpenAI客户端（可选）
+        """
+        self.local_classifier = local_classifier
+        self.confidence_threshold = confidence_threshold
+        self.max_text_chars = max_text_chars
+        self.batch_max_pages = max(1, batch_max_pages)
+        self.batch_max_prompt_tokens = batch_max_prompt_tokens
+        self.batch_snippet_chars = batch_snippet_chars
+        self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
+        
+        self._lock = threading.Lock()
+        self._pages = 0
+        self._escalated_pages = 0
+        self._failed_escalations = 0
+        self._successful_escalations = 0
+        self._batch_requests = 0
+        self._fallback_pages = 0
+        self._escalation_ms = 0.0
+        self._saved_ms = 0.0
+    
+    def bind_clients(self, openai_client=None, async_openai_client=None):
+        """
+        绑定处理器在预热阶段打开的OpenAI客户端，构造时已提供的客户端不被覆盖
+        
+        Args:
+            openai_client: Azure OpenAI客户端
+            async_openai_client: 异步Azure OpenAI客户端
+        """
+        if self.openai_client is None:
+            self.openai_client = openai_client
+        if self.async_openai_client is None:
+            self.async_openai_client = async_openai_client
+        self.local_classifier.bind_clients(openai_client, async_openai_client)
+    
+    def classify(self, text: str) -> ClassificationResult:
+        """
+        对单个页面分类
+        
+        Args:
+            text: 页面文本
+        
+        Returns:
+            ClassificationResult: 分类结果
+        """
+        return self.classify_many([text])[0]
+    
+    def classify_many(self, texts: Iterable[str]) -> List[ClassificationResult]:
+        """
+        批量分类页面，低置信度的页面按批交给OpenAI分类，批量结果中缺失或无法解析的页面再逐页分类
+        
+        Args:
+            texts: 页面文本
+        
+        Returns:
+            与输入顺序一致的分类结果列表
+        """
+        stream = self.stream()
+        stream.add(list(texts))
+        return stream.finish()
+    
+    async def classify_many_async(self, texts: List[str]) -> List[ClassificationResult]:
+        """
+        classify_many的异步版本，各批请求和逐页回退请求分别并发执行
+        
+        Args:
+            texts: 页面文本
+        
+        Returns:
+            与输入顺序一致的分类结果列表
+        """
+        stream = self.stream()
+        await stream.add_async(list(texts))
+        return await stream.finish_async()
+    
+    def stream(self) -> "CascadeClassificationStream":
+        return CascadeClassificationStream(self)
+    
+    def _batch_pages(self, texts: List[str], batch: List[int]) -> List[Tuple[str, str]]:
+        return [(page_id(i), texts[i][:self.batch_snippet_chars]) for i in batch]
+    
+    def _batch_max_tokens(self, batch: List[int]) -> int:
+        # 每个页面的标签约占15个token，另留出数组括号等的余量
+        return LABEL_TOKENS_PER_PAGE * len(batch) + 50
+    
+    def _apply_batch_response(self, results: List[ClassificationResult], batch: List[int],
+                              response, start: float) -> List[int]:
+        """
+        把批量分类的响应写入结果列表
+        请求失败时整批保留本地结果（限制器已重试过），不逐页回退；标签缺失或无效的页面需要逐页分类
+        
+        Args:
+            results: 分类结果列表，原地更新
+            batch: 本批页面下标
+            response: OpenAI返回的文本，调用失败时为异常
+            start: 调用开始时间（time.perf_counter）
+        
+        Returns:
+            需要逐页分类的页面下标
+        """
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if isinstance(response, Exception):
+            print(f"Batch classification of {len(batch)} pages failed, keeping local results: {response!r}")
+            self._record_escalations(0, len(batch), 0.0, batch_request=True)
+            return []
+        
+        labels = parse_batch_labels(response)
+        fallback = []
+        for i in batch:
+            document_type = labels.get(page_id(i))
+            if document_type is None:
+                fallback.append(i)
+            else:
+                results[i] = self._escalated(results[i], document_type)
+        if fallback:
+            print(f"Batch classification returned no valid label for {len(fallback)} of {len(batch)} pages, "
+                  f"classifying them one by one")
+        self._record_escalations(len(batch) - len(fallback), 0, elapsed_ms, batch_request=True,
+                                 fallback_pages=len(fallback))
+        return fallback
+    
+    def _escalated_result(self, local_result: ClassificationResult, response, start: float) -> ClassificationResult:
+        """
+        根据单页分类的响应生成分类结果，调用失败或返回无效类型时保留本地结果
+        
+        Args:
+            local_result: 本地分类结果
+            response: OpenAI返回的文本，调用失败时为异常
+            start: 调用开始时间（time.perf_counter）
+        
+        Returns:
+            ClassificationResult: 分类结果
+        """
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        document_type = None if isinstance(response, Exception) else parse_document_type(response)
+        if document_type is None:
+            self._record_escalations(0, 1, 0.0)
+            print(f"Classification escalation failed, keeping local result {local_result.document_type}: {response!r}")
+            return local_result
+        self._record_escalations(1, 0, elapsed_ms)
+        return self._escalated(local_result, document_type)
+    
+    def _escalated(self, local_result: ClassificationResult, document_type: str) -> ClassificationResult:
+        return ClassificationResult(
+            document_type=document_type,
+            confidence=1.0,
+            matched_keywords=local_result.matched_keywords,
+            escalated=True
+        )
+    
+    def _record_escalations(self, succeeded: int, failed: int, elapsed_ms: float,
+                            batch_request: bool = False, fallback_pages: int = 0):
+        with self._lock:
+            self._successful_escalations += succeeded
+            self._failed_escalations += failed
+            self._escalation_ms += elapsed_ms
+            self._batch_requests += int(batch_request)
+            self._fallback_pages += fallback_pages
+    
+    def _record_batch(self, pages: int, escalated: int):
+        """
+        累计统计，并把本批页面的升级情况记入当前索赔的性能报告
+        节省的时间按当前每页的平均升级耗时估算，尚未有成功的升级时为0
+        
+        Args:
+            pages: 本批页面数
+            escalated: 本批交给OpenAI分类的页面数
+        """
+        with self._lock:
+            mean_escalation_ms = self._escalation_ms / self._successful_escalations if self._successful_escalations else 0.0
+            saved_ms = (pages - escalated) * mean_escalation_ms
+            self._pages += pages
+            self._escalated_pages += escalated
+            self._saved_ms += saved_ms
+        
+        recorder = get_current_recorder()
+        if recorder is not None:
+            recorder.record_classification(pages, escalated, saved_ms)
+    
+    def stats(self) -> CascadeClassifierStats:
+        """
+        获取当前进程中的累计统计
+        
+        Returns:
+            CascadeClassifierStats: 统计信息
+        """
+        with self._lock:
+            return CascadeClassifierStats(
+                pages=self._pages,
+                escalated_pages=self._escalated_pages,
+                failed_escalations=self._failed_escalations,
+                batch_requests=self._batch_requests,
+                fallback_pages=self._fallback_pages,
+                escalation_rate=round(self._escalated_pages / self._pages, 4) if self._pages else 0.0,
+                mean_escalation_ms=round(
+                    self._escalation_ms / self._successful_escalations if self._successful_escalations else 0.0, 3
+                ),
+                estimated_saved_ms=round(self._saved_ms, 3)
+            )
+
+class CascadeClassificationStream(ClassificationStream):
+    """
+    级联分类器的流式会话
+    每批页面到达时立即做本地分类，低置信度的页面进入待升级缓冲区；缓冲区达到batch_max_pages页
+    或提示词token预算时立即发送一个批量请求（异步时在后台并发执行），不等待后续文件下载，
+    剩余的页面在finish时发送
+    """
+    
+    def __init__(self, classifier: CascadeDocumentClassifier):
+        super().__init__(classifier)
+        self.texts: List[str] = []
+        self._pending: List[int] = []
+        self._pending_tokens = 0
+        self._escalated = 0
+        self._tasks: List[asyncio.Task] = []
+        self._budget = classifier.batch_max_prompt_tokens - estimate_tokens(BATCH_CLASSIFY_PROMPT)
+    
+    def add(self, texts: List[str]) -> None:
+        for batch in self._buffer(texts, self.classifier.openai_client):
+            self._escalate(batch)
+    
+    async def add_async(self, texts: List[str]) -> None:
+        for batch in self._buffer(texts, self.classifier.async_openai_client):
+            self._tasks.append(asyncio.create_task(self._escalate_async(batch)))
+    
+    def finish(self) -> List[ClassificationResult]:
+        if self._pending:
+            self._escalate(self._take_pending())
+        self.classifier._record_batch(len(self.texts), self._escalated)
+        return self.results
+    
+    async def finish_async(self) -> List[ClassificationResult]:
+        if self._pending:
+            self._tasks.append(asyncio.create_task(self._escalate_async(self._take_pending())))
+        await asyncio.gather(*self._tasks)
+        self.classifier._record_batch(len(self.texts), self._escalated)
+        return self.results
+    
+    def _buffer(self, texts: List[str], client) -> List[List[int]]:
+        """
+        本地分类新加入的页面，把低置信度的页面加入待升级缓冲区
+        单个页面超出预算时单独成批（其文本已截断为batch_snippet_chars）
+        
+        Args:
+            texts: 新加入的页面文本
+            client: 升级使用的OpenAI客户端，为None时只使用本地分类结果
+        
+        Returns:
+            已满、需要立即发送的批（页面在本会话中的下标）
+        """
+        classifier = self.classifier
+        offset = len(self.texts)
+        self.texts.extend(texts)
+        self.results.extend(classifier.local_classifier.classify_many(texts))
+        if client is None:
+            return []
+        
+        ready = []
+        for i in range(offset, len(self.texts)):
+            if self.results[i].confidence >= classifier.confidence_threshold:
+                continue
+            self._escalated += 1
+            page_tokens = estimate_tokens(self.texts[i][:classifier.batch_snippet_chars]) + PAGE_OVERHEAD_TOKENS
+            if self._pending and self._pending_tokens + page_tokens > self._budget:
+                ready.append(self._take_pending())
+            self._pending.append(i)
+            self._pending_tokens += page_tokens
+            if len(self._pending) >= classifier.batch_max_pages or self._pending_tokens >= self._budget:
+                ready.append(self._take_pending())
+        return ready
+    
+    def _take_pending(self) -> List[int]:
+        batch = self._pending
+        self._pending, self._pending_tokens = [], 0
+        return batch
+    
+    def _escalate(self, batch: List[int]):
+        """
+        用OpenAI分类一批页面，batch_max_pages为1时每页单独请求；批量结果中缺失或无效的页面逐页分类
+        
+        Args:
+            batch: 页面下标
+        """
+        classifier = self.classifier
+        client = classifier.openai_client
+        fallback = batch
+        if classifier.batch_max_pages > 1:
+            start = time.perf_counter()
+            try:
+                response = client.classify_documents(
+                    BATCH_CLASSIFY_PROMPT, classifier._batch_pages(self.texts, batch),
+                    max_tokens=classifier._batch_max_tokens(batch)
+                )
+            except Exception as e:
+                response = e
+            fallback = classifier._apply_batch_response(self.results, batch, response, start)
+        
+        for i in fallback:
+            start = time.perf_counter()
+            try:
+                response = client.classify_document(CLASSIFY_PROMPT, self.texts[i][:classifier.max_text_chars])
+            except Exception as e:
+                response = e
+            self.results[i] = classifier._escalated_result(self.results[i], response, start)
+    
+    async def _escalate_async(self, batch: List[int]):
+        """
+        _escalate的异步版本，逐页回退请求并发执行
+        
+        Args:
+            batch: 页面下标
+        """
+        classifier = self.classifier
+        client = classifier.async_openai_client
+        fallback = batch
+        if classifier.batch_max_pages > 1:
+            start = time.perf_counter()
+            try:
+                response = await client.classify_documents(
+                    BATCH_CLASSIFY_PROMPT, classifier._batch_pages(self.texts, batch),
+                    max_tokens=classifier._batch_max_tokens(batch)
+                )
+            except Exception as e:
+                response = e
+            fallback = classifier._apply_batch_response(self.results, batch, response, start)
+        
+        async def escalate(i: int) -> ClassificationResult:
+            start = time.perf_counter()
+            try:
+                response = await client.classify_document(CLASSIFY_PROMPT, self.texts[i][:classifier.max_text_chars])
+            except Exception as e:
+                response = e
+            return classifier._escalated_result(self.results[i], response, start)
+        
+        for i, result in zip(fallback, await asyncio.gather(*(escalate(i) for i in fallback))):
+            self.results[i] = result
\ No newline at end of file
@@ -0,0 +1,33 @@
+# 级联分类器升级到OpenAI时使用的分类提示词，页面文本由classify_document附加在提示词之后
+
+CLASSIFY_PROMPT = """
+You are an expert document classifier for insurance claims processing. 
+
+Please classify the following document text into one of these exact categories:
+- "claim_form": Insurance claim form with policy number and claim details
+- "discharge": Hospital discharge summary or report
+- "invoice": Medical invoice or bill with itemized costs
+- "receipt": Payment receipt with transaction details
+- "payment_proof": Bank statement or other proof of payment
+- "id_card": Patient identification card or document
+
+Respond with ONLY the category name in lowercase, nothing else.
+"""
+
+# 批量分类提示词，页面由classify_documents用带ID的page标签附加在提示词之后
+BATCH_CLASSIFY_PROMPT = """
+You are an expert document classifier for insurance claims processing. 
+
+Each page below is wrapped in a <page id="..."> tag. Classify every page into one of these exact categories:
+- "claim_form": Insurance claim form with policy number and claim details
+- "discharge": Hospital discharge summary or report
+- "invoice": Medical invoice or bill with itemized costs
+- "receipt": Payment receipt with transaction details
+- "payment_proof": Bank statement or other proof of payment
+- "id_card": Patient identification card or document
+
+Pages may be truncated. Classify each page on its own.
+
+Respond with ONLY a JSON array containing one object per page, in the same order, using the page ids exactly as given:
+[{"id": "p1", "document_type": "invoice"}, {"id": "p2", "document_type": "receipt"}]
+"""
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+编译式关键字分类引擎
+把分类器的全部关键字规则编译成一个正则表达式，每个页面只扫描一遍文本，
+再用位掩码按优先级判断规则，而不是对每个关键字分别做子串查找
+"""
+import re
+from typing import Dict, Iterable, List, Tuple
+from pydantic import BaseModel
+from schemas.classification_result import ClassificationResult
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """
+    把关键字构造成前缀树形式的正则表达式，例如id和identification构造为id(?:entification)?
+    每个位置只需比较一次首字符，并且总是匹配该位置上最长的关键字
+    
+    Args:
+        keywords: 小写关键字
+    
+    Returns:
+        正则表达式
+    """
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+    
+    return build(trie)
+
+class KeywordRule(BaseModel):
+    """
+    关键字规则：all_of中的每一组关键字都至少出现一个时规则命中
+    关键字按子串匹配（不区分大小写），例如"insur"同时匹配insurance和insured
+    """
+    document_type: str
+    all_of: List[List[str]]
+
+class CompiledKeywordClassifier:
+    """
+    编译后的关键字分类器
+    规则按列表顺序决定优先级，第一个命中的规则决定文档类型；没有规则命中时返回默认类型
+    """
+    
+    def __init__(self, rules: List[KeywordRule], default_type: str):
+        """
+        编译关键字规则
+        
+        Args:
+            rules: 按优先级排列的关键字规则
+            default_type: 没有规则命中时的文档类型
+        """
+        keywords = sorted({keyword.lower() for rule in rules for group in rule.all_of for keyword in group})
+        self._keywords = keywords
+        self._bits = {keyword: 1 << i for i, keyword in enumerate(keywords)}
+        
+        # 不重叠匹配时，完全包含在已匹配关键字中的关键字（例如paid中的id）必然也出现
+        self._implied = {
+            keyword: self._mask(k for k in keywords if k in keyword)
+            for keyword in keywords
+        }
+        # 从已匹配关键字内部开始、延伸到其后的关键字会被跳过（例如paidate中的date），
+        # 只有在可能造成跳过的关键字命中时才对其单独做一次子串查找
+        self._straddled: List[Tuple[str, int, int]] = []
+        for keyword in keywords:
+            sources = self._mask(
+                other for other in keywords
+                if keyword not in other and any(keyword.startswith(other[i:]) for i in range(1, len(other)))
+            )
+            if sources:
+                self._straddled.append((keyword, self._bits[keyword], sources))
+        self._pattern = re.compile(_trie_pattern(keywords))
+        
+        self._rules: List[Tuple[str, List[int]]] = [
+            (rule.document_type, [self._mask(k.lower() for k in group) for group in rule.all_of])
+            for rule in rules
+        ]
+        self._type_masks: Dict[str, int] = {}
+        for document_type, groups in self._rules:
+            for group in groups:
+                self._type_masks[document_type] = self._type_masks.get(document_type, 0) | group
+        self._default_type = default_type
+    
+    def _mask(self, keywords: Iterable[str]) -> int:
+        mask = 0
+        for keyword in keywords:
+            mask |= self._bits[keyword]
+        return mask
+    
+    def scan(self, text: str) -> int:
+        """
+        扫描一遍页面文本，返回出现的关键字位掩码
+        
+        Args:
+            text: 页面文本
+        
+        Returns:
+            关键字位掩码
+        """
+        implied = self._implied
+        text = text.lower()
+        mask = 0
+        for keyword in set(self._pattern.findall(text)):
+            mask |= implied[keyword]
+        for keyword, bit, sources in self._straddled:
+            if mask & sources and not mask & bit and keyword in text:
+                mask |= bit
+        return mask
+    
+    def classify(self, text: str) -> ClassificationResult:
+        """
+        对单个页面分类
+        置信度为获胜类型的关键字证据占所有命中规则的类型的关键字证据的比例：
+        只有一种类型的规则命中时为1，多种类型同时命中（按优先级取第一个）时相应降低，没有规则命中时为0
+        
+        Args:
+            text: 页面文本
+        
+        Returns:
+            ClassificationResult: 分类结果
+        """
+        mask = self.scan(text)
+        matched_keywords = [keyword for keyword in self._keywords if mask & self._bits[keyword]]
+        
+        matched_types = []
+        for document_type, groups in self._rules:
+            if document_type not in matched_types and all(mask & group for group in groups):
+                matched_types.append(document_type)
+        
+        if not matched_types:
+            return ClassificationResult(
+                document_type=self._default_type, confidence=0.0, matched_keywords=matched_keywords
+            )
+        
+        evidence = {t: bin(mask & self._type_masks[t]).count("1") for t in matched_types}
+        return ClassificationResult(
+            document_type=matched_types[0],
+            confidence=round(evidence[matched_types[0]] / sum(evidence.values()), 3),
+            matched_keywords=matched_keywords
+        )
+    
+    def classify_many(self, texts: Iterable[str]) -> List[ClassificationResult]:
+        """
+        批量分类页面
+        
+        Args:
+            texts: 页面文本
+        
+        Returns:
+            与输入顺序一致的分类结果列表
+        """
+        classify = self.classify
+        return [classify(text) for text in texts]
\ No newline at end of file
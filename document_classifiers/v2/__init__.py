@@ -0,0 +1 @@
+# document classifiers v2 package
\ No newline at end of file
@@ -0,0 +1,129 @@
+from pathlib import Path
+from typing import Iterable, List, Optional, get_args
+import numpy as np
+from pydantic import BaseModel
+from document_classifiers.base_classifier import BaseDocumentClassifier, DocumentType
+from document_classifiers.v2.features import FeatureHasher, HashingConfig
+from schemas.classification_result import ClassificationResult
+from config.settings import CLASSIFIER_V2_WEIGHTS_PATH
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# 每次矩阵运算处理的页面数，限制特征权重矩阵的临时内存
+BATCH_PAGES = 256
+
+class V2ModelMetadata(BaseModel):
+    """
+    权重文件旁的元数据（同名.json文件）
+    """
+    classes: List[str]  # 权重矩阵各列对应的文档类型
+    hashing: HashingConfig
+    trained_pages: int = 0
+    validation_accuracy: Optional[float] = None
+
+def resolve_weights_path(path: Optional[str] = None) -> Path:
+    """
+    解析权重文件路径，相对路径相对于项目根目录
+    
+    Args:
+        path: 权重文件路径，默认使用配置中的v2_weights_path
+    
+    Returns:
+        权重文件的绝对路径
+    """
+    resolved = Path(path or CLASSIFIER_V2_WEIGHTS_PATH)
+    return resolved if resolved.is_absolute() else PROJECT_ROOT / resolved
+
+def metadata_path(weights_path: Path) -> Path:
+    return weights_path.with_suffix(".json")
+
+def linear_scores(weights: np.ndarray, offsets: np.ndarray, columns: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    计算一批页面的线性得分：权重矩阵最后一行是偏置，其余行按特征下标取出后按特征数值加权求和
+    
+    Args:
+        weights: (n_features + 1, 类型数) 的权重矩阵（可以是内存映射数组）
+        offsets: 行偏移，见FeatureHasher.transform
+        columns: 特征下标
+        values: 特征数值
+    
+    Returns:
+        (页面数, 类型数) 的得分矩阵
+    """
+    row_count = len(offsets) - 1
+    scores = np.tile(np.asarray(weights[-1], dtype=np.float32), (row_count, 1))
+    if columns.size:
+        contributions = np.asarray(weights[columns]) * values[:, None]
+        # reduceat不支持空区间，没有特征的页面只保留偏置
+        nonempty = offsets[:-1] < offsets[1:]
+        scores[nonempty] += np.add.reduceat(contributions, offsets[:-1][nonempty], axis=0)
+    return scores
+
+def softmax(scores: np.ndarray) -> np.ndarray:
+    exp = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+class DocumentClassifierV2(BaseDocumentClassifier):
+    """
+    哈希特征的线性分类器（多类逻辑回归），介于关键字规则和OpenAI之间
+    权重以内存映射方式加载，同一台机器上的所有worker进程共享同一份物理内存页
+    权重由document_classifiers.v2.train离线训练生成
+    """
+    
+    def __init__(self, weights_path: Optional[str] = None):
+        """
+        加载权重和元数据
+        
+        Args:
+            weights_path: 权重文件（.npy）路径，默认使用配置中的v2_weights_path
+        """
+        path = resolve_weights_path(weights_path)
+        if not path.exists():
+            raise FileNotFoundError(
+                f"Document classifier v2 weights not found at {path}; "
+                f"train them with python -m document_classifiers.v2.train --output {path}"
+            )
+        metadata = V2ModelMetadata.model_validate_json(metadata_path(path).read_text(encoding="utf-8"))
+        unknown = set(metadata.classes) - set(get_args(DocumentType))
+        if unknown:
+            raise ValueError(f"Unsupported document types in {metadata_path(path)}: {sorted(unknown)}")
+        
+        self.weights = np.load(path, mmap_mode="r")
+        expected_shape = (metadata.hashing.n_features + 1, len(metadata.classes))
+        if self.weights.shape != expected_shape:
+            raise ValueError(f"Weights {path} have shape {self.weights.shape}, expected {expected_shape}")
+        self.classes = metadata.classes
+        self.hasher = FeatureHasher(metadata.hashing)
+    
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """
+        计算一批页面属于各文档类型的概率
+        
+        Args:
+            texts: 页面文本
+        
+        Returns:
+            (页面数, 类型数) 的概率矩阵，列顺序与self.classes一致
+        """
+        probabilities = [np.empty((0, len(self.classes)), dtype=np.float32)]
+        for start in range(0, len(texts), BATCH_PAGES):
+            offsets, columns, values = self.hasher.transform(texts[start:start + BATCH_PAGES])
+            probabilities.append(softmax(linear_scores(self.weights, offsets, columns, values)))
+        return np.concatenate(probabilities)
+    
+    def classify(self, text: str) -> ClassificationResult:
+        """
+        对单个页面分类，置信度为预测类型的概率
+        """
+        return self.classify_many([text])[0]
+    
+    def classify_many(self, texts: Iterable[str]) -> List[ClassificationResult]:
+        """
+        按矩阵批量分类页面
+        """
+        probabilities = self.predict_proba(list(texts))
+        best = probabilities.argmax(axis=1)
+        return [
+            ClassificationResult(document_type=self.classes[index], confidence=round(float(row[index]), 3))
+            for index, row in zip(best, probabilities)
+        ]
\ No newline at end of file
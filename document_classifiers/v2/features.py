@@ -0,0 +1,126 @@
+"""
+v2分类器的哈希特征
+页面文本归一化后取单词、相邻词对和词内字符n-gram，用crc32哈希到固定维度（不需要词表），
+训练和推理共用同一套特征，参数保存在权重元数据中
+"""
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Tuple
+import numpy as np
+from pydantic import BaseModel
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_DIGIT_PATTERN = re.compile(r"[0-9]+")
+
+# 单词到特征下标的缓存上限，同一批页面中的单词大量重复
+_WORD_CACHE_LIMIT = 200000
+
+# 组合相邻两个单词哈希的乘数（64位黄金比例常数）
+_BIGRAM_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+class HashingConfig(BaseModel):
+    """
+    特征哈希参数
+    """
+    n_features: int = 1 << 18  # 哈希空间大小，必须是2的幂
+    char_ngram_min: int = 3
+    char_ngram_max: int = 5
+    max_chars: int = 4000  # 每页只使用开头这么多字符
+
+class FeatureHasher:
+    """
+    把页面文本转换为稀疏的哈希特征向量（下标和数值），数值为log(1 + 次数)并做L2归一化
+    """
+    
+    def __init__(self, config: HashingConfig):
+        if config.n_features & (config.n_features - 1):
+            raise ValueError(f"n_features must be a power of two: {config.n_features}")
+        self.config = config
+        self._mask = config.n_features - 1
+        self._word_cache: Dict[str, Tuple[int, Tuple[int, ...]]] = {}
+    
+    def _hash(self, feature: str) -> int:
+        return zlib.crc32(feature.encode("utf-8")) & self._mask
+    
+    def _word_entry(self, word: str) -> Tuple[int, Tuple[int, ...]]:
+        # (单词的32位哈希, 单词及其字符n-gram的特征下标)
+        entry = self._word_cache.get(word)
+        if entry is not None:
+            return entry
+        
+        padded = f"<{word}>"
+        grams = [f"w:{word}"]
+        for n in range(self.config.char_ngram_min, self.config.char_ngram_max + 1):
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        entry = (zlib.crc32(word.encode("utf-8")), tuple(self._hash(gram) for gram in grams))
+        
+        if len(self._word_cache) >= _WORD_CACHE_LIMIT:
+            self._word_cache.clear()
+        self._word_cache[word] = entry
+        return entry
+    
+    def transform(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        计算一批页面的特征，按CSR格式排列
+        单词特征按每页不重复的单词计算一次再乘以出现次数，相邻词对的特征由两个单词的哈希组合得到，
+        合并计数、取对数和归一化对整批页面一次完成
+        
+        Args:
+            texts: 页面文本
+        
+        Returns:
+            (行偏移, 特征下标, 特征数值)，第i页的特征位于offsets[i]到offsets[i + 1]之间，每页内下标升序且不重复
+        """
+        n_features = self.config.n_features
+        keys: List[int] = []  # 页面序号 * n_features + 特征下标
+        weights: List[int] = []
+        word_hashes: List[int] = []
+        bigram_rows: List[int] = []
+        for row, text in enumerate(texts):
+            words = _TOKEN_PATTERN.findall(_DIGIT_PATTERN.sub("0", text[:self.config.max_chars].lower()))
+            base = row * n_features
+            entries = {}
+            for word, count in Counter(words).items():
+                entries[word] = self._word_entry(word)
+                features = entries[word][1]
+                keys.extend(base + feature for feature in features)
+                weights.extend([count] * len(features))
+            if len(words) > 1:
+                word_hashes.extend(entries[word][0] for word in words)
+                bigram_rows.extend([row] * len(words))
+                # 每页最后一个单词不与下一页的第一个单词组合
+                bigram_rows[-1] = -1
+        
+        hashes = np.asarray(word_hashes, dtype=np.uint64)
+        bigrams = hashes[:-1] * _BIGRAM_MULTIPLIER + hashes[1:]
+        bigrams = (bigrams ^ (bigrams >> np.uint64(29))) & np.uint64(self._mask)
+        rows = np.asarray(bigram_rows[:-1], dtype=np.int64)
+        within_page = rows >= 0
+        bigram_keys = rows[within_page] * n_features + bigrams[within_page].astype(np.int64)
+        
+        all_keys = np.concatenate([np.asarray(keys, dtype=np.int64), bigram_keys])
+        all_weights = np.concatenate([np.asarray(weights, dtype=np.float64), np.ones(len(bigram_keys))])
+        unique_keys, inverse = np.unique(all_keys, return_inverse=True)
+        values = np.log1p(np.bincount(inverse, weights=all_weights, minlength=len(unique_keys))).astype(np.float32)
+        
+        key_rows = unique_keys // n_features
+        offsets = np.searchsorted(key_rows, np.arange(len(texts) + 1))
+        if len(values):
+            nonempty = offsets[:-1] < offsets[1:]
+            norms = np.sqrt(np.add.reduceat(values * values, offsets[:-1][nonempty]))
+            values /= np.repeat(norms, np.diff(offsets)[nonempty])
+        return offsets.astype(np.int64), unique_keys % n_features, values
+    
+    def transform_one(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        计算单个页面的特征
+        
+        Args:
+            text: 页面文本
+        
+        Returns:
+            (特征下标, 特征数值)，下标升序且不重复
+        """
+        _, columns, values = self.transform([text])
+        return columns, values
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+离线训练v2文档分类器
+从带标注的DocumentPage数据（JSONL，每行一个页面）训练哈希特征的多类逻辑回归，
+把权重写入.npy文件（最后一行为偏置），元数据写入同名.json文件
+
+用法:
+    python -m document_classifiers.v2.train --data labeled_pages.jsonl
+    python -m document_classifiers.v2.train --synthetic-claims 500 --output /tmp/v2.npy
+"""
+import os
+import sys
+import uuid
+import random
+import argparse
+from pathlib import Path
+from typing import List, Optional, Tuple, get_args
+import numpy as np
+from pydantic import TypeAdapter
+from schemas.document_page import DocumentPage
+from document_classifiers.base_classifier import DocumentType
+from document_classifiers.v2.features import FeatureHasher, HashingConfig
+from document_classifiers.v2.classifier import (
+    V2ModelMetadata, linear_scores, softmax, resolve_weights_path, metadata_path
+)
+
+def load_labeled_pages(paths: List[str]) -> List[DocumentPage]:
+    """
+    读取带标注的页面，每行一个DocumentPage的JSON（只使用raw_text和document_type）
+    
+    Args:
+        paths: JSONL文件路径
+    
+    Returns:
+        页面列表
+    """
+    adapter = TypeAdapter(DocumentPage)
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.extend(adapter.validate_json(line) for line in f if line.strip())
+    return pages
+
+def synthetic_pages(claim_count: int, seed: int) -> List[DocumentPage]:
+    """
+    用基准测试的合成语料生成带标注的页面，用于本地开发和基准测试
+    """
+    from benchmarks.synthetic_claims import generate_corpus
+    claims = generate_corpus(claim_count, pages_per_document=3, seed=seed)
+    return [page for claim in claims for page in claim.expected_pages()]
+
+def train(pages: List[DocumentPage],
+          hashing: HashingConfig,
+          epochs: int = 100,
+          learning_rate: float = 20.0,
+          l2: float = 1e-6,
+          validation_fraction: float = 0.1,
+          seed: int = 42) -> Tuple[np.ndarray, V2ModelMetadata]:
+    """
+    用全批量梯度下降训练多类逻辑回归
+    
+    Args:
+        pages: 带标注的页面
+        hashing: 特征哈希参数
+        epochs: 迭代次数
+        learning_rate: 学习率（特征已做L2归一化）
+        l2: L2正则化系数（不作用于偏置）
+        validation_fraction: 留作验证集的页面比例
+        seed: 划分验证集的随机种子
+    
+    Returns:
+        (权重矩阵, 元数据)
+    """
+    classes = list(get_args(DocumentType))
+    class_index = {document_type: i for i, document_type in enumerate(classes)}
+    pages = list(pages)
+    random.Random(seed).shuffle(pages)
+    validation_count = int(len(pages) * validation_fraction) if len(pages) > 1 else 0
+    validation, training = pages[:validation_count], pages[validation_count:]
+    if not training:
+        raise ValueError("No labeled pages to train on")
+    
+    hasher = FeatureHasher(hashing)
+    offsets, columns, values = hasher.transform([page.raw_text for page in training])
+    labels = np.array([class_index[page.document_type] for page in training])
+    targets = np.eye(len(classes), dtype=np.float32)[labels]
+    rows = np.repeat(np.arange(len(training)), np.diff(offsets))
+    
+    weights = np.zeros((hashing.n_features + 1, len(classes)), dtype=np.float32)
+    for epoch in range(epochs):
+        probabilities = softmax(linear_scores(weights, offsets, columns, values))
+        errors = (probabilities - targets) / len(training)
+        gradient = np.empty_like(weights)
+        for c in range(len(classes)):
+            gradient[:-1, c] = np.bincount(columns, weights=values * errors[rows, c], minlength=hashing.n_features)
+        gradient[:-1] += l2 * weights[:-1]
+        gradient[-1] = errors.sum(axis=0)
+        weights -= learning_rate * gradient
+        if (epoch + 1) % 20 == 0 or epoch == epochs - 1:
+            loss = -np.log(probabilities[np.arange(len(training)), labels] + 1e-12).mean()
+            print(f"epoch {epoch + 1}/{epochs}: loss={loss:.4f}")
+    
+    validation_accuracy = None
+    if validation:
+        offsets, columns, values = hasher.transform([page.raw_text for page in validation])
+        predicted = linear_scores(weights, offsets, columns, values).argmax(axis=1)
+        validation_accuracy = round(float(np.mean([
+            classes[index] == page.document_type for index, page in zip(predicted, validation)
+        ])), 4)
+    
+    metadata = V2ModelMetadata(
+        classes=classes,
+        hashing=hashing,
+        trained_pages=len(training),
+        validation_accuracy=validation_accuracy
+    )
+    return weights, metadata
+
+def save_model(weights: np.ndarray, metadata: V2ModelMetadata, path: Path):
+    """
+    保存权重和元数据，先写临时文件再替换，正在内存映射旧权重的进程不受影响
+    
+    Args:
+        weights: 权重矩阵
+        metadata: 元数据
+        path: 权重文件路径（.npy）
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    suffix = uuid.uuid4().hex
+    tmp_weights = path.with_name(f"{path.stem}.{suffix}.tmp.npy")
+    tmp_metadata = path.with_name(f"{path.stem}.{suffix}.tmp.json")
+    np.save(tmp_weights, weights.astype(np.float32))
+    tmp_metadata.write_text(metadata.model_dump_json(indent=2), encoding="utf-8")
+    os.replace(tmp_weights, path)
+    os.replace(tmp_metadata, metadata_path(path))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Train the v2 hashed n-gram document classifier")
+    parser.add_argument("--data", action="append", default=[], help="JSONL file of labeled DocumentPage records")
+    parser.add_argument("--synthetic-claims", type=int, default=0,
+                        help="add pages from this many synthetic benchmark claims")
+    parser.add_argument("--output", help="weights file (.npy), defaults to classification.v2_weights_path")
+    parser.add_argument("--n-features", type=int, default=HashingConfig().n_features, help="hash space size (power of two)")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--learning-rate", type=float, default=20.0)
+    parser.add_argument("--l2", type=float, default=1e-6)
+    parser.add_argument("--validation-fraction", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    
+    pages = load_labeled_pages(args.data)
+    if args.synthetic_claims:
+        pages.extend(synthetic_pages(args.synthetic_claims, args.seed))
+    if not pages:
+        parser.error("no training data, pass --data and/or --synthetic-claims")
+    
+    weights, metadata = train(
+        pages, HashingConfig(n_features=args.n_features), args.epochs, args.learning_rate, args.l2,
+        args.validation_fraction, args.seed
+    )
+    path = resolve_weights_path(args.output)
+    save_model(weights, metadata, path)
+    print(f"Trained on {metadata.trained_pages} pages, validation accuracy {metadata.validation_accuracy}; "
+          f"weights written to {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
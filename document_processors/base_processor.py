@@ -1,12 +1,28 @@
+import sqlite3
 from abc import ABC, abstractmethod
-from pydantic import BaseModel
-from typing import List
+from functools import cached_property
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, List, Optional, Type, get_type_hints
+from config.settings import EXTRACTION_CHUNK_MAX_TOKENS, EXTRACTION_CHUNK_MAX_PARALLEL, OPENAI_MODEL
+from document_processors.chunking import split_pages_into_chunks, map_chunks
+from document_processors.reducers import reduce_partials
+from utils.extraction_cache import BaseExtractionCache, make_extraction_cache_key
+from utils.performance import get_current_recorder
 
 class BaseDocumentProcessor(ABC):
     """
     文档处理器抽象基类
+    每个(文档类型, 版本)只有一个实例，由处理器注册表在所有索赔和线程之间共享，
+    因此extract必须是线程安全的，不能在实例上保存单次调用的状态
+    
+    子类通过prompt类属性声明使用的提示词模板，document_type和version由注册表在实例化时设置；
+    三者与模型一起构成提取结果缓存的键，提示词或版本变化时旧的缓存条目自动失效
     """
     
+    prompt: str = ""
+    document_type: Optional[str] = None
+    version: Optional[str] = None
+    
     @abstractmethod
     def extract(self, page_texts: List[str]) -> BaseModel:
         """
@@ -18,4 +34,156 @@ class BaseDocumentProcessor(ABC):
         Returns:
             提取的信息（特定于文档类型的Pydantic模型）
         """
-        pass
\ No newline at end of file
+        pass
+    
+    def from_extracted(self, data: Dict[str, Any]) -> BaseModel:
+        """
+        把模型返回的字段字典应用本版本的验证规则并转换为结果模型
+        extract（作为AzureOpenAIClient.extract_model的build参数）和整个索赔一次提取
+        （见document_processors/claim_extraction.py）共用，子类应覆盖以应用各自的规则
+        
+        Args:
+            data: 模型返回的字段字典
+            
+        Returns:
+            提取的信息（特定于文档类型的Pydantic模型）
+        """
+        if self.result_type is None:
+            raise TypeError(f"{type(self).__name__}.extract must be annotated with a concrete result model")
+        return self.result_type.model_validate(data)
+    
+    def reduce(self, partials: List[BaseModel]) -> BaseModel:
+        """
+        合并同一文档各分块的部分结果，默认按结果类型使用document_processors.reducers中的规则
+        
+        Args:
+            partials: 按页面顺序排列的部分结果
+            
+        Returns:
+            合并后的提取结果
+        """
+        return reduce_partials(partials)
+    
+    @cached_property
+    def result_type(self) -> Optional[Type[BaseModel]]:
+        """
+        extract返回值注解中的具体模型类型，用于反序列化缓存的结果；注解不是具体模型时为None（不缓存）
+        """
+        result_type = get_type_hints(type(self).extract).get("return")
+        if isinstance(result_type, type) and issubclass(result_type, BaseModel) and result_type is not BaseModel:
+            return result_type
+        return None
+    
+    def extract_document(self,
+                         page_texts: List[str],
+                         max_chunk_tokens: Optional[int] = None,
+                         max_parallel: Optional[int] = None,
+                         cache: Optional[BaseExtractionCache] = None) -> BaseModel:
+        """
+        提取整个文档：估算token数不超过预算时直接调用extract，
+        否则按预算切分为分块，并行对各分块调用extract，再用reduce合并
+        
+        Args:
+            page_texts: 文档页面文本列表
+            max_chunk_tokens: 每个分块的估算token上限，默认使用extraction.chunk_max_tokens
+            max_parallel: 同一文档最多并行提取的分块数，默认使用extraction.chunk_max_parallel
+            cache: 提取结果缓存（可选），文档或分块的文本命中时不再调用extract
+            
+        Returns:
+            提取的信息（特定于文档类型的Pydantic模型）
+        """
+        def extract(chunk: List[str]) -> BaseModel:
+            return self._extract_cached(chunk, cache) if cache is not None else self.extract(chunk)
+        
+        chunks = split_pages_into_chunks(
+            page_texts, EXTRACTION_CHUNK_MAX_TOKENS if max_chunk_tokens is None else max_chunk_tokens
+        )
+        if len(chunks) == 1:
+            return extract(chunks[0])
+        partials = map_chunks(
+            extract, chunks, EXTRACTION_CHUNK_MAX_PARALLEL if max_parallel is None else max_parallel
+        )
+        return self.reduce(partials)
+    
+    def _extract_cached(self, page_texts: List[str], cache: BaseExtractionCache) -> BaseModel:
+        """
+        通过提取结果缓存调用extract
+        """
+        cached = self.cached_result(page_texts, cache)
+        if cached is not None:
+            return cached
+        result = self.extract(page_texts)
+        self.store_result(page_texts, cache, result)
+        return result
+    
+    def cache_key(self, page_texts: List[str], prompt: Optional[str] = None,
+                  namespace: Optional[str] = None) -> Optional[str]:
+        """
+        计算提取结果的缓存键
+        
+        Args:
+            page_texts: 文档（或分块）的页面文本
+            prompt: 生成结果使用的提示词，默认为处理器自己的提示词
+            namespace: 提取方式的命名空间，见make_extraction_cache_key
+        
+        Returns:
+            缓存键，处理器没有结果类型或文档类型时返回None
+        """
+        if self.result_type is None or self.document_type is None:
+            return None
+        return make_extraction_cache_key(
+            self.document_type, self.version or "", self.prompt if prompt is None else prompt, OPENAI_MODEL,
+            page_texts, namespace
+        )
+    
+    def cached_result(self, page_texts: List[str], cache: BaseExtractionCache,
+                      keys: Optional[List[Optional[str]]] = None) -> Optional[BaseModel]:
+        """
+        查询提取结果缓存，并把命中或未命中记入性能报告
+        缓存读取失败或缓存值无法解析时视为未命中
+        
+        Args:
+            page_texts: 文档（或分块）的页面文本
+            cache: 提取结果缓存
+            keys: 依次查询的缓存键，默认只查询逐文档提取的键
+            
+        Returns:
+            缓存的提取结果，未命中时返回None
+        """
+        keys = [key for key in (keys or [self.cache_key(page_texts)]) if key is not None]
+        if not keys:
+            return None
+        cached = None
+        for key in keys:
+            try:
+                value = cache.get(key)
+                if value is not None:
+                    cached = self.result_type.model_validate_json(value)
+            except (OSError, sqlite3.Error, ValueError, ValidationError) as e:
+                print(f"Ignoring extraction cache entry for {self.document_type}: {e}")
+            if cached is not None:
+                break
+        
+        recorder = get_current_recorder()
+        if recorder is not None:
+            recorder.record_extraction_cache(cached is not None)
+        return cached
+    
+    def store_result(self, page_texts: List[str], cache: BaseExtractionCache, result: BaseModel,
+                     key: Optional[str] = None):
+        """
+        把提取结果写入缓存，写入失败只记录日志
+        
+        Args:
+            page_texts: 文档（或分块）的页面文本
+            cache: 提取结果缓存
+            result: 提取结果
+            key: 缓存键，默认为逐文档提取的键
+        """
+        key = key or self.cache_key(page_texts)
+        if key is None:
+            return
+        try:
+            cache.put(key, self.document_type, result.model_dump_json())
+        except (OSError, sqlite3.Error) as e:
+            print(f"Failed to write extraction cache entry for {self.document_type}: {e}")
\ No newline at end of file
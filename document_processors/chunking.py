@@ -0,0 +1,89 @@
+"""
+长文档的分块提取
+按token预算把文档页面切分为分块，并行提取各分块的部分结果，再由处理器的reduce合并
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, TypeVar
+from utils.tokens import estimate_tokens, CHARS_PER_TOKEN
+
+T = TypeVar("T")
+
+def _split_long_page(text: str, max_tokens: int) -> List[str]:
+    """
+    把超过预算的单个页面按行切分，单行仍超过预算时按字符硬切分
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    pieces = []
+    current = []
+    current_chars = 0
+    for line in text.split("\n"):
+        while len(line) > max_chars:
+            if current:
+                pieces.append("\n".join(current))
+                current, current_chars = [], 0
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and current_chars + len(line) + 1 > max_chars:
+            pieces.append("\n".join(current))
+            current, current_chars = [], 0
+        current.append(line)
+        current_chars += len(line) + 1
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+def split_pages_into_chunks(page_texts: List[str], max_tokens: int) -> List[List[str]]:
+    """
+    按页面顺序把页面合并为不超过token预算的分块，不拆分页面；
+    单个页面超过预算时单独切分为多个分块
+    
+    Args:
+        page_texts: 文档页面文本列表
+        max_tokens: 每个分块的估算token上限，小于等于0时不分块
+    
+    Returns:
+        分块列表，每个分块是页面文本列表
+    """
+    if max_tokens <= 0 or sum(estimate_tokens(text) for text in page_texts) <= max_tokens:
+        return [list(page_texts)]
+    
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for text in page_texts:
+        tokens = estimate_tokens(text)
+        if tokens > max_tokens:
+            if current:
+                chunks.append(current)
+                current, current_tokens = [], 0
+            chunks.extend([piece] for piece in _split_long_page(text, max_tokens))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def map_chunks(extract: Callable[[List[str]], T], chunks: List[List[str]], max_parallel: int) -> List[T]:
+    """
+    并行提取各分块，结果顺序与分块顺序一致；任一分块失败时抛出第一个错误
+    
+    Args:
+        extract: 对一个分块提取部分结果的函数
+        chunks: 分块列表
+        max_parallel: 最大并行数
+    
+    Returns:
+        部分结果列表
+    """
+    if max_parallel <= 1 or len(chunks) <= 1:
+        return [extract(chunk) for chunk in chunks]
+    
+    with ThreadPoolExecutor(max_workers=min(max_parallel, len(chunks)), thread_name_prefix="ocr-chunk") as executor:
+        # 每个分块复制当前上下文，使性能记录器在工作线程中可用
+        futures = [executor.submit(contextvars.copy_context().run, extract, chunk) for chunk in chunks]
+        return [future.result() for future in futures]
\ No newline at end of file
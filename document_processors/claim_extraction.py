@@ -0,0 +1,100 @@
+"""
+整个索赔一次提取
+小索赔（例如一份理赔表加几张单页收据）逐个文档提取时，每次请求的固定延迟比token成本更高；
+这里把索赔的所有文档放进一次结构化请求，响应的JSON schema由各文档类型的结果模型（ClaimFormOCR、InvoiceOCR等）生成，
+响应中每个文档的字段再经过对应处理器的验证规则
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from utils.structured_output import extraction_schema, load_json_object
+from utils.tokens import estimate_tokens
+
+_DEFS_REF_PREFIX = "#/$defs/"
+
+# 整个索赔一次提取的结果在提取结果缓存中的命名空间
+CLAIM_CACHE_NAMESPACE = "whole_claim"
+
+CLAIM_EXTRACTION_PROMPT = """
+You are an expert insurance claims processor. The documents of one claim are given below, each wrapped in a
+document tag with its id and document type.
+
+Extract every document into the JSON object under its id, following the response schema for its document type.
+Only use information from that document. If a field is not present, set it to null. Dates use the YYYY-MM-DD format.
+
+Return ONLY the JSON object.
+"""
+
+def claim_cache_key(processor, page_texts: List[str]) -> Optional[str]:
+    """
+    整个索赔一次提取的结果的缓存键
+    结果由共用的CLAIM_EXTRACTION_PROMPT和该文档类型的响应schema生成，而不是处理器自己的提示词，
+    因此以两者为提示词并使用独立的命名空间，不会被逐文档提取复用
+    
+    Args:
+        processor: 文档类型对应的处理器
+        page_texts: 文档的页面文本
+    
+    Returns:
+        缓存键，处理器没有结果类型时返回None
+    """
+    if processor.result_type is None:
+        return None
+    prompt = CLAIM_EXTRACTION_PROMPT + json.dumps(extraction_schema(processor.result_type), sort_keys=True)
+    return processor.cache_key(page_texts, prompt=prompt, namespace=CLAIM_CACHE_NAMESPACE)
+
+def claim_response_schema(documents: List[Tuple[str, Type[BaseModel]]]) -> Dict[str, Any]:
+    """
+    生成整个索赔的响应schema：每个文档ID对应其文档类型结果模型的schema
+    
+    Args:
+        documents: (文档ID, 结果模型类型) 列表
+    
+    Returns:
+        JSON schema
+    """
+    defs: Dict[str, Any] = {}
+    properties = {}
+    for doc_id, model in documents:
+        if model.__name__ not in defs:
+            schema = extraction_schema(model)
+            defs.update(schema.pop("$defs", {}))
+            defs[model.__name__] = schema
+        properties[doc_id] = {"$ref": f"{_DEFS_REF_PREFIX}{model.__name__}"}
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": [doc_id for doc_id, _ in documents],
+        "additionalProperties": False,
+        "$defs": defs
+    }
+
+def parse_claim_response(content: str, doc_ids: List[str]) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+    """
+    解析整个索赔的提取响应，JSON有小问题时先在本地修复
+    
+    Args:
+        content: 模型返回的文本
+        doc_ids: 请求中的文档ID
+    
+    Returns:
+        (文档ID到字段字典的映射，缺失或格式不正确的文档不包含在内, 是否经过修复)
+    """
+    data, repaired = load_json_object(content)
+    return {doc_id: data[doc_id] for doc_id in doc_ids if isinstance(data.get(doc_id), dict)}, repaired
+
+def fits_whole_claim(document_texts: List[List[str]], max_documents: int, max_tokens: int) -> bool:
+    """
+    判断索赔是否足够小，可以在一次请求中提取
+    
+    Args:
+        document_texts: 每个文档的页面文本
+        max_documents: 文档数上限
+        max_tokens: 所有文档的估算token数上限
+    
+    Returns:
+        是否在两个上限以内
+    """
+    if not document_texts or len(document_texts) > max_documents:
+        return False
+    return sum(estimate_tokens(text) for texts in document_texts for text in texts) <= max_tokens
\ No newline at end of file
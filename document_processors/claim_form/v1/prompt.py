@@ -5,8 +5,8 @@ You are an expert insurance claims processor. Extract the following fields from
 
 - policy_number: Insurance policy number
 - patient_name: Name of the patient
-- claim_amount: Total amount claimed
-- date_of_service: Date when service was provided
+- claim_amount: Total amount claimed, as a number
+- claim_date: Date of the claim (YYYY-MM-DD)
 - diagnosis_codes: List of diagnosis codes (ICD-10 format)
 
 Return ONLY a JSON object with these fields. If any field is not present, set it to null.
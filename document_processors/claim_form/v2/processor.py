@@ -2,13 +2,15 @@ from document_processors.base_processor import BaseDocumentProcessor
 from document_processors.claim_form.v2.prompt import CLAIM_FORM_V2_PROMPT
 from document_processors.claim_form.v2.rules import validate_claim_form_v2
 from schemas.ocr_output import ClaimFormOCR
-from typing import List
+from typing import Any, Dict, List
 
 class ClaimFormV2Processor(BaseDocumentProcessor):
     """
     Claim Form v2 版本处理器
     """
     
+    prompt = CLAIM_FORM_V2_PROMPT
+    
     def extract(self, page_texts: List[str]) -> ClaimFormOCR:
         """
         从Claim Form中提取信息
@@ -28,15 +30,24 @@ class ClaimFormV2Processor(BaseDocumentProcessor):
             "policy_number": "POL-2025-001",
             "patient_name": "John Doe",
             "claim_amount": 1250.00,
-            "date_of_service": "2025-01-15",
+            "claim_date": "2025-01-15",
             "diagnosis_codes": ["I10", "E11.9"],
             "provider_name": "City General Hospital",
             "provider_npi": "1234567890",
             "claim_submission_date": "2025-01-20"
         }
         
-        # 应用验证规则
-        validated_data = validate_claim_form_v2(mock_data)
+        # 应用验证规则并返回Pydantic模型
+        return self.from_extracted(mock_data)
+    
+    def from_extracted(self, data: Dict[str, Any]) -> ClaimFormOCR:
+        """
+        对模型返回的字段应用Claim Form v2验证规则
         
-        # 返回Pydantic模型
-        return ClaimFormOCR(**validated_data)
\ No newline at end of file
+        Args:
+            data: 模型返回的字段字典
+            
+        Returns:
+            ClaimFormOCR: 验证后的信息
+        """
+        return ClaimFormOCR(**validate_claim_form_v2(data))
\ No newline at end of file
@@ -5,12 +5,12 @@ You are an expert insurance claims processor. Extract the following fields from
 
 - policy_number: Insurance policy number
 - patient_name: Name of the patient
-- claim_amount: Total amount claimed
-- date_of_service: Date when service was provided
+- claim_amount: Total amount claimed, as a number
+- claim_date: Date of the claim (YYYY-MM-DD)
 - diagnosis_codes: List of diagnosis codes (ICD-10 format)
 - provider_name: Name of healthcare provider
 - provider_npi: National Provider Identifier
-- claim_submission_date: Date when claim was submitted
+- claim_submission_date: Date when claim was submitted (YYYY-MM-DD)
 
 Return ONLY a JSON object with these fields. If any field is not present, set it to null.
 If diagnosis_codes are present, return them as a JSON array.
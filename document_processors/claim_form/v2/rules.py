@@ -25,7 +25,7 @@ def validate_claim_form_v2(data):
         data['diagnosis_codes'] = []
     
     # 验证日期格式
-    date_fields = ['date_of_service', 'claim_submission_date']
+    date_fields = ['claim_date', 'claim_submission_date']
     # 在实际实现中，这里会有日期验证逻辑
     
     return data
\ No newline at end of file
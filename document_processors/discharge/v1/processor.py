@@ -2,13 +2,15 @@ from document_processors.base_processor import BaseDocumentProcessor
 from document_processors.discharge.v1.prompt import DISCHARGE_V1_PROMPT
 from document_processors.discharge.v1.rules import validate_discharge
 from schemas.ocr_output import DischargeOCR
-from typing import List
+from typing import Any, Dict, List
 
 class DischargeV1Processor(BaseDocumentProcessor):
     """
     Discharge v1 版本处理器
     """
     
+    prompt = DISCHARGE_V1_PROMPT
+    
     def extract(self, page_texts: List[str]) -> DischargeOCR:
         """
         从Discharge文档中提取信息
@@ -35,8 +37,17 @@ class DischargeV1Processor(BaseDocumentProcessor):
             "discharge_condition": "Stable"
         }
         
-        # 应用验证规则
-        validated_data = validate_discharge(mock_data)
+        # 应用验证规则并返回Pydantic模型
+        return self.from_extracted(mock_data)
+    
+    def from_extracted(self, data: Dict[str, Any]) -> DischargeOCR:
+        """
+        对模型返回的字段应用Discharge v1验证规则
         
-        # 返回Pydantic模型
-        return DischargeOCR(**validated_data)
\ No newline at end of file
+        Args:
+            data: 模型返回的字段字典
+            
+        Returns:
+            DischargeOCR: 验证后的信息
+        """
+        return DischargeOCR(**validate_discharge(data))
\ No newline at end of file
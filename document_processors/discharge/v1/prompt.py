@@ -6,8 +6,8 @@ You are an expert medical discharge summary processor. Extract the following fie
 - patient_name: Name of the patient
 - diagnosis_codes: List of diagnosis codes (ICD-10 format)
 - procedure_codes: List of procedure codes
-- admission_date: Date when patient was admitted
-- discharge_date: Date when patient was discharged
+- admission_date: Date when patient was admitted (YYYY-MM-DD)
+- discharge_date: Date when patient was discharged (YYYY-MM-DD)
 - attending_physician: Name of the attending physician
 - hospital_name: Name of the hospital
 - discharge_condition: Patient's condition at discharge
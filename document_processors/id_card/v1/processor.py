@@ -2,13 +2,15 @@ from document_processors.base_processor import BaseDocumentProcessor
 from document_processors.id_card.v1.prompt import ID_CARD_V1_PROMPT
 from document_processors.id_card.v1.rules import validate_id_card
 from schemas.ocr_output import IDCardOCR
-from typing import List
+from typing import Any, Dict, List
 
 class IDCardV1Processor(BaseDocumentProcessor):
     """
     ID Card v1 版本处理器
     """
     
+    prompt = ID_CARD_V1_PROMPT
+    
     def extract(self, page_texts: List[str]) -> IDCardOCR:
         """
         从ID Card文档中提取信息
@@ -25,16 +27,26 @@ class IDCardV1Processor(BaseDocumentProcessor):
         # 在实际实现中，这里会调用OpenAI API
         # 为简化起见，我们使用模拟数据
         mock_data = {
-            "patient_name": "John Doe",
+            "name": "John Doe",
             "date_of_birth": "1980-05-15",
             "id_number": "ID-1980-05-15-1234",
-            "expiration_date": "2030-05-15",
+            "issue_date": "2020-05-15",
+            "expiry_date": "2030-05-15",
             "issuing_authority": "Government Identity Agency",
             "address": "123 Main St, City, State 12345"
         }
         
-        # 应用验证规则
-        validated_data = validate_id_card(mock_data)
+        # 应用验证规则并返回Pydantic模型
+        return self.from_extracted(mock_data)
+    
+    def from_extracted(self, data: Dict[str, Any]) -> IDCardOCR:
+        """
+        对模型返回的字段应用ID Card v1验证规则
         
-        # 返回Pydantic模型
-        return IDCardOCR(**validated_data)
\ No newline at end of file
+        Args:
+            data: 模型返回的字段字典
+            
+        Returns:
+            IDCardOCR: 验证后的信息
+        """
+        return IDCardOCR(**validate_id_card(data))
\ No newline at end of file
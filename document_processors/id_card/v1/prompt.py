@@ -3,12 +3,13 @@
 ID_CARD_V1_PROMPT = """
 You are an expert identity document processor. Extract the following fields from the ID card:
 
-- patient_name: Full name of the patient
-- date_of_birth: Date of birth
+- name: Full name on the ID card
 - id_number: ID card number
-- expiration_date: Expiration date of the ID card
-- issuing_authority: Authority that issued the ID card
+- date_of_birth: Date of birth (YYYY-MM-DD)
 - address: Address on the ID card
+- issue_date: Issue date of the ID card (YYYY-MM-DD)
+- expiry_date: Expiration date of the ID card (YYYY-MM-DD)
+- issuing_authority: Authority that issued the ID card
 
 Return ONLY a JSON object with these fields. If any field is not present, set it to null.
 
@@ -2,13 +2,15 @@ from document_processors.base_processor import BaseDocumentProcessor
 from document_processors.invoice.v1.prompt import INVOICE_V1_PROMPT
 from document_processors.invoice.v1.rules import validate_invoice
 from schemas.ocr_output import InvoiceOCR
-from typing import List
+from typing import Any, Dict, List
 
 class InvoiceV1Processor(BaseDocumentProcessor):
     """
     Invoice v1 版本处理器
     """
     
+    prompt = INVOICE_V1_PROMPT
+    
     def extract(self, page_texts: List[str]) -> InvoiceOCR:
         """
         从Invoice中提取信息
@@ -30,7 +32,7 @@ class InvoiceV1Processor(BaseDocumentProcessor):
             "total_amount": 1450.00,  # 合并金额
             "hospital_name": "City General Hospital",
             "service_date": "2025-01-15",  # 使用最早的日期
-            "itemized_services": [
+            "itemized_charges": [
                 {"service": "Consultation", "cost": 100.00},
                 {"service": "Laboratory Tests", "cost": 350.00},
                 {"service": "Medication", "cost": 800.00},
@@ -39,8 +41,17 @@ class InvoiceV1Processor(BaseDocumentProcessor):
             "patient_account_number": "ACC-2025-789"
         }
         
-        # 应用验证规则
-        validated_data = validate_invoice(mock_data)
+        # 应用验证规则并返回Pydantic模型
+        return self.from_extracted(mock_data)
+    
+    def from_extracted(self, data: Dict[str, Any]) -> InvoiceOCR:
+        """
+        对模型返回的字段应用Invoice v1验证规则
         
-        # 返回Pydantic模型
-        return InvoiceOCR(**validated_data)
\ No newline at end of file
+        Args:
+            data: 模型返回的字段字典
+            
+        Returns:
+            InvoiceOCR: 验证后的信息
+        """
+        return InvoiceOCR(**validate_invoice(data))
\ No newline at end of file
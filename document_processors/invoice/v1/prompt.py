@@ -3,14 +3,14 @@
 INVOICE_V1_PROMPT = """
 You are an expert medical billing specialist. Extract the following fields from the medical invoice:
 
-- total_amount: Total amount billed
+- total_amount: Total amount billed, as a number
 - hospital_name: Name of the hospital or medical facility
-- service_date: Date when service was provided
-- itemized_services: List of services with their individual costs
+- service_date: Date when service was provided (YYYY-MM-DD)
+- itemized_charges: List of services with their individual costs
 - patient_account_number: Patient account or reference number
 
 Return ONLY a JSON object with these fields. If any field is not present, set it to null.
-If itemized_services is present, return it as a JSON array of objects with 'service' and 'cost' properties.
+If itemized_charges is present, return it as a JSON array of objects with 'service' and 'cost' (a number) properties.
 
 Text:
 {text}
@@ -17,11 +17,11 @@ def validate_invoice(data):
         except (ValueError, TypeError):
             data['total_amount'] = None
     
-    # 确保itemized_services为列表
-    if data.get('itemized_services') is not None:
-        if not isinstance(data['itemized_services'], list):
-            data['itemized_services'] = []
+    # 确保itemized_charges为列表
+    if data.get('itemized_charges') is not None:
+        if not isinstance(data['itemized_charges'], list):
+            data['itemized_charges'] = []
     else:
-        data['itemized_services'] = []
+        data['itemized_charges'] = []
     
     return data
\ No newline at end of file
@@ -1,43 +1,28 @@
-from config.settings import get_document_version
+from typing import Dict, Optional
+from document_processors.base_processor import BaseDocumentProcessor
+from document_processors.registry import get_processor_registry
 
-def load_document_processor(document_type: str):
+def load_document_processor(document_type: str, version: Optional[str] = None) -> BaseDocumentProcessor:
     """
-    根据文档类型和配置版本加载相应的文档处理器
+    根据文档类型和配置版本获取相应的文档处理器
+    处理器由注册表缓存，同一(文档类型, 版本)总是返回同一个实例
     
     Args:
         document_type: 文档类型
-        
+        version: 处理器版本，默认使用document_versions.yaml中的版本
+    
     Returns:
         对应的文档处理器实例
     """
-    version = get_document_version(document_type)
-    
-    if document_type == "claim_form":
-        if version == "v1":
-            from document_processors.claim_form.v1.processor import ClaimFormV1Processor
-            return ClaimFormV1Processor()
-        elif version == "v2":
-            from document_processors.claim_form.v2.processor import ClaimFormV2Processor
-            return ClaimFormV2Processor()
-    elif document_type == "discharge":
-        if version == "v1":
-            from document_processors.discharge.v1.processor import DischargeV1Processor
-            return DischargeV1Processor()
-    elif document_type == "invoice":
-        if version == "v1":
-            from document_processors.invoice.v1.processor import InvoiceV1Processor
-            return InvoiceV1Processor()
-    elif document_type == "receipt":
-        if version == "v1":
-            from document_processors.receipt.v1.processor import ReceiptV1Processor
-            return ReceiptV1Processor()
-    elif document_type == "payment_proof":
-        if version == "v1":
-            from document_processors.payment_proof.v1.processor import PaymentProofV1Processor
-            return PaymentProofV1Processor()
-    elif document_type == "id_card":
-        if version == "v1":
-            from document_processors.id_card.v1.processor import IDCardV1Processor
-            return IDCardV1Processor()
+    return get_processor_registry().get(document_type, version)
+
+def preload_document_processors() -> Dict[str, BaseDocumentProcessor]:
+    """
+    预加载配置中所有文档类型的处理器
+    用于在worker启动时完成处理器模块的导入和实例化；document_versions.yaml中的版本不存在时抛出ValueError，
+    使配置错误在启动时暴露，而不是在处理索赔时才报错
     
-    raise ValueError(f"Unsupported document type '{document_type}' or version '{version}'")
\ No newline at end of file
+    Returns:
+        文档类型到处理器实例的映射
+    """
+    return get_processor_registry().preload()
\ No newline at end of file
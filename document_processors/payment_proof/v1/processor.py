@@ -2,13 +2,15 @@ from document_processors.base_processor import BaseDocumentProcessor
 from document_processors.payment_proof.v1.prompt import PAYMENT_PROOF_V1_PROMPT
 from document_processors.payment_proof.v1.rules import validate_payment_proof
 from schemas.ocr_output import PaymentProofOCR
-from typing import List
+from typing import Any, Dict, List
 
 class PaymentProofV1Processor(BaseDocumentProcessor):
     """
     Payment Proof v1 版本处理器
     """
     
+    prompt = PAYMENT_PROOF_V1_PROMPT
+    
     def extract(self, page_texts: List[str]) -> PaymentProofOCR:
         """
         从Payment Proof文档中提取信息
@@ -26,17 +28,27 @@ class PaymentProofV1Processor(BaseDocumentProcessor):
         # 为简化起见，我们使用模拟数据
         mock_data = {
             "payer_name": "John Doe",
-            "payee_name": "City General Hospital",
+            "beneficiary_name": "City General Hospital",
             "payment_amount": 1250.00,
             "payment_date": "2025-01-20",
+            "payment_method": "Bank Transfer",
             "bank_name": "Global Bank",
             "account_number_last4": "5678",
             "transaction_id": "TXN-2025-456",
             "payment_purpose": "Medical Services"
         }
         
-        # 应用验证规则
-        validated_data = validate_payment_proof(mock_data)
+        # 应用验证规则并返回Pydantic模型
+        return self.from_extracted(mock_data)
+    
+    def from_extracted(self, data: Dict[str, Any]) -> PaymentProofOCR:
+        """
+        对模型返回的字段应用Payment Proof v1验证规则
         
-        # 返回Pydantic模型
-        return PaymentProofOCR(**validated_data)
\ No newline at end of file
+        Args:
+            data: 模型返回的字段字典
+            
+        Returns:
+            PaymentProofOCR: 验证后的信息
+        """
+        return PaymentProofOCR(**validate_payment_proof(data))
\ No newline at end of file
@@ -4,12 +4,13 @@ PAYMENT_PROOF_V1_PROMPT = """
 You are an expert payment proof processor. Extract the following fields from the payment proof document:
 
 - payer_name: Name of the person or entity making the payment
-- payee_name: Name of the person or entity receiving the payment
-- payment_amount: Total amount paid
-- payment_date: Date when payment was made
+- beneficiary_name: Name of the person or entity receiving the payment
+- payment_amount: Total amount paid, as a number
+- payment_date: Date when payment was made (YYYY-MM-DD)
+- payment_method: Method of payment (cash, credit card, bank transfer, etc.)
+- transaction_id: Transaction ID or reference number
 - bank_name: Name of the bank (if applicable)
 - account_number_last4: Last 4 digits of the account number (if applicable)
-- transaction_id: Transaction ID or reference number
 - payment_purpose: Purpose or description of the payment
 
 Return ONLY a JSON object with these fields. If any field is not present, set it to null.
@@ -2,13 +2,15 @@ from document_processors.base_processor import BaseDocumentProcessor
 from document_processors.receipt.v1.prompt import RECEIPT_V1_PROMPT
 from document_processors.receipt.v1.rules import validate_receipt
 from schemas.ocr_output import ReceiptOCR
-from typing import List
+from typing import Any, Dict, List
 
 class ReceiptV1Processor(BaseDocumentProcessor):
     """
     Receipt v1 版本处理器
     """
     
+    prompt = RECEIPT_V1_PROMPT
+    
     def extract(self, page_texts: List[str]) -> ReceiptOCR:
         """
         从Receipt文档中提取信息
@@ -33,8 +35,17 @@ class ReceiptV1Processor(BaseDocumentProcessor):
             "patient_name": "John Doe"
         }
         
-        # 应用验证规则
-        validated_data = validate_receipt(mock_data)
+        # 应用验证规则并返回Pydantic模型
+        return self.from_extracted(mock_data)
+    
+    def from_extracted(self, data: Dict[str, Any]) -> ReceiptOCR:
+        """
+        对模型返回的字段应用Receipt v1验证规则
         
-        # 返回Pydantic模型
-        return ReceiptOCR(**validated_data)
\ No newline at end of file
+        Args:
+            data: 模型返回的字段字典
+            
+        Returns:
+            ReceiptOCR: 验证后的信息
+        """
+        return ReceiptOCR(**validate_receipt(data))
\ No newline at end of file
@@ -3,8 +3,8 @@
 RECEIPT_V1_PROMPT = """
 You are an expert payment receipt processor. Extract the following fields from the payment receipt:
 
-- payment_amount: Total amount paid
-- payment_date: Date when payment was made
+- payment_amount: Total amount paid, as a number
+- payment_date: Date when payment was made (YYYY-MM-DD)
 - payment_method: Method of payment (cash, credit card, bank transfer, etc.)
 - merchant_name: Name of the merchant or service provider
 - transaction_reference: Transaction reference or receipt number
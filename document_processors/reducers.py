@@ -0,0 +1,119 @@
+"""
+分块提取结果的合并规则
+同一文档各分块的部分结果按字段合并：列表字段按出现顺序去重合并，日期取最早或最晚，
+其他字段取各分块中出现次数最多的非空值（全部为空时保留空值）；发票和出院小结有各自的规则
+"""
+import json
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Type
+from pydantic import BaseModel
+from schemas.ocr_output import DischargeOCR, InvoiceOCR
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == []
+
+def _key(value: Any) -> str:
+    if isinstance(value, BaseModel):
+        value = value.model_dump(mode="json")
+    return json.dumps(value, sort_keys=True, default=str)
+
+def consensus(values: Iterable[Any]) -> Any:
+    """
+    取出现次数最多的非空值，次数相同时取最先出现的值；全部为空时返回None
+    """
+    candidates = [value for value in values if not _is_empty(value)]
+    if not candidates:
+        return None
+    counts = Counter(_key(value) for value in candidates)
+    best = max(counts.values())
+    return next(value for value in candidates if counts[_key(value)] == best)
+
+def ordered_union(lists: Iterable[Optional[List[Any]]]) -> List[Any]:
+    """
+    按出现顺序合并多个列表并去除重复元素
+    """
+    seen = set()
+    merged = []
+    for values in lists:
+        for value in values or []:
+            key = _key(value)
+            if key not in seen:
+                seen.add(key)
+                merged.append(value)
+    return merged
+
+def merge_models(partials: List[BaseModel],
+                 min_fields: Iterable[str] = (),
+                 max_fields: Iterable[str] = (),
+                 concat_fields: Iterable[str] = ()) -> BaseModel:
+    """
+    按字段合并同一类型的部分结果
+    
+    Args:
+        partials: 各分块的部分结果（同一模型类型）
+        min_fields: 取最小值的字段（例如入院日期）
+        max_fields: 取最大值的字段（例如出院日期）
+        concat_fields: 直接拼接而不去重的列表字段（例如费用明细，不同页上相同的明细是不同的费用）
+    
+    Returns:
+        合并后的结果
+    """
+    model_class = type(partials[0])
+    min_fields, max_fields, concat_fields = set(min_fields), set(max_fields), set(concat_fields)
+    data: Dict[str, Any] = {}
+    for name in model_class.model_fields:
+        values = [getattr(partial, name) for partial in partials]
+        present = [value for value in values if not _is_empty(value)]
+        if name in concat_fields:
+            data[name] = [item for value in values for item in value or []]
+        elif isinstance(values[0], list):
+            data[name] = ordered_union(values)
+        elif name in min_fields and present:
+            data[name] = min(present)
+        elif name in max_fields and present:
+            data[name] = max(present)
+        elif present:
+            data[name] = consensus(present)
+        else:
+            # 所有分块都为空（例如每页都没有主治医生）时保留原值，避免必填字段变为None而无法校验
+            data[name] = values[0]
+    return model_class.model_validate(data)
+
+def reduce_invoice(partials: List[InvoiceOCR]) -> InvoiceOCR:
+    """
+    合并发票：费用明细按页面顺序拼接，总金额为明细金额之和（明细缺少金额时取各分块总金额的最大值），
+    服务日期取最早
+    """
+    merged = merge_models(partials, min_fields=["service_date"], concat_fields=["itemized_charges"])
+    costs = [charge.get("cost") for charge in merged.itemized_charges]
+    if costs and all(isinstance(cost, (int, float)) for cost in costs):
+        merged.total_amount = round(sum(costs), 2)
+    else:
+        merged.total_amount = max(partial.total_amount for partial in partials)
+    return merged
+
+def reduce_discharge(partials: List[DischargeOCR]) -> DischargeOCR:
+    """
+    合并出院小结：诊断和手术编码去重合并，入院日期取最早，出院日期取最晚
+    """
+    return merge_models(partials, min_fields=["admission_date"], max_fields=["discharge_date"])
+
+REDUCERS: Dict[Type[BaseModel], Callable[[List[Any]], BaseModel]] = {
+    InvoiceOCR: reduce_invoice,
+    DischargeOCR: reduce_discharge,
+}
+
+def reduce_partials(partials: List[BaseModel]) -> BaseModel:
+    """
+    按部分结果的模型类型选择合并规则，没有专门规则的类型使用merge_models
+    
+    Args:
+        partials: 各分块的部分结果
+    
+    Returns:
+        合并后的结果
+    """
+    if len(partials) == 1:
+        return partials[0]
+    reducer = REDUCERS.get(type(partials[0]), merge_models)
+    return reducer(partials)
\ No newline at end of file
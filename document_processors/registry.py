@@ -0,0 +1,166 @@
+"""
+文档处理器注册表
+启动时按document_processors/<文档类型>/<版本>/processor.py的目录结构发现所有处理器，
+每个(文档类型, 版本)只导入和实例化一次，之后的查找为一次字典访问
+"""
+import importlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from config.settings import get_document_version, DOCUMENT_VERSIONS
+from document_processors.base_processor import BaseDocumentProcessor
+
+PROCESSORS_ROOT = Path(__file__).resolve().parent
+PROCESSORS_PACKAGE = "document_processors"
+
+def discover_processor_modules(root: Path = PROCESSORS_ROOT,
+                               package: str = PROCESSORS_PACKAGE) -> Dict[Tuple[str, str], str]:
+    """
+    扫描处理器目录（不导入模块）
+    
+    Args:
+        root: document_processors包所在目录
+        package: 包名
+    
+    Returns:
+        (文档类型, 版本)到处理器模块名的映射
+    """
+    modules = {}
+    for processor_file in sorted(root.glob("*/*/processor.py")):
+        version_dir = processor_file.parent
+        document_type = version_dir.parent.name
+        if document_type.startswith(("_", ".")) or version_dir.name.startswith(("_", ".")):
+            continue
+        modules[(document_type, version_dir.name)] = f"{package}.{document_type}.{version_dir.name}.processor"
+    return modules
+
+def _configured_versions(document_versions: Dict[str, dict]) -> Dict[str, str]:
+    return {
+        document_type: (settings or {}).get("version", "v1")
+        for document_type, settings in document_versions.items()
+    }
+
+class ProcessorRegistry:
+    """
+    文档处理器注册表（线程安全）
+    处理器实例在所有索赔和线程之间共享，因此extract不能在实例上保存单次调用的状态
+    """
+    
+    def __init__(self, modules: Optional[Dict[Tuple[str, str], str]] = None):
+        """
+        初始化注册表
+        
+        Args:
+            modules: (文档类型, 版本)到模块名的映射，默认扫描document_processors目录
+        """
+        self._modules = modules if modules is not None else discover_processor_modules()
+        self._instances: Dict[Tuple[str, str], BaseDocumentProcessor] = {}
+        self._lock = threading.Lock()
+    
+    def available_versions(self, document_type: str) -> List[str]:
+        """
+        获取某个文档类型已发现的版本
+        
+        Args:
+            document_type: 文档类型
+        
+        Returns:
+            版本列表
+        """
+        return sorted(version for doc_type, version in self._modules if doc_type == document_type)
+    
+    def get(self, document_type: str, version: Optional[str] = None) -> BaseDocumentProcessor:
+        """
+        获取文档处理器，首次获取时导入模块并实例化
+        
+        Args:
+            document_type: 文档类型
+            version: 处理器版本，默认使用document_versions.yaml中的版本
+        
+        Returns:
+            共享的处理器实例
+        """
+        key = (document_type, version or get_document_version(document_type))
+        processor = self._instances.get(key)
+        if processor is not None:
+            return processor
+        
+        with self._lock:
+            processor = self._instances.get(key)
+            if processor is None:
+                processor = self._create(key)
+                self._instances[key] = processor
+            return processor
+    
+    def _create(self, key: Tuple[str, str]) -> BaseDocumentProcessor:
+        document_type, version = key
+        module_name = self._modules.get(key)
+        if module_name is None:
+            raise ValueError(f"Unsupported document type '{document_type}' or version '{version}'")
+        
+        module = importlib.import_module(module_name)
+        processor_classes = [
+            value for value in vars(module).values()
+            if isinstance(value, type) and issubclass(value, BaseDocumentProcessor)
+            and value is not BaseDocumentProcessor and value.__module__ == module_name
+        ]
+        if len(processor_classes) != 1:
+            raise ValueError(
+                f"{module_name} must define exactly one BaseDocumentProcessor subclass, "
+                f"found {[cls.__name__ for cls in processor_classes]}"
+            )
+        processor = processor_classes[0]()
+        processor.document_type = document_type
+        processor.version = version
+        return processor
+    
+    def validate(self, document_versions: Optional[Dict[str, dict]] = None):
+        """
+        检查document_versions.yaml中配置的每个版本都存在对应的处理器目录，有缺失时一次性报告全部问题
+        
+        Args:
+            document_versions: 文档版本配置，默认使用DOCUMENT_VERSIONS
+        """
+        document_versions = DOCUMENT_VERSIONS if document_versions is None else document_versions
+        problems = []
+        for document_type, version in _configured_versions(document_versions).items():
+            if (document_type, version) not in self._modules:
+                available = ", ".join(self.available_versions(document_type)) or "none"
+                problems.append(f"{document_type} {version} (available: {available})")
+        if problems:
+            raise ValueError("document_versions.yaml names missing document processors: " + "; ".join(problems))
+    
+    def preload(self, document_versions: Optional[Dict[str, dict]] = None) -> Dict[str, BaseDocumentProcessor]:
+        """
+        校验配置并实例化所有已配置版本的处理器
+        
+        Args:
+            document_versions: 文档版本配置，默认使用DOCUMENT_VERSIONS
+        
+        Returns:
+            文档类型到处理器实例的映射
+        """
+        document_versions = DOCUMENT_VERSIONS if document_versions is None else document_versions
+        self.validate(document_versions)
+        return {
+            document_type: self.get(document_type, version)
+            for document_type, version in _configured_versions(document_versions).items()
+        }
+
+# 进程级单例，首次使用时扫描目录
+_registry: Optional[ProcessorRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_processor_registry() -> ProcessorRegistry:
+    """
+    获取进程级的处理器注册表
+    
+    Returns:
+        ProcessorRegistry: 注册表
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProcessorRegistry()
+    return _registry
\ No newline at end of file
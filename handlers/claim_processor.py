@@ -2,15 +2,178 @@
 理赔处理器
 负责端到端的理赔处理流程
 """
-from typing import List
+from typing import List, Optional, Tuple, Dict, Any, Iterable, Iterator, AsyncIterator
 import uuid
+import asyncio
+import threading
+import importlib
+import contextvars
+import time
 from datetime import datetime
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from schemas.document_page import DocumentPage
-from schemas.claim_result import ClaimResult
+from schemas.classification_result import ClassificationResult
+from schemas.claim_result import ClaimResult, ClaimBatchItem
+from schemas.ocr_output import OCROutput
+from schemas.ner_output import NEROutput
+from schemas.rule_output import RuleCheckOutput
+from document_classifiers.base_classifier import BaseDocumentClassifier
 from utils.document_classifier_loader import load_document_classifier, group_pages_into_documents
 from services.ocr_service import OCRService
 from services.ner_service import NERService
 from services.rule_service import RuleService
+from document_processors.loader import preload_document_processors
+from config.settings import (
+    BATCH_MAX_CONCURRENT_CLAIMS, INGESTION_PREFETCH_WINDOW, DEDUP_LEASE_SECONDS, DEDUP_POLL_INTERVAL_SECONDS,
+    get_config_version
+)
+from utils.performance import PerformanceRecorder, recording, emit_performance_report, get_current_recorder
+from utils.checkpoint_store import (
+    BaseCheckpointStore, ClaimCheckpoint, create_checkpoint_store, make_checkpoint_key
+)
+from utils.dedup_index import BaseDedupIndex, ClaimDeduplicator, create_dedup_index, make_claim_fingerprint
+from utils.result_sink import BaseResultSink, create_result_sink
+from utils.template_index import TemplateIndex, create_template_index
+from utils.extraction_cache import BaseExtractionCache, create_extraction_cache
+from utils.adaptive_concurrency import limit_client, SERVICE_DOCUMENT_INTELLIGENCE, SERVICE_OPENAI
+
+# 性能报告中的下载阶段名称（不做检查点）
+STAGE_DOWNLOAD = "download"
+
+# 检查点阶段名称
+STAGE_CLASSIFIED_PAGES = "classified_pages"
+STAGE_GROUPED_PAGES = "grouped_pages"
+STAGE_OCR = "ocr"
+STAGE_NER = "ner"
+STAGE_RULE_CHECK = "rule_check"
+
+# 未配置Azure客户端时使用的模拟页面数据，包括多份文档示例
+SAMPLE_PAGE_TEXTS = [
+    # 理赔表 (只有一份)
+    "Insurance Claim Form\nPolicy Number: POL-2025-001\nPatient: John Doe\nClaim Amount: $1,250.00\nDate of Service: 2025-01-15\nDiagnosis: I10, E11.9",
+    
+    # 出院小结 (可能有多份)
+    "Discharge Summary\nPatient: John Doe\nDiagnosis: I10, E11.9\nProcedure: 99213, 85025\nAdmission: 2025-01-10\nDischarge: 2025-01-15\nPhysician: Dr. Smith",
+    
+    # 发票 (可能有多份)
+    "Hospital Invoice\nPatient: John Doe\nTotal Amount: $1,250.00\nService Date: 2025-01-15\nHospital: Beijing Union Medical College Hospital",
+    
+    # 收据 (可能有多份)
+    "Payment Receipt\nPatient: John Doe\nAmount: $250.00\nDate: 2025-01-20\nMethod: Bank Transfer\nReference: TXN-20250120-001",
+    
+    # 付款证明 (可能有多份)
+    "Bank Statement\nPayer: John Doe\nAmount: $1,000.00\nDate: 2025-01-25\nBeneficiary: Beijing Union Medical College Hospital\nTransaction ID: BANK-20250125-999",
+    
+    # 身份证 (可能有多份)
+    "ID Card\nName: John Doe\nID Number: 110101199001011234\nDOB: 1990-01-01\nAddress: Beijing, China\nIssue Date: 2020-01-01\nExpiry Date: 2030-01-01"
+]
+
+def split_blob_directory(blob_directory: str) -> Tuple[str, str]:
+    """
+    将Blob路径拆分为容器名和目录前缀
+    例如 "claims/CLAIM-001/form.pdf" -> ("claims", "CLAIM-001/")
+    
+    Args:
+        blob_directory: 以容器名开头的Blob路径（目录或触发事件的文件）
+    
+    Returns:
+        (容器名称, Blob名称前缀)
+    """
+    container_name, _, prefix = blob_directory.strip("/").partition("/")
+    
+    # 触发路径指向文件时，使用其所在目录作为索赔目录
+    directory, _, file_name = prefix.rpartition("/")
+    if directory and "." in file_name:
+        prefix = directory + "/"
+    elif prefix and "." not in file_name:
+        # 目录前缀以"/"结尾，避免匹配到同名前缀的其他目录
+        prefix = prefix + "/"
+    
+    return container_name, prefix
+
+def extract_page_texts(analyze_result: Dict[str, Any]) -> List[str]:
+    """
+    从Document Intelligence分析结果中按页提取文本
+    
+    Args:
+        analyze_result: 格式化后的分析结果字典
+    
+    Returns:
+        每页一条的文本列表
+    """
+    return [
+        "\n".join(line["text"] for line in page.get("lines", []))
+        for page in analyze_result.get("pages", [])
+    ]
+
+class _StreamingClassification:
+    """
+    一个索赔的流式页面分类状态
+    每个文件的页面先查模板索引，未命中的页面加入分类器的流式会话，全部接收后填回分类结果并登记新模板
+    """
+    
+    def __init__(self, classifier: BaseDocumentClassifier, template_index: Optional[TemplateIndex]):
+        self.stream = classifier.stream()
+        self.template_index = template_index
+        self.page_texts: List[str] = []
+        self.results: List[Optional[ClassificationResult]] = []
+        self.fingerprints: List[Optional[int]] = []
+        self.misses: List[int] = []  # 未命中模板、由分类器分类的页面下标
+    
+    def add(self, page_texts: List[str]):
+        misses = self._match(page_texts)
+        if misses:
+            self.stream.add(misses)
+    
+    async def add_async(self, page_texts: List[str]):
+        misses = self._match(page_texts)
+        if misses:
+            await self.stream.add_async(misses)
+    
+    def _match(self, page_texts: List[str]) -> List[str]:
+        """
+        记录新到达的页面并查模板索引
+        
+        Args:
+            page_texts: 一个文件的页面文本
+        
+        Returns:
+            未命中模板、需要分类器分类的页面文本
+        """
+        offset = len(self.page_texts)
+        self.page_texts.extend(page_texts)
+        if self.template_index is None:
+            self.results.extend([None] * len(page_texts))
+            self.misses.extend(range(offset, len(self.page_texts)))
+            return page_texts
+        
+        fingerprints, results = self.template_index.match_many(page_texts)
+        self.fingerprints.extend(fingerprints)
+        self.results.extend(results)
+        misses = [offset + i for i, result in enumerate(results) if result is None]
+        self.misses.extend(misses)
+        return [self.page_texts[i] for i in misses]
+    
+    def finish(self, classified: List[ClassificationResult]) -> List[ClassificationResult]:
+        """
+        把分类器对未命中模板页面的结果填回结果列表，登记新模板并记录命中数
+        
+        Args:
+            classified: 分类器流式会话的结果，与misses顺序一致
+        
+        Returns:
+            与页面顺序一致的分类结果
+        """
+        for i, result in zip(self.misses, classified):
+            self.results[i] = result
+        if self.template_index is not None:
+            self.template_index.remember(self.fingerprints, self.results)
+            recorder = get_current_recorder()
+            if recorder is not None:
+                recorder.record_template_hits(len(self.results) - len(self.misses))
+        return self.results
 
 class ClaimProcessor:
     """
@@ -18,15 +181,156 @@ class ClaimProcessor:
     协调整个理赔处理流程
     """
     
-    def __init__(self):
+    def __init__(self,
+                 openai_client=None,
+                 document_intelligence_client=None,
+                 blob_storage_client=None,
+                 checkpoint_store: Optional[BaseCheckpointStore] = None,
+                 async_openai_client=None,
+                 async_document_intelligence_client=None,
+                 async_blob_storage_client=None,
+                 dedup_index: Optional[BaseDedupIndex] = None,
+                 result_sink: Optional[BaseResultSink] = None,
+                 classifier: Optional[BaseDocumentClassifier] = None,
+                 template_index: Optional[TemplateIndex] = None,
+                 extraction_cache: Optional[BaseExtractionCache] = None):
         """
         初始化理赔处理器
+        
+        Args:
+            openai_client: Azure OpenAI客户端（可选，未提供时在预热阶段创建）
+            document_intelligence_client: Azure Document Intelligence客户端（可选）
+            blob_storage_client: Azure Blob Storage客户端（可选）
+            checkpoint_store: 阶段检查点存储（可选，未提供时在预热阶段根据环境变量创建）
+            async_openai_client: 异步Azure OpenAI客户端（可选）
+            async_document_intelligence_client: 异步Azure Document Intelligence客户端（可选）
+            async_blob_storage_client: 异步Azure Blob Storage客户端（可选）
+            dedup_index: 索赔内容去重索引（可选，未提供时在预热阶段根据环境变量创建）
+            result_sink: 处理结果输出（可选，未提供时在预热阶段根据环境变量创建）
+            classifier: 文档分类器（可选，未提供时根据全局配置加载）
+            template_index: 跨索赔的页面模板索引（可选，未提供时在预热阶段根据配置创建）
+            extraction_cache: 文档提取结果缓存（可选，未提供时在预热阶段根据环境变量创建）
         """
         # 根据全局配置加载文档分类器
-        self.classifier = load_document_classifier()
-        self.ocr_service = OCRService()
+        self.classifier = classifier or load_document_classifier()
+        self.ocr_service = OCRService(extraction_cache=extraction_cache)
         self.ner_service = NERService()
         self.rule_service = RuleService()
+        
+        # SDK客户端在实例生命周期内复用
+        self.openai_client = openai_client
+        self.document_intelligence_client = document_intelligence_client
+        self.blob_storage_client = blob_storage_client
+        self.async_openai_client = async_openai_client
+        self.async_document_intelligence_client = async_document_intelligence_client
+        self.async_blob_storage_client = async_blob_storage_client
+        self.checkpoint_store = checkpoint_store
+        self.deduplicator = self._create_deduplicator(dedup_index)
+        self.result_sink = result_sink
+        self.template_index = template_index
+        
+        # 流式摄取时预先下载并识别的最大文件数
+        self.prefetch_window = INGESTION_PREFETCH_WINDOW
+        
+        # 预热耗时（秒），只向首次调用方报告一次
+        self.warmup_seconds: Optional[float] = None
+        self._warmup_reported = False
+        self._warmup_lock = threading.Lock()
+    
+    def warm_up(self) -> float:
+        """
+        预热处理器：导入所有已配置的文档处理器、实例化当前规则引擎并打开SDK客户端
+        
+        Returns:
+            预热耗时（秒）
+        """
+        start = time.perf_counter()
+        
+        preload_document_processors()
+        self.rule_service.get_rule_engine()
+        self._open_clients()
+        if self.checkpoint_store is None:
+            self.checkpoint_store = create_checkpoint_store(self.blob_storage_client)
+        if self.deduplicator is None:
+            self.deduplicator = self._create_deduplicator(create_dedup_index(self.blob_storage_client))
+        if self.result_sink is None:
+            self.result_sink = create_result_sink(self.blob_storage_client)
+        if self.template_index is None:
+            self.template_index = create_template_index()
+        if self.ocr_service.extraction_cache is None:
+            self.ocr_service.extraction_cache = create_extraction_cache()
+        
+        self.warmup_seconds = time.perf_counter() - start
+        return self.warmup_seconds
+    
+    def pop_warmup_seconds(self) -> Optional[float]:
+        """
+        获取预热耗时，仅首次调用返回数值，之后返回None
+        
+        Returns:
+            预热耗时（秒）或None
+        """
+        with self._warmup_lock:
+            if self._warmup_reported or self.warmup_seconds is None:
+                return None
+            self._warmup_reported = True
+            return self.warmup_seconds
+    
+    def _open_clients(self):
+        """
+        打开Azure SDK客户端
+        缺少配置的客户端会被跳过，保持为None
+        """
+        if self.openai_client is None:
+            self.openai_client = self._try_create_client("utils.openai_client", "AzureOpenAIClient")
+        if self.document_intelligence_client is None:
+            self.document_intelligence_client = self._try_create_client(
+                "utils.azure_document_intelligence", "AzureDocumentIntelligenceClient"
+            )
+        if self.blob_storage_client is None:
+            self.blob_storage_client = self._try_create_client("utils.blob_storage", "AzureBlobStorageClient")
+        
+        # process_async使用的异步客户端
+        if self.async_openai_client is None:
+            self.async_openai_client = self._try_create_client("utils.openai_client", "AsyncAzureOpenAIClient")
+        if self.async_document_intelligence_client is None:
+            self.async_document_intelligence_client = self._try_create_client(
+                "utils.azure_document_intelligence", "AsyncAzureDocumentIntelligenceClient"
+            )
+        if self.async_blob_storage_client is None:
+            self.async_blob_storage_client = self._try_create_client(
+                "utils.blob_storage", "AsyncAzureBlobStorageClient"
+            )
+        
+        # 对外部AI服务的调用经过按服务共享的自适应并发限制器
+        self.openai_client = limit_client(self.openai_client, SERVICE_OPENAI)
+        self.async_openai_client = limit_client(self.async_openai_client, SERVICE_OPENAI)
+        self.document_intelligence_client = limit_client(self.document_intelligence_client, SERVICE_DOCUMENT_INTELLIGENCE)
+        self.async_document_intelligence_client = limit_client(
+            self.async_document_intelligence_client, SERVICE_DOCUMENT_INTELLIGENCE
+        )
+        
+        # 级联分类器在本地分类置信度不足时、OCR服务在整个索赔一次提取时使用OpenAI客户端
+        self.classifier.bind_clients(self.openai_client, self.async_openai_client)
+        self.ocr_service.bind_clients(self.openai_client, self.async_openai_client)
+    
+    def _try_create_client(self, module_name: str, class_name: str):
+        """
+        尝试创建SDK客户端
+        
+        Args:
+            module_name: 客户端所在模块
+            class_name: 客户端类名
+        
+        Returns:
+            客户端实例，配置缺失或SDK未安装时返回None
+        """
+        try:
+            module = importlib.import_module(module_name)
+            return getattr(module, class_name)()
+        except (ValueError, ImportError) as e:
+            print(f"Skipping {class_name} during warm-up: {e}")
+            return None
     
     def process(self, blob_directory: str) -> ClaimResult:
         """
@@ -34,33 +338,318 @@ class ClaimProcessor:
         
         Args:
             blob_directory: Azure Blob存储中的目录路径
-            
+        
         Returns:
             ClaimResult: 处理结果
         """
         print(f"Processing claim from directory: {blob_directory}")
         print(f"Using document classifier version: {type(self.classifier).__name__}")
         
-        # 1. 模拟下载和预处理PDF文件
-        # 在实际实现中，这里会从Azure Blob Storage下载文件
-        page_texts = self._download_and_extract_pages(blob_directory)
-        
-        # 2. 对文档页面进行分类
-        classified_pages = self._classify_pages(page_texts)
+        # 相同内容的索赔只处理一次：已处理过的直接返回保存的结果，正在处理的等待其完成
+        fingerprint = self._get_claim_fingerprint(blob_directory)
+        if fingerprint is None:
+            return self._process_claim(blob_directory)
+        return self.deduplicator.run(
+            fingerprint, blob_directory, ClaimResult, lambda: self._process_claim(blob_directory),
+            on_duplicate=lambda result: self._write_duplicate_result(blob_directory, result)
+        )
+    
+    def _write_duplicate_result(self, blob_directory: str, claim_result: ClaimResult) -> None:
+        """
+        为内容重复、结果来自其他索赔目录的索赔输出结果，使每个上传目录都有输出
         
-        # 3. 将页面分组为文档
-        grouped_pages = group_pages_into_documents(classified_pages)
+        Args:
+            blob_directory: 当前索赔目录
+            claim_result: 复用的处理结果
+        """
+        if self.result_sink is not None:
+            self.result_sink.write_durable(blob_directory, claim_result)
+    
+    def _process_claim(self, blob_directory: str) -> ClaimResult:
+        """
+        执行完整的索赔处理流程（不做去重）
         
-        # 4. OCR处理 - 支持多文档结构
-        ocr_result = self.ocr_service.process_documents(grouped_pages)
+        Args:
+            blob_directory: Azure Blob存储中的目录路径
         
-        # 5. NER处理 - 支持从多文档中提取实体
-        ner_result = self.ner_service.extract_entities(ocr_result)
+        Returns:
+            ClaimResult: 处理结果
+        """
+        checkpoint = self._get_checkpoint(blob_directory)
+        recorder = PerformanceRecorder()
         
-        # 6. 规则检查 - 基于多文档的规则验证
-        rule_result = self.rule_service.check_claim(ner_result, ocr_result)
+        with recording(recorder):
+            # 1-2. 流式下载和预处理PDF文件，页面到达即分类
+            def classify() -> List[DocumentPage]:
+                return self._classify_pages(self._iter_page_texts(blob_directory))
+            
+            # 3. 将页面分组为文档
+            def group() -> List[DocumentPage]:
+                classified_pages = checkpoint.run(STAGE_CLASSIFIED_PAGES, List[DocumentPage], classify)
+                with recorder.stage(STAGE_GROUPED_PAGES):
+                    return group_pages_into_documents(classified_pages)
+            
+            # 4. OCR处理 - 支持多文档结构
+            def extract() -> OCROutput:
+                grouped_pages = checkpoint.run(STAGE_GROUPED_PAGES, List[DocumentPage], group)
+                with recorder.stage(STAGE_OCR):
+                    return self.ocr_service.process_documents(grouped_pages)
+            
+            # 已有检查点的阶段直接恢复，不会再执行其前置阶段
+            ocr_result = checkpoint.run(STAGE_OCR, OCROutput, extract)
+            
+            # 5. NER处理 - 支持从多文档中提取实体
+            def extract_entities() -> NEROutput:
+                with recorder.stage(STAGE_NER):
+                    return self.ner_service.extract_entities(ocr_result)
+            
+            ner_result = checkpoint.run(STAGE_NER, NEROutput, extract_entities)
+            
+            # 6. 规则检查 - 基于多文档的规则验证
+            def check_claim() -> RuleCheckOutput:
+                with recorder.stage(STAGE_RULE_CHECK):
+                    return self.rule_service.check_claim(ner_result, ocr_result)
+            
+            rule_result = checkpoint.run(STAGE_RULE_CHECK, RuleCheckOutput, check_claim)
         
         # 7. 构建最终结果 - 适配多文档输出结构
+        claim_result = self._build_claim_result(ocr_result, ner_result, rule_result)
+        self._attach_performance_report(claim_result, recorder, checkpoint)
+        
+        # 8. 输出结果，结果持久化后才删除检查点（返回后才标记去重完成），输出失败时重试不会重新执行各阶段
+        if self.result_sink is not None:
+            self.result_sink.write_durable(blob_directory, claim_result)
+        checkpoint.clear()
+        return claim_result
+    
+    async def process_async(self, blob_directory: str) -> ClaimResult:
+        """
+        处理索赔请求的异步入口点
+        网络I/O（下载、文档识别、文档提取）期间不阻塞事件循环，
+        同一worker可以同时处理多个索赔
+        
+        Args:
+            blob_directory: Azure Blob存储中的目录路径
+        
+        Returns:
+            ClaimResult: 处理结果
+        """
+        print(f"Processing claim asynchronously from directory: {blob_directory}")
+        
+        fingerprint = await self._get_claim_fingerprint_async(blob_directory)
+        if fingerprint is None:
+            return await self._process_claim_async(blob_directory)
+        return await self.deduplicator.run_async(
+            fingerprint, blob_directory, ClaimResult, lambda: self._process_claim_async(blob_directory),
+            on_duplicate=lambda result: asyncio.to_thread(self._write_duplicate_result, blob_directory, result)
+        )
+    
+    async def _process_claim_async(self, blob_directory: str) -> ClaimResult:
+        """
+        异步执行完整的索赔处理流程（不做去重）
+        
+        Args:
+            blob_directory: Azure Blob存储中的目录路径
+        
+        Returns:
+            ClaimResult: 处理结果
+        """
+        checkpoint = self._get_checkpoint(blob_directory)
+        recorder = PerformanceRecorder()
+        
+        with recording(recorder):
+            # 1-2. 异步流式下载和预处理PDF文件，分类为本地计算，页面到达即分类
+            async def classify() -> List[DocumentPage]:
+                return await self._classify_pages_async(self._aiter_page_texts(blob_directory))
+            
+            # 3. 将页面分组为文档
+            async def group() -> List[DocumentPage]:
+                classified_pages = await checkpoint.run_async(STAGE_CLASSIFIED_PAGES, List[DocumentPage], classify)
+                with recorder.stage(STAGE_GROUPED_PAGES):
+                    return group_pages_into_documents(classified_pages)
+            
+            # 4. OCR处理 - 各文档并发提取
+            async def extract() -> OCROutput:
+                grouped_pages = await checkpoint.run_async(STAGE_GROUPED_PAGES, List[DocumentPage], group)
+                with recorder.stage(STAGE_OCR):
+                    return await self.ocr_service.process_documents_async(grouped_pages)
+            
+            ocr_result = await checkpoint.run_async(STAGE_OCR, OCROutput, extract)
+            
+            # 5-6. NER和规则检查
+            async def extract_entities() -> NEROutput:
+                with recorder.stage(STAGE_NER):
+                    return self.ner_service.extract_entities(ocr_result)
+            
+            ner_result = await checkpoint.run_async(STAGE_NER, NEROutput, extract_entities)
+            
+            async def check_claim() -> RuleCheckOutput:
+                with recorder.stage(STAGE_RULE_CHECK):
+                    return self.rule_service.check_claim(ner_result, ocr_result)
+            
+            rule_result = await checkpoint.run_async(STAGE_RULE_CHECK, RuleCheckOutput, check_claim)
+        
+        # 7. 构建最终结果
+        claim_result = self._build_claim_result(ocr_result, ner_result, rule_result)
+        self._attach_performance_report(claim_result, recorder, checkpoint)
+        
+        if self.result_sink is not None:
+            await asyncio.to_thread(self.result_sink.write_durable, blob_directory, claim_result)
+        await asyncio.to_thread(checkpoint.clear)
+        return claim_result
+    
+    def process_batch(self,
+                      directories: List[str],
+                      max_concurrency: Optional[int] = None) -> List[ClaimBatchItem]:
+        """
+        在一次调用中处理多个索赔目录
+        单个索赔失败不影响其他索赔，错误记录在对应的结果项中
+        
+        Args:
+            directories: Azure Blob存储中的索赔目录列表
+            max_concurrency: 同时处理的最大索赔数，默认使用性能配置
+        
+        Returns:
+            与directories顺序一致的批处理结果列表
+        """
+        max_concurrency = max_concurrency or BATCH_MAX_CONCURRENT_CLAIMS
+        unique_directories = list(dict.fromkeys(directories))
+        
+        def process_one(blob_directory: str) -> ClaimBatchItem:
+            try:
+                return ClaimBatchItem(blob_directory=blob_directory, result=self.process(blob_directory))
+            except Exception as e:
+                print(f"Failed to process claim {blob_directory}: {e}")
+                return ClaimBatchItem(blob_directory=blob_directory, error=f"{type(e).__name__}: {e}")
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="claim-batch") as executor:
+            items = dict(zip(unique_directories, executor.map(process_one, unique_directories)))
+        
+        # 同一批次中重复的目录只处理一次
+        return [items[blob_directory] for blob_directory in directories]
+    
+    async def process_batch_async(self,
+                                  directories: List[str],
+                                  max_concurrency: Optional[int] = None) -> List[ClaimBatchItem]:
+        """
+        异步在一次调用中处理多个索赔目录
+        
+        Args:
+            directories: Azure Blob存储中的索赔目录列表
+            max_concurrency: 同时处理的最大索赔数，默认使用性能配置
+        
+        Returns:
+            与directories顺序一致的批处理结果列表
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or BATCH_MAX_CONCURRENT_CLAIMS))
+        unique_directories = list(dict.fromkeys(directories))
+        
+        async def process_one(blob_directory: str) -> ClaimBatchItem:
+            async with semaphore:
+                try:
+                    result = await self.process_async(blob_directory)
+                    return ClaimBatchItem(blob_directory=blob_directory, result=result)
+                except Exception as e:
+                    print(f"Failed to process claim {blob_directory}: {e}")
+                    return ClaimBatchItem(blob_directory=blob_directory, error=f"{type(e).__name__}: {e}")
+        
+        results = await asyncio.gather(*(process_one(d) for d in unique_directories))
+        items = dict(zip(unique_directories, results))
+        return [items[blob_directory] for blob_directory in directories]
+    
+    def _get_checkpoint(self, blob_directory: str) -> ClaimCheckpoint:
+        """
+        获取索赔的检查点访问器，键由索赔目录和当前配置版本决定
+        
+        Args:
+            blob_directory: Azure Blob存储中的目录路径
+        
+        Returns:
+            ClaimCheckpoint: 检查点访问器（未配置存储时不做持久化）
+        """
+        claim_key = make_checkpoint_key(blob_directory, get_config_version())
+        return ClaimCheckpoint(self.checkpoint_store, claim_key)
+    
+    def _create_deduplicator(self, dedup_index: Optional[BaseDedupIndex]) -> Optional[ClaimDeduplicator]:
+        """
+        为去重索引创建去重处理器，未配置索引时返回None
+        
+        Args:
+            dedup_index: 去重索引
+        
+        Returns:
+            ClaimDeduplicator或None
+        """
+        if dedup_index is None:
+            return None
+        return ClaimDeduplicator(
+            dedup_index,
+            lease_seconds=DEDUP_LEASE_SECONDS,
+            poll_interval_seconds=DEDUP_POLL_INTERVAL_SECONDS
+        )
+    
+    def _get_claim_fingerprint(self, blob_directory: str) -> Optional[str]:
+        """
+        根据索赔目录中各文件的内容MD5和ETag计算内容指纹
+        未启用去重或未配置Blob Storage客户端时返回None
+        
+        Args:
+            blob_directory: Azure Blob存储中的目录路径
+        
+        Returns:
+            内容指纹或None
+        """
+        if self.deduplicator is None or self.blob_storage_client is None:
+            return None
+        container_name, prefix = split_blob_directory(blob_directory)
+        blob_properties = self.blob_storage_client.list_blob_properties(container_name, prefix)
+        return make_claim_fingerprint(blob_properties, get_config_version())
+    
+    async def _get_claim_fingerprint_async(self, blob_directory: str) -> Optional[str]:
+        """
+        _get_claim_fingerprint的异步版本
+        
+        Args:
+            blob_directory: Azure Blob存储中的目录路径
+        
+        Returns:
+            内容指纹或None
+        """
+        if self.deduplicator is None or self.async_blob_storage_client is None:
+            return None
+        container_name, prefix = split_blob_directory(blob_directory)
+        blob_properties = await self.async_blob_storage_client.list_blob_properties(container_name, prefix)
+        return make_claim_fingerprint(blob_properties, get_config_version())
+    
+    def _attach_performance_report(self,
+                                   claim_result: ClaimResult,
+                                   recorder: PerformanceRecorder,
+                                   checkpoint: ClaimCheckpoint):
+        """
+        生成性能报告，附加到索赔结果并发送指标
+        
+        Args:
+            claim_result: 索赔结果
+            recorder: 本次处理的性能记录器
+            checkpoint: 本次处理的检查点访问器
+        """
+        report = recorder.finish()
+        report.resumed_stages = list(checkpoint.resumed_stages)
+        claim_result.performance = report
+        emit_performance_report(claim_result.claim_id, report)
+    
+    def _build_claim_result(self, ocr_result, ner_result, rule_result) -> ClaimResult:
+        """
+        根据各阶段结果构建最终索赔结果
+        
+        Args:
+            ocr_result: OCR处理结果
+            ner_result: NER处理结果
+            rule_result: 规则检查结果
+        
+        Returns:
+            ClaimResult: 处理结果
+        """
         claim_id = ocr_result.metadata.claim_id or str(uuid.uuid4())
         policy_number = ocr_result.metadata.policy_number or ner_result.policy_number
         
@@ -77,66 +666,225 @@ class ClaimProcessor:
         
         return claim_result
     
-    def _download_and_extract_pages(self, blob_directory: str) -> List[str]:
+    def _iter_page_texts(self, blob_directory: str) -> Iterator[List[str]]:
         """
-        模拟从Blob存储下载PDF并提取页面文本
+        从Blob存储流式下载PDF并逐个文件产出页面文本，页面顺序与文件顺序一致
+        整个目录在后台并行下载（见download_directory），最多预先识别prefetch_window个文件，
+        调用方处理当前页面时后续文件继续下载和识别
+        未配置Blob Storage或Document Intelligence客户端时产出模拟数据
         
         Args:
             blob_directory: Blob目录路径
-            
-        Returns:
-            页面文本列表
+        
+        Yields:
+            每个文件的页面文本列表
+        """
+        if self.blob_storage_client is None or self.document_intelligence_client is None:
+            yield list(SAMPLE_PAGE_TEXTS)
+            return
+        
+        container_name, prefix = split_blob_directory(blob_directory)
+        downloads = self.blob_storage_client.download_directory(container_name, prefix)
+        
+        def extract(downloaded) -> List[str]:
+            # 直接将下载缓冲区作为流传给Document Intelligence，不复制为bytes
+            with downloaded:
+                result = self.document_intelligence_client.analyze_document_from_bytes(
+                    downloaded.open(), "prebuilt-read"
+                )
+            return extract_page_texts(result)
+        
+        window = max(1, self.prefetch_window)
+        executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix="claim-ingest")
+        pending = deque()
+        try:
+            # 每个任务复制当前上下文，使限流等待和重试记入当前索赔的性能报告
+            for downloaded in islice(downloads, window):
+                pending.append((downloaded, executor.submit(contextvars.copy_context().run, extract, downloaded)))
+            while pending:
+                page_texts = pending.popleft()[1].result()
+                
+                # 先补充窗口再产出页面，使下载与分类重叠
+                downloaded = next(downloads, None)
+                if downloaded is not None:
+                    pending.append((downloaded, executor.submit(contextvars.copy_context().run, extract, downloaded)))
+                
+                yield page_texts
+        finally:
+            # 调用方提前结束或出错时取消尚未开始的识别，并释放对应的下载缓冲区
+            executor.shutdown(wait=True, cancel_futures=True)
+            for downloaded, _ in pending:
+                downloaded.close()
+            downloads.close()
+    
+    async def _aiter_page_texts(self, blob_directory: str) -> AsyncIterator[List[str]]:
+        """
+        _iter_page_texts的异步版本，预取窗口内的文件并发下载和识别
+        未配置异步客户端时产出模拟数据
+        
+        Args:
+            blob_directory: Blob目录路径
+        
+        Yields:
+            每个文件的页面文本列表
         """
-        # 在实际实现中，这里会:
-        # 1. 连接到Azure Blob Storage
-        # 2. 下载目录中的所有PDF文件
-        # 3. 将PDF分解为页面
-        # 4. 使用OCR提取每页文本
+        if self.async_blob_storage_client is None or self.async_document_intelligence_client is None:
+            yield list(SAMPLE_PAGE_TEXTS)
+            return
         
-        # 为简化起见，我们返回模拟数据，包括多份文档示例
+        container_name, prefix = split_blob_directory(blob_directory)
+        downloads = self.async_blob_storage_client.download_directory(container_name, prefix)
+        
+        async def extract(downloaded) -> List[str]:
+            with downloaded:
+                result = await self.async_document_intelligence_client.analyze_document_from_bytes(
+                    downloaded.open(), "prebuilt-read"
+                )
+            return extract_page_texts(result)
+        
+        async def next_download():
+            try:
+                return await downloads.__anext__()
+            except StopAsyncIteration:
+                return None
+        
+        window = max(1, self.prefetch_window)
+        pending = deque()
+        try:
+            for _ in range(window):
+                downloaded = await next_download()
+                if downloaded is None:
+                    break
+                pending.append((downloaded, asyncio.create_task(extract(downloaded))))
+            while pending:
+                page_texts = await pending.popleft()[1]
+                
+                downloaded = await next_download()
+                if downloaded is not None:
+                    pending.append((downloaded, asyncio.create_task(extract(downloaded))))
+                
+                yield page_texts
+        finally:
+            for downloaded, task in pending:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+            for downloaded, _ in pending:
+                downloaded.close()
+            await downloads.aclose()
+    
+    def _build_pages(self, page_texts: List[str], results: List[ClassificationResult]) -> List[DocumentPage]:
+        """
+        根据分类结果构建文档页面，文档ID在分组阶段分配
+        
+        Args:
+            page_texts: 索赔所有页面的文本
+            results: 与页面顺序一致的分类结果
+        
+        Returns:
+            分类后的文档页面列表
+        """
         return [
-            # 理赔表 (只有一份)
-            "Insurance Claim Form\nPolicy Number: POL-2025-001\nPatient: John Doe\nClaim Amount: $1,250.00\nDate of Service: 2025-01-15\nDiagnosis: I10, E11.9",
-            
-            # 出院小结 (可能有多份)
-            "Discharge Summary\nPatient: John Doe\nDiagnosis: I10, E11.9\nProcedure: 99213, 85025\nAdmission: 2025-01-10\nDischarge: 2025-01-15\nPhysician: Dr. Smith",
-            
-            # 发票 (可能有多份)
-            "Hospital Invoice\nPatient: John Doe\nTotal Amount: $1,250.00\nService Date: 2025-01-15\nHospital: Beijing Union Medical College Hospital",
-            
-            # 收据 (可能有多份)
-            "Payment Receipt\nPatient: John Doe\nAmount: $250.00\nDate: 2025-01-20\nMethod: Bank Transfer\nReference: TXN-20250120-001",
-            
-            # 付款证明 (可能有多份)
-            "Bank Statement\nPayer: John Doe\nAmount: $1,000.00\nDate: 2025-01-25\nBeneficiary: Beijing Union Medical College Hospital\nTransaction ID: BANK-20250125-999",
-            
-            # 身份证 (可能有多份)
-            "ID Card\nName: John Doe\nID Number: 110101199001011234\nDOB: 1990-01-01\nAddress: Beijing, China\nIssue Date: 2020-01-01\nExpiry Date: 2030-01-01"
+            DocumentPage(
+                page_number=i + 1,
+                raw_text=text,
+                document_type=result.document_type,
+                confidence=result.confidence
+            )
+            for i, (text, result) in enumerate(zip(page_texts, results))
         ]
     
-    def _classify_pages(self, page_texts: List[str]) -> List[DocumentPage]:
+    def _classify_pages(self, page_batches: Iterable[List[str]]) -> List[DocumentPage]:
         """
-        对文档页面进行分类
+        边接收边对页面进行分类：每个文件的页面到达后立即查模板索引并加入分类器的流式会话，
+        级联分类器只缓冲需要升级的页面，凑满一批就发送，剩余的在全部页面接收后发送
+        分别记录等待页面（下载和识别）与分类本身的耗时
         
         Args:
-            page_texts: 页面文本列表
-            
+            page_batches: 每个文件的页面文本列表（可以是流式产出的迭代器）
+        
         Returns:
             分类后的文档页面列表
         """
-        classified_pages = []
+        classification = _StreamingClassification(self.classifier, self.template_index)
+        wait_seconds = 0.0
+        classify_seconds = 0.0
         
-        for i, text in enumerate(page_texts):
-            # 使用文档分类器对页面进行分类
-            classification_result = self.classifier.classify(text)
-            
-            page = DocumentPage(
-                page_number=i+1,
-                raw_text=text,
-                document_type=classification_result.document_type,
-                document_id=classification_result.document_id,  # 支持同一类型多个文档
-                confidence=classification_result.confidence
-            )
-            classified_pages.append(page)
-            
-        return classified_pages
\ No newline at end of file
+        waiting_since = time.perf_counter()
+        for page_texts in page_batches:
+            start = time.perf_counter()
+            wait_seconds += start - waiting_since
+            classification.add(page_texts)
+            waiting_since = time.perf_counter()
+            classify_seconds += waiting_since - start
+        wait_seconds += time.perf_counter() - waiting_since
+        
+        start = time.perf_counter()
+        results = classification.finish(classification.stream.finish())
+        classify_seconds += time.perf_counter() - start
+        
+        self._record_ingestion(wait_seconds, classify_seconds)
+        return self._build_pages(classification.page_texts, results)
+    
+    async def _classify_pages_async(self, page_batches: AsyncIterator[List[str]]) -> List[DocumentPage]:
+        """
+        _classify_pages的异步版本，接收异步迭代器，凑满的升级批在后台并发请求
+        
+        Args:
+            page_batches: 异步产出的每个文件的页面文本列表
+        
+        Returns:
+            分类后的文档页面列表
+        """
+        classification = _StreamingClassification(self.classifier, self.template_index)
+        wait_seconds = 0.0
+        classify_seconds = 0.0
+        
+        waiting_since = time.perf_counter()
+        async for page_texts in page_batches:
+            start = time.perf_counter()
+            wait_seconds += start - waiting_since
+            await classification.add_async(page_texts)
+            waiting_since = time.perf_counter()
+            classify_seconds += waiting_since - start
+        wait_seconds += time.perf_counter() - waiting_since
+        
+        start = time.perf_counter()
+        results = classification.finish(await classification.stream.finish_async())
+        classify_seconds += time.perf_counter() - start
+        
+        self._record_ingestion(wait_seconds, classify_seconds)
+        return self._build_pages(classification.page_texts, results)
+    
+    def _record_ingestion(self, wait_seconds: float, classify_seconds: float):
+        """
+        将流式摄取中交替执行的下载等待和分类耗时分别记入性能报告
+        
+        Args:
+            wait_seconds: 等待页面的总时间（秒）
+            classify_seconds: 分类的总时间（秒）
+        """
+        recorder = get_current_recorder()
+        if recorder is not None:
+            recorder.record_stage(STAGE_DOWNLOAD, wait_seconds * 1000)
+            recorder.record_stage(STAGE_CLASSIFIED_PAGES, classify_seconds * 1000)
+
+# 进程级单例，每个worker只构建和预热一次
+_claim_processor: Optional[ClaimProcessor] = None
+_claim_processor_lock = threading.Lock()
+
+def get_claim_processor() -> ClaimProcessor:
+    """
+    获取进程级共享的理赔处理器实例（线程安全）
+    首次调用时构建并预热处理器，之后的调用直接复用
+    
+    Returns:
+        ClaimProcessor: 已预热的理赔处理器
+    """
+    global _claim_processor
+    if _claim_processor is None:
+        with _claim_processor_lock:
+            if _claim_processor is None:
+                processor = ClaimProcessor()
+                processor.warm_up()
+                _claim_processor = processor
+    return _claim_processor
\ No newline at end of file
@@ -0,0 +1,474 @@
+"""
+分阶段索赔处理
+将分类、逐文档提取、NER和规则检查拆分为通过队列连接的独立阶段，每个阶段可以单独扩展：
+    classify -> extract（每个文档一条消息）-> fan_in（全部文档完成后组装OCROutput）-> ner -> rules
+各阶段的中间结果保存在检查点存储中，消息只携带索赔标识；队列至少投递一次，各阶段的处理是幂等的
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+from pydantic import TypeAdapter
+from schemas.document_page import DocumentPage
+from schemas.claim_result import ClaimResult, ClaimBatchItem
+from schemas.ocr_output import OCROutput
+from schemas.ner_output import NEROutput
+from schemas.rule_output import RuleCheckOutput
+from schemas.performance_report import PerformanceReport
+from schemas.stage_message import StageMessage
+from config.settings import (
+    STAGE_QUEUE_NAMES, STAGE_MAX_DEQUEUE_COUNT, STAGE_VISIBILITY_TIMEOUT_SECONDS, get_config_version
+)
+from handlers.claim_processor import (
+    ClaimProcessor, get_claim_processor,
+    STAGE_CLASSIFIED_PAGES, STAGE_GROUPED_PAGES, STAGE_OCR, STAGE_NER, STAGE_RULE_CHECK
+)
+from utils.document_classifier_loader import group_pages_into_documents
+from utils.checkpoint_store import BaseCheckpointStore, ClaimCheckpoint, make_checkpoint_key
+from utils.dedup_index import STATUS_DONE
+from utils.performance import PerformanceRecorder, recording, merge_performance_reports, emit_performance_report
+from utils.work_queue import BaseWorkQueue, QueueMessage, create_work_queue
+
+# 处理阶段，与performance.yaml中stages.queues的键一致
+PIPELINE_CLASSIFY = "classify"
+PIPELINE_EXTRACT = "extract"
+PIPELINE_FAN_IN = "fan_in"
+PIPELINE_NER = "ner"
+PIPELINE_RULES = "rules"
+PIPELINE_STAGES = [PIPELINE_CLASSIFY, PIPELINE_EXTRACT, PIPELINE_FAN_IN, PIPELINE_NER, PIPELINE_RULES]
+
+# 汇总和结果输出只能执行一次，用原子创建的检查点标记认领和完成情况
+STAGE_FAN_IN_CLAIM = "fan-in-claim"
+STAGE_RESULT_WRITTEN = "result-written"
+
+# 环境变量CLAIM_PIPELINE_MODE为该值时，触发器只提交索赔，由各阶段函数处理
+STAGED_MODE = "staged"
+
+def is_staged_mode() -> bool:
+    """
+    是否启用分阶段处理模式
+    """
+    return os.getenv("CLAIM_PIPELINE_MODE", "inline").lower() == STAGED_MODE
+
+def _document_stage(index: int) -> str:
+    return f"document-{index:04d}"
+
+def _performance_stage(name: str) -> str:
+    return f"performance-{name}"
+
+class StagedClaimPipeline:
+    """
+    分阶段索赔处理流水线
+    各阶段复用ClaimProcessor的服务和流式分类，handle()处理一条消息并把后续工作项发送到下一阶段的队列
+    """
+    
+    def __init__(self,
+                 processor: ClaimProcessor,
+                 queue: BaseWorkQueue,
+                 state_store: Optional[BaseCheckpointStore] = None,
+                 queue_names: Optional[Dict[str, str]] = None):
+        """
+        初始化分阶段处理流水线
+        
+        Args:
+            processor: 已预热的索赔处理器
+            queue: 连接各阶段的工作队列
+            state_store: 保存中间结果的存储，默认使用处理器的检查点存储
+            queue_names: 阶段到队列名称的映射，默认使用性能配置
+        """
+        self.processor = processor
+        self.queue = queue
+        self.state_store = state_store or processor.checkpoint_store
+        if self.state_store is None:
+            raise ValueError(
+                "Staged processing requires a checkpoint store for intermediate results. "
+                "Please set CLAIM_CHECKPOINT_CONTAINER or CLAIM_CHECKPOINT_DIR."
+            )
+        self.queue_names = {**STAGE_QUEUE_NAMES, **(queue_names or {})}
+        self._handlers: Dict[str, Callable[[StageMessage], Optional[ClaimResult]]] = {
+            PIPELINE_CLASSIFY: self._classify,
+            PIPELINE_EXTRACT: self._extract,
+            PIPELINE_FAN_IN: self._fan_in,
+            PIPELINE_NER: self._extract_entities,
+            PIPELINE_RULES: self._check_rules
+        }
+    
+    def submit(self, blob_directory: str) -> str:
+        """
+        提交索赔进行分阶段处理
+        启用去重时先登记内容指纹：已处理过的内容不再提交（来自其他目录的结果为当前目录输出），
+        同一目录的重复触发直接忽略，其他目录正在处理相同内容时等待其完成
+        
+        Args:
+            blob_directory: Azure Blob存储中的目录路径
+        
+        Returns:
+            索赔的检查点键
+        """
+        run_key = make_checkpoint_key(blob_directory, get_config_version())
+        fingerprint = self.processor._get_claim_fingerprint(blob_directory)
+        if fingerprint is not None:
+            entry = self.processor.deduplicator.register(fingerprint, blob_directory)
+            if entry.status == STATUS_DONE:
+                print(f"Claim {blob_directory} is a duplicate of {entry.blob_directory}, returning stored result")
+                if entry.blob_directory != blob_directory:
+                    self.processor._write_duplicate_result(
+                        blob_directory, ClaimResult.model_validate_json(entry.result)
+                    )
+                return run_key
+            if not entry.acquired:
+                print(f"Claim {blob_directory} is already being processed, skipping duplicate trigger")
+                return run_key
+        
+        self._send(PIPELINE_CLASSIFY, StageMessage(
+            run_key=run_key, blob_directory=blob_directory, fingerprint=fingerprint
+        ))
+        print(f"Submitted claim {blob_directory} for staged processing")
+        return run_key
+    
+    def handle(self, stage: str, body: str) -> Optional[ClaimResult]:
+        """
+        处理某个阶段的一条消息
+        
+        Args:
+            stage: 阶段名称
+            body: 消息内容（StageMessage的JSON）
+        
+        Returns:
+            规则检查阶段返回最终结果，其他阶段返回None
+        """
+        handler = self._handlers.get(stage)
+        if handler is None:
+            raise ValueError(f"Unknown pipeline stage: {stage}")
+        message = StageMessage.model_validate_json(body)
+        if message.fingerprint is not None and self.processor.deduplicator is not None:
+            # 处理跨越多个阶段，每个阶段续租一次去重记录
+            self.processor.deduplicator.renew_lease(message.fingerprint, message.blob_directory)
+        return handler(message)
+    
+    def _send(self, stage: str, message: StageMessage):
+        self.queue.send(self.queue_names[stage], message.model_dump_json())
+    
+    def _load(self, checkpoint: ClaimCheckpoint, stage: str, result_type: Any) -> Optional[Any]:
+        payload = self.state_store.load(checkpoint.claim_key, stage)
+        if payload is None:
+            return None
+        return TypeAdapter(result_type).validate_json(payload)
+    
+    @contextmanager
+    def _recording(self, checkpoint: ClaimCheckpoint, name: str, output_stage: str):
+        """
+        记录本阶段的性能报告并保存，规则检查阶段合并各阶段的报告
+        
+        Args:
+            checkpoint: 索赔检查点访问器
+            name: 报告名称（阶段名，提取阶段包含文档序号）
+            output_stage: 本阶段产出的检查点阶段
+        """
+        recorder = PerformanceRecorder()
+        with recording(recorder):
+            yield recorder
+        if output_stage in checkpoint.resumed_stages:
+            # 重复投递的消息直接恢复了本阶段的结果，保留首次执行时的报告
+            return
+        report = recorder.finish()
+        report.resumed_stages = list(checkpoint.resumed_stages)
+        self.state_store.save(checkpoint.claim_key, _performance_stage(name), report.model_dump_json())
+    
+    def _claim(self, checkpoint: ClaimCheckpoint, stage: str, message: StageMessage) -> bool:
+        """
+        原子地认领只能执行一次的步骤
+        认领标记记录发起认领的文档序号，认领方的消息重新投递时（处理中途失败）可以继续
+        
+        Args:
+            checkpoint: 索赔检查点访问器
+            stage: 认领标记的阶段名称
+            message: 当前消息
+        
+        Returns:
+            是否由当前消息执行该步骤
+        """
+        owner = str(message.document_index)
+        if self.state_store.create(checkpoint.claim_key, stage, owner):
+            return True
+        return self.state_store.load(checkpoint.claim_key, stage) == owner
+    
+    def _extraction_jobs(self, grouped_pages: List[DocumentPage]):
+        # 分组结果是确定的，每个阶段重新计算任务列表即可得到相同的文档序号
+        return self.processor.ocr_service.collect_extraction_jobs(grouped_pages)
+    
+    def _classify(self, message: StageMessage) -> None:
+        """
+        下载并分类页面、分组为文档，为每个文档发送一条提取消息
+        """
+        checkpoint = ClaimCheckpoint(self.state_store, message.run_key)
+        with self._recording(checkpoint, PIPELINE_CLASSIFY, STAGE_GROUPED_PAGES) as recorder:
+            def classify() -> List[DocumentPage]:
+                return self.processor._classify_pages(self.processor._iter_page_texts(message.blob_directory))
+            
+            def group() -> List[DocumentPage]:
+                classified_pages = checkpoint.run(STAGE_CLASSIFIED_PAGES, List[DocumentPage], classify)
+                with recorder.stage(STAGE_GROUPED_PAGES):
+                    return group_pages_into_documents(classified_pages)
+            
+            grouped_pages = checkpoint.run(STAGE_GROUPED_PAGES, List[DocumentPage], group)
+            document_count = len(self._extraction_jobs(grouped_pages))
+        
+        for index in range(document_count):
+            self._send(PIPELINE_EXTRACT, message.model_copy(update={"document_index": index}))
+        print(f"Claim {message.blob_directory}: {document_count} documents sent for extraction")
+    
+    def _extract(self, message: StageMessage) -> None:
+        """
+        提取单个文档并保存结果，然后通知汇总阶段
+        """
+        checkpoint = ClaimCheckpoint(self.state_store, message.run_key)
+        grouped_pages = self._load(checkpoint, STAGE_GROUPED_PAGES, List[DocumentPage])
+        if grouped_pages is None:
+            print(f"Claim {message.blob_directory} has no grouped pages, skipping duplicate extraction message")
+            return
+        
+        doc_type, pages = self._extraction_jobs(grouped_pages)[message.document_index]
+        document_stage = _document_stage(message.document_index)
+        with self._recording(checkpoint, f"{PIPELINE_EXTRACT}-{message.document_index:04d}", document_stage):
+            # 提取结果按文档类型各不相同，以JSON对象保存，汇总时由OCROutput校验
+            checkpoint.run(
+                document_stage, Any,
+                lambda: self.processor.ocr_service.extract_document(doc_type, pages, time.perf_counter())
+            )
+        self._send(PIPELINE_FAN_IN, message)
+    
+    def _fan_in(self, message: StageMessage) -> None:
+        """
+        所有文档提取完成后组装OCROutput并发送到NER阶段
+        每个文档完成时都会触发一次检查，多个文档同时完成时可能有多条消息看到全部结果，
+        只有原子认领成功的那条会继续
+        """
+        checkpoint = ClaimCheckpoint(self.state_store, message.run_key)
+        grouped_pages = self._load(checkpoint, STAGE_GROUPED_PAGES, List[DocumentPage])
+        if grouped_pages is None:
+            return
+        
+        extraction_jobs = self._extraction_jobs(grouped_pages)
+        extracted_results = []
+        for index in range(len(extraction_jobs)):
+            extracted = self._load(checkpoint, _document_stage(index), Any)
+            if extracted is None:
+                return
+            extracted_results.append(extracted)
+        
+        if not self._claim(checkpoint, STAGE_FAN_IN_CLAIM, message):
+            # 其他消息已汇总（或正在汇总）
+            return
+        
+        with self._recording(checkpoint, PIPELINE_FAN_IN, STAGE_OCR) as recorder:
+            def build_output() -> OCROutput:
+                with recorder.stage(STAGE_OCR):
+                    return self.processor.ocr_service.build_output(extraction_jobs, extracted_results)
+            
+            checkpoint.run(STAGE_OCR, OCROutput, build_output)
+        self._send(PIPELINE_NER, message)
+    
+    def _extract_entities(self, message: StageMessage) -> None:
+        """
+        NER阶段
+        """
+        checkpoint = ClaimCheckpoint(self.state_store, message.run_key)
+        ocr_result = self._load(checkpoint, STAGE_OCR, OCROutput)
+        if ocr_result is None:
+            print(f"Claim {message.blob_directory} has no OCR result, skipping duplicate NER message")
+            return
+        
+        with self._recording(checkpoint, PIPELINE_NER, STAGE_NER) as recorder:
+            def extract_entities() -> NEROutput:
+                with recorder.stage(STAGE_NER):
+                    return self.processor.ner_service.extract_entities(ocr_result)
+            
+            checkpoint.run(STAGE_NER, NEROutput, extract_entities)
+        self._send(PIPELINE_RULES, message)
+    
+    def _check_rules(self, message: StageMessage) -> Optional[ClaimResult]:
+        """
+        规则检查阶段：构建最终结果、合并各阶段性能报告、输出结果并清理中间结果
+        结果输出后记录完成标记，重复投递的消息只清理中间结果，不会再次输出
+        """
+        checkpoint = ClaimCheckpoint(self.state_store, message.run_key)
+        if self.state_store.load(checkpoint.claim_key, STAGE_RESULT_WRITTEN) is not None:
+            print(f"Claim {message.blob_directory} result already written, cleaning up intermediate results")
+            checkpoint.clear()
+            return None
+        grouped_pages = self._load(checkpoint, STAGE_GROUPED_PAGES, List[DocumentPage])
+        ocr_result = self._load(checkpoint, STAGE_OCR, OCROutput)
+        ner_result = self._load(checkpoint, STAGE_NER, NEROutput)
+        if grouped_pages is None or ocr_result is None or ner_result is None:
+            print(f"Claim {message.blob_directory} has no NER result, skipping duplicate rule check message")
+            return None
+        
+        with self._recording(checkpoint, PIPELINE_RULES, STAGE_RULE_CHECK) as recorder:
+            def check_claim() -> RuleCheckOutput:
+                with recorder.stage(STAGE_RULE_CHECK):
+                    return self.processor.rule_service.check_claim(ner_result, ocr_result)
+            
+            rule_result = checkpoint.run(STAGE_RULE_CHECK, RuleCheckOutput, check_claim)
+        
+        claim_result = self.processor._build_claim_result(ocr_result, ner_result, rule_result)
+        claim_result.performance = self._merge_reports(checkpoint, len(self._extraction_jobs(grouped_pages)))
+        emit_performance_report(claim_result.claim_id, claim_result.performance)
+        
+        # 结果持久化后才标记去重完成并删除中间结果
+        if self.processor.result_sink is not None:
+            self.processor.result_sink.write_durable(message.blob_directory, claim_result)
+        if message.fingerprint is not None and self.processor.deduplicator is not None:
+            self.processor.deduplicator.complete(message.fingerprint, ClaimResult, claim_result)
+        self.state_store.save(checkpoint.claim_key, STAGE_RESULT_WRITTEN, claim_result.claim_id)
+        checkpoint.clear()
+        print(f"Claim {message.blob_directory} completed: {claim_result.overall_status}")
+        return claim_result
+    
+    def _merge_reports(self, checkpoint: ClaimCheckpoint, document_count: int) -> PerformanceReport:
+        names = [PIPELINE_CLASSIFY]
+        names += [f"{PIPELINE_EXTRACT}-{index:04d}" for index in range(document_count)]
+        names += [PIPELINE_FAN_IN, PIPELINE_NER, PIPELINE_RULES]
+        reports = [self._load(checkpoint, _performance_stage(name), PerformanceReport) for name in names]
+        return merge_performance_reports([report for report in reports if report is not None])
+
+class LocalStageRunner:
+    """
+    在本进程中运行分阶段流水线的各阶段消费者，用于离线测试和基准测试
+    失败的消息立即放回队列重试，超过最大出队次数后移入"<队列名>-poison"，与Functions的队列触发器一致
+    """
+    
+    def __init__(self,
+                 pipeline: StagedClaimPipeline,
+                 workers_per_stage: int = 2,
+                 visibility_timeout_seconds: float = STAGE_VISIBILITY_TIMEOUT_SECONDS,
+                 max_dequeue_count: int = STAGE_MAX_DEQUEUE_COUNT,
+                 poll_interval_seconds: float = 0.01):
+        """
+        初始化本地阶段运行器
+        
+        Args:
+            pipeline: 分阶段处理流水线
+            workers_per_stage: 每个阶段的消费者线程数
+            visibility_timeout_seconds: 消息取出后的可见性超时（秒），消费者异常退出时消息在超时后重新投递
+            max_dequeue_count: 最大出队次数
+            poll_interval_seconds: 队列为空时的轮询间隔（秒）
+        """
+        self.pipeline = pipeline
+        self.workers_per_stage = max(1, workers_per_stage)
+        self.visibility_timeout_seconds = visibility_timeout_seconds
+        self.max_dequeue_count = max_dequeue_count
+        self.poll_interval_seconds = poll_interval_seconds
+        self.results: Dict[str, ClaimResult] = {}
+        self.errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+    
+    def run_until_idle(self, timeout_seconds: Optional[float] = None) -> List[ClaimBatchItem]:
+        """
+        运行各阶段消费者，直到所有队列为空且没有正在处理的消息
+        
+        Args:
+            timeout_seconds: 最长运行时间（秒），为None时不限制
+        
+        Returns:
+            已完成和失败的索赔，按完成顺序排列
+        """
+        stop = threading.Event()
+        workers = [
+            threading.Thread(target=self._consume, args=(stage, stop), name=f"stage-{stage}-{i}", daemon=True)
+            for stage in PIPELINE_STAGES
+            for i in range(self.workers_per_stage)
+        ]
+        for worker in workers:
+            worker.start()
+        
+        deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+        try:
+            while not self._is_idle():
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError("Staged pipeline did not become idle before the timeout")
+                time.sleep(self.poll_interval_seconds)
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        
+        with self._lock:
+            items = [ClaimBatchItem(blob_directory=d, result=r) for d, r in self.results.items()]
+            items += [ClaimBatchItem(blob_directory=d, error=e) for d, e in self.errors.items()]
+        return items
+    
+    def _is_idle(self) -> bool:
+        # 持有锁时消费者不能取出新消息，正在处理的消息发送的后续消息一定在其完成前入队
+        with self._lock:
+            return self._in_flight == 0 and all(
+                self.pipeline.queue.count(self.pipeline.queue_names[stage]) == 0
+                for stage in PIPELINE_STAGES
+            )
+    
+    def _consume(self, stage: str, stop: threading.Event):
+        queue = self.pipeline.queue
+        queue_name = self.pipeline.queue_names[stage]
+        while not stop.is_set():
+            with self._lock:
+                message = queue.receive(queue_name, self.visibility_timeout_seconds)
+                if message is not None:
+                    self._in_flight += 1
+            if message is None:
+                time.sleep(self.poll_interval_seconds)
+                continue
+            try:
+                self._process(stage, message)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+    
+    def _process(self, stage: str, message: QueueMessage):
+        queue = self.pipeline.queue
+        try:
+            result = self.pipeline.handle(stage, message.body)
+        except Exception as e:
+            print(f"Stage {stage} failed (attempt {message.dequeue_count}): {e}")
+            if message.dequeue_count >= self.max_dequeue_count:
+                queue.send(f"{message.queue_name}-poison", message.body)
+                queue.delete(message)
+                blob_directory = StageMessage.model_validate_json(message.body).blob_directory
+                with self._lock:
+                    self.errors[blob_directory] = f"{stage}: {e}"
+            else:
+                queue.release(message)
+            return
+        
+        queue.delete(message)
+        if result is not None:
+            blob_directory = StageMessage.model_validate_json(message.body).blob_directory
+            with self._lock:
+                # 重复投递时保留最先完成的结果
+                self.results.setdefault(blob_directory, result)
+
+# 进程级单例，与get_claim_processor共享处理器
+_staged_pipeline: Optional[StagedClaimPipeline] = None
+_staged_pipeline_lock = threading.Lock()
+
+def get_staged_pipeline() -> StagedClaimPipeline:
+    """
+    获取进程级共享的分阶段处理流水线（线程安全）
+    工作队列根据环境变量创建，见create_work_queue
+    
+    Returns:
+        StagedClaimPipeline: 分阶段处理流水线
+    """
+    global _staged_pipeline
+    if _staged_pipeline is None:
+        with _staged_pipeline_lock:
+            if _staged_pipeline is None:
+                queue = create_work_queue()
+                if queue is None:
+                    raise ValueError(
+                        "Staged processing requires a work queue. "
+                        "Please set CLAIM_STAGE_QUEUE_CONNECTION (or AzureWebJobsStorage) or CLAIM_STAGE_QUEUE_DB."
+                    )
+                _staged_pipeline = StagedClaimPipeline(get_claim_processor(), queue)
+    return _staged_pipeline
\ No newline at end of file
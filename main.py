@@ -1,16 +1,27 @@
+import asyncio
 import logging
 import azure.functions as func
-from handlers.claim_processor import ClaimProcessor
+from handlers.claim_processor import get_claim_processor
+from handlers.stage_pipeline import is_staged_mode, get_staged_pipeline
 
-def main(myblob: func.InputStream):
+async def main(myblob: func.InputStream):
     logging.info(f"Python blob trigger function processed blob \n"
                  f"Name: {myblob.name}\n"
                  f"Blob Size: {myblob.length} bytes")
     
-    # 创建索赔处理器实例
-    processor = ClaimProcessor()
+    # 分阶段处理模式下只提交索赔，由各阶段的队列触发器处理；
+    # 提交时可能等待其他worker处理相同内容，在线程中执行以免阻塞事件循环
+    if is_staged_mode():
+        await asyncio.to_thread(get_staged_pipeline().submit, myblob.name)
+        return
+    
+    # 获取已预热的索赔处理器实例（每个worker只构建一次）
+    processor = get_claim_processor()
+    warmup_seconds = processor.pop_warmup_seconds()
+    if warmup_seconds is not None:
+        logging.info(f"Claim processor warm-up took {warmup_seconds:.3f}s")
     
     # 处理索赔
-    result = processor.process(myblob.name)
+    result = await processor.process_async(myblob.name)
     
     logging.info(f"Processing result: {result}")
\ No newline at end of file
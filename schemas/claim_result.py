@@ -4,6 +4,7 @@ from datetime import datetime
 from schemas.ocr_output import OCROutput
 from schemas.ner_output import NEROutput
 from schemas.rule_output import RuleCheckOutput
+from schemas.performance_report import PerformanceReport
 
 class ClaimResult(BaseModel):
     """
@@ -16,4 +17,13 @@ class ClaimResult(BaseModel):
     rule_check: RuleCheckOutput
     overall_status: Optional[str] = None  # "APPROVED", "REJECTED", "PENDING_REVIEW"
     processing_timestamp: datetime
-    pipeline_version: Optional[str] = None
\ No newline at end of file
+    pipeline_version: Optional[str] = None
+    performance: Optional[PerformanceReport] = None  # 各阶段耗时和OpenAI用量
+
+class ClaimBatchItem(BaseModel):
+    """
+    批处理中单个索赔的处理结果
+    """
+    blob_directory: str
+    result: Optional[ClaimResult] = None  # 处理成功时的结果
+    error: Optional[str] = None  # 处理失败时的错误信息
\ No newline at end of file
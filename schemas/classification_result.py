@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List, Literal
+
+class ClassificationResult(BaseModel):
+    """
+    单个页面的分类结果
+    """
+    document_type: Literal["claim_form", "discharge", "invoice", "receipt", "payment_proof", "id_card"]
+    confidence: float = 1.0  # 0到1，没有任何规则命中而使用默认类型时为0
+    matched_keywords: List[str] = []  # 页面中出现的规则关键字，按字母顺序排列
+    escalated: bool = False  # 是否由级联分类器交给OpenAI重新分类
+    template_match: bool = False  # 是否复用了模板索引中近似页面的分类结果
\ No newline at end of file
@@ -0,0 +1,54 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class StageTiming(BaseModel):
+    """
+    单个处理阶段的耗时
+    """
+    stage: str
+    wall_time_ms: float
+
+class DocumentTiming(BaseModel):
+    """
+    单个文档提取的耗时
+    """
+    document_type: str
+    document_id: Optional[str] = None
+    page_count: int
+    queue_wait_ms: float  # 等待并发槽位的时间
+    wall_time_ms: float  # 提取本身的耗时
+
+class OpenAICallUsage(BaseModel):
+    """
+    单次OpenAI调用的耗时和token用量
+    """
+    deployment: str
+    wall_time_ms: float
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+
+class PerformanceReport(BaseModel):
+    """
+    单个索赔的性能报告：各阶段、各文档耗时以及OpenAI用量
+    """
+    total_wall_time_ms: float = 0.0
+    stages: List[StageTiming] = []
+    documents: List[DocumentTiming] = []
+    openai_calls: List[OpenAICallUsage] = []
+    resumed_stages: List[str] = []  # 从检查点恢复、未重新执行的阶段
+    retries: int = 0
+    throttled_calls: int = 0  # 收到429的外部服务调用数
+    concurrency_wait_ms: float = 0.0  # 等待自适应并发限制器槽位的总时间
+    classified_pages: int = 0  # 经过级联分类器的页面数
+    escalated_pages: int = 0  # 其中交给OpenAI分类的页面数
+    classification_saved_ms: float = 0.0  # 未升级的页面节省的OpenAI调用时间（估算值）
+    template_hits: int = 0  # 复用模板索引中近似页面分类结果、未经过分类器的页面数
+    extraction_cache_hits: int = 0  # 从提取结果缓存读取、未调用OpenAI的提取（文档或分块）数
+    extraction_cache_misses: int = 0  # 查询提取结果缓存未命中的提取数
+    structured_outputs: int = 0  # 解析为结果模型的结构化回复数（包括解析失败的）
+    structured_output_repairs: int = 0  # 其中经过本地修复才解析成功的回复数
+    structured_output_failures: int = 0  # 其中修复后仍无法解析的回复数
+    total_prompt_tokens: int = 0
+    total_completion_tokens: int = 0
\ No newline at end of file
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class StageMessage(BaseModel):
+    """
+    分阶段处理模式中各阶段之间传递的工作项
+    消息只携带索赔标识，各阶段的中间结果保存在检查点存储中（队列消息有大小限制）
+    """
+    run_key: str  # 索赔的检查点键
+    blob_directory: str
+    document_index: Optional[int] = None  # 提取阶段处理的文档序号
+    fingerprint: Optional[str] = None  # 启用去重时索赔的内容指纹，规则检查阶段保存结果
\ No newline at end of file
@@ -51,8 +51,8 @@ class NERService:
             policy_number = ocr_output.claim_form.policy_number
             diagnosis_codes.extend(ocr_output.claim_form.diagnosis_codes)
             total_amount = ocr_output.claim_form.claim_amount
-            if ocr_output.claim_form.date_of_service:
-                service_dates.append(ocr_output.claim_form.date_of_service)
+            if ocr_output.claim_form.claim_date:
+                service_dates.append(ocr_output.claim_form.claim_date)
         
         # 从discharge文档中提取信息（可能有多份）
         if ocr_output.discharge:
@@ -104,8 +104,8 @@ class NERService:
         # 从id_card文档中提取信息（可能有多份）
         if ocr_output.id_card:
             for id_card_doc in ocr_output.id_card:
-                if not patient_name and id_card_doc.patient_name:
-                    patient_name = id_card_doc.patient_name
+                if not patient_name and id_card_doc.name:
+                    patient_name = id_card_doc.name
         
         # 创建NER输出
         ner_output = NEROutput(
@@ -116,7 +116,7 @@ class NERService:
             total_claimed_amount=total_amount,
             provider_signature_verified=provider_signature_verified,
             hospital_name=hospital_name,
-            service_dates=service_dates,
+            service_dates=[service_date.isoformat() for service_date in service_dates],
             ner_version="v1"
         )
         
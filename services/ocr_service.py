@@ -1,10 +1,26 @@
 import uuid
-from typing import List, Dict, Optional
+import time
+import asyncio
+import contextvars
+from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from pydantic import BaseModel
 from schemas.document_page import DocumentPage
 from schemas.ocr_output import OCROutput, DocumentMetadata
-from config.settings import get_document_version, is_document_required
+from schemas.performance_report import DocumentTiming
+from config.settings import (
+    get_document_version, is_document_required, OCR_MAX_CONCURRENCY,
+    WHOLE_CLAIM_EXTRACTION_ENABLED, WHOLE_CLAIM_MAX_DOCUMENTS, WHOLE_CLAIM_MAX_TOKENS, WHOLE_CLAIM_MAX_COMPLETION_TOKENS
+)
+from document_processors.base_processor import BaseDocumentProcessor
+from document_processors.claim_extraction import (
+    CLAIM_EXTRACTION_PROMPT, claim_cache_key, claim_response_schema, parse_claim_response, fits_whole_claim
+)
 from document_processors.loader import load_document_processor
+from utils.performance import get_current_recorder, record_structured_output
+from utils.structured_output import StructuredOutputError, build_model
+from utils.extraction_cache import BaseExtractionCache
 from datetime import datetime
 
 class OCRService:
@@ -12,6 +28,37 @@ class OCRService:
     OCR服务，负责协调不同文档类型的处理
     """
     
+    def __init__(self,
+                 max_concurrency: Optional[int] = None,
+                 extraction_cache: Optional[BaseExtractionCache] = None,
+                 whole_claim: Optional[bool] = None):
+        """
+        初始化OCR服务
+        
+        Args:
+            max_concurrency: 单个索赔内同时进行提取的最大文档数，默认使用性能配置
+            extraction_cache: 提取结果缓存（可选）
+            whole_claim: 是否对小索赔使用整个索赔一次提取，默认使用whole_claim_extraction.enabled
+        """
+        self.max_concurrency = max_concurrency or OCR_MAX_CONCURRENCY
+        self.extraction_cache = extraction_cache
+        self.whole_claim = WHOLE_CLAIM_EXTRACTION_ENABLED if whole_claim is None else whole_claim
+        self.openai_client = None
+        self.async_openai_client = None
+    
+    def bind_clients(self, openai_client=None, async_openai_client=None):
+        """
+        绑定整个索赔一次提取使用的OpenAI客户端
+        
+        Args:
+            openai_client: Azure OpenAI客户端
+            async_openai_client: 异步Azure OpenAI客户端
+        """
+        if self.openai_client is None:
+            self.openai_client = openai_client
+        if self.async_openai_client is None:
+            self.async_openai_client = async_openai_client
+    
     def process_documents(self, document_pages: List[DocumentPage]) -> OCROutput:
         """
         处理文档页面，支持同一类型多个文档
@@ -22,6 +69,45 @@ class OCRService:
         Returns:
             OCROutput: OCR处理结果
         """
+        extraction_jobs = self.collect_extraction_jobs(document_pages)
+        
+        # 执行提取（小索赔一次请求，否则按文档并发），结果顺序与任务顺序一致
+        if self._use_whole_claim(extraction_jobs, self.openai_client):
+            extracted_results = self._extract_whole_claim(extraction_jobs)
+        else:
+            extracted_results = self._extract_documents(extraction_jobs)
+        
+        return self.build_output(extraction_jobs, extracted_results)
+    
+    async def process_documents_async(self, document_pages: List[DocumentPage]) -> OCROutput:
+        """
+        异步处理文档页面，各文档的提取并发执行，不阻塞事件循环
+        
+        Args:
+            document_pages: 文档页面列表
+        
+        Returns:
+            OCROutput: OCR处理结果
+        """
+        extraction_jobs = self.collect_extraction_jobs(document_pages)
+        if self._use_whole_claim(extraction_jobs, self.async_openai_client):
+            extracted_results = await self._extract_whole_claim_async(extraction_jobs)
+        else:
+            extracted_results = await self._extract_documents_async(extraction_jobs)
+        return self.build_output(extraction_jobs, extracted_results)
+    
+    def collect_extraction_jobs(self, document_pages: List[DocumentPage]) -> List[Tuple[str, List[DocumentPage]]]:
+        """
+        将页面按文档分组，并按固定顺序生成提取任务：
+        先claim_form（必须且只有一份），再其他可能有多份的文档类型；
+        分阶段处理的各阶段据此得到相同的文档序号
+        
+        Args:
+            document_pages: 文档页面列表
+        
+        Returns:
+            (文档类型, 文档页面列表) 的有序列表
+        """
         # 按文档类型和文档ID分组页面
         document_groups = defaultdict(list)
         for page in document_pages:
@@ -39,44 +125,52 @@ class OCRService:
                 if not type_docs:
                     print(f"Warning: Missing required document type: {doc_type}")
         
-        # 处理每个文档组
-        results = {
-            "discharge": [],
-            "invoice": [],
-            "receipt": [],
-            "payment_proof": [],
-            "id_card": []
-        }
-        
-        document_versions = {}
-        
-        # 先处理claim_form（必须且只有一份）
+        extraction_jobs = []
         claim_form_group = [(k, v) for k, v in document_groups.items() if k[0] == "claim_form"]
         if claim_form_group:
             # 只取第一份理赔表（应该只有一份）
             (doc_type, doc_id), pages = claim_form_group[0]
-            version = get_document_version(doc_type)
-            document_versions[doc_type] = version
-            
-            processor = load_document_processor(doc_type, version)
-            page_texts = [page.raw_text for page in pages]
-            extracted_data = processor.extract(page_texts)
-            results["claim_form"] = extracted_data
+            extraction_jobs.append((doc_type, pages))
         else:
             raise ValueError("Required document 'claim_form' is missing")
         
-        # 处理可能有多份的文档类型
         multi_doc_types = ["discharge", "invoice", "receipt", "payment_proof", "id_card"]
         for doc_type in multi_doc_types:
             # 查找该类型的所有文档
             type_groups = [(k, v) for k, v in document_groups.items() if k[0] == doc_type]
             for (doc_type, doc_id), pages in type_groups:
-                version = get_document_version(doc_type)
-                document_versions[doc_type] = version
-                
-                processor = load_document_processor(doc_type, version)
-                page_texts = [page.raw_text for page in pages]
-                extracted_data = processor.extract(page_texts)
+                extraction_jobs.append((doc_type, pages))
+        
+        return extraction_jobs
+    
+    def build_output(self,
+                     extraction_jobs: List[Tuple[str, List[DocumentPage]]],
+                     extracted_results: List[BaseModel]) -> OCROutput:
+        """
+        将按任务顺序排列的提取结果组装为OCROutput
+        分阶段处理时由汇总阶段在各文档分别提取后调用
+        
+        Args:
+            extraction_jobs: (文档类型, 文档页面列表) 的有序列表
+            extracted_results: 与extraction_jobs顺序一致的提取结果
+        
+        Returns:
+            OCROutput: OCR处理结果
+        """
+        results = {
+            "discharge": [],
+            "invoice": [],
+            "receipt": [],
+            "payment_proof": [],
+            "id_card": []
+        }
+        
+        document_versions = {}
+        for (doc_type, _), extracted_data in zip(extraction_jobs, extracted_results):
+            document_versions[doc_type] = get_document_version(doc_type)
+            if doc_type == "claim_form":
+                results["claim_form"] = extracted_data
+            else:
                 results[doc_type].append(extracted_data)
         
         # 构建元数据
@@ -90,6 +184,279 @@ class OCRService:
         
         return ocr_output
     
+    def _use_whole_claim(self, extraction_jobs: List[Tuple[str, List[DocumentPage]]], client) -> bool:
+        """
+        判断是否对索赔使用整个索赔一次提取：已启用、有OpenAI客户端且索赔在大小上限以内
+        """
+        if not self.whole_claim or client is None:
+            return False
+        document_texts = [[page.raw_text for page in pages] for _, pages in extraction_jobs]
+        return fits_whole_claim(document_texts, WHOLE_CLAIM_MAX_DOCUMENTS, WHOLE_CLAIM_MAX_TOKENS)
+    
+    def _prepare_whole_claim(self, extraction_jobs: List[Tuple[str, List[DocumentPage]]]):
+        """
+        为整个索赔一次提取加载处理器并查询提取结果缓存（逐文档提取的结果和整个索赔提取的结果都可复用）
+        
+        Returns:
+            (处理器列表, 每个文档的页面文本, 结果列表（缓存命中的文档已填入）, 待提取的文档序号)
+        """
+        processors = [
+            load_document_processor(doc_type, get_document_version(doc_type)) for doc_type, _ in extraction_jobs
+        ]
+        document_texts = [[page.raw_text for page in pages] for _, pages in extraction_jobs]
+        results: List[Optional[BaseModel]] = [None] * len(extraction_jobs)
+        if self.extraction_cache is not None:
+            for i, processor in enumerate(processors):
+                results[i] = processor.cached_result(document_texts[i], self.extraction_cache, keys=[
+                    processor.cache_key(document_texts[i]), claim_cache_key(processor, document_texts[i])
+                ])
+        pending = [i for i, result in enumerate(results) if result is None]
+        return processors, document_texts, results, pending
+    
+    @staticmethod
+    def _claim_request(extraction_jobs: List[Tuple[str, List[DocumentPage]]],
+                       processors: List[BaseDocumentProcessor],
+                       document_texts: List[List[str]],
+                       pending: List[int]):
+        """
+        构建整个索赔一次提取的请求参数
+        
+        Returns:
+            (文档列表, 响应schema)，文档ID为doc_<任务序号>
+        """
+        documents = [
+            (f"doc_{i + 1}", extraction_jobs[i][0], "\n".join(document_texts[i])) for i in pending
+        ]
+        schema = claim_response_schema([(f"doc_{i + 1}", processors[i].result_type) for i in pending])
+        return documents, schema
+    
+    def _apply_claim_response(self,
+                              extraction_jobs: List[Tuple[str, List[DocumentPage]]],
+                              processors: List[BaseDocumentProcessor],
+                              document_texts: List[List[str]],
+                              results: List[Optional[BaseModel]],
+                              pending: List[int],
+                              content: Optional[str],
+                              start: float) -> List[int]:
+        """
+        把整个索赔的响应按文档经过处理器的验证规则填入结果，并记录各文档的耗时
+        
+        Returns:
+            响应中缺失或未通过验证、需要回退为逐个提取的文档序号
+        """
+        if content is None:
+            return list(pending)
+        try:
+            extracted, repaired_json = parse_claim_response(content, [f"doc_{i + 1}" for i in pending])
+        except StructuredOutputError as e:
+            print(f"Failed to parse whole-claim extraction response ({e}), extracting documents separately")
+            for _ in pending:
+                record_structured_output(parsed=False)
+            return list(pending)
+        
+        wall_time_ms = round((time.perf_counter() - start) * 1000, 3)
+        recorder = get_current_recorder()
+        fallback = []
+        for i in pending:
+            doc_type, pages = extraction_jobs[i]
+            data = extracted.get(f"doc_{i + 1}")
+            try:
+                if data is None:
+                    raise StructuredOutputError("missing from the response")
+                results[i], repaired_fields = build_model(
+                    data, processors[i].result_type, processors[i].from_extracted
+                )
+            except StructuredOutputError as e:
+                print(f"Whole-claim extraction of {doc_type} document failed ({e}), extracting it separately")
+                record_structured_output(parsed=False)
+                fallback.append(i)
+                continue
+            record_structured_output(parsed=True, repaired=repaired_json or repaired_fields)
+            # JSON经过本地修复的响应可能丢弃了截断处的字段，不写入缓存
+            if self.extraction_cache is not None and not repaired_json:
+                processors[i].store_result(
+                    document_texts[i], self.extraction_cache, results[i],
+                    key=claim_cache_key(processors[i], document_texts[i])
+                )
+            if recorder is not None:
+                recorder.record_document(DocumentTiming(
+                    document_type=doc_type,
+                    document_id=pages[0].document_id if pages else None,
+                    page_count=len(pages),
+                    queue_wait_ms=0.0,
+                    wall_time_ms=wall_time_ms
+                ))
+        return fallback
+    
+    def _extract_whole_claim(self, extraction_jobs: List[Tuple[str, List[DocumentPage]]]) -> List[BaseModel]:
+        """
+        在一次结构化请求中提取索赔的所有文档（缓存命中的文档除外）；
+        请求失败时整个索赔、响应中缺失或未通过验证的文档按文档逐个提取
+        
+        Args:
+            extraction_jobs: (文档类型, 文档页面列表) 的有序列表
+        
+        Returns:
+            与extraction_jobs顺序一致的提取结果列表
+        """
+        processors, document_texts, results, pending = self._prepare_whole_claim(extraction_jobs)
+        if pending:
+            documents, schema = self._claim_request(extraction_jobs, processors, document_texts, pending)
+            start = time.perf_counter()
+            content = None
+            try:
+                content = self.openai_client.extract_claim(
+                    CLAIM_EXTRACTION_PROMPT, documents, schema, max_tokens=WHOLE_CLAIM_MAX_COMPLETION_TOKENS
+                )
+            except Exception as e:
+                print(f"Whole-claim extraction request failed ({e}), extracting documents separately")
+            fallback = self._apply_claim_response(
+                extraction_jobs, processors, document_texts, results, pending, content, start
+            )
+            if fallback:
+                fallback_results = self._extract_documents([extraction_jobs[i] for i in fallback])
+                for i, result in zip(fallback, fallback_results):
+                    results[i] = result
+        return results
+    
+    async def _extract_whole_claim_async(self, extraction_jobs: List[Tuple[str, List[DocumentPage]]]) -> List[BaseModel]:
+        """
+        异步在一次结构化请求中提取索赔的所有文档，回退规则与_extract_whole_claim相同
+        
+        Args:
+            extraction_jobs: (文档类型, 文档页面列表) 的有序列表
+        
+        Returns:
+            与extraction_jobs顺序一致的提取结果列表
+        """
+        processors, document_texts, results, pending = await asyncio.to_thread(
+            self._prepare_whole_claim, extraction_jobs
+        )
+        if pending:
+            documents, schema = self._claim_request(extraction_jobs, processors, document_texts, pending)
+            start = time.perf_counter()
+            content = None
+            try:
+                content = await self.async_openai_client.extract_claim(
+                    CLAIM_EXTRACTION_PROMPT, documents, schema, max_tokens=WHOLE_CLAIM_MAX_COMPLETION_TOKENS
+                )
+            except Exception as e:
+                print(f"Whole-claim extraction request failed ({e}), extracting documents separately")
+            fallback = await asyncio.to_thread(
+                self._apply_claim_response,
+                extraction_jobs, processors, document_texts, results, pending, content, start
+            )
+            if fallback:
+                fallback_results = await self._extract_documents_async([extraction_jobs[i] for i in fallback])
+                for i, result in zip(fallback, fallback_results):
+                    results[i] = result
+        return results
+    
+    def _extract_documents(self, extraction_jobs: List[Tuple[str, List[DocumentPage]]]) -> List[BaseModel]:
+        """
+        对一组文档执行提取，支持有界并发
+        
+        Args:
+            extraction_jobs: (文档类型, 文档页面列表) 的有序列表
+            
+        Returns:
+            与extraction_jobs顺序一致的提取结果列表
+        """
+        if self.max_concurrency <= 1 or len(extraction_jobs) <= 1:
+            return [self.extract_document(doc_type, pages) for doc_type, pages in extraction_jobs]
+        
+        max_workers = min(self.max_concurrency, len(extraction_jobs))
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr-extract")
+        try:
+            # 每个任务复制当前上下文，使性能记录器在工作线程中可用
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self.extract_document, doc_type, pages, time.perf_counter()
+                )
+                for doc_type, pages in extraction_jobs
+            ]
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            
+            # 任一文档失败时取消尚未开始的提取，并按文档顺序抛出第一个错误
+            failed = [future for future in futures if future in done and future.exception() is not None]
+            if failed:
+                for future in not_done:
+                    future.cancel()
+                raise failed[0].exception()
+            
+            return [future.result() for future in futures]
+        finally:
+            # 等待已开始的提取结束，避免失败后仍有后台调用
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    async def _extract_documents_async(self, extraction_jobs: List[Tuple[str, List[DocumentPage]]]) -> List[BaseModel]:
+        """
+        异步对一组文档执行有界并发提取
+        处理器为同步实现，在线程中运行以避免阻塞事件循环
+        
+        Args:
+            extraction_jobs: (文档类型, 文档页面列表) 的有序列表
+        
+        Returns:
+            与extraction_jobs顺序一致的提取结果列表
+        """
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        
+        async def extract(doc_type: str, pages: List[DocumentPage]) -> BaseModel:
+            submitted_at = time.perf_counter()
+            async with semaphore:
+                return await asyncio.to_thread(self.extract_document, doc_type, pages, submitted_at)
+        
+        tasks = [asyncio.ensure_future(extract(doc_type, pages)) for doc_type, pages in extraction_jobs]
+        if not tasks:
+            return []
+        
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        
+        # 任一文档失败时取消其余提取，并按文档顺序抛出第一个错误
+        failed = [task for task in tasks if task in done and task.exception() is not None]
+        if failed:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise failed[0].exception()
+        
+        return [task.result() for task in tasks]
+    
+    def extract_document(self,
+                         doc_type: str,
+                         pages: List[DocumentPage],
+                         submitted_at: Optional[float] = None) -> BaseModel:
+        """
+        使用对应版本的处理器提取单个文档
+        分阶段处理时每条提取消息调用一次
+        
+        Args:
+            doc_type: 文档类型
+            pages: 文档页面列表
+            submitted_at: 任务提交时间（time.perf_counter），用于计算排队等待时间
+        
+        Returns:
+            提取的信息（特定于文档类型的Pydantic模型）
+        """
+        start = time.perf_counter()
+        processor = load_document_processor(doc_type, get_document_version(doc_type))
+        page_texts = [page.raw_text for page in pages]
+        extracted_data = processor.extract_document(page_texts, cache=self.extraction_cache)
+        
+        recorder = get_current_recorder()
+        if recorder is not None:
+            recorder.record_document(DocumentTiming(
+                document_type=doc_type,
+                document_id=pages[0].document_id if pages else None,
+                page_count=len(pages),
+                queue_wait_ms=round((start - (submitted_at or start)) * 1000, 3),
+                wall_time_ms=round((time.perf_counter() - start) * 1000, 3)
+            ))
+        
+        return extracted_data
+    
     def _create_metadata(self, document_versions: Dict[str, str]) -> DocumentMetadata:
         """
         创建OCR元数据
@@ -38,46 +38,43 @@ class RuleService:
     规则服务，负责加载和执行规则引擎
     """
     
-    def check_claim(self, ner_output: NEROutput, ocr_outputs: List[OCROutput]) -> RuleCheckOutput:
+    def __init__(self):
+        """
+        初始化规则服务
+        """
+        # 规则引擎实例在首次使用时创建，之后复用
+        self._rule_engine = None
+    
+    def check_claim(self, ner_output: NEROutput, ocr_output: OCROutput) -> RuleCheckOutput:
         """
         检查索赔是否符合规则
         
         Args:
             ner_output: NER处理结果
-            ocr_outputs: 多个OCR处理结果列表
+            ocr_output: OCR处理结果（包含索赔的所有文档）
             
         Returns:
             RuleCheckOutput: 规则检查结果
         """
         # 根据配置加载规则引擎
-        rule_engine = self._load_rule_engine()
+        rule_engine = self.get_rule_engine()
         
         # 模拟从数据库获取策略数据
         policy_data = self._get_policy_data(ner_output.policy_number)
         
-        # 初始化汇总结果
-        all_results = []
-        passed = True
-        messages = []
-
-        # 遍历每个OCR输出并执行规则检查
-        for ocr_output in ocr_outputs:
-            result = rule_engine.check_claim(ner_output, policy_data, ocr_output)
-            all_results.append(result)
-            
-            if not result.passed:
-                passed = False
-                messages.extend(result.messages)
-
-        # 合并最终结果
-        final_result = RuleCheckOutput(
-            passed=passed,
-            claim_id=ner_output.claim_id,
-            policy_number=ner_output.policy_number,
-            messages=messages or ["所有文档均通过规则检查"]
-        )
+        # 规则引擎基于整个索赔的OCR输出做检查
+        return rule_engine.check_claim(ner_output, policy_data, ocr_output)
+    
+    def get_rule_engine(self):
+        """
+        获取当前配置的规则引擎实例（按需创建并缓存）
         
-        return final_result
+        Returns:
+            规则引擎实例
+        """
+        if self._rule_engine is None:
+            self._rule_engine = self._load_rule_engine()
+        return self._rule_engine
     
     def _load_rule_engine(self):
         """
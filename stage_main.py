@@ -0,0 +1,30 @@
+import logging
+import azure.functions as func
+from handlers.stage_pipeline import (
+    get_staged_pipeline,
+    PIPELINE_CLASSIFY, PIPELINE_EXTRACT, PIPELINE_FAN_IN, PIPELINE_NER, PIPELINE_RULES
+)
+
+# 分阶段处理模式的队列触发器，每个阶段一个函数（见claim_stage_*目录），可分别扩展
+# 处理失败时抛出异常，由队列重试该消息，超过最大出队次数后移入poison队列
+
+def _handle(stage: str, msg: func.QueueMessage):
+    logging.info(f"Stage {stage} received message {msg.id} (dequeue count {msg.dequeue_count})")
+    result = get_staged_pipeline().handle(stage, msg.get_body().decode("utf-8"))
+    if result is not None:
+        logging.info(f"Claim {result.claim_id} processed: {result.overall_status}")
+
+def classify(msg: func.QueueMessage):
+    _handle(PIPELINE_CLASSIFY, msg)
+
+def extract(msg: func.QueueMessage):
+    _handle(PIPELINE_EXTRACT, msg)
+
+def fan_in(msg: func.QueueMessage):
+    _handle(PIPELINE_FAN_IN, msg)
+
+def ner(msg: func.QueueMessage):
+    _handle(PIPELINE_NER, msg)
+
+def rules(msg: func.QueueMessage):
+    _handle(PIPELINE_RULES, msg)
\ No newline at end of file
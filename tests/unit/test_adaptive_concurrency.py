@@ -0,0 +1,237 @@
+import io
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+from utils.adaptive_concurrency import AdaptiveConcurrencyLimiter, get_retry_after_seconds, is_retryable_error
+
+class ServiceError(Exception):
+    """
+    带status_code和响应头的错误，与openai和azure-core的错误一致
+    """
+    
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+def _limiter(**options):
+    defaults = dict(initial_limit=4, min_limit=1, max_limit=8, latency_target_ms=10000,
+                    increase_step=1, latency_decrease_factor=0.9, throttle_decrease_factor=0.5,
+                    max_retries=2, backoff_seconds=0, default_retry_after_seconds=0)
+    defaults.update(options)
+    return AdaptiveConcurrencyLimiter("test", **defaults)
+
+def _failing(errors, result="ok"):
+    """
+    依次抛出errors中的错误，之后返回result
+    """
+    calls = []
+    
+    def func(*args, **kwargs):
+        calls.append(args)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return func, calls
+
+def test_healthy_calls_increase_limit_additively():
+    limiter = _limiter(initial_limit=4)
+    for _ in range(4):
+        limiter.call(lambda: None)
+    # 每次调用增加1/limit，约limit次调用增加1
+    assert 4.8 < limiter._limit < 5
+    limiter.call(lambda: None)
+    assert limiter.limit == 5
+
+def test_limit_stays_within_bounds():
+    limiter = _limiter(initial_limit=4, max_limit=5)
+    for _ in range(50):
+        limiter.call(lambda: None)
+    assert limiter.limit == 5
+    
+    limiter = _limiter(initial_limit=2, min_limit=1)
+    for _ in range(5):
+        with pytest.raises(ServiceError):
+            limiter.call(_failing([ServiceError(429)] * 10)[0])
+    assert limiter.limit == 1
+
+def test_slow_calls_decrease_limit():
+    limiter = _limiter(initial_limit=10, max_limit=16, latency_target_ms=0)
+    limiter.call(lambda: time.sleep(0.001))
+    assert limiter._limit == pytest.approx(9)
+
+def test_throttling_decreases_limit_once_per_epoch():
+    limiter = _limiter(initial_limit=8)
+    permits = [limiter._acquire() for _ in range(3)]
+    for permit in permits:
+        limiter._release_failed(permit, ServiceError(429), attempt=0)
+    # 同一周期内并发的三次限流只降低一次
+    assert limiter.limit == 4
+    assert limiter.stats().throttled == 3
+    
+    # 降低之后发起的调用属于新的周期
+    limiter._release_failed(limiter._acquire(), ServiceError(429), attempt=0)
+    assert limiter.limit == 2
+
+def test_retry_after_is_honored():
+    limiter = _limiter(initial_limit=8)
+    func, calls = _failing([ServiceError(429, {"retry-after-ms": "150"})])
+    start = time.monotonic()
+    assert limiter.call(func) == "ok"
+    assert time.monotonic() - start >= 0.15
+    assert len(calls) == 2
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+def test_retry_after_blocks_other_callers():
+    limiter = _limiter(initial_limit=8)
+    with pytest.raises(ServiceError):
+        limiter.call(_failing([ServiceError(429, {"retry-after": "0.2"})] * 10)[0])
+    start = time.monotonic()
+    limiter.call(lambda: None)
+    assert time.monotonic() - start >= 0.1
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "250"}, 0.25),
+    ({"x-ms-retry-after-ms": "1000"}, 1.0),
+    ({"retry-after": "3"}, 3.0),
+    ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, None),
+    ({}, None),
+])
+def test_get_retry_after_seconds(headers, expected):
+    assert get_retry_after_seconds(ServiceError(429, headers)) == expected
+
+def test_retryable_errors():
+    assert is_retryable_error(ServiceError(429))
+    assert is_retryable_error(ServiceError(503))
+    assert is_retryable_error(ConnectionError())
+    assert not is_retryable_error(ServiceError(400))
+    assert not is_retryable_error(ValueError())
+
+def test_gives_up_after_retry_budget():
+    limiter = _limiter(max_retries=2)
+    func, calls = _failing([ServiceError(503)] * 10)
+    with pytest.raises(ServiceError):
+        limiter.call(func)
+    assert len(calls) == 3
+    assert limiter.in_flight == 0
+
+def test_non_retryable_error_is_raised_immediately():
+    limiter = _limiter()
+    func, calls = _failing([ValueError("bad request")])
+    with pytest.raises(ValueError):
+        limiter.call(func)
+    assert len(calls) == 1
+    assert limiter.in_flight == 0
+    assert limiter.limit == 4
+
+def test_streams_are_rewound_before_retry():
+    limiter = _limiter()
+    reads = []
+    
+    def upload(stream):
+        reads.append(stream.read())
+        if len(reads) == 1:
+            raise ServiceError(503)
+        return len(reads[-1])
+    
+    stream = io.BytesIO(b"header-page-data")
+    stream.read(7)
+    assert limiter.call(upload, stream) == 9
+    assert reads == [b"page-data", b"page-data"]
+
+def test_threads_never_exceed_limit():
+    limiter = _limiter(initial_limit=2, max_limit=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+    
+    def work():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.01)
+        with lock:
+            active.pop()
+    
+    threads = [threading.Thread(target=limiter.call, args=(work,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+    assert limiter.in_flight == 0
+    assert limiter.queue_depth == 0
+
+def test_cancelled_call_releases_its_slot():
+    limiter = _limiter(initial_limit=1, max_limit=1)
+    
+    async def main():
+        started = asyncio.Event()
+        
+        async def hang():
+            started.set()
+            await asyncio.sleep(10)
+        
+        task = asyncio.ensure_future(limiter.call_async(hang))
+        await started.wait()
+        assert limiter.in_flight == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert limiter.in_flight == 0
+        
+        async def done():
+            return "ok"
+        assert await limiter.call_async(done) == "ok"
+    
+    asyncio.run(main())
+    assert limiter.in_flight == 0
+
+def test_cancelled_waiter_leaves_queue_and_returns_granted_slot():
+    limiter = _limiter(initial_limit=1, max_limit=1)
+    
+    async def done():
+        return "ok"
+    
+    async def main():
+        permit = limiter._acquire()
+        waiting = asyncio.ensure_future(limiter.call_async(done))
+        await asyncio.sleep(0.01)
+        assert limiter.queue_depth == 1
+        
+        # 槽位已移交给等待中的调用，但调用在恢复前被取消
+        limiter._release(permit)
+        assert limiter.in_flight == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.in_flight == 0
+        
+        # 排队中被取消的调用直接移出队列
+        permit = limiter._acquire()
+        waiting = asyncio.ensure_future(limiter.call_async(done))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.queue_depth == 0
+        limiter._release(permit)
+    
+    asyncio.run(main())
+    assert limiter.in_flight == 0
+
+def test_async_exception_releases_slot():
+    limiter = _limiter(max_retries=1)
+    calls = []
+    
+    async def fail():
+        calls.append(1)
+        raise ServiceError(500)
+    
+    with pytest.raises(ServiceError):
+        asyncio.run(limiter.call_async(fail))
+    assert len(calls) == 2
+    assert limiter.in_flight == 0
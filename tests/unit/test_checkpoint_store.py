@@ -0,0 +1,93 @@
+import asyncio
+from typing import List
+import pytest
+from schemas.document_page import DocumentPage
+from utils.checkpoint_store import ClaimCheckpoint, LocalDiskCheckpointStore, make_checkpoint_key
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalDiskCheckpointStore(str(tmp_path / "checkpoints"))
+
+def _pages():
+    return [DocumentPage(page_number=1, raw_text="page one", document_type="invoice", document_id="invoice-1")]
+
+def _counting(result):
+    calls = []
+    
+    def compute():
+        calls.append(1)
+        return result
+    return compute, calls
+
+def test_stage_is_computed_once_and_resumed(store):
+    compute, calls = _counting(_pages())
+    first = ClaimCheckpoint(store, "claim")
+    assert first.run("classified-pages", List[DocumentPage], compute) == _pages()
+    assert first.resumed_stages == []
+    
+    # 重试时从检查点恢复，不再计算
+    retry = ClaimCheckpoint(store, "claim")
+    assert retry.run("classified-pages", List[DocumentPage], compute) == _pages()
+    assert retry.resumed_stages == ["classified-pages"]
+    assert calls == [1]
+
+def test_retry_resumes_after_last_completed_stage(store):
+    first = ClaimCheckpoint(store, "claim")
+    first.run("ocr", int, lambda: 1)
+    
+    def fail():
+        raise RuntimeError("NER timed out")
+    
+    with pytest.raises(RuntimeError):
+        first.run("ner", int, fail)
+    
+    retry = ClaimCheckpoint(store, "claim")
+    compute_ocr, ocr_calls = _counting(1)
+    compute_ner, ner_calls = _counting(2)
+    assert retry.run("ocr", int, compute_ocr) == 1
+    assert retry.run("ner", int, compute_ner) == 2
+    assert retry.resumed_stages == ["ocr"]
+    assert ocr_calls == []
+    assert ner_calls == [1]
+
+def test_without_store_stages_are_always_computed():
+    compute, calls = _counting(1)
+    checkpoint = ClaimCheckpoint(None, "claim")
+    checkpoint.run("ocr", int, compute)
+    checkpoint.run("ocr", int, compute)
+    checkpoint.clear()
+    assert calls == [1, 1]
+    assert checkpoint.resumed_stages == []
+
+def test_async_stage_is_resumed(store):
+    calls = []
+    
+    async def compute():
+        calls.append(1)
+        return _pages()
+    
+    async def run():
+        checkpoint = ClaimCheckpoint(store, "claim")
+        return await checkpoint.run_async("grouped-pages", List[DocumentPage], compute), checkpoint.resumed_stages
+    
+    assert asyncio.run(run()) == (_pages(), [])
+    assert asyncio.run(run()) == (_pages(), ["grouped-pages"])
+    assert calls == [1]
+
+def test_clear_removes_all_stages(store):
+    checkpoint = ClaimCheckpoint(store, "claim")
+    checkpoint.run("ocr", int, lambda: 1)
+    checkpoint.run("ner", int, lambda: 2)
+    checkpoint.clear()
+    assert store.load("claim", "ocr") is None
+    assert store.load("claim", "ner") is None
+    # 重复清理不报错
+    checkpoint.clear()
+
+def test_checkpoint_key_depends_on_directory_and_config_version():
+    key = make_checkpoint_key("claims/a", "v1")
+    assert key == make_checkpoint_key("claims/a", "v1")
+    assert key != make_checkpoint_key("claims/b", "v1")
+    # 配置变化后不复用旧检查点
+    assert key != make_checkpoint_key("claims/a", "v2")
+    assert "/" not in key
@@ -0,0 +1,304 @@
+import time
+import asyncio
+import threading
+import itertools
+from types import SimpleNamespace
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+import utils.dedup_index as dedup_index
+from utils.dedup_index import BlobDedupIndex, ClaimDeduplicator, SQLiteDedupIndex, STATUS_DONE, STATUS_IN_FLIGHT
+
+class FakeBlobClient:
+    """
+    按ETag条件读写的内存Blob
+    """
+    
+    def __init__(self, blobs, name):
+        self._blobs = blobs
+        self._name = name
+    
+    def download_blob(self):
+        if self._name not in self._blobs:
+            raise ResourceNotFoundError("not found")
+        data, etag = self._blobs[self._name]
+        return SimpleNamespace(readall=lambda: data, properties=SimpleNamespace(etag=etag))
+    
+    def _check(self, etag, match_condition):
+        if match_condition == MatchConditions.IfNotModified:
+            if self._name not in self._blobs:
+                raise ResourceNotFoundError("not found")
+            if self._blobs[self._name][1] != etag:
+                raise ResourceModifiedError("modified")
+    
+    def upload_blob(self, data, overwrite=False, etag=None, match_condition=None):
+        if not overwrite and self._name in self._blobs:
+            raise ResourceExistsError("exists")
+        self._check(etag, match_condition)
+        self._blobs[self._name] = (data, f"etag-{next(self._blobs.etags)}")
+    
+    def delete_blob(self, etag=None, match_condition=None):
+        self._check(etag, match_condition)
+        del self._blobs[self._name]
+
+class _Blobs(dict):
+    """
+    容器中的Blob：名称到(内容, ETag)
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.etags = itertools.count()
+
+class FakeBlobStorage:
+    """
+    AzureBlobStorageClient中去重索引用到的部分
+    """
+    
+    def __init__(self):
+        self.containers = {}
+    
+    def get_blob_client(self, container_name, blob_name):
+        return FakeBlobClient(self.containers.setdefault(container_name, _Blobs()), blob_name)
+
+@pytest.fixture(params=["sqlite", "blob"])
+def index(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteDedupIndex(str(tmp_path / "dedup.db"))
+    return BlobDedupIndex(FakeBlobStorage(), "dedup")
+
+def test_acquire_is_exclusive_until_released(index):
+    first = index.acquire("fp", "claims/a", lease_seconds=60)
+    second = index.acquire("fp", "claims/b", lease_seconds=60)
+    assert first.acquired
+    assert not second.acquired
+    assert second.status == STATUS_IN_FLIGHT
+    assert second.blob_directory == "claims/a"
+    
+    index.release("fp")
+    assert index.get("fp") is None
+    assert index.acquire("fp", "claims/b", lease_seconds=60).acquired
+
+def test_completed_entry_returns_result(index):
+    index.acquire("fp", "claims/a", lease_seconds=60)
+    index.complete("fp", '{"ok": true}')
+    entry = index.acquire("fp", "claims/b", lease_seconds=0)
+    assert not entry.acquired
+    assert entry.status == STATUS_DONE
+    assert entry.result == '{"ok": true}'
+    assert entry.blob_directory == "claims/a"
+    
+    # 已完成的记录不会被release删除
+    index.release("fp")
+    assert index.get("fp").status == STATUS_DONE
+
+def test_expired_lease_is_taken_over(index):
+    index.acquire("fp", "claims/a", lease_seconds=60)
+    entry = index.acquire("fp", "claims/b", lease_seconds=0)
+    assert entry.acquired
+    assert index.get("fp").blob_directory == "claims/b"
+
+def test_blob_takeover_fails_when_entry_changed():
+    storage = FakeBlobStorage()
+    index = BlobDedupIndex(storage, "dedup")
+    index.acquire("fp", "claims/a", lease_seconds=60)
+    _, etag = index._read("fp")
+    index.complete("fp", "{}")
+    assert not index._write("fp", {"status": STATUS_IN_FLIGHT, "updated_at": 0}, etag)
+    assert index.get("fp").status == STATUS_DONE
+
+def test_renew_only_extends_own_in_flight_entry(index):
+    index.acquire("fp", "claims/a", lease_seconds=60)
+    assert index.renew("fp", "claims/a")
+    assert not index.renew("fp", "claims/b")
+    index.complete("fp", "{}")
+    assert not index.renew("fp", "claims/a")
+    assert not index.renew("missing", "claims/a")
+
+def test_renewed_entry_is_not_taken_over(index, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dedup_index.time, "time", lambda: now[0])
+    index.acquire("fp", "claims/a", lease_seconds=60)
+    now[0] += 50
+    assert index.renew("fp", "claims/a")
+    now[0] += 50
+    assert not index.acquire("fp", "claims/b", lease_seconds=60).acquired
+    now[0] += 61
+    assert index.acquire("fp", "claims/b", lease_seconds=60).acquired
+
+def test_deduplicator_renews_lease_while_computing(tmp_path):
+    index = SQLiteDedupIndex(str(tmp_path / "dedup.db"))
+    renewals = []
+    renew = index.renew
+    index.renew = lambda fingerprint, blob_directory: renewals.append(blob_directory) or renew(fingerprint, blob_directory)
+    deduplicator = ClaimDeduplicator(index, lease_seconds=0.15, poll_interval_seconds=0.01)
+    
+    def compute():
+        time.sleep(0.3)
+        # 处理时间超过租约时间，续租后其他worker仍不能接手
+        assert not index.acquire("fp", "claims/b", deduplicator.lease_seconds).acquired
+        return 1
+    
+    assert deduplicator.run("fp", "claims/a", int, compute) == 1
+    assert renewals and set(renewals) == {"claims/a"}
+    assert index.get("fp").status == STATUS_DONE
+
+def test_duplicate_from_another_directory_is_reported(tmp_path):
+    deduplicator = ClaimDeduplicator(SQLiteDedupIndex(str(tmp_path / "dedup.db")), poll_interval_seconds=0.01)
+    duplicates = []
+    
+    def run(blob_directory):
+        return deduplicator.run(
+            "fp", blob_directory, int, lambda: 7,
+            on_duplicate=lambda result: duplicates.append((blob_directory, result))
+        )
+    
+    assert run("claims/a") == 7
+    assert run("claims/a") == 7
+    assert duplicates == []
+    assert run("claims/b") == 7
+    assert duplicates == [("claims/b", 7)]
+
+def test_attached_duplicate_from_another_directory_is_reported(tmp_path):
+    deduplicator = ClaimDeduplicator(SQLiteDedupIndex(str(tmp_path / "dedup.db")), poll_interval_seconds=0.01)
+    duplicates = []
+    computed = []
+    
+    async def compute():
+        computed.append(1)
+        await asyncio.sleep(0.05)
+        return 7
+    
+    async def on_duplicate(result):
+        duplicates.append(result)
+    
+    async def main():
+        return await asyncio.gather(*(
+            deduplicator.run_async("fp", blob_directory, int, compute, on_duplicate=on_duplicate)
+            for blob_directory in ("claims/a", "claims/a", "claims/b")
+        ))
+    
+    assert asyncio.run(main()) == [7, 7, 7]
+    assert computed == [1]
+    assert duplicates == [7]
+
+def test_register_for_staged_processing(tmp_path):
+    deduplicator = ClaimDeduplicator(SQLiteDedupIndex(str(tmp_path / "dedup.db")), poll_interval_seconds=0.01)
+    assert deduplicator.register("fp", "claims/a").acquired
+    # 同一目录的重复触发直接返回
+    duplicate = deduplicator.register("fp", "claims/a")
+    assert not duplicate.acquired and duplicate.status == STATUS_IN_FLIGHT
+    
+    # 其他目录等待处理方完成
+    timer = threading.Timer(0.05, deduplicator.complete, args=("fp", int, 7))
+    timer.start()
+    entry = deduplicator.register("fp", "claims/b")
+    timer.join()
+    assert entry.status == STATUS_DONE
+    assert entry.result == "7"
+    assert entry.blob_directory == "claims/a"
+
+def test_deduplicator_computes_once_and_returns_stored_result(tmp_path):
+    deduplicator = ClaimDeduplicator(SQLiteDedupIndex(str(tmp_path / "dedup.db")), poll_interval_seconds=0.01)
+    computed = []
+    
+    def compute():
+        computed.append(1)
+        return 7
+    
+    assert deduplicator.run("fp", "claims/a", int, compute) == 7
+    assert deduplicator.run("fp", "claims/a", int, compute) == 7
+    assert computed == [1]
+
+def test_concurrent_threads_share_one_run(tmp_path):
+    deduplicator = ClaimDeduplicator(SQLiteDedupIndex(str(tmp_path / "dedup.db")), poll_interval_seconds=0.01)
+    computed = []
+    results = []
+    
+    def compute():
+        computed.append(1)
+        time.sleep(0.05)
+        return 7
+    
+    threads = [
+        threading.Thread(target=lambda: results.append(deduplicator.run("fp", "claims/a", int, compute)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [7, 7, 7, 7]
+    assert computed == [1]
+
+def test_waits_for_other_worker(tmp_path):
+    # 两个去重处理器共享一个索引，模拟两个worker
+    path = str(tmp_path / "dedup.db")
+    first = ClaimDeduplicator(SQLiteDedupIndex(path), poll_interval_seconds=0.01)
+    second = ClaimDeduplicator(SQLiteDedupIndex(path), poll_interval_seconds=0.01)
+    started = threading.Event()
+    computed = []
+    
+    def slow():
+        started.set()
+        time.sleep(0.1)
+        return 7
+    
+    thread = threading.Thread(target=first.run, args=("fp", "claims/a", int, slow))
+    thread.start()
+    started.wait()
+    assert second.run("fp", "claims/b", int, lambda: computed.append(1) or 8) == 7
+    thread.join()
+    assert computed == []
+
+def test_failed_run_releases_fingerprint(tmp_path):
+    index = SQLiteDedupIndex(str(tmp_path / "dedup.db"))
+    deduplicator = ClaimDeduplicator(index, poll_interval_seconds=0.01)
+    
+    def fail():
+        raise RuntimeError("boom")
+    
+    with pytest.raises(RuntimeError):
+        deduplicator.run("fp", "claims/a", int, fail)
+    assert index.get("fp") is None
+    assert deduplicator.run("fp", "claims/a", int, lambda: 7) == 7
+
+def test_waiting_worker_takes_over_after_failure(tmp_path):
+    path = str(tmp_path / "dedup.db")
+    first = ClaimDeduplicator(SQLiteDedupIndex(path), poll_interval_seconds=0.01)
+    second = ClaimDeduplicator(SQLiteDedupIndex(path), poll_interval_seconds=0.01)
+    started = threading.Event()
+    
+    def fail():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+    
+    def run_first():
+        with pytest.raises(RuntimeError):
+            first.run("fp", "claims/a", int, fail)
+    
+    thread = threading.Thread(target=run_first)
+    thread.start()
+    started.wait()
+    assert second.run("fp", "claims/b", int, lambda: 8) == 8
+    thread.join()
+    assert second.index.get("fp").blob_directory == "claims/b"
+
+def test_cancelled_async_run_releases_fingerprint(tmp_path):
+    index = SQLiteDedupIndex(str(tmp_path / "dedup.db"))
+    deduplicator = ClaimDeduplicator(index, poll_interval_seconds=0.01)
+    
+    async def hang():
+        await asyncio.sleep(10)
+    
+    async def main():
+        task = asyncio.ensure_future(deduplicator.run_async("fp", "claims/a", int, hang))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    asyncio.run(main())
+    assert index.get("fp") is None
+    assert deduplicator._in_flight_async == {}
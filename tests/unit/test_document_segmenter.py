@@ -0,0 +1,75 @@
+import pytest
+from schemas.document_page import DocumentPage
+from utils.document_segmenter import CLAIM_FORM_DOCUMENT_ID, header_tokens, parse_page_marker, segment_pages
+
+def _pages(*pages):
+    return [
+        DocumentPage(page_number=number, raw_text=text, document_type=doc_type)
+        for number, (doc_type, text) in enumerate(pages, start=1)
+    ]
+
+def _ids(pages):
+    return [page.document_id for page in segment_pages(pages)]
+
+@pytest.mark.parametrize("text, expected", [
+    ("City General Hospital\nPage 2 of 6\nCharges", (2, 6)),
+    ("Invoice INV-1\nCharges\np. 3/4", (3, 4)),
+    ("Invoice\nPG. 1 of 1", (1, 1)),
+    ("Invoice\nPage 7 of 6", None),
+    ("Invoice without marker", None),
+])
+def test_parse_page_marker(text, expected):
+    assert parse_page_marker(text) == expected
+
+def test_parse_page_marker_ignores_body_references():
+    text = "Invoice\n" + "line\n" * 100 + "see page 2 of 6 of the policy\n" + "line\n" * 100
+    assert parse_page_marker(text, scan_chars=50) is None
+
+def test_header_tokens_ignore_numbers_and_continuation_words():
+    assert header_tokens("CITY HOSPITAL Invoice 123 (continued) Page 2 of 3") == {"city", "hospital", "invoice"}
+
+def test_page_markers_split_consecutive_documents_of_same_type():
+    pages = _pages(
+        ("invoice", "City Hospital Invoice\nPage 1 of 2"),
+        ("invoice", "City Hospital Invoice\nPage 2 of 2"),
+        ("invoice", "City Hospital Invoice\nPage 1 of 1"),
+    )
+    assert _ids(pages) == ["invoice_1", "invoice_1", "invoice_2"]
+
+def test_broken_page_sequence_starts_new_document():
+    pages = _pages(
+        ("invoice", "Invoice A\nPage 1 of 3"),
+        ("invoice", "Invoice A\nPage 3 of 3"),
+        ("invoice", "Invoice B\nPage 2 of 4"),
+    )
+    assert _ids(pages) == ["invoice_1", "invoice_2", "invoice_3"]
+
+def test_unmarked_pages_continue_by_header_similarity():
+    pages = _pages(
+        ("discharge", "City General Hospital Discharge Summary\nPatient John Doe"),
+        ("discharge", "City General Hospital Discharge Summary\nPatient John Doe\nMedications"),
+        ("discharge", "Riverside Clinic Discharge Summary\nPatient John Doe"),
+        ("discharge", "Medications (continued)\nAspirin"),
+    )
+    assert _ids(pages) == ["discharge_1", "discharge_1", "discharge_2", "discharge_2"]
+
+def test_unmarked_page_after_last_marked_page_starts_new_document():
+    pages = _pages(
+        ("receipt", "Pharmacy Receipt\nPage 2 of 2"),
+        ("receipt", "Pharmacy Receipt\nTotal paid"),
+    )
+    assert _ids(pages) == ["receipt_1", "receipt_2"]
+
+def test_type_change_starts_new_document_and_claim_form_is_single():
+    pages = _pages(
+        ("claim_form", "Claim Form\nPage 1 of 2"),
+        ("invoice", "City Hospital Invoice"),
+        ("claim_form", "Claim Form\nPage 2 of 2"),
+        ("invoice", "City Hospital Invoice"),
+    )
+    assert _ids(pages) == [CLAIM_FORM_DOCUMENT_ID, "invoice_1", CLAIM_FORM_DOCUMENT_ID, "invoice_2"]
+
+def test_pages_keep_their_order():
+    pages = _pages(("invoice", "Invoice\nPage 1 of 1"), ("receipt", "Receipt"))
+    assert segment_pages(pages) is pages
+    assert [page.page_number for page in pages] == [1, 2]
@@ -0,0 +1,75 @@
+import re
+import random
+import pytest
+from document_classifiers.keyword_engine import CompiledKeywordClassifier, KeywordRule, _trie_pattern
+from document_classifiers.v1.classifier import V1_RULES, DocumentClassifierV1
+
+def _naive_type(text, rules, default_type):
+    # 逐个关键字做子串查找的参考实现
+    text = text.lower()
+    for rule in rules:
+        if all(any(keyword in text for keyword in group) for group in rule.all_of):
+            return rule.document_type
+    return default_type
+
+def test_trie_pattern_matches_longest_keyword():
+    pattern = re.compile(_trie_pattern(["id", "identification", "insur"]))
+    assert pattern.findall("identification id insured") == ["identification", "id", "insur"]
+
+def test_scan_matches_substring_search():
+    engine = CompiledKeywordClassifier(V1_RULES, default_type="claim_form")
+    keywords = engine._keywords
+    rng = random.Random(0)
+    fragments = keywords + ["a", "e", "te", "pa", "x", " ", "\n", "PAID", "Insurance"]
+    for _ in range(2000):
+        text = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 12)))
+        expected = {keyword for keyword in keywords if keyword in text.lower()}
+        mask = engine.scan(text)
+        assert {keyword for keyword in keywords if mask & engine._bits[keyword]} == expected, text
+
+@pytest.mark.parametrize("text", [
+    "paidate",  # date从paid内部开始
+    "paid",  # id包含在paid中
+    "identification card",
+    "Invoice total amount",
+])
+def test_overlapping_keywords_are_found(text):
+    engine = CompiledKeywordClassifier(V1_RULES, default_type="claim_form")
+    assert engine.classify(text).document_type == _naive_type(text, V1_RULES, "claim_form")
+
+def test_classification_matches_reference_on_random_pages():
+    engine = CompiledKeywordClassifier(V1_RULES, default_type="claim_form")
+    words = engine._keywords + ["patient", "total", "the", "ward", "ref", "no"]
+    rng = random.Random(1)
+    for _ in range(1000):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 8)))
+        assert engine.classify(text).document_type == _naive_type(text, V1_RULES, "claim_form"), text
+
+def test_first_matching_rule_wins_and_confidence_reflects_ambiguity():
+    engine = CompiledKeywordClassifier(V1_RULES, default_type="claim_form")
+    result = engine.classify("Hospital invoice")
+    assert result.document_type == "invoice"
+    assert result.confidence == 1.0
+    
+    # 同时命中出院小结和发票规则，按优先级取出院小结
+    result = engine.classify("Discharge summary, hospital treatment invoice")
+    assert result.document_type == "discharge"
+    assert result.confidence == 0.75
+    assert result.matched_keywords == ["discharge", "hospital", "invoice", "treatment"]
+
+def test_unmatched_page_returns_default_type():
+    engine = CompiledKeywordClassifier(
+        [KeywordRule(document_type="receipt", all_of=[["receipt"]])], default_type="claim_form"
+    )
+    result = engine.classify("Lab results")
+    assert result.document_type == "claim_form"
+    assert result.confidence == 0.0
+    assert result.matched_keywords == []
+
+def test_classify_many_matches_classify():
+    classifier = DocumentClassifierV1()
+    texts = ["Claim form, policy number", "Receipt", "Bank transaction payment", "", "ID card"]
+    assert classifier.classify_many(texts) == [classifier.classify(text) for text in texts]
+    assert [result.document_type for result in classifier.classify_many(texts)] == [
+        "claim_form", "receipt", "payment_proof", "claim_form", "id_card"
+    ]
@@ -0,0 +1,60 @@
+from datetime import date
+from schemas.ocr_output import DischargeOCR, InvoiceOCR
+from document_processors.reducers import consensus, reduce_discharge, reduce_invoice, reduce_partials
+
+def _discharge(**fields):
+    data = {
+        "patient_name": "John Doe",
+        "diagnosis_codes": ["I10"],
+        "procedure_codes": [],
+        "admission_date": date(2025, 1, 10),
+        "discharge_date": date(2025, 1, 15),
+        "attending_physician": "Dr. Smith",
+        "hospital_name": "City General Hospital",
+        "discharge_condition": "Stable"
+    }
+    data.update(fields)
+    return DischargeOCR(**data)
+
+def test_consensus_prefers_most_common_non_empty_value():
+    assert consensus(["", "B", "A", "A", None]) == "A"
+    assert consensus(["B", "A"]) == "B"
+    assert consensus(["", None]) is None
+
+def test_reduce_discharge_merges_codes_and_dates():
+    merged = reduce_discharge([
+        _discharge(diagnosis_codes=["I10", "E11.9"], admission_date=date(2025, 1, 11)),
+        _discharge(diagnosis_codes=["E11.9", "J18.9"], admission_date=date(2025, 1, 9),
+                   discharge_date=date(2025, 1, 20), attending_physician=""),
+    ])
+    assert merged.diagnosis_codes == ["I10", "E11.9", "J18.9"]
+    assert merged.admission_date == date(2025, 1, 9)
+    assert merged.discharge_date == date(2025, 1, 20)
+    assert merged.attending_physician == "Dr. Smith"
+
+def test_reduce_discharge_keeps_fields_empty_in_every_chunk():
+    partial = _discharge(attending_physician="", discharge_condition="")
+    merged = reduce_discharge([partial, partial.model_copy()])
+    assert merged.attending_physician == ""
+    assert merged.discharge_condition == ""
+    assert merged.patient_name == "John Doe"
+
+def test_reduce_invoice_concatenates_charges_and_sums_costs():
+    partials = [
+        InvoiceOCR(total_amount=100.0, service_date=date(2025, 1, 12), hospital_name="City General Hospital",
+                   itemized_charges=[{"item": "X-ray", "cost": 100.0}]),
+        InvoiceOCR(total_amount=100.0, service_date=date(2025, 1, 10), hospital_name="",
+                   itemized_charges=[{"item": "X-ray", "cost": 100.0}, {"item": "Lab", "cost": 25.5}]),
+    ]
+    merged = reduce_partials(partials)
+    assert len(merged.itemized_charges) == 3
+    assert merged.total_amount == 225.5
+    assert merged.service_date == date(2025, 1, 10)
+    assert merged.hospital_name == "City General Hospital"
+
+def test_reduce_invoice_without_costs_uses_largest_total():
+    partials = [
+        InvoiceOCR(total_amount=80.0, service_date=date(2025, 1, 10), hospital_name="H", itemized_charges=[{"item": "A"}]),
+        InvoiceOCR(total_amount=120.0, service_date=date(2025, 1, 10), hospital_name="H", itemized_charges=[]),
+    ]
+    assert reduce_invoice(partials).total_amount == 120.0
@@ -0,0 +1,113 @@
+import threading
+from datetime import date
+from types import SimpleNamespace
+import pytest
+from schemas.document_page import DocumentPage
+from schemas.ocr_output import ClaimFormOCR, DocumentMetadata, OCROutput
+from schemas.stage_message import StageMessage
+from handlers.claim_processor import STAGE_GROUPED_PAGES, STAGE_OCR
+from handlers.stage_pipeline import (
+    PIPELINE_NER, STAGE_FAN_IN_CLAIM, StagedClaimPipeline, _document_stage
+)
+from utils.checkpoint_store import LocalDiskCheckpointStore
+from utils.work_queue import InMemoryWorkQueue
+
+DOCUMENT_COUNT = 3
+
+class FakeOCRService:
+    """
+    汇总阶段用到的OCRService部分，记录组装次数
+    """
+    
+    def __init__(self):
+        self.build_calls = 0
+        self._lock = threading.Lock()
+    
+    def collect_extraction_jobs(self, grouped_pages):
+        return [(page.document_type, [page]) for page in grouped_pages]
+    
+    def build_output(self, extraction_jobs, extracted_results):
+        with self._lock:
+            self.build_calls += 1
+        return OCROutput(
+            claim_form=ClaimFormOCR(
+                policy_number="P-1", patient_name="John Doe", claim_amount=100.0,
+                claim_date=date(2025, 1, 20), diagnosis_codes=["I10"]
+            ),
+            metadata=DocumentMetadata(
+                ocr_version="test", document_versions={}, processing_timestamp="2025-01-20T00:00:00"
+            )
+        )
+
+@pytest.fixture
+def pipeline(tmp_path):
+    processor = SimpleNamespace(ocr_service=FakeOCRService(), checkpoint_store=None, deduplicator=None)
+    store = LocalDiskCheckpointStore(str(tmp_path / "state"))
+    pages = [
+        DocumentPage(page_number=index + 1, raw_text=f"page {index}", document_type="invoice", document_id=f"invoice-{index}")
+        for index in range(DOCUMENT_COUNT)
+    ]
+    store.save("claim", STAGE_GROUPED_PAGES, "[" + ",".join(page.model_dump_json() for page in pages) + "]")
+    return StagedClaimPipeline(processor, InMemoryWorkQueue(), state_store=store)
+
+def _message(index):
+    return StageMessage(run_key="claim", blob_directory="claims/a", document_index=index)
+
+def _extract_all(pipeline):
+    for index in range(DOCUMENT_COUNT):
+        pipeline.state_store.save("claim", _document_stage(index), "{}")
+
+def test_fan_in_waits_for_all_documents(pipeline):
+    pipeline.state_store.save("claim", _document_stage(0), "{}")
+    pipeline._fan_in(_message(0))
+    assert pipeline.processor.ocr_service.build_calls == 0
+    assert pipeline.state_store.load("claim", STAGE_FAN_IN_CLAIM) is None
+    assert pipeline.queue.count(pipeline.queue_names[PIPELINE_NER]) == 0
+
+def test_concurrent_fan_in_messages_build_output_once(pipeline):
+    _extract_all(pipeline)
+    # 所有文档同时完成，每条消息都看到全部结果
+    barrier = threading.Barrier(DOCUMENT_COUNT)
+    
+    def fan_in(index):
+        barrier.wait()
+        pipeline._fan_in(_message(index))
+    
+    threads = [threading.Thread(target=fan_in, args=(index,)) for index in range(DOCUMENT_COUNT)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pipeline.processor.ocr_service.build_calls == 1
+    assert pipeline.queue.count(pipeline.queue_names[PIPELINE_NER]) == 1
+    assert pipeline.state_store.load("claim", STAGE_OCR) is not None
+
+def test_redelivered_claimant_message_continues(pipeline):
+    _extract_all(pipeline)
+    # 认领方在汇总中途失败，其消息重新投递后继续；其他消息仍被跳过
+    pipeline.state_store.create("claim", STAGE_FAN_IN_CLAIM, "1")
+    pipeline._fan_in(_message(0))
+    assert pipeline.processor.ocr_service.build_calls == 0
+    pipeline._fan_in(_message(1))
+    assert pipeline.processor.ocr_service.build_calls == 1
+    assert pipeline.queue.count(pipeline.queue_names[PIPELINE_NER]) == 1
+
+def test_create_is_atomic(tmp_path):
+    store = LocalDiskCheckpointStore(str(tmp_path / "state"))
+    barrier = threading.Barrier(8)
+    created = []
+    
+    def create(owner):
+        barrier.wait()
+        if store.create("claim", "claim-marker", owner):
+            created.append(owner)
+    
+    threads = [threading.Thread(target=create, args=(str(index),)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert store.load("claim", "claim-marker") == created[0]
+    # 没有留下临时文件
+    assert [path.name for path in (tmp_path / "state" / "claim").iterdir()] == ["claim-marker.json"]
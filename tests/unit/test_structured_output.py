@@ -0,0 +1,105 @@
+import json
+import pytest
+from schemas.ocr_output import DischargeOCR, InvoiceOCR
+from utils.structured_output import StructuredOutputError, build_model, load_json_object, repair_json
+
+DISCHARGE = {
+    "patient_name": "John Doe",
+    "diagnosis_codes": ["I10", "E11.9"],
+    "procedure_codes": ["99213"],
+    "admission_date": "2025-01-10",
+    "discharge_date": "2025-01-15",
+    "attending_physician": "Dr. Smith",
+    "hospital_name": "City General Hospital",
+    "discharge_condition": "Stable"
+}
+
+def _truncated(data, marker):
+    """
+    在marker之后截断JSON文本，模拟被max_tokens截断的回复
+    """
+    text = json.dumps(data)
+    return text[:text.index(marker) + len(marker)]
+
+@pytest.mark.parametrize("content, expected", [
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('{"a": [1, 2,], "b": "x",}', {"a": [1, 2], "b": "x"}),
+    ('Result: {"a": "x\\"}"} done', {"a": 'x"}'}),
+])
+def test_repair_json_fixes_formatting(content, expected):
+    assert json.loads(repair_json(content)) == expected
+
+@pytest.mark.parametrize("content, expected", [
+    # 截断在字符串值中：不保留不完整的值
+    ('{"a": "x", "discharge_condition": "Sta', {"a": "x"}),
+    # 截断在数组中：整个成员丢弃，不保留被截断的元素
+    ('{"a": "x", "codes": ["I10", "E11', {"a": "x"}),
+    ('{"a": "x", "codes": ["I10", "E11.9"', {"a": "x"}),
+    # 截断在嵌套对象中
+    ('{"a": "x", "b": {"c": "y", "d": "Sta', {"a": "x"}),
+    # 截断在键、冒号、数字或字面量处
+    ('{"a": "x", "dis', {"a": "x"}),
+    ('{"a": "x", "b":', {"a": "x"}),
+    ('{"a": "x", "b": 12', {"a": "x"}),
+    ('{"a": "x", "b": tru', {"a": "x"}),
+    # 截断在第一个成员中
+    ('{"a": "Sta', {}),
+    # 截断在完整的值之后
+    ('{"a": "x", "b": [1, 2]', {"a": "x", "b": [1, 2]}),
+    ('{"a": "x", "b": 1, ', {"a": "x", "b": 1}),
+    ('[{"a": 1}, {"b": "c"', [{"a": 1}]),
+])
+def test_repair_json_drops_truncated_member(content, expected):
+    assert json.loads(repair_json(content)) == expected
+
+def test_truncated_string_is_not_kept():
+    content = _truncated(DISCHARGE, '"discharge_condition": "Sta')
+    data, repaired = load_json_object(content)
+    assert repaired
+    assert "discharge_condition" not in data
+    with pytest.raises(StructuredOutputError):
+        build_model(data, DischargeOCR)
+
+def test_truncated_list_item_is_not_kept():
+    content = _truncated(DISCHARGE, '"diagnosis_codes": ["I10", "E11')
+    data, repaired = load_json_object(content)
+    assert repaired
+    assert data == {"patient_name": "John Doe"}
+
+def test_load_json_object_rejects_non_object():
+    with pytest.raises(StructuredOutputError):
+        load_json_object("[1, 2]")
+
+def test_build_model_valid_data_is_not_repaired():
+    result, repaired = build_model(dict(DISCHARGE), DischargeOCR)
+    assert not repaired
+    assert result.discharge_condition == "Stable"
+
+def test_build_model_coerces_field_types():
+    data = {
+        "total_amount": "$1,234.50",
+        "service_date": "2025-01-10",
+        "hospital_name": "City General Hospital",
+        "itemized_charges": {"item": "X-ray", "amount": 100}
+    }
+    result, repaired = build_model(data, InvoiceOCR)
+    assert repaired
+    assert result.total_amount == 1234.5
+    assert result.itemized_charges == [{"item": "X-ray", "amount": 100}]
+
+def test_build_model_passes_a_copy_to_build():
+    data = dict(DISCHARGE, diagnosis_codes="I10")
+    
+    def build(fields):
+        fields["patient_name"] = fields["patient_name"].upper()
+        return DischargeOCR.model_validate(fields)
+    
+    result, repaired = build_model(data, DischargeOCR, build)
+    assert repaired
+    assert result.diagnosis_codes == ["I10"]
+    assert result.patient_name == "JOHN DOE"
+    assert data["patient_name"] == "John Doe"
+
+def test_build_model_raises_when_coercion_fails():
+    with pytest.raises(StructuredOutputError):
+        build_model(dict(DISCHARGE, admission_date="unknown"), DischargeOCR)
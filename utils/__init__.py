@@ -1,18 +1,42 @@
 """
 Utils模块初始化文件
+包中的类按需导入：导入utils或其中的轻量模块时不会加载Azure SDK、OpenAI和opencensus，
+第一次访问对应名称时才导入所在的子模块，以缩短冷启动时间
 """
-from .document_classifier_loader import load_document_classifier
-from .azure_document_intelligence import AzureDocumentIntelligenceClient
-from .openai_client import AzureOpenAIClient
-from .blob_storage import AzureBlobStorageClient
-from .log_manager import LogManager
-from .signature_detector import SignatureDetector
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = [
-    "load_document_classifier",
-    "AzureDocumentIntelligenceClient",
-    "AzureOpenAIClient",
-    "AzureBlobStorageClient",
-    "LogManager",
-    "SignatureDetector"
-]
\ No newline at end of file
+# 对外名称到所在子模块的映射
+_LAZY_ATTRIBUTES = {
+    "load_document_classifier": ".document_classifier_loader",
+    "AzureDocumentIntelligenceClient": ".azure_document_intelligence",
+    "AsyncAzureDocumentIntelligenceClient": ".azure_document_intelligence",
+    "AzureOpenAIClient": ".openai_client",
+    "AsyncAzureOpenAIClient": ".openai_client",
+    "AzureBlobStorageClient": ".blob_storage",
+    "AsyncAzureBlobStorageClient": ".blob_storage",
+    "LogManager": ".log_manager",
+    "SignatureDetector": ".signature_detector"
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .document_classifier_loader import load_document_classifier
+    from .azure_document_intelligence import AzureDocumentIntelligenceClient, AsyncAzureDocumentIntelligenceClient
+    from .openai_client import AzureOpenAIClient, AsyncAzureOpenAIClient
+    from .blob_storage import AzureBlobStorageClient, AsyncAzureBlobStorageClient
+    from .log_manager import LogManager
+    from .signature_detector import SignatureDetector
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # 缓存到模块命名空间，之后的访问不再经过__getattr__
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
\ No newline at end of file
@@ -0,0 +1,510 @@
+"""
+自适应并发限制
+按AIMD（加性增、乘性减）调整对外部AI服务（Document Intelligence、OpenAI）的并发调用数：
+延迟正常时逐步提高并发，收到429或延迟超过目标时成倍降低，并遵守服务返回的Retry-After。
+同一服务的所有调用（同步和异步、所有索赔）共享一个限制器，限流和失败重试也在这里统一处理，SDK内部的重试已关闭
+"""
+import time
+import random
+import asyncio
+import inspect
+import threading
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from config.settings import (
+    ADAPTIVE_CONCURRENCY_SERVICES, ADAPTIVE_CONCURRENCY_MAX_RETRIES, ADAPTIVE_CONCURRENCY_BACKOFF_SECONDS,
+    ADAPTIVE_CONCURRENCY_DEFAULT_RETRY_AFTER_SECONDS, ADAPTIVE_CONCURRENCY_INCREASE_STEP,
+    ADAPTIVE_CONCURRENCY_LATENCY_DECREASE_FACTOR, ADAPTIVE_CONCURRENCY_THROTTLE_DECREASE_FACTOR
+)
+from utils.performance import get_current_recorder
+
+# 共享限制器的服务名称，与performance.yaml中adaptive_concurrency.services的键一致
+SERVICE_DOCUMENT_INTELLIGENCE = "document_intelligence"
+SERVICE_OPENAI = "openai"
+
+# 经过限制器的客户端方法，其余属性直接访问底层客户端
+LIMITED_METHODS = {
+    SERVICE_DOCUMENT_INTELLIGENCE: [
+        "analyze_document", "analyze_document_from_bytes", "extract_text", "extract_text_from_bytes"
+    ],
+    SERVICE_OPENAI: [
+        "chat_completion", "extract_json_data", "extract_model", "extract_claim", "classify_document", "classify_documents"
+    ]
+}
+
+# 可重试的HTTP状态码（429单独处理）
+_RETRYABLE_STATUS_CODES = {408, 500, 502, 503, 504}
+
+# 连接类错误的类名（openai、azure-core），避免在此导入SDK
+_RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "ServiceRequestError", "ServiceResponseError"}
+
+class ConcurrencyLimiterStats(BaseModel):
+    """
+    限制器的当前状态，作为指标发送
+    """
+    service: str
+    limit: int  # 当前允许的并发调用数
+    in_flight: int  # 正在进行的调用数
+    queue_depth: int  # 等待并发槽位的调用数
+    throttled: int  # 累计收到的限流响应数
+    blocked_seconds: float  # 距Retry-After到期的剩余时间（秒）
+
+def _get_status_code(error: BaseException) -> Optional[int]:
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+def is_throttling_error(error: BaseException) -> bool:
+    """
+    是否为限流错误（HTTP 429）
+    openai.RateLimitError和azure.core.exceptions.HttpResponseError都带有status_code
+    """
+    return _get_status_code(error) == 429
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    是否为可重试的暂时性错误（限流、服务端错误、连接错误）
+    """
+    if is_throttling_error(error) or _get_status_code(error) in _RETRYABLE_STATUS_CODES:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in _RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+def get_retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    从错误响应的头中读取服务要求的等待时间
+    依次检查retry-after-ms、x-ms-retry-after-ms（毫秒）和Retry-After（秒）
+    
+    Args:
+        error: 调用抛出的错误
+    
+    Returns:
+        等待时间（秒），响应中没有时返回None
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except (TypeError, ValueError):
+            # Retry-After也可以是HTTP日期，这种情况使用默认等待时间
+            return None
+    return None
+
+class _Waiter:
+    """
+    等待并发槽位的调用，释放槽位时按先后顺序直接移交
+    """
+    
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future: Optional[asyncio.Future] = None
+    
+    def notify(self):
+        if self.loop is None:
+            self.event.set()
+        elif self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class _Permit:
+    """
+    一次调用占用的并发槽位
+    """
+    
+    def __init__(self, epoch: int, wait_seconds: float):
+        self.epoch = epoch  # 获取槽位时的限制周期，同一周期内的多次降低只生效一次
+        self.wait_seconds = wait_seconds
+        self.start = time.monotonic()
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD自适应并发限制器（线程安全，同步和异步调用方可共享）
+    - 调用成功且延迟不超过目标：并发上限增加increase_step / limit，约每limit次调用加increase_step
+    - 调用成功但延迟超过目标：并发上限乘以latency_decrease_factor
+    - 收到429：并发上限乘以throttle_decrease_factor，并在Retry-After到期前暂停发起新调用
+    同一周期内（上次降低之前发起的调用）的多次降低只生效一次，避免一批并发调用同时失败时上限直接降到最小值
+    """
+    
+    def __init__(self,
+                 service: str,
+                 initial_limit: int = 32,
+                 min_limit: int = 1,
+                 max_limit: int = 64,
+                 latency_target_ms: float = 10000,
+                 increase_step: float = ADAPTIVE_CONCURRENCY_INCREASE_STEP,
+                 latency_decrease_factor: float = ADAPTIVE_CONCURRENCY_LATENCY_DECREASE_FACTOR,
+                 throttle_decrease_factor: float = ADAPTIVE_CONCURRENCY_THROTTLE_DECREASE_FACTOR,
+                 max_retries: int = ADAPTIVE_CONCURRENCY_MAX_RETRIES,
+                 backoff_seconds: float = ADAPTIVE_CONCURRENCY_BACKOFF_SECONDS,
+                 default_retry_after_seconds: float = ADAPTIVE_CONCURRENCY_DEFAULT_RETRY_AFTER_SECONDS):
+        """
+        初始化自适应并发限制器
+        
+        Args:
+            service: 服务名称，用于指标
+            initial_limit: 初始并发上限
+            min_limit: 并发上限的最小值
+            max_limit: 并发上限的最大值
+            latency_target_ms: 单次调用的目标延迟（毫秒），超过时降低并发
+            increase_step: 每个窗口（约limit次健康调用）增加的并发数
+            latency_decrease_factor: 延迟超过目标时并发上限的乘数
+            throttle_decrease_factor: 收到429时并发上限的乘数
+            max_retries: 暂时性错误的最大重试次数
+            backoff_seconds: 非限流错误重试的初始退避时间（秒），每次重试加倍
+            default_retry_after_seconds: 429响应没有Retry-After时的等待时间（秒）
+        """
+        self.service = service
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.latency_target_ms = latency_target_ms
+        self.increase_step = increase_step
+        self.latency_decrease_factor = latency_decrease_factor
+        self.throttle_decrease_factor = throttle_decrease_factor
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.default_retry_after_seconds = default_retry_after_seconds
+        
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiters: deque = deque()
+        self._blocked_until = 0.0
+        self._epoch = 0
+        self._throttled = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+    
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+    
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+    
+    def stats(self) -> ConcurrencyLimiterStats:
+        """
+        获取限制器的当前状态
+        """
+        with self._lock:
+            return ConcurrencyLimiterStats(
+                service=self.service,
+                limit=self.limit,
+                in_flight=self._in_flight,
+                queue_depth=len(self._waiters),
+                throttled=self._throttled,
+                blocked_seconds=round(max(0.0, self._blocked_until - time.monotonic()), 3)
+            )
+    
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        在并发限制下调用函数，暂时性错误按策略重试
+        
+        Args:
+            func: 同步函数
+            *args, **kwargs: 调用参数
+        
+        Returns:
+            函数返回值
+        """
+        positions = _stream_positions(args, kwargs)
+        attempt = 0
+        while True:
+            permit = self._acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                delay = self._release_failed(permit, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                _rewind_streams(positions)
+                continue
+            self._release_succeeded(permit)
+            return result
+    
+    async def call_async(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        call的异步版本，等待槽位和退避时不阻塞事件循环
+        
+        Args:
+            func: 异步函数
+            *args, **kwargs: 调用参数
+        
+        Returns:
+            函数返回值
+        """
+        positions = _stream_positions(args, kwargs)
+        attempt = 0
+        while True:
+            permit = await self._acquire_async()
+            try:
+                result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                self._release(permit)
+                raise
+            except Exception as e:
+                delay = self._release_failed(permit, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                _rewind_streams(positions)
+                continue
+            self._release_succeeded(permit)
+            return result
+    
+    def _try_acquire_locked(self, waiter: Optional[_Waiter]) -> Tuple[bool, Optional[float]]:
+        """
+        尝试获取槽位（调用方持有锁）
+        
+        Returns:
+            (是否获得槽位, 需要等待Retry-After到期的时间)
+        """
+        if waiter is not None and waiter.granted:
+            return True, None
+        blocked_seconds = self._blocked_until - time.monotonic()
+        if blocked_seconds > 0:
+            return False, blocked_seconds
+        if waiter is None and not self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            return True, None
+        return False, None
+    
+    def _acquire(self) -> _Permit:
+        start = time.monotonic()
+        waiter = None
+        try:
+            while True:
+                with self._lock:
+                    acquired, blocked_seconds = self._try_acquire_locked(waiter)
+                    if acquired:
+                        return self._new_permit_locked(start)
+                    if waiter is None:
+                        waiter = _Waiter()
+                        self._waiters.append(waiter)
+                    waiter.event.clear()
+                waiter.event.wait(blocked_seconds)
+                if blocked_seconds is not None:
+                    # Retry-After到期后按等待顺序分配槽位
+                    with self._lock:
+                        self._grant_waiters_locked()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+    
+    async def _acquire_async(self) -> _Permit:
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        waiter = None
+        try:
+            while True:
+                with self._lock:
+                    acquired, blocked_seconds = self._try_acquire_locked(waiter)
+                    if acquired:
+                        return self._new_permit_locked(start)
+                    if waiter is None:
+                        waiter = _Waiter(loop)
+                        self._waiters.append(waiter)
+                    waiter.future = loop.create_future()
+                await asyncio.wait([waiter.future], timeout=blocked_seconds)
+                if blocked_seconds is not None:
+                    with self._lock:
+                        self._grant_waiters_locked()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+    
+    def _abandon(self, waiter: Optional[_Waiter]):
+        # 等待被中断（例如任务取消）：移出队列，已移交的槽位归还
+        if waiter is None:
+            return
+        with self._lock:
+            if waiter.granted:
+                self._in_flight -= 1
+                self._grant_waiters_locked()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+    
+    def _new_permit_locked(self, start: float) -> _Permit:
+        return _Permit(self._epoch, time.monotonic() - start)
+    
+    def _grant_waiters_locked(self):
+        if self._blocked_until > time.monotonic():
+            return
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self._in_flight += 1
+            waiter.notify()
+    
+    def _decrease_locked(self, permit: _Permit, factor: float):
+        if permit.epoch != self._epoch:
+            return
+        self._limit = max(float(self.min_limit), self._limit * factor)
+        self._epoch += 1
+    
+    def _release(self, permit: _Permit):
+        with self._lock:
+            self._in_flight -= 1
+            self._grant_waiters_locked()
+    
+    def _release_succeeded(self, permit: _Permit):
+        latency_ms = (time.monotonic() - permit.start) * 1000
+        with self._lock:
+            if latency_ms <= self.latency_target_ms:
+                self._limit = min(float(self.max_limit), self._limit + self.increase_step / max(self._limit, 1.0))
+            else:
+                self._decrease_locked(permit, self.latency_decrease_factor)
+            self._in_flight -= 1
+            self._grant_waiters_locked()
+        _record_call(permit)
+    
+    def _release_failed(self, permit: _Permit, error: Exception, attempt: int) -> Optional[float]:
+        """
+        释放失败调用的槽位并决定是否重试
+        
+        Returns:
+            重试前的等待时间（秒），不重试时返回None
+        """
+        throttled = is_throttling_error(error)
+        with self._lock:
+            if throttled:
+                self._throttled += 1
+                self._decrease_locked(permit, self.throttle_decrease_factor)
+                retry_after = get_retry_after_seconds(error)
+                if retry_after is None:
+                    retry_after = self.default_retry_after_seconds
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                # 正在等待的调用需要按新的到期时间重新等待
+                for waiter in self._waiters:
+                    waiter.notify()
+            self._in_flight -= 1
+            self._grant_waiters_locked()
+        _record_call(permit, throttled)
+        
+        if attempt >= self.max_retries or not is_retryable_error(error):
+            return None
+        
+        recorder = get_current_recorder()
+        if recorder is not None:
+            recorder.record_retry()
+        print(f"{self.service} call failed (attempt {attempt + 1}), retrying: {error}")
+        if throttled:
+            # 等待Retry-After由获取槽位时处理
+            return 0.0
+        return self.backoff_seconds * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+def _record_call(permit: _Permit, throttled: bool = False):
+    recorder = get_current_recorder()
+    if recorder is not None:
+        recorder.record_concurrency_wait(permit.wait_seconds * 1000, throttled)
+
+def _stream_positions(args: tuple, kwargs: dict) -> List[Tuple[Any, int]]:
+    # 流参数在重试前需要回到初始位置
+    positions = []
+    for value in list(args) + list(kwargs.values()):
+        if hasattr(value, "seek") and hasattr(value, "tell"):
+            try:
+                positions.append((value, value.tell()))
+            except (OSError, ValueError):
+                pass
+    return positions
+
+def _rewind_streams(positions: List[Tuple[Any, int]]):
+    for stream, position in positions:
+        stream.seek(position)
+
+class LimitedClient:
+    """
+    客户端代理：LIMITED_METHODS中的方法通过服务的共享限制器调用，其余属性直接访问底层客户端
+    """
+    
+    def __init__(self, client, limiter: AdaptiveConcurrencyLimiter, methods: List[str]):
+        """
+        初始化客户端代理
+        
+        Args:
+            client: 底层客户端
+            limiter: 共享的并发限制器
+            methods: 需要限制的方法名
+        """
+        self.client = client
+        self.limiter = limiter
+        self._methods = set(methods)
+    
+    def __getattr__(self, name: str):
+        attribute = getattr(self.client, name)
+        if name not in self._methods or not callable(attribute):
+            return attribute
+        
+        if inspect.iscoroutinefunction(attribute):
+            @wraps(attribute)
+            async def limited_async(*args, **kwargs):
+                return await self.limiter.call_async(attribute, *args, **kwargs)
+            return limited_async
+        
+        @wraps(attribute)
+        def limited(*args, **kwargs):
+            return self.limiter.call(attribute, *args, **kwargs)
+        return limited
+
+# 进程级共享的限制器，同一服务的所有客户端和索赔共用
+_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_concurrency_limiter(service: str) -> AdaptiveConcurrencyLimiter:
+    """
+    获取服务的共享限制器，首次调用时按性能配置创建
+    
+    Args:
+        service: 服务名称
+    
+    Returns:
+        AdaptiveConcurrencyLimiter: 限制器
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(service)
+        if limiter is None:
+            limiter = AdaptiveConcurrencyLimiter(service, **ADAPTIVE_CONCURRENCY_SERVICES.get(service, {}))
+            _limiters[service] = limiter
+        return limiter
+
+def get_concurrency_limiters() -> List[AdaptiveConcurrencyLimiter]:
+    """
+    获取已创建的所有限制器
+    """
+    with _limiters_lock:
+        return list(_limiters.values())
+
+def limit_client(client, service: str):
+    """
+    用服务的共享限制器包装客户端
+    
+    Args:
+        client: 客户端实例，可以为None
+        service: 服务名称（SERVICE_DOCUMENT_INTELLIGENCE或SERVICE_OPENAI）
+    
+    Returns:
+        包装后的客户端，client为None或已包装时原样返回
+    """
+    if client is None or isinstance(client, LimitedClient):
+        return client
+    return LimitedClient(client, get_concurrency_limiter(service), LIMITED_METHODS[service])
\ No newline at end of file
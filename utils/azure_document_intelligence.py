@@ -3,12 +3,113 @@ Azure Document Intelligence工具类
 用于与Azure Document Intelligence服务进行交互
 """
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union, IO
 from azure.core.credentials import AzureKeyCredential, TokenCredential
 from azure.identity import DefaultAzureCredential
+from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
 from azure.ai.formrecognizer import DocumentAnalysisClient
+from azure.ai.formrecognizer.aio import DocumentAnalysisClient as AsyncDocumentAnalysisClient
 from config.settings import ADI_API_VERSION
 
+def _get_endpoint() -> str:
+    """
+    从环境变量读取Azure Document Intelligence终结点
+    """
+    endpoint = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
+    
+    if not endpoint:
+        raise ValueError(
+            "Missing Azure Document Intelligence endpoint. "
+            "Please set AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT environment variable."
+        )
+    return endpoint
+
+def _get_key_credential() -> Optional[AzureKeyCredential]:
+    """
+    获取API密钥凭据
+    
+    Returns:
+        AzureKeyCredential，使用托管身份时返回None
+    """
+    if os.getenv("AZURE_USE_MANAGED_IDENTITY", "false").lower() == "true":
+        return None
+    
+    key = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
+    if not key:
+        raise ValueError(
+            "Missing Azure Document Intelligence credentials. "
+            "Please set AZURE_DOCUMENT_INTELLIGENCE_KEY environment variable "
+            "or use managed identity by setting AZURE_USE_MANAGED_IDENTITY=true."
+        )
+    return AzureKeyCredential(key)
+
+def _format_analyze_result(result) -> Dict[str, Any]:
+    """
+    格式化分析结果为标准字典格式
+    
+    Args:
+        result: Azure Document Intelligence分析结果对象
+    
+    Returns:
+        格式化后的结果字典
+    """
+    formatted_result = {
+        "content": result.content,
+        "pages": [],
+        "tables": [],
+        "key_value_pairs": []
+    }
+    
+    # 提取页面信息
+    for page in result.pages:
+        page_info = {
+            "page_number": page.page_number,
+            "width": page.width,
+            "height": page.height,
+            "unit": page.unit,
+            "lines": []
+        }
+        
+        # 提取页面中的文本行
+        for line in page.lines:
+            page_info["lines"].append({
+                "text": line.content,
+                "bounding_box": [(point.x, point.y) for point in line.polygon]
+            })
+        
+        formatted_result["pages"].append(page_info)
+    
+    # 提取表格信息
+    for table in result.tables:
+        table_info = {
+            "row_count": table.row_count,
+            "column_count": table.column_count,
+            "cells": []
+        }
+        
+        for cell in table.cells:
+            cell_info = {
+                "row_index": cell.row_index,
+                "column_index": cell.column_index,
+                "text": cell.content,
+                "is_header": cell.kind == "columnHeader" if cell.kind else False
+            }
+            table_info["cells"].append(cell_info)
+        
+        formatted_result["tables"].append(table_info)
+    
+    # 提取键值对信息
+    if result.key_value_pairs:
+        for kv_pair in result.key_value_pairs:
+            kv_info = {
+                "key": kv_pair.key.content if kv_pair.key else None,
+                "value": kv_pair.value.content if kv_pair.value else None,
+                "confidence": kv_pair.confidence
+            }
+            formatted_result["key_value_pairs"].append(kv_info)
+    
+    return formatted_result
+
 class AzureDocumentIntelligenceClient:
     """
     Azure Document Intelligence客户端
@@ -21,33 +122,17 @@ class AzureDocumentIntelligenceClient:
         初始化Azure Document Intelligence客户端
         支持使用API密钥或托管身份进行身份验证
         """
-        endpoint = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
-        
-        if not endpoint:
-            raise ValueError(
-                "Missing Azure Document Intelligence endpoint. "
-                "Please set AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT environment variable."
-            )
-        
-        # 尝试使用托管身份
-        if os.getenv("AZURE_USE_MANAGED_IDENTITY", "false").lower() == "true":
-            # 使用托管身份
-            credential = DefaultAzureCredential()
-        else:
-            # 使用API密钥
-            key = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
-            if not key:
-                raise ValueError(
-                    "Missing Azure Document Intelligence credentials. "
-                    "Please set AZURE_DOCUMENT_INTELLIGENCE_KEY environment variable "
-                    "or use managed identity by setting AZURE_USE_MANAGED_IDENTITY=true."
-                )
-            credential = AzureKeyCredential(key)
+        endpoint = _get_endpoint()
+        
+        # 尝试使用托管身份，否则使用API密钥
+        credential = _get_key_credential() or DefaultAzureCredential()
         
+        # 重试（包括429）由自适应并发限制器统一处理，见utils/adaptive_concurrency.py
         self.client = DocumentAnalysisClient(
             endpoint=endpoint,
             credential=credential,
-            api_version=ADI_API_VERSION
+            api_version=ADI_API_VERSION,
+            retry_total=0
         )
     
     def analyze_document(self, document_path: str, model_id: str = "prebuilt-document") -> Dict[str, Any]:
@@ -57,24 +142,24 @@ class AzureDocumentIntelligenceClient:
         Args:
             document_path: 文档文件路径
             model_id: 使用的模型ID，默认为"prebuilt-document"
-            
+        
         Returns:
             包含文档分析结果的字典
         """
         with open(document_path, "rb") as f:
             poller = self.client.begin_analyze_document(model_id, f)
             result = poller.result()
-            
+        
         return self._format_result(result)
     
-    def analyze_document_from_bytes(self, document_bytes: bytes, model_id: str = "prebuilt-document") -> Dict[str, Any]:
+    def analyze_document_from_bytes(self, document_bytes: Union[bytes, IO[bytes]], model_id: str = "prebuilt-document") -> Dict[str, Any]:
         """
         从字节数据分析文档内容
         
         Args:
-            document_bytes: 文档文件的字节数据
+            document_bytes: 文档文件的字节数据或二进制流
             model_id: 使用的模型ID，默认为"prebuilt-document"
-            
+        
         Returns:
             包含文档分析结果的字典
         """
@@ -89,66 +174,11 @@ class AzureDocumentIntelligenceClient:
         
         Args:
             result: Azure Document Intelligence分析结果对象
-            
+        
         Returns:
             格式化后的结果字典
         """
-        formatted_result = {
-            "content": result.content,
-            "pages": [],
-            "tables": [],
-            "key_value_pairs": []
-        }
-        
-        # 提取页面信息
-        for page in result.pages:
-            page_info = {
-                "page_number": page.page_number,
-                "width": page.width,
-                "height": page.height,
-                "unit": page.unit,
-                "lines": []
-            }
-            
-            # 提取页面中的文本行
-            for line in page.lines:
-                page_info["lines"].append({
-                    "text": line.content,
-                    "bounding_box": [(point.x, point.y) for point in line.polygon]
-                })
-            
-            formatted_result["pages"].append(page_info)
-        
-        # 提取表格信息
-        for table in result.tables:
-            table_info = {
-                "row_count": table.row_count,
-                "column_count": table.column_count,
-                "cells": []
-            }
-            
-            for cell in table.cells:
-                cell_info = {
-                    "row_index": cell.row_index,
-                    "column_index": cell.column_index,
-                    "text": cell.content,
-                    "is_header": cell.kind == "columnHeader" if cell.kind else False
-                }
-                table_info["cells"].append(cell_info)
-            
-            formatted_result["tables"].append(table_info)
-        
-        # 提取键值对信息
-        if result.key_value_pairs:
-            for kv_pair in result.key_value_pairs:
-                kv_info = {
-                    "key": kv_pair.key.content if kv_pair.key else None,
-                    "value": kv_pair.value.content if kv_pair.value else None,
-                    "confidence": kv_pair.confidence
-                }
-                formatted_result["key_value_pairs"].append(kv_info)
-        
-        return formatted_result
+        return _format_analyze_result(result)
     
     def extract_text(self, document_path: str) -> str:
         """
@@ -156,7 +186,7 @@ class AzureDocumentIntelligenceClient:
         
         Args:
             document_path: 文档文件路径
-            
+        
         Returns:
             提取的纯文本内容
         """
@@ -169,9 +199,65 @@ class AzureDocumentIntelligenceClient:
         
         Args:
             document_bytes: 文档文件的字节数据
-            
+        
         Returns:
             提取的纯文本内容
         """
         result = self.analyze_document_from_bytes(document_bytes, "prebuilt-read")
-        return result.get("content", "")
\ No newline at end of file
+        return result.get("content", "")
+
+class AsyncAzureDocumentIntelligenceClient:
+    """
+    Azure Document Intelligence异步客户端
+    基于azure.ai.formrecognizer.aio，接口与AzureDocumentIntelligenceClient一致
+    """
+    
+    def __init__(self):
+        """
+        初始化Azure Document Intelligence异步客户端
+        支持使用API密钥或托管身份进行身份验证
+        """
+        endpoint = _get_endpoint()
+        credential = _get_key_credential() or AsyncDefaultAzureCredential()
+        
+        self.client = AsyncDocumentAnalysisClient(
+            endpoint=endpoint,
+            credential=credential,
+            api_version=ADI_API_VERSION,
+            retry_total=0
+        )
+    
+    async def analyze_document_from_bytes(self, document_bytes: Union[bytes, IO[bytes]], model_id: str = "prebuilt-document") -> Dict[str, Any]:
+        """
+        异步从字节数据分析文档内容
+        
+        Args:
+            document_bytes: 文档文件的字节数据或二进制流
+            model_id: 使用的模型ID，默认为"prebuilt-document"
+        
+        Returns:
+            包含文档分析结果的字典
+        """
+        poller = await self.client.begin_analyze_document(model_id, document_bytes)
+        result = await poller.result()
+        
+        return _format_analyze_result(result)
+    
+    async def extract_text_from_bytes(self, document_bytes: bytes) -> str:
+        """
+        异步从字节数据中提取纯文本内容
+        
+        Args:
+            document_bytes: 文档文件的字节数据
+        
+        Returns:
+            提取的纯文本内容
+        """
+        result = await self.analyze_document_from_bytes(document_bytes, "prebuilt-read")
+        return result.get("content", "")
+    
+    async def close(self):
+        """
+        关闭底层HTTP连接
+        """
+        await self.client.close()
\ No newline at end of file
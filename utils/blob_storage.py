@@ -2,14 +2,262 @@
 Azure Blob Storage工具类
 用于与Azure Blob Storage服务进行交互
 """
+import io
 import os
-from typing import List, Optional, IO, Any
+import mmap
+import asyncio
+import tempfile
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, IO, Any, Tuple, Dict, Iterator, AsyncIterator
+import requests
+from urllib3.util.retry import Retry
+from azure.core.pipeline.transport import RequestsTransport
 from azure.storage.blob import BlobServiceClient, ContainerClient, BlobClient
 from azure.storage.blob import generate_blob_sas, BlobSasPermissions
 from azure.storage.blob import ContentSettings
+from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
 from azure.identity import DefaultAzureCredential
+from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
 from datetime import datetime, timedelta
 from pathlib import Path
+from config.settings import (
+    BLOB_DOWNLOAD_MAX_WORKERS, BLOB_DOWNLOAD_MAX_CONCURRENCY, BLOB_DOWNLOAD_CHUNK_SIZE_BYTES,
+    BLOB_DOWNLOAD_SPOOL_THRESHOLD_BYTES, BLOB_LIST_PAGE_SIZE
+)
+
+def _resolve_connection(connection_string: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    根据环境变量确定存储账户的连接方式
+    
+    Args:
+        connection_string: 显式传入的连接字符串
+    
+    Returns:
+        (托管身份使用的账户URL, 连接字符串)，两者只有一个非空
+    """
+    # 尝试使用托管身份
+    if os.getenv("AZURE_USE_MANAGED_IDENTITY", "false").lower() == "true":
+        account_url = os.getenv("AZURE_STORAGE_ACCOUNT_URL")
+        if not account_url:
+            raise ValueError(
+                "Missing Azure Storage account URL. "
+                "Please set AZURE_STORAGE_ACCOUNT_URL environment variable "
+                "when using managed identity."
+            )
+        return account_url, None
+    
+    # 使用连接字符串
+    if connection_string is None:
+        connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+    
+    if not connection_string:
+        raise ValueError(
+            "Missing Azure Storage connection string. "
+            "Please set AZURE_STORAGE_CONNECTION_STRING environment variable "
+            "or use managed identity by setting AZURE_USE_MANAGED_IDENTITY=true "
+            "and providing AZURE_STORAGE_ACCOUNT_URL."
+        )
+    return None, connection_string
+
+def _format_blob_properties(blob) -> Dict[str, Any]:
+    """
+    将列举结果中的BlobProperties格式化为字典
+    
+    Args:
+        blob: azure.storage.blob.BlobProperties
+    
+    Returns:
+        包含名称、ETag、大小和内容MD5（十六进制，未设置时为None）的字典
+    """
+    content_md5 = blob.content_settings.content_md5 if blob.content_settings else None
+    return {
+        "name": blob.name,
+        "etag": blob.etag,
+        "size": blob.size,
+        "content_md5": bytes(content_md5).hex() if content_md5 else None
+    }
+
+def _create_pooled_transport() -> RequestsTransport:
+    """
+    创建连接池足够大的HTTP传输，使目录下载的所有并发请求共享连接而不是反复建立新连接
+    requests默认每个主机只保留10个连接
+    
+    Returns:
+        RequestsTransport实例
+    """
+    pool_size = max(10, BLOB_DOWNLOAD_MAX_WORKERS * BLOB_DOWNLOAD_MAX_CONCURRENCY)
+    session = requests.Session()
+    # 与azure-core默认设置一致：重试由SDK的重试策略负责
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=False, redirect=False, raise_on_status=False)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return RequestsTransport(session=session, session_owner=True)
+
+class _MemoryBuffer(io.RawIOBase):
+    """
+    基于memoryview的可定位二进制流
+    下载时SDK（包括并行分块下载）直接写入预分配的缓冲区，读取时也不复制数据
+    """
+    
+    def __init__(self, buffer: memoryview):
+        self._buffer = buffer
+        self._position = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def writable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        self._position = max(0, offset)
+        return self._position
+    
+    def readinto(self, b) -> int:
+        chunk = self._buffer[self._position:self._position + len(b)]
+        size = len(chunk)
+        b[:size] = chunk
+        self._position += size
+        return size
+    
+    def write(self, data) -> int:
+        size = len(data)
+        self._buffer[self._position:self._position + size] = data
+        self._position += size
+        return size
+    
+    def getbuffer(self) -> memoryview:
+        return self._buffer
+
+class DownloadedBlob:
+    """
+    已下载的Blob内容，通过memoryview访问而不复制数据
+    较小的文件下载到预分配的内存缓冲区，超过阈值的文件写入临时文件并内存映射
+    使用完毕后应调用close()（或使用with语句）释放缓冲区和临时文件
+    """
+    
+    def __init__(self, name: str, data: memoryview,
+                 temp_file: Optional[IO[bytes]] = None,
+                 mapped: Optional[mmap.mmap] = None):
+        """
+        初始化已下载的Blob
+        
+        Args:
+            name: Blob名称
+            data: Blob内容
+            temp_file: 内容所在的临时文件（可选）
+            mapped: 临时文件的内存映射（可选）
+        """
+        self.name = name
+        self.data = data
+        self._temp_file = temp_file
+        self._mapped = mapped
+        self._closed = False
+    
+    @classmethod
+    def from_bytes(cls, name: str, data: bytes) -> "DownloadedBlob":
+        """
+        用已有的字节数据创建DownloadedBlob
+        
+        Args:
+            name: Blob名称
+            data: 字节数据
+        
+        Returns:
+            DownloadedBlob实例
+        """
+        return cls(name, memoryview(data))
+    
+    @property
+    def size(self) -> int:
+        return self.data.nbytes
+    
+    def open(self) -> IO[bytes]:
+        """
+        返回从头读取Blob内容的二进制流，可直接传给接受IO[bytes]的SDK方法
+        
+        Returns:
+            二进制流
+        """
+        return _MemoryBuffer(self.data)
+    
+    def close(self):
+        """
+        释放缓冲区、内存映射和临时文件，重复调用无副作用
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.data.release()
+        if self._mapped is not None:
+            self._mapped.close()
+        if self._temp_file is not None:
+            self._temp_file.close()
+    
+    def __enter__(self) -> "DownloadedBlob":
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+def _open_download_target(size: int, spool_threshold_bytes: int) -> IO[bytes]:
+    """
+    为大小已知的Blob创建下载目标
+    
+    Args:
+        size: Blob大小（字节）
+        spool_threshold_bytes: 超过该大小时写入临时文件
+    
+    Returns:
+        可定位的可写二进制流
+    """
+    if size > spool_threshold_bytes:
+        return tempfile.TemporaryFile(prefix="blob-")
+    return _MemoryBuffer(memoryview(bytearray(size)))
+
+def _finish_download(blob_name: str, target: IO[bytes]) -> DownloadedBlob:
+    """
+    将写满的下载目标转换为DownloadedBlob，临时文件通过内存映射访问
+    
+    Args:
+        blob_name: Blob名称
+        target: _open_download_target创建的下载目标
+    
+    Returns:
+        DownloadedBlob实例
+    """
+    if isinstance(target, _MemoryBuffer):
+        return DownloadedBlob(blob_name, target.getbuffer())
+    target.flush()
+    mapped = mmap.mmap(target.fileno(), 0, access=mmap.ACCESS_READ)
+    return DownloadedBlob(blob_name, memoryview(mapped), temp_file=target, mapped=mapped)
+
+def _close_downloaded(futures):
+    """
+    关闭已完成但未交给调用方的下载结果
+    
+    Args:
+        futures: 下载任务（concurrent.futures.Future或asyncio.Task）
+    """
+    for future in futures:
+        if future.done() and not future.cancelled() and future.exception() is None:
+            future.result().close()
 
 class AzureBlobStorageClient:
     """
@@ -25,32 +273,25 @@ class AzureBlobStorageClient:
         Args:
             connection_string: 连接字符串，如果为None则尝试使用托管身份
         """
-        # 尝试使用托管身份
-        if os.getenv("AZURE_USE_MANAGED_IDENTITY", "false").lower() == "true":
-            account_url = os.getenv("AZURE_STORAGE_ACCOUNT_URL")
-            if not account_url:
-                raise ValueError(
-                    "Missing Azure Storage account URL. "
-                    "Please set AZURE_STORAGE_ACCOUNT_URL environment variable "
-                    "when using managed identity."
-                )
-            
+        account_url, connection_string = _resolve_connection(connection_string)
+        if account_url:
+            # 使用托管身份
             credential = DefaultAzureCredential()
-            self.blob_service_client = BlobServiceClient(account_url=account_url, credential=credential)
+            self.blob_service_client = BlobServiceClient(
+                account_url=account_url,
+                credential=credential,
+                transport=_create_pooled_transport(),
+                max_single_get_size=BLOB_DOWNLOAD_CHUNK_SIZE_BYTES,
+                max_chunk_get_size=BLOB_DOWNLOAD_CHUNK_SIZE_BYTES
+            )
         else:
             # 使用连接字符串
-            if connection_string is None:
-                connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-                
-            if not connection_string:
-                raise ValueError(
-                    "Missing Azure Storage connection string. "
-                    "Please set AZURE_STORAGE_CONNECTION_STRING environment variable "
-                    "or use managed identity by setting AZURE_USE_MANAGED_IDENTITY=true "
-                    "and providing AZURE_STORAGE_ACCOUNT_URL."
-                )
-            
-            self.blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+            self.blob_service_client = BlobServiceClient.from_connection_string(
+                connection_string,
+                transport=_create_pooled_transport(),
+                max_single_get_size=BLOB_DOWNLOAD_CHUNK_SIZE_BYTES,
+                max_chunk_get_size=BLOB_DOWNLOAD_CHUNK_SIZE_BYTES
+            )
     
     def get_container_client(self, container_name: str) -> ContainerClient:
         """
@@ -58,7 +299,7 @@ class AzureBlobStorageClient:
         
         Args:
             container_name: 容器名称
-            
+        
         Returns:
             ContainerClient实例
         """
@@ -71,7 +312,7 @@ class AzureBlobStorageClient:
         Args:
             container_name: 容器名称
             blob_name: Blob名称
-            
+        
         Returns:
             BlobClient实例
         """
@@ -87,7 +328,7 @@ class AzureBlobStorageClient:
         Args:
             container_name: 容器名称
             prefix: Blob名称前缀（可选）
-            
+        
         Returns:
             Blob名称列表
         """
@@ -95,6 +336,99 @@ class AzureBlobStorageClient:
         blobs = container_client.list_blobs(name_starts_with=prefix)
         return [blob.name for blob in blobs]
     
+    def list_blob_properties(self, container_name: str, prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        列出容器中的所有Blob及其ETag和内容MD5
+        
+        Args:
+            container_name: 容器名称
+            prefix: Blob名称前缀（可选）
+        
+        Returns:
+            Blob属性字典列表，见_format_blob_properties
+        """
+        container_client = self.get_container_client(container_name)
+        blobs = container_client.list_blobs(name_starts_with=prefix)
+        return [_format_blob_properties(blob) for blob in blobs]
+    
+    def iter_blob_properties(self, container_name: str, prefix: Optional[str] = None,
+                             page_size: int = BLOB_LIST_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        按页惰性列举容器中的Blob，消费完当前页后才请求下一页
+        
+        Args:
+            container_name: 容器名称
+            prefix: Blob名称前缀（可选）
+            page_size: 每页的Blob数量
+        
+        Yields:
+            Blob属性字典，见_format_blob_properties
+        """
+        container_client = self.get_container_client(container_name)
+        for blob in container_client.list_blobs(name_starts_with=prefix, results_per_page=page_size):
+            yield _format_blob_properties(blob)
+    
+    def download_blob_to_buffer(self, container_name: str, blob_name: str,
+                                max_concurrency: int = BLOB_DOWNLOAD_MAX_CONCURRENCY,
+                                spool_threshold_bytes: int = BLOB_DOWNLOAD_SPOOL_THRESHOLD_BYTES) -> DownloadedBlob:
+        """
+        下载Blob到预分配的缓冲区
+        超过单次请求大小的文件按Range分块并行下载，超过阈值的文件写入内存映射的临时文件
+        
+        Args:
+            container_name: 容器名称
+            blob_name: Blob名称
+            max_concurrency: 单个Blob并行下载的分块数
+            spool_threshold_bytes: 超过该大小时写入临时文件
+        
+        Returns:
+            DownloadedBlob实例，调用方负责关闭
+        """
+        blob_client = self.get_blob_client(container_name, blob_name)
+        downloader = blob_client.download_blob(max_concurrency=max_concurrency)
+        target = _open_download_target(downloader.size, spool_threshold_bytes)
+        try:
+            downloader.readinto(target)
+            return _finish_download(blob_name, target)
+        except BaseException:
+            target.close()
+            raise
+    
+    def download_directory(self, container_name: str, prefix: Optional[str] = None,
+                           max_workers: int = BLOB_DOWNLOAD_MAX_WORKERS) -> Iterator[DownloadedBlob]:
+        """
+        并行下载目录下的所有Blob，按列举顺序逐个产出
+        列举按页惰性进行，同时最多下载max_workers个文件，所有请求共享客户端的连接池；
+        调用方消费较慢时下载随之暂停，因此已下载未消费的文件数不超过max_workers
+        
+        Args:
+            container_name: 容器名称
+            prefix: Blob名称前缀（可选）
+            max_workers: 同时下载的最大文件数
+        
+        Yields:
+            DownloadedBlob实例，调用方负责关闭
+        """
+        blob_names = (blob["name"] for blob in self.iter_blob_properties(container_name, prefix))
+        window = max(1, max_workers)
+        executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix="blob-download")
+        pending = deque()
+        try:
+            for blob_name in islice(blob_names, window):
+                pending.append(executor.submit(self.download_blob_to_buffer, container_name, blob_name))
+            while pending:
+                downloaded = pending.popleft().result()
+                
+                next_name = next(blob_names, None)
+                if next_name is not None:
+                    pending.append(executor.submit(self.download_blob_to_buffer, container_name, next_name))
+                
+                yield downloaded
+        finally:
+            # 调用方提前结束或出错时取消尚未开始的下载，并释放已下载但未产出的文件
+            executor.shutdown(wait=True, cancel_futures=True)
+            _close_downloaded(pending)
+    
     def download_blob(self, container_name: str, blob_name: str, file_path: str) -> None:
         """
         下载Blob到本地文件
@@ -120,7 +454,7 @@ class AzureBlobStorageClient:
         Args:
             container_name: 容器名称
             blob_name: Blob名称
-            
+        
         Returns:
             Blob的字节数据
         """
@@ -142,7 +476,7 @@ class AzureBlobStorageClient:
             blob_client.upload_blob(f, overwrite=True)
     
     def upload_blob_from_bytes(self, container_name: str, blob_name: str, data: bytes, 
-                              content_type: Optional[str] = None) -> None:
+                              content_type: Optional[str] = None, overwrite: bool = True) -> None:
         """
         从字节数据上传Blob
         
@@ -151,6 +485,7 @@ class AzureBlobStorageClient:
             blob_name: Blob名称
             data: 字节数据
             content_type: 内容类型（可选）
+            overwrite: 是否覆盖已存在的Blob，为False时Blob已存在会抛出ResourceExistsError
         """
         blob_client = self.get_blob_client(container_name, blob_name)
         
@@ -159,7 +494,7 @@ class AzureBlobStorageClient:
         if content_type:
             blob_content_settings = ContentSettings(content_type=content_type)
         
-        blob_client.upload_blob(data, overwrite=True, content_settings=blob_content_settings)
+        blob_client.upload_blob(data, overwrite=overwrite, content_settings=blob_content_settings)
     
     def blob_exists(self, container_name: str, blob_name: str) -> bool:
         """
@@ -168,7 +503,7 @@ class AzureBlobStorageClient:
         Args:
             container_name: 容器名称
             blob_name: Blob名称
-            
+        
         Returns:
             如果Blob存在返回True，否则返回False
         """
@@ -186,7 +521,7 @@ class AzureBlobStorageClient:
         Args:
             container_name: 容器名称
             blob_name: Blob名称
-            
+        
         Returns:
             Blob的URL
         """
@@ -204,7 +539,7 @@ class AzureBlobStorageClient:
             blob_name: Blob名称
             expiry_hours: SAS URL过期时间（小时），默认为1小时
             permissions: SAS权限，默认为读权限
-            
+        
         Returns:
             带SAS令牌的Blob URL
         """
@@ -254,4 +589,207 @@ class AzureBlobStorageClient:
         blob_url = self.get_blob_url(container_name, blob_name)
         sas_url = f"{blob_url}?{sas_token}"
         
-        return sas_url
\ No newline at end of file
+        return sas_url
+
+class AsyncAzureBlobStorageClient:
+    """
+    Azure Blob Storage异步客户端
+    基于azure.storage.blob.aio，提供索赔处理流程所需的读写操作
+    """
+    
+    def __init__(self, connection_string: Optional[str] = None):
+        """
+        初始化Azure Blob Storage异步客户端
+        
+        Args:
+            connection_string: 连接字符串，如果为None则尝试使用托管身份
+        """
+        account_url, connection_string = _resolve_connection(connection_string)
+        if account_url:
+            credential = AsyncDefaultAzureCredential()
+            self.blob_service_client = AsyncBlobServiceClient(
+                account_url=account_url,
+                credential=credential,
+                max_single_get_size=BLOB_DOWNLOAD_CHUNK_SIZE_BYTES,
+                max_chunk_get_size=BLOB_DOWNLOAD_CHUNK_SIZE_BYTES
+            )
+        else:
+            self.blob_service_client = AsyncBlobServiceClient.from_connection_string(
+                connection_string,
+                max_single_get_size=BLOB_DOWNLOAD_CHUNK_SIZE_BYTES,
+                max_chunk_get_size=BLOB_DOWNLOAD_CHUNK_SIZE_BYTES
+            )
+    
+    async def list_blobs(self, container_name: str, prefix: Optional[str] = None) -> List[str]:
+        """
+        异步列出容器中的所有Blob
+        
+        Args:
+            container_name: 容器名称
+            prefix: Blob名称前缀（可选）
+        
+        Returns:
+            Blob名称列表
+        """
+        container_client = self.blob_service_client.get_container_client(container_name)
+        return [blob.name async for blob in container_client.list_blobs(name_starts_with=prefix)]
+    
+    async def list_blob_properties(self, container_name: str, prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        异步列出容器中的所有Blob及其ETag和内容MD5
+        
+        Args:
+            container_name: 容器名称
+            prefix: Blob名称前缀（可选）
+        
+        Returns:
+            Blob属性字典列表，见_format_blob_properties
+        """
+        container_client = self.blob_service_client.get_container_client(container_name)
+        return [
+            _format_blob_properties(blob)
+            async for blob in container_client.list_blobs(name_starts_with=prefix)
+        ]
+    
+    async def iter_blob_properties(self, container_name: str, prefix: Optional[str] = None,
+                                   page_size: int = BLOB_LIST_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """
+        异步按页惰性列举容器中的Blob
+        
+        Args:
+            container_name: 容器名称
+            prefix: Blob名称前缀（可选）
+            page_size: 每页的Blob数量
+        
+        Yields:
+            Blob属性字典，见_format_blob_properties
+        """
+        container_client = self.blob_service_client.get_container_client(container_name)
+        async for blob in container_client.list_blobs(name_starts_with=prefix, results_per_page=page_size):
+            yield _format_blob_properties(blob)
+    
+    async def download_blob_to_buffer(self, container_name: str, blob_name: str,
+                                      max_concurrency: int = BLOB_DOWNLOAD_MAX_CONCURRENCY,
+                                      spool_threshold_bytes: int = BLOB_DOWNLOAD_SPOOL_THRESHOLD_BYTES) -> DownloadedBlob:
+        """
+        异步下载Blob到预分配的缓冲区，见AzureBlobStorageClient.download_blob_to_buffer
+        
+        Args:
+            container_name: 容器名称
+            blob_name: Blob名称
+            max_concurrency: 单个Blob并行下载的分块数
+            spool_threshold_bytes: 超过该大小时写入临时文件
+        
+        Returns:
+            DownloadedBlob实例，调用方负责关闭
+        """
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        downloader = await blob_client.download_blob(max_concurrency=max_concurrency)
+        target = _open_download_target(downloader.size, spool_threshold_bytes)
+        try:
+            await downloader.readinto(target)
+            return _finish_download(blob_name, target)
+        except BaseException:
+            target.close()
+            raise
+    
+    async def download_directory(self, container_name: str, prefix: Optional[str] = None,
+                                 max_workers: int = BLOB_DOWNLOAD_MAX_WORKERS) -> AsyncIterator[DownloadedBlob]:
+        """
+        异步并行下载目录下的所有Blob，按列举顺序逐个产出，见AzureBlobStorageClient.download_directory
+        
+        Args:
+            container_name: 容器名称
+            prefix: Blob名称前缀（可选）
+            max_workers: 同时下载的最大文件数
+        
+        Yields:
+            DownloadedBlob实例，调用方负责关闭
+        """
+        blob_properties = self.iter_blob_properties(container_name, prefix)
+        
+        async def next_name() -> Optional[str]:
+            try:
+                return (await blob_properties.__anext__())["name"]
+            except StopAsyncIteration:
+                return None
+        
+        def start(blob_name: str) -> asyncio.Task:
+            return asyncio.create_task(self.download_blob_to_buffer(container_name, blob_name))
+        
+        pending = deque()
+        try:
+            for _ in range(max(1, max_workers)):
+                blob_name = await next_name()
+                if blob_name is None:
+                    break
+                pending.append(start(blob_name))
+            while pending:
+                downloaded = await pending.popleft()
+                
+                blob_name = await next_name()
+                if blob_name is not None:
+                    pending.append(start(blob_name))
+                
+                yield downloaded
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            _close_downloaded(pending)
+            await blob_properties.aclose()
+    
+    async def download_blob_to_bytes(self, container_name: str, blob_name: str) -> bytes:
+        """
+        异步下载Blob到字节数据
+        
+        Args:
+            container_name: 容器名称
+            blob_name: Blob名称
+        
+        Returns:
+            Blob的字节数据
+        """
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        downloader = await blob_client.download_blob()
+        return await downloader.readall()
+    
+    async def upload_blob_from_bytes(self, container_name: str, blob_name: str, data: bytes,
+                                     content_type: Optional[str] = None, overwrite: bool = True) -> None:
+        """
+        异步从字节数据上传Blob
+        
+        Args:
+            container_name: 容器名称
+            blob_name: Blob名称
+            data: 字节数据
+            content_type: 内容类型（可选）
+            overwrite: 是否覆盖已存在的Blob，为False时Blob已存在会抛出ResourceExistsError
+        """
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        
+        blob_content_settings = None
+        if content_type:
+            blob_content_settings = ContentSettings(content_type=content_type)
+        
+        await blob_client.upload_blob(data, overwrite=overwrite, content_settings=blob_content_settings)
+    
+    async def blob_exists(self, container_name: str, blob_name: str) -> bool:
+        """
+        异步检查Blob是否存在
+        
+        Args:
+            container_name: 容器名称
+            blob_name: Blob名称
+        
+        Returns:
+            如果Blob存在返回True，否则返回False
+        """
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        return await blob_client.exists()
+    
+    async def close(self):
+        """
+        关闭底层HTTP连接
+        """
+        await self.blob_service_client.close()
\ No newline at end of file
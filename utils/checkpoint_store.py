@@ -0,0 +1,297 @@
+"""
+阶段检查点存储
+将理赔处理各阶段的结果持久化，重试时从最后完成的阶段继续
+"""
+import os
+import uuid
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+from pydantic import TypeAdapter
+
+class BaseCheckpointStore(ABC):
+    """
+    检查点存储抽象基类
+    """
+    
+    @abstractmethod
+    def load(self, claim_key: str, stage: str) -> Optional[str]:
+        """
+        读取指定阶段的检查点
+        
+        Args:
+            claim_key: 索赔检查点键
+            stage: 阶段名称
+        
+        Returns:
+            序列化的阶段结果，不存在时返回None
+        """
+        pass
+    
+    @abstractmethod
+    def save(self, claim_key: str, stage: str, payload: str) -> None:
+        """
+        保存指定阶段的检查点
+        
+        Args:
+            claim_key: 索赔检查点键
+            stage: 阶段名称
+            payload: 序列化的阶段结果
+        """
+        pass
+    
+    @abstractmethod
+    def create(self, claim_key: str, stage: str, payload: str) -> bool:
+        """
+        原子地保存指定阶段的检查点，已存在时不覆盖
+        用于分阶段处理中只能由一个worker执行的步骤（多个worker同时调用时只有一个成功）
+        
+        Args:
+            claim_key: 索赔检查点键
+            stage: 阶段名称
+            payload: 序列化的阶段结果
+        
+        Returns:
+            是否由本次调用创建
+        """
+        pass
+    
+    @abstractmethod
+    def clear(self, claim_key: str) -> None:
+        """
+        删除索赔的所有检查点
+        
+        Args:
+            claim_key: 索赔检查点键
+        """
+        pass
+
+class LocalDiskCheckpointStore(BaseCheckpointStore):
+    """
+    本地磁盘检查点存储，用于测试和本地开发
+    """
+    
+    def __init__(self, root_dir: str):
+        """
+        初始化本地磁盘检查点存储
+        
+        Args:
+            root_dir: 检查点根目录
+        """
+        self.root_dir = Path(root_dir)
+    
+    def _stage_path(self, claim_key: str, stage: str) -> Path:
+        return self.root_dir / claim_key / f"{stage}.json"
+    
+    def load(self, claim_key: str, stage: str) -> Optional[str]:
+        try:
+            return self._stage_path(claim_key, stage).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+    
+    def save(self, claim_key: str, stage: str, payload: str) -> None:
+        path = self._stage_path(claim_key, stage)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # 先写临时文件再替换，避免进程中断时留下不完整的检查点；
+        # 临时文件名唯一，多个worker同时保存同一阶段（分阶段处理的重复投递）时互不影响
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, path)
+    
+    def create(self, claim_key: str, stage: str, payload: str) -> bool:
+        path = self._stage_path(claim_key, stage)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # 硬链接在目标已存在时失败，写入完整内容后再链接，其他worker不会读到不完整的文件
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        try:
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            tmp_path.unlink(missing_ok=True)
+    
+    def clear(self, claim_key: str) -> None:
+        claim_dir = self.root_dir / claim_key
+        try:
+            paths = list(claim_dir.iterdir())
+        except FileNotFoundError:
+            return
+        for path in paths:
+            path.unlink(missing_ok=True)
+        try:
+            claim_dir.rmdir()
+        except OSError:
+            # 其他worker同时写入了新的检查点
+            pass
+
+class BlobCheckpointStore(BaseCheckpointStore):
+    """
+    Azure Blob Storage检查点存储，用于生产环境
+    """
+    
+    def __init__(self, blob_storage_client, container_name: str):
+        """
+        初始化Blob检查点存储
+        
+        Args:
+            blob_storage_client: AzureBlobStorageClient实例
+            container_name: 存放检查点的容器名称
+        """
+        self.blob_storage_client = blob_storage_client
+        self.container_name = container_name
+    
+    def load(self, claim_key: str, stage: str) -> Optional[str]:
+        blob_name = f"{claim_key}/{stage}.json"
+        if not self.blob_storage_client.blob_exists(self.container_name, blob_name):
+            return None
+        return self.blob_storage_client.download_blob_to_bytes(self.container_name, blob_name).decode("utf-8")
+    
+    def save(self, claim_key: str, stage: str, payload: str) -> None:
+        self.blob_storage_client.upload_blob_from_bytes(
+            self.container_name,
+            f"{claim_key}/{stage}.json",
+            payload.encode("utf-8"),
+            content_type="application/json"
+        )
+    
+    def create(self, claim_key: str, stage: str, payload: str) -> bool:
+        from azure.core.exceptions import ResourceExistsError
+        try:
+            # 不覆盖时使用If-None-Match: *条件写入，由存储服务保证只有一个写入成功
+            self.blob_storage_client.upload_blob_from_bytes(
+                self.container_name,
+                f"{claim_key}/{stage}.json",
+                payload.encode("utf-8"),
+                content_type="application/json",
+                overwrite=False
+            )
+            return True
+        except ResourceExistsError:
+            return False
+    
+    def clear(self, claim_key: str) -> None:
+        container_client = self.blob_storage_client.get_container_client(self.container_name)
+        for blob_name in self.blob_storage_client.list_blobs(self.container_name, prefix=f"{claim_key}/"):
+            container_client.delete_blob(blob_name)
+
+def make_checkpoint_key(blob_directory: str, config_version: str) -> str:
+    """
+    根据索赔目录和配置版本生成检查点键
+    配置版本变化后旧检查点不会被复用
+    
+    Args:
+        blob_directory: 索赔目录
+        config_version: 配置版本指纹
+    
+    Returns:
+        检查点键
+    """
+    digest = hashlib.sha256(blob_directory.encode("utf-8")).hexdigest()[:32]
+    return f"{digest}-{config_version}"
+
+class ClaimCheckpoint:
+    """
+    单个索赔的检查点访问器
+    store为None时不做持久化，各阶段总是重新计算
+    """
+    
+    def __init__(self, store: Optional[BaseCheckpointStore], claim_key: str):
+        """
+        初始化索赔检查点访问器
+        
+        Args:
+            store: 检查点存储，为None时禁用检查点
+            claim_key: 索赔检查点键
+        """
+        self.store = store
+        self.claim_key = claim_key
+        # 本次处理中从检查点恢复的阶段
+        self.resumed_stages = []
+    
+    def run(self, stage: str, result_type: Any, compute: Callable[[], Any]) -> Any:
+        """
+        存在检查点时直接恢复阶段结果，否则计算并保存
+        
+        Args:
+            stage: 阶段名称
+            result_type: 阶段结果类型，用于序列化和反序列化
+            compute: 计算阶段结果的函数
+        
+        Returns:
+            阶段结果
+        """
+        adapter = TypeAdapter(result_type)
+        if self.store is not None:
+            payload = self.store.load(self.claim_key, stage)
+            if payload is not None:
+                print(f"Resuming stage '{stage}' from checkpoint")
+                self.resumed_stages.append(stage)
+                return adapter.validate_json(payload)
+        
+        result = compute()
+        if self.store is not None:
+            self.store.save(self.claim_key, stage, adapter.dump_json(result).decode("utf-8"))
+        return result
+    
+    async def run_async(self, stage: str, result_type: Any, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        run的异步版本，检查点读写在线程中执行
+        
+        Args:
+            stage: 阶段名称
+            result_type: 阶段结果类型，用于序列化和反序列化
+            compute: 计算阶段结果的异步函数
+        
+        Returns:
+            阶段结果
+        """
+        adapter = TypeAdapter(result_type)
+        if self.store is not None:
+            payload = await asyncio.to_thread(self.store.load, self.claim_key, stage)
+            if payload is not None:
+                print(f"Resuming stage '{stage}' from checkpoint")
+                self.resumed_stages.append(stage)
+                return adapter.validate_json(payload)
+        
+        result = await compute()
+        if self.store is not None:
+            await asyncio.to_thread(
+                self.store.save, self.claim_key, stage, adapter.dump_json(result).decode("utf-8")
+            )
+        return result
+    
+    def clear(self) -> None:
+        """
+        删除该索赔的所有检查点
+        """
+        if self.store is not None:
+            self.store.clear(self.claim_key)
+
+def create_checkpoint_store(blob_storage_client=None) -> Optional[BaseCheckpointStore]:
+    """
+    根据环境变量创建检查点存储
+    - CLAIM_CHECKPOINT_CONTAINER: 使用Blob Storage容器保存检查点
+    - CLAIM_CHECKPOINT_DIR: 使用本地目录保存检查点
+    都未设置时返回None（不启用检查点）
+    
+    Args:
+        blob_storage_client: AzureBlobStorageClient实例（使用Blob存储时必需）
+    
+    Returns:
+        检查点存储实例或None
+    """
+    container_name = os.getenv("CLAIM_CHECKPOINT_CONTAINER")
+    if container_name and blob_storage_client is not None:
+        return BlobCheckpointStore(blob_storage_client, container_name)
+    
+    root_dir = os.getenv("CLAIM_CHECKPOINT_DIR")
+    if root_dir:
+        return LocalDiskCheckpointStore(root_dir)
+    
+    return None
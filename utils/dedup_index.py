@@ -0,0 +1,640 @@
+"""
+索赔去重索引
+根据索赔目录的内容指纹识别重复提交：已完成的直接返回保存的结果，正在处理的等待其完成
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel, TypeAdapter
+
+# 去重记录状态
+STATUS_IN_FLIGHT = "in_flight"
+STATUS_DONE = "done"
+
+class DedupEntry(BaseModel):
+    """
+    去重索引中的一条记录
+    """
+    fingerprint: str
+    status: str  # STATUS_IN_FLIGHT 或 STATUS_DONE
+    blob_directory: Optional[str] = None  # 首次处理该内容的索赔目录
+    result: Optional[str] = None  # 已完成时保存的序列化结果
+    acquired: bool = False  # 本次调用是否获得了处理权
+
+class BaseDedupIndex(ABC):
+    """
+    去重索引抽象基类
+    acquire必须是原子操作，多个worker同时提交相同内容时只有一个获得处理权
+    """
+    
+    @abstractmethod
+    def acquire(self, fingerprint: str, blob_directory: str, lease_seconds: float) -> DedupEntry:
+        """
+        查询指纹，不存在（或处理中的记录已超过租约时间）时登记为处理中并获得处理权
+        
+        Args:
+            fingerprint: 内容指纹
+            blob_directory: 当前索赔目录
+            lease_seconds: 处理中记录的租约时间，超时视为处理方已失败
+        
+        Returns:
+            DedupEntry: 现有记录或新登记的记录（acquired=True）
+        """
+        pass
+    
+    @abstractmethod
+    def get(self, fingerprint: str) -> Optional[DedupEntry]:
+        """
+        读取指纹对应的记录
+        
+        Args:
+            fingerprint: 内容指纹
+        
+        Returns:
+            记录，不存在时返回None
+        """
+        pass
+    
+    @abstractmethod
+    def complete(self, fingerprint: str, result: str) -> None:
+        """
+        保存处理结果并标记为已完成
+        
+        Args:
+            fingerprint: 内容指纹
+            result: 序列化的处理结果
+        """
+        pass
+    
+    @abstractmethod
+    def renew(self, fingerprint: str, blob_directory: str) -> bool:
+        """
+        续租处理中的记录，处理方在处理期间定期调用，避免长时间处理的记录被视为失败
+        
+        Args:
+            fingerprint: 内容指纹
+            blob_directory: 登记该记录的索赔目录
+        
+        Returns:
+            是否续租成功（记录已完成、已删除或已被其他worker接手时返回False）
+        """
+        pass
+    
+    @abstractmethod
+    def release(self, fingerprint: str) -> None:
+        """
+        处理失败时删除处理中的记录，使后续提交可以重新处理
+        
+        Args:
+            fingerprint: 内容指纹
+        """
+        pass
+
+class SQLiteDedupIndex(BaseDedupIndex):
+    """
+    基于本地SQLite文件的去重索引，用于测试和单机部署
+    """
+    
+    def __init__(self, db_path: str):
+        """
+        初始化SQLite去重索引
+        
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS claim_dedup ("
+                "fingerprint TEXT PRIMARY KEY, "
+                "status TEXT NOT NULL, "
+                "blob_directory TEXT, "
+                "result TEXT, "
+                "updated_at REAL NOT NULL)"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作使用独立连接，可在多个线程和进程间安全使用
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def acquire(self, fingerprint: str, blob_directory: str, lease_seconds: float) -> DedupEntry:
+        conn = self._connect()
+        try:
+            # 立即获取写锁，查询和登记之间不会被其他进程插入
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT status, blob_directory, result, updated_at FROM claim_dedup WHERE fingerprint = ?",
+                (fingerprint,)
+            ).fetchone()
+            now = time.time()
+            
+            if row is not None:
+                status, existing_directory, result, updated_at = row
+                if status == STATUS_DONE or now - updated_at < lease_seconds:
+                    conn.rollback()
+                    return DedupEntry(
+                        fingerprint=fingerprint, status=status,
+                        blob_directory=existing_directory, result=result
+                    )
+            
+            conn.execute(
+                "INSERT OR REPLACE INTO claim_dedup (fingerprint, status, blob_directory, result, updated_at) "
+                "VALUES (?, ?, ?, NULL, ?)",
+                (fingerprint, STATUS_IN_FLIGHT, blob_directory, now)
+            )
+            conn.commit()
+            return DedupEntry(
+                fingerprint=fingerprint, status=STATUS_IN_FLIGHT,
+                blob_directory=blob_directory, acquired=True
+            )
+        finally:
+            conn.close()
+    
+    def get(self, fingerprint: str) -> Optional[DedupEntry]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT status, blob_directory, result FROM claim_dedup WHERE fingerprint = ?",
+                (fingerprint,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        status, blob_directory, result = row
+        return DedupEntry(fingerprint=fingerprint, status=status, blob_directory=blob_directory, result=result)
+    
+    def complete(self, fingerprint: str, result: str) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE claim_dedup SET status = ?, result = ?, updated_at = ? WHERE fingerprint = ?",
+                    (STATUS_DONE, result, time.time(), fingerprint)
+                )
+        finally:
+            conn.close()
+    
+    def renew(self, fingerprint: str, blob_directory: str) -> bool:
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE claim_dedup SET updated_at = ? WHERE fingerprint = ? AND status = ? AND blob_directory = ?",
+                    (time.time(), fingerprint, STATUS_IN_FLIGHT, blob_directory)
+                )
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+    
+    def release(self, fingerprint: str) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "DELETE FROM claim_dedup WHERE fingerprint = ? AND status = ?",
+                    (fingerprint, STATUS_IN_FLIGHT)
+                )
+        finally:
+            conn.close()
+
+class BlobDedupIndex(BaseDedupIndex):
+    """
+    Azure Blob Storage去重索引，用于生产环境，所有Function实例共享
+    每个指纹一个Blob；登记使用If-None-Match: *条件写入，接手过期记录、标记完成和删除使用ETag条件写入，
+    由存储服务保证多个实例同时操作时只有一个成功
+    """
+    
+    def __init__(self, blob_storage_client, container_name: str):
+        """
+        初始化Blob去重索引
+        
+        Args:
+            blob_storage_client: AzureBlobStorageClient实例
+            container_name: 存放去重记录的容器名称
+        """
+        self.blob_storage_client = blob_storage_client
+        self.container_name = container_name
+    
+    def _blob_client(self, fingerprint: str):
+        return self.blob_storage_client.get_blob_client(self.container_name, f"{fingerprint}.json")
+    
+    def _read(self, fingerprint: str):
+        """
+        读取记录及其ETag，不存在时返回(None, None)
+        """
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            downloader = self._blob_client(fingerprint).download_blob()
+            payload = json.loads(downloader.readall())
+        except ResourceNotFoundError:
+            return None, None
+        return payload, downloader.properties.etag
+    
+    def _write(self, fingerprint: str, payload: Dict[str, Any], etag: Optional[str] = None) -> bool:
+        """
+        写入记录：etag为None时只在记录不存在时创建，否则只在记录未被修改时覆盖
+        
+        Returns:
+            是否写入成功
+        """
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+        data = json.dumps(payload).encode("utf-8")
+        try:
+            if etag is None:
+                self._blob_client(fingerprint).upload_blob(data, overwrite=False)
+            else:
+                self._blob_client(fingerprint).upload_blob(
+                    data, overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified
+                )
+            return True
+        except (ResourceExistsError, ResourceModifiedError, ResourceNotFoundError):
+            return False
+    
+    def acquire(self, fingerprint: str, blob_directory: str, lease_seconds: float) -> DedupEntry:
+        while True:
+            payload, etag = self._read(fingerprint)
+            if payload is not None and (
+                payload["status"] == STATUS_DONE or time.time() - payload["updated_at"] < lease_seconds
+            ):
+                return DedupEntry(
+                    fingerprint=fingerprint, status=payload["status"],
+                    blob_directory=payload.get("blob_directory"), result=payload.get("result")
+                )
+            
+            # 记录不存在时创建，处理中的记录已过期时接手；其他实例抢先写入时重新读取
+            if self._write(fingerprint, {
+                "status": STATUS_IN_FLIGHT, "blob_directory": blob_directory, "result": None, "updated_at": time.time()
+            }, etag):
+                return DedupEntry(
+                    fingerprint=fingerprint, status=STATUS_IN_FLIGHT,
+                    blob_directory=blob_directory, acquired=True
+                )
+    
+    def get(self, fingerprint: str) -> Optional[DedupEntry]:
+        payload, _ = self._read(fingerprint)
+        if payload is None:
+            return None
+        return DedupEntry(
+            fingerprint=fingerprint, status=payload["status"],
+            blob_directory=payload.get("blob_directory"), result=payload.get("result")
+        )
+    
+    def complete(self, fingerprint: str, result: str) -> None:
+        payload, _ = self._read(fingerprint)
+        blob_directory = payload.get("blob_directory") if payload is not None else None
+        self._blob_client(fingerprint).upload_blob(json.dumps({
+            "status": STATUS_DONE, "blob_directory": blob_directory, "result": result, "updated_at": time.time()
+        }).encode("utf-8"), overwrite=True)
+    
+    def renew(self, fingerprint: str, blob_directory: str) -> bool:
+        payload, etag = self._read(fingerprint)
+        if payload is None or payload["status"] != STATUS_IN_FLIGHT or payload.get("blob_directory") != blob_directory:
+            return False
+        return self._write(fingerprint, dict(payload, updated_at=time.time()), etag)
+    
+    def release(self, fingerprint: str) -> None:
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceModifiedError, ResourceNotFoundError
+        payload, etag = self._read(fingerprint)
+        if payload is None or payload["status"] != STATUS_IN_FLIGHT:
+            return
+        try:
+            # 读取之后被标记完成的记录不删除
+            self._blob_client(fingerprint).delete_blob(etag=etag, match_condition=MatchConditions.IfNotModified)
+        except (ResourceModifiedError, ResourceNotFoundError):
+            pass
+
+def make_claim_fingerprint(blob_properties: List[Dict[str, Any]], config_version: str) -> str:
+    """
+    根据索赔目录中各文件的内容哈希生成内容指纹
+    文件有内容MD5时使用MD5（重新上传相同文件也能识别），否则使用ETag（识别同一次上传的重复触发）
+    文件名和目录不参与计算；配置版本参与计算，配置变化后不会复用旧结果
+    
+    Args:
+        blob_properties: 索赔目录下的Blob属性列表（见AzureBlobStorageClient.list_blob_properties）
+        config_version: 配置版本指纹
+    
+    Returns:
+        内容指纹
+    """
+    file_hashes = sorted(
+        f"md5:{blob['content_md5']}" if blob.get("content_md5") else f"etag:{blob['etag']}"
+        for blob in blob_properties
+    )
+    digest = hashlib.sha256()
+    digest.update(config_version.encode("utf-8"))
+    for file_hash in file_hashes:
+        digest.update(b"\n")
+        digest.update(file_hash.encode("utf-8"))
+    return digest.hexdigest()
+
+class ClaimDeduplicator:
+    """
+    基于去重索引执行索赔处理
+    - 指纹已完成：直接返回保存的结果
+    - 同一进程内正在处理：等待该次处理的结果
+    - 其他worker正在处理：轮询索引直到完成，租约过期或处理方失败时接手处理
+    - 未处理过：登记指纹并处理，处理期间每三分之一个租约时间续租一次，完成后保存结果
+    
+    租约时间应小于Function的超时时间（host.json的functionTimeout，消耗计划默认5分钟）：
+    处理方崩溃后记录最多一个租约时间后过期，重试的调用在自己超时之前才能接手处理
+    """
+    
+    def __init__(self,
+                 index: BaseDedupIndex,
+                 lease_seconds: float = 120,
+                 poll_interval_seconds: float = 2):
+        """
+        初始化去重处理器
+        
+        Args:
+            index: 去重索引
+            lease_seconds: 处理中记录的租约时间
+            poll_interval_seconds: 等待其他worker时的轮询间隔
+        """
+        self.index = index
+        self.lease_seconds = lease_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_async: Dict[str, asyncio.Future] = {}
+    
+    def run(self,
+            fingerprint: str,
+            blob_directory: str,
+            result_type: Any,
+            compute: Callable[[], Any],
+            on_duplicate: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        对指定指纹执行去重处理
+        
+        Args:
+            fingerprint: 内容指纹
+            blob_directory: 当前索赔目录
+            result_type: 结果类型，用于序列化和反序列化
+            compute: 实际处理函数
+            on_duplicate: 结果来自其他索赔目录（相同内容上传到新路径）时调用，例如为当前目录输出结果；
+                同一目录的重复触发不调用，其结果已由处理方输出
+        
+        Returns:
+            处理结果（新处理的或保存的）
+        """
+        with self._lock:
+            future = self._in_flight.get(fingerprint)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[fingerprint] = future
+        
+        if not owner:
+            print(f"Attaching {blob_directory} to in-flight run of identical claim content")
+            result, source_directory = future.result()
+        else:
+            try:
+                result, source_directory = self._run_once(fingerprint, blob_directory, TypeAdapter(result_type), compute)
+                future.set_result((result, source_directory))
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight.pop(fingerprint, None)
+        
+        if on_duplicate is not None and source_directory != blob_directory:
+            on_duplicate(result)
+        return result
+    
+    def _run_once(self, fingerprint: str, blob_directory: str, adapter: TypeAdapter,
+                  compute: Callable[[], Any]) -> Tuple[Any, Optional[str]]:
+        """
+        Returns:
+            (处理结果, 产生该结果的索赔目录)
+        """
+        while True:
+            entry = self.index.acquire(fingerprint, blob_directory, self.lease_seconds)
+            if entry.status == STATUS_DONE:
+                print(f"Returning stored result for {blob_directory} (duplicate of {entry.blob_directory})")
+                return adapter.validate_json(entry.result), entry.blob_directory
+            if entry.acquired:
+                break
+            
+            # 其他worker正在处理相同内容，等待其完成
+            entry = self._wait_for_other_worker(fingerprint)
+            if entry is not None:
+                print(f"Returning result of concurrent run for {blob_directory} (duplicate of {entry.blob_directory})")
+                return adapter.validate_json(entry.result), entry.blob_directory
+        
+        try:
+            with self._renewing_lease(fingerprint, blob_directory):
+                result = compute()
+        except BaseException:
+            self.index.release(fingerprint)
+            raise
+        self.index.complete(fingerprint, adapter.dump_json(result).decode("utf-8"))
+        return result, blob_directory
+    
+    def register(self, fingerprint: str, blob_directory: str) -> DedupEntry:
+        """
+        登记指纹但不在本次调用中处理，用于处理跨越多个调用的分阶段流水线：
+        处理方在流水线各阶段调用renew_lease续租，最后一个阶段调用complete保存结果
+        其他索赔目录正在处理相同内容时等待其完成；同一目录正在处理（重复触发）时直接返回
+        
+        Args:
+            fingerprint: 内容指纹
+            blob_directory: 当前索赔目录
+        
+        Returns:
+            已完成的记录、同一目录处理中的记录（acquired=False）或新登记的记录（acquired=True）
+        """
+        while True:
+            entry = self.index.acquire(fingerprint, blob_directory, self.lease_seconds)
+            if entry.status == STATUS_DONE or entry.acquired or entry.blob_directory == blob_directory:
+                return entry
+            entry = self._wait_for_other_worker(fingerprint)
+            if entry is not None:
+                return entry
+    
+    def complete(self, fingerprint: str, result_type: Any, result: Any) -> None:
+        """
+        保存register登记的指纹的处理结果
+        
+        Args:
+            fingerprint: 内容指纹
+            result_type: 结果类型，用于序列化
+            result: 处理结果
+        """
+        self.index.complete(fingerprint, TypeAdapter(result_type).dump_json(result).decode("utf-8"))
+    
+    def renew_lease(self, fingerprint: str, blob_directory: str) -> None:
+        """
+        续租处理中的记录，失败只记录日志
+        
+        Args:
+            fingerprint: 内容指纹
+            blob_directory: 登记该记录的索赔目录
+        """
+        try:
+            if not self.index.renew(fingerprint, blob_directory):
+                print(f"Dedup lease for {blob_directory} was lost, another worker may process the same content")
+        except Exception as e:
+            print(f"Failed to renew dedup lease for {blob_directory}: {e}")
+    
+    @contextmanager
+    def _renewing_lease(self, fingerprint: str, blob_directory: str):
+        """
+        在后台线程中定期续租，退出时停止
+        """
+        stopped = threading.Event()
+        
+        def renew():
+            while not stopped.wait(self.lease_seconds / 3):
+                self.renew_lease(fingerprint, blob_directory)
+        
+        thread = threading.Thread(target=renew, name="dedup-lease", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+    
+    def _wait_for_other_worker(self, fingerprint: str) -> Optional[DedupEntry]:
+        """
+        轮询直到其他worker完成处理，最多等待一个租约时间（处理方仍在续租时由调用方继续等待）
+        
+        Returns:
+            已完成的记录；处理方失败（记录被删除）或等待超时时返回None，由调用方重新尝试获取处理权
+        """
+        deadline = time.monotonic() + self.lease_seconds
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval_seconds)
+            entry = self.index.get(fingerprint)
+            if entry is None:
+                return None
+            if entry.status == STATUS_DONE:
+                return entry
+        return None
+    
+    async def run_async(self,
+                        fingerprint: str,
+                        blob_directory: str,
+                        result_type: Any,
+                        compute: Callable[[], Awaitable[Any]],
+                        on_duplicate: Optional[Callable[[Any], Awaitable[None]]] = None) -> Any:
+        """
+        run的异步版本，索引读写在线程中执行
+        
+        Args:
+            fingerprint: 内容指纹
+            blob_directory: 当前索赔目录
+            result_type: 结果类型，用于序列化和反序列化
+            compute: 实际处理的异步函数
+            on_duplicate: 结果来自其他索赔目录时调用的异步函数，见run
+        
+        Returns:
+            处理结果（新处理的或保存的）
+        """
+        future = self._in_flight_async.get(fingerprint)
+        if future is not None:
+            print(f"Attaching {blob_directory} to in-flight run of identical claim content")
+            # shield避免一个等待方被取消时取消共享的结果
+            result, source_directory = await asyncio.shield(future)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight_async[fingerprint] = future
+            try:
+                result, source_directory = await self._run_once_async(
+                    fingerprint, blob_directory, TypeAdapter(result_type), compute
+                )
+                future.set_result((result, source_directory))
+            except BaseException as e:
+                future.set_exception(e)
+                # 没有等待方时避免"exception was never retrieved"警告
+                future.exception()
+                raise
+            finally:
+                self._in_flight_async.pop(fingerprint, None)
+        
+        if on_duplicate is not None and source_directory != blob_directory:
+            await on_duplicate(result)
+        return result
+    
+    async def _run_once_async(self,
+                              fingerprint: str,
+                              blob_directory: str,
+                              adapter: TypeAdapter,
+                              compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, Optional[str]]:
+        while True:
+            entry = await asyncio.to_thread(self.index.acquire, fingerprint, blob_directory, self.lease_seconds)
+            if entry.status == STATUS_DONE:
+                print(f"Returning stored result for {blob_directory} (duplicate of {entry.blob_directory})")
+                return adapter.validate_json(entry.result), entry.blob_directory
+            if entry.acquired:
+                break
+            
+            entry = await self._wait_for_other_worker_async(fingerprint)
+            if entry is not None:
+                print(f"Returning result of concurrent run for {blob_directory} (duplicate of {entry.blob_directory})")
+                return adapter.validate_json(entry.result), entry.blob_directory
+        
+        async def renew():
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                await asyncio.to_thread(self.renew_lease, fingerprint, blob_directory)
+        
+        try:
+            renewal = asyncio.ensure_future(renew())
+            try:
+                result = await compute()
+            finally:
+                renewal.cancel()
+        except BaseException:
+            await asyncio.to_thread(self.index.release, fingerprint)
+            raise
+        await asyncio.to_thread(self.index.complete, fingerprint, adapter.dump_json(result).decode("utf-8"))
+        return result, blob_directory
+    
+    async def _wait_for_other_worker_async(self, fingerprint: str) -> Optional[DedupEntry]:
+        deadline = time.monotonic() + self.lease_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval_seconds)
+            entry = await asyncio.to_thread(self.index.get, fingerprint)
+            if entry is None:
+                return None
+            if entry.status == STATUS_DONE:
+                return entry
+        return None
+
+def create_dedup_index(blob_storage_client=None) -> Optional[BaseDedupIndex]:
+    """
+    根据环境变量创建去重索引
+    - CLAIM_DEDUP_CONTAINER: 使用Blob Storage容器保存去重记录（所有实例共享）
+    - CLAIM_DEDUP_DB: 本地SQLite数据库文件路径（只在单个实例内去重）
+    都未设置时返回None（不启用去重）
+    
+    Args:
+        blob_storage_client: AzureBlobStorageClient实例（使用Blob存储时必需）
+    
+    Returns:
+        去重索引实例或None
+    """
+    container_name = os.getenv("CLAIM_DEDUP_CONTAINER")
+    if container_name and blob_storage_client is not None:
+        return BlobDedupIndex(blob_storage_client, container_name)
+    
+    db_path = os.getenv("CLAIM_DEDUP_DB")
+    if db_path:
+        return SQLiteDedupIndex(db_path)
+    return None
\ No newline at end of file
@@ -2,62 +2,55 @@
 文档分类器加载器
 根据全局配置加载相应的文档分类器版本
 """
-import uuid
-from typing import List
-from config.settings import DOCUMENT_CLASSIFIER_VERSION
+from typing import List, Optional
+from config.settings import (
+    DOCUMENT_CLASSIFIER_VERSION, CLASSIFIER_CASCADE_LOCAL_VERSION, CLASSIFIER_CASCADE_CONFIDENCE_THRESHOLD,
+    CLASSIFIER_CASCADE_MAX_TEXT_CHARS, CLASSIFIER_BATCH_MAX_PAGES, CLASSIFIER_BATCH_MAX_PROMPT_TOKENS,
+    CLASSIFIER_BATCH_SNIPPET_CHARS
+)
 from schemas.document_page import DocumentPage
+from utils.document_segmenter import segment_pages
 
-def load_document_classifier():
+def load_document_classifier(version: Optional[str] = None):
     """
     根据全局配置加载相应的文档分类器版本
+    
+    Args:
+        version: 分类器版本，默认使用全局配置中的document_classifier_version
     """
-    if DOCUMENT_CLASSIFIER_VERSION == "v1":
+    version = version or DOCUMENT_CLASSIFIER_VERSION
+    if version == "v1":
         from document_classifiers.v1.classifier import DocumentClassifierV1
         return DocumentClassifierV1()
-    elif DOCUMENT_CLASSIFIER_VERSION == "v2":
-        # 为将来扩展预留
-        try:
-            from document_classifiers.v2.classifier import DocumentClassifierV2
-            return DocumentClassifierV2()
-        except ImportError:
-            raise ValueError(f"Document classifier version {DOCUMENT_CLASSIFIER_VERSION} not implemented")
+    elif version == "cascade":
+        # 本地分类器置信度不足时才调用OpenAI，OpenAI客户端在处理器预热时绑定
+        if CLASSIFIER_CASCADE_LOCAL_VERSION == "cascade":
+            raise ValueError("cascade_local_version must name a local classifier version, not cascade")
+        from document_classifiers.cascade.classifier import CascadeDocumentClassifier
+        return CascadeDocumentClassifier(
+            load_document_classifier(CLASSIFIER_CASCADE_LOCAL_VERSION),
+            confidence_threshold=CLASSIFIER_CASCADE_CONFIDENCE_THRESHOLD,
+            max_text_chars=CLASSIFIER_CASCADE_MAX_TEXT_CHARS,
+            batch_max_pages=CLASSIFIER_BATCH_MAX_PAGES,
+            batch_max_prompt_tokens=CLASSIFIER_BATCH_MAX_PROMPT_TOKENS,
+            batch_snippet_chars=CLASSIFIER_BATCH_SNIPPET_CHARS
+        )
+    elif version == "v2":
+        # 哈希特征线性模型，需要numpy和离线训练的权重文件（classification.v2_weights_path）
+        from document_classifiers.v2.classifier import DocumentClassifierV2
+        return DocumentClassifierV2()
     else:
-        raise ValueError(f"Unsupported classifier version: {DOCUMENT_CLASSIFIER_VERSION}")
+        raise ValueError(f"Unsupported classifier version: {version}")
 
 def group_pages_into_documents(pages: List[DocumentPage]) -> List[DocumentPage]:
     """
     将页面分组为文档，为同一类型的不同文档分配唯一ID
+    同一类型的连续页面根据页码标记和页眉相似度合并为一份文档，见utils.document_segmenter
     
     Args:
         pages: 已分类的页面列表
         
     Returns:
-        带有文档ID的页面列表
+        带有文档ID的页面列表（保持页面顺序）
     """
-    # 按页面顺序和文档类型分组
-    result_pages = []
-    document_counters = {}  # 记录每种文档类型的计数
-    
-    # 先处理claim_form类型，确保只有一份
-    claim_form_pages = [page for page in pages if page.document_type == "claim_form"]
-    other_pages = [page for page in pages if page.document_type != "claim_form"]
-    
-    # 为理赔表分配ID
-    for page in claim_form_pages:
-        page.document_id = "claim_form_1"
-        result_pages.append(page)
-    
-    # 为其他文档类型分配ID
-    for page in other_pages:
-        doc_type = page.document_type
-        if doc_type not in document_counters:
-            document_counters[doc_type] = 1
-        else:
-            # 简化逻辑：每遇到一个新页面就认为是新文档
-            # 在实际实现中，这里可能需要更复杂的逻辑来判断页面是否属于同一文档
-            document_counters[doc_type] += 1
-        
-        page.document_id = f"{doc_type}_{document_counters[doc_type]}"
-        result_pages.append(page)
-    
-    return result_pages
\ No newline at end of file
+    return segment_pages(pages)
\ No newline at end of file
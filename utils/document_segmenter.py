@@ -0,0 +1,128 @@
+"""
+文档分段
+按页面顺序一次遍历已分类的页面，根据类型连续段、页码标记（"Page 2 of 6"）和页眉相似度
+判断每个页面是延续当前文档还是开始一份新文档，使多页文档只提取一次
+"""
+import re
+from typing import FrozenSet, List, Optional, Tuple
+from schemas.document_page import DocumentPage
+from config.settings import SEGMENTATION_HEADER_CHARS, SEGMENTATION_HEADER_SIMILARITY, SEGMENTATION_MARKER_SCAN_CHARS
+
+# 理赔表只有一份，所有理赔表页面归为同一文档
+CLAIM_FORM_DOCUMENT_ID = "claim_form_1"
+
+_PAGE_MARKER_PATTERN = re.compile(r"\b(?:page|pg\.?|p\.)\s*(\d{1,3})\s*(?:of|/)\s*(\d{1,3})\b", re.IGNORECASE)
+_HEADER_TOKEN_PATTERN = re.compile(r"[a-z]+")
+# 续页页眉中的这些词不参与相似度比较
+_HEADER_STOPWORDS = frozenset({"continued", "cont", "page", "of"})
+_CONTINUED_PATTERN = re.compile(r"\(?\bcont(?:inued|'d|\.)", re.IGNORECASE)
+
+def parse_page_marker(text: str, scan_chars: int = SEGMENTATION_MARKER_SCAN_CHARS) -> Optional[Tuple[int, int]]:
+    """
+    查找页面开头或结尾处的页码标记，例如"Page 2 of 6"、"p. 2/6"
+    只扫描首尾scan_chars个字符，正文中引用的页码不会被误认
+    
+    Args:
+        text: 页面文本
+        scan_chars: 首尾各扫描的字符数
+    
+    Returns:
+        (页码, 总页数)，没有有效标记时返回None
+    """
+    regions = [text] if len(text) <= 2 * scan_chars else [text[-scan_chars:], text[:scan_chars]]
+    for region in regions:
+        matches = _PAGE_MARKER_PATTERN.findall(region)
+        if matches:
+            page, total = (int(value) for value in matches[-1])
+            if 1 <= page <= total:
+                return page, total
+    return None
+
+def header_tokens(text: str, header_chars: int = SEGMENTATION_HEADER_CHARS) -> FrozenSet[str]:
+    """
+    提取页眉（页面开头header_chars个字符）中的单词，忽略数字和续页标记词
+    
+    Args:
+        text: 页面文本
+        header_chars: 页眉的字符数
+    
+    Returns:
+        页眉单词集合
+    """
+    return frozenset(_HEADER_TOKEN_PATTERN.findall(text[:header_chars].lower())) - _HEADER_STOPWORDS
+
+def _similarity(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+def _continues(marker: Optional[Tuple[int, int]],
+               last_marker: Optional[Tuple[int, int]],
+               header: FrozenSet[str],
+               first_header: FrozenSet[str],
+               text: str,
+               header_chars: int,
+               header_similarity: float) -> bool:
+    """
+    判断与当前文档类型相同的下一个页面是否延续当前文档
+    页码标记优先：第1页总是新文档，页码连续且总页数一致时延续，当前文档已到最后一页时开始新文档；
+    没有可用的标记时，页眉带续页标记或与文档首页页眉足够相似则延续
+    """
+    if marker is not None:
+        page, total = marker
+        if page == 1:
+            return False
+        if last_marker is not None:
+            return last_marker[1] == total and last_marker[0] + 1 == page
+    elif last_marker is not None and last_marker[0] == last_marker[1]:
+        return False
+    
+    if _CONTINUED_PATTERN.search(text[:header_chars]):
+        return True
+    return _similarity(header, first_header) >= header_similarity
+
+def segment_pages(pages: List[DocumentPage],
+                  header_chars: int = SEGMENTATION_HEADER_CHARS,
+                  header_similarity: float = SEGMENTATION_HEADER_SIMILARITY) -> List[DocumentPage]:
+    """
+    为已分类的页面分配文档ID（原地修改并按原顺序返回）
+    只有与上一页类型相同的页面才可能延续上一页的文档，每页只解析一次页码标记和页眉，整体为线性时间
+    
+    Args:
+        pages: 按页面顺序排列的已分类页面
+        header_chars: 页眉的字符数
+        header_similarity: 没有页码标记时视为同一文档的最低页眉相似度（Jaccard）
+    
+    Returns:
+        带有文档ID的页面列表
+    """
+    document_counters = {}  # 每种文档类型已开始的文档数
+    previous_type = None
+    last_marker = None  # 当前文档最后一页的页码标记
+    first_header = frozenset()  # 当前文档首页的页眉
+    
+    for page in pages:
+        doc_type = page.document_type
+        if doc_type == "claim_form":
+            page.document_id = CLAIM_FORM_DOCUMENT_ID
+            previous_type = doc_type
+            continue
+        
+        marker = parse_page_marker(page.raw_text)
+        header = header_tokens(page.raw_text, header_chars)
+        if doc_type != previous_type or not _continues(
+            marker, last_marker, header, first_header, page.raw_text, header_chars, header_similarity
+        ):
+            document_counters[doc_type] = document_counters.get(doc_type, 0) + 1
+            first_header = header
+            last_marker = None
+        
+        page.document_id = f"{doc_type}_{document_counters[doc_type]}"
+        if marker is not None:
+            last_marker = marker
+        elif last_marker is not None:
+            # 没有标记的页面视为紧接上一页，使下一页的标记仍可校验连续性
+            last_marker = (last_marker[0] + 1, last_marker[1])
+        previous_type = doc_type
+    
+    return pages
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+文档提取结果缓存
+按内容寻址：键由文档类型、处理器版本、提示词哈希、模型和归一化文本的哈希组成，
+相同文本在重试、重新处理、重复上传和规则回测时不再重复调用OpenAI；
+提示词或版本变化时键随之变化，旧条目不再命中并最终被淘汰
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional
+from config.settings import EXTRACTION_CACHE_MAX_MB, EXTRACTION_CACHE_TTL_HOURS
+
+_WHITESPACE_PATTERN = re.compile(r"[ \t\r\f\v]+")
+
+def normalize_document_text(page_texts: List[str]) -> str:
+    """
+    归一化文档文本：合并行内连续空白、去除行首尾空白和空行，页面之间用分页符分隔
+    OCR结果中空白的细微差异不影响缓存命中
+    
+    Args:
+        page_texts: 文档页面文本列表
+    
+    Returns:
+        归一化后的文本
+    """
+    pages = []
+    for text in page_texts:
+        lines = (_WHITESPACE_PATTERN.sub(" ", line).strip() for line in text.splitlines())
+        pages.append("\n".join(line for line in lines if line))
+    return "\f".join(pages)
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def make_extraction_cache_key(document_type: str,
+                              version: str,
+                              prompt: str,
+                              model: str,
+                              page_texts: List[str],
+                              namespace: Optional[str] = None) -> str:
+    """
+    计算提取结果的缓存键
+    
+    Args:
+        document_type: 文档类型
+        version: 处理器版本
+        prompt: 生成结果使用的提示词模板
+        model: OpenAI模型
+        page_texts: 文档（或分块）的页面文本
+        namespace: 提取方式的命名空间（如整个索赔一次提取），不同方式的结果互不复用；
+            逐文档提取不设置，其键与引入命名空间之前相同
+    
+    Returns:
+        缓存键（十六进制SHA-256）
+    """
+    fields = {
+        "document_type": document_type,
+        "version": version,
+        "prompt": _sha256(prompt),
+        "model": model,
+        "text": _sha256(normalize_document_text(page_texts))
+    }
+    if namespace is not None:
+        fields["namespace"] = namespace
+    return _sha256(json.dumps(fields, sort_keys=True))
+
+class BaseExtractionCache(ABC):
+    """
+    提取结果缓存抽象基类，值为序列化的提取结果
+    """
+    
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取未过期的缓存值
+        
+        Args:
+            key: 缓存键
+        
+        Returns:
+            缓存值，不存在或已过期时返回None
+        """
+        pass
+    
+    @abstractmethod
+    def put(self, key: str, document_type: str, value: str) -> None:
+        """
+        写入缓存值
+        
+        Args:
+            key: 缓存键
+            document_type: 文档类型（用于按类型统计和清理）
+            value: 序列化的提取结果
+        """
+        pass
+
+class SQLiteExtractionCache(BaseExtractionCache):
+    """
+    基于本地SQLite文件的提取结果缓存
+    条目超过ttl_seconds后不再命中；总大小超过max_bytes时按最近访问时间淘汰（LRU），
+    同时清除过期条目。可在多个线程和进程间共享同一个文件
+    """
+    
+    def __init__(self, db_path: str, max_bytes: int, ttl_seconds: float):
+        """
+        初始化SQLite提取结果缓存
+        
+        Args:
+            db_path: 数据库文件路径
+            max_bytes: 缓存值的总字节数上限
+            ttl_seconds: 条目的有效期（秒）
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS extraction_cache ("
+                "cache_key TEXT PRIMARY KEY, "
+                "document_type TEXT NOT NULL, "
+                "value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS extraction_cache_accessed ON extraction_cache (accessed_at)"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作使用独立连接，可在多个线程和进程间安全使用
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value FROM extraction_cache WHERE cache_key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE extraction_cache SET accessed_at = ? WHERE cache_key = ?", (now, key))
+                conn.commit()
+        finally:
+            conn.close()
+        return row[0] if row is not None else None
+    
+    def put(self, key: str, document_type: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache "
+                "(cache_key, document_type, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, document_type, value, size, now, now)
+            )
+            self._evict(conn, now)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM extraction_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extraction_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 按最近访问时间从旧到新删除，直到总大小回到上限以内
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for cache_key, size in conn.execute("SELECT cache_key, size FROM extraction_cache ORDER BY accessed_at"):
+            doomed.append((cache_key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM extraction_cache WHERE cache_key = ?", doomed)
+
+def create_extraction_cache() -> Optional[BaseExtractionCache]:
+    """
+    根据环境变量创建提取结果缓存
+    - CLAIM_EXTRACTION_CACHE_DB: 本地SQLite数据库文件路径
+    未设置时返回None（不启用缓存）
+    
+    Returns:
+        提取结果缓存实例或None
+    """
+    db_path = os.getenv("CLAIM_EXTRACTION_CACHE_DB")
+    if db_path:
+        return SQLiteExtractionCache(
+            db_path,
+            max_bytes=int(EXTRACTION_CACHE_MAX_MB * 1024 * 1024),
+            ttl_seconds=EXTRACTION_CACHE_TTL_HOURS * 3600
+        )
+    return None
\ No newline at end of file
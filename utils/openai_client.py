@@ -3,10 +3,135 @@ Azure OpenAI工具类
 用于与Azure OpenAI服务进行交互
 """
 import os
-from typing import Dict, Any, List, Optional
+import time
+from typing import Dict, Any, List, Optional, Tuple, Type, Callable
 import openai
-from azure.identity import DefaultAzureCredential
-from config.settings import OPENAI_MODEL
+from pydantic import BaseModel
+from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from config.settings import OPENAI_MODEL, STRUCTURED_OUTPUT_MAX_ATTEMPTS
+from utils.performance import record_openai_usage, record_structured_output
+from utils.structured_output import (
+    StructuredOutputError, extraction_schema, json_schema_response_format, parse_structured_output
+)
+
+# 默认API版本：json_schema结构化输出需要2024-08-01-preview或更新的版本，这里使用支持它的GA版本
+DEFAULT_API_VERSION = "2024-10-21"
+
+# 部署不支持json_schema时使用的回复格式，schema中的字段名已在提示词中列出
+_JSON_OBJECT_RESPONSE_FORMAT = {"type": "json_object"}
+
+def _get_client_options() -> Dict[str, Any]:
+    """
+    根据环境变量构建Azure OpenAI客户端参数
+    支持使用API密钥或托管身份进行身份验证
+    
+    Returns:
+        传给openai.AzureOpenAI / openai.AsyncAzureOpenAI的参数
+    """
+    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+    
+    if not endpoint:
+        raise ValueError(
+            "Missing Azure OpenAI endpoint. "
+            "Please set AZURE_OPENAI_ENDPOINT environment variable."
+        )
+    
+    options = {
+        "azure_endpoint": endpoint,
+        "api_version": os.getenv("AZURE_OPENAI_API_VERSION", DEFAULT_API_VERSION),
+        # 重试（包括429）由自适应并发限制器统一处理，见utils/adaptive_concurrency.py
+        "max_retries": 0
+    }
+    
+    # 配置Azure OpenAI客户端
+    if os.getenv("AZURE_USE_MANAGED_IDENTITY", "false").lower() == "true":
+        # 使用托管身份；客户端在整个工作进程中复用，因此传入令牌提供器，
+        # 每次请求时取得缓存的令牌并在过期前自动刷新，而不是只在创建时获取一次
+        options["azure_ad_token_provider"] = get_bearer_token_provider(
+            DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
+        )
+    else:
+        # 使用API密钥
+        key = os.getenv("AZURE_OPENAI_KEY")
+        if not key:
+            raise ValueError(
+                "Missing Azure OpenAI credentials. "
+                "Please set AZURE_OPENAI_KEY environment variable "
+                "or use managed identity by setting AZURE_USE_MANAGED_IDENTITY=true."
+            )
+        options["api_key"] = key
+    
+    return options
+
+def _is_response_format_error(error: BaseException) -> bool:
+    """
+    判断请求是否因为API版本或模型不支持response_format而被拒绝
+    """
+    return isinstance(error, openai.BadRequestError) and "response_format" in str(error)
+
+def _format_chat_response(response) -> Dict[str, Any]:
+    """
+    将聊天完成API响应格式化为字典
+    
+    Args:
+        response: openai返回的ChatCompletion对象
+    
+    Returns:
+        格式化后的响应字典
+    """
+    return {
+        "content": response.choices[0].message.content,
+        "role": response.choices[0].message.role,
+        "finish_reason": response.choices[0].finish_reason,
+        "usage": {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens
+        }
+    }
+
+def _build_extraction_messages(prompt: str, text: str) -> List[Dict[str, str]]:
+    """
+    构建结构化数据提取的消息列表
+    提示词模板中有{text}占位符时把文本填入占位符，否则附加在提示词之后
+    """
+    full_prompt = prompt.replace("{text}", text) if "{text}" in prompt else f"{prompt}\n\n{text}"
+    
+    return [
+        {"role": "system", "content": "You are a helpful assistant that extracts structured data from documents. Respond only with valid JSON."},
+        {"role": "user", "content": full_prompt}
+    ]
+
+def _build_classification_messages(prompt: str, text: str) -> List[Dict[str, str]]:
+    """
+    构建文档分类的消息列表
+    """
+    return [
+        {"role": "system", "content": "You are an expert document classifier. Respond only with the document type."},
+        {"role": "user", "content": f"{prompt}\n\nDocument text:\n{text}"}
+    ]
+
+def _build_batch_classification_messages(prompt: str, pages: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+    """
+    构建多页批量分类的消息列表，每个页面用带页面ID的page标签包裹
+    """
+    page_blocks = "\n".join(f'<page id="{page_id}">\n{text}\n</page>' for page_id, text in pages)
+    return [
+        {"role": "system", "content": "You are an expert document classifier. Respond only with a JSON array."},
+        {"role": "user", "content": f"{prompt}\n\nPages:\n{page_blocks}"}
+    ]
+
+def _build_claim_extraction_messages(prompt: str, documents: List[Tuple[str, str, str]]) -> List[Dict[str, str]]:
+    """
+    构建整个索赔一次提取的消息列表，每个文档用带文档ID和类型的document标签包裹
+    """
+    document_blocks = "\n".join(
+        f'<document id="{doc_id}" type="{doc_type}">\n{text}\n</document>' for doc_id, doc_type, text in documents
+    )
+    return [
+        {"role": "system", "content": "You are a helpful assistant that extracts structured data from documents. Respond only with valid JSON."},
+        {"role": "user", "content": f"{prompt}\n\nDocuments:\n{document_blocks}"}
+    ]
 
 class AzureOpenAIClient:
     """
@@ -20,43 +145,13 @@ class AzureOpenAIClient:
         初始化Azure OpenAI客户端
         支持使用API密钥或托管身份进行身份验证
         """
-        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        
-        if not endpoint:
-            raise ValueError(
-                "Missing Azure OpenAI endpoint. "
-                "Please set AZURE_OPENAI_ENDPOINT environment variable."
-            )
-        
-        # 配置Azure OpenAI客户端
-        if os.getenv("AZURE_USE_MANAGED_IDENTITY", "false").lower() == "true":
-            # 使用托管身份
-            credential = DefaultAzureCredential()
-            token = credential.get_token("https://cognitiveservices.azure.com/.default")
-            
-            self.client = openai.AzureOpenAI(
-                azure_endpoint=endpoint,
-                azure_ad_token=token.token,
-                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-29")
-            )
-        else:
-            # 使用API密钥
-            key = os.getenv("AZURE_OPENAI_KEY")
-            if not key:
-                raise ValueError(
-                    "Missing Azure OpenAI credentials. "
-                    "Please set AZURE_OPENAI_KEY environment variable "
-                    "or use managed identity by setting AZURE_USE_MANAGED_IDENTITY=true."
-                )
-            
-            self.client = openai.AzureOpenAI(
-                azure_endpoint=endpoint,
-                api_key=key,
-                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-29")
-            )
+        self.client = openai.AzureOpenAI(**_get_client_options())
         
         # 默认部署名称（模型）
         self.default_deployment = OPENAI_MODEL
+        
+        # 部署是否支持json_schema回复格式，第一次被拒绝后改用json_object
+        self.json_schema_supported = True
     
     def chat_completion(self, 
                        messages: List[Dict[str, str]], 
@@ -73,31 +168,51 @@ class AzureOpenAIClient:
             temperature: 采样温度，控制输出随机性
             max_tokens: 最大生成token数
             **kwargs: 其他参数
-            
+        
         Returns:
             API响应结果
         """
         if deployment_name is None:
             deployment_name = self.default_deployment
-            
-        response = self.client.chat.completions.create(
+        
+        start = time.perf_counter()
+        raw_response = self.client.chat.completions.with_raw_response.create(
             model=deployment_name,
             messages=messages,
             temperature=temperature,
             max_tokens=max_tokens,
             **kwargs
         )
+        response = raw_response.parse()
         
-        return {
-            "content": response.choices[0].message.content,
-            "role": response.choices[0].message.role,
-            "finish_reason": response.choices[0].finish_reason,
-            "usage": {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
-            }
-        }
+        # 记录耗时、重试次数和token用量到当前索赔的性能报告
+        record_openai_usage(deployment_name, start, response.usage, raw_response.retries_taken)
+        
+        return _format_chat_response(response)
+    
+    def _structured_completion(self, messages: List[Dict[str, str]], response_format: Dict[str, Any],
+                               **kwargs) -> Dict[str, Any]:
+        """
+        以结构化输出调用聊天完成API；API版本或模型不支持json_schema时，
+        本客户端之后的请求都改用json_object
+        
+        Args:
+            messages: 消息列表
+            response_format: json_schema回复格式
+            **kwargs: chat_completion的其他参数
+        
+        Returns:
+            API响应结果
+        """
+        if self.json_schema_supported:
+            try:
+                return self.chat_completion(messages=messages, response_format=response_format, **kwargs)
+            except openai.BadRequestError as e:
+                if not _is_response_format_error(e):
+                    raise
+                print(f"json_schema response format is not supported ({e}), falling back to json_object")
+                self.json_schema_supported = False
+        return self.chat_completion(messages=messages, response_format=_JSON_OBJECT_RESPONSE_FORMAT, **kwargs)
     
     def extract_json_data(self, 
                          prompt: str, 
@@ -112,16 +227,11 @@ class AzureOpenAIClient:
             text: 要处理的文本内容
             deployment_name: 部署名称（模型），默认使用全局配置
             temperature: 采样温度
-            
+        
         Returns:
             提取的JSON数据
         """
-        full_prompt = f"{prompt}\n\n{text}"
-        
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant that extracts structured data from documents. Respond only with valid JSON."},
-            {"role": "user", "content": full_prompt}
-        ]
+        messages = _build_extraction_messages(prompt, text)
         
         response = self.chat_completion(
             messages=messages,
@@ -129,9 +239,102 @@ class AzureOpenAIClient:
             temperature=temperature
         )
         
-        # 在实际应用中，可能需要添加JSON解析和验证逻辑
+        # 返回原始响应；需要解析并验证为Pydantic模型时使用extract_model
         return response
     
+    def extract_model(self,
+                      prompt: str,
+                      text: str,
+                      model: Type[BaseModel],
+                      build: Optional[Callable[[Dict[str, Any]], BaseModel]] = None,
+                      deployment_name: Optional[str] = None,
+                      temperature: float = 0.0,
+                      max_tokens: int = 800,
+                      max_attempts: Optional[int] = None) -> BaseModel:
+        """
+        使用结构化输出从文本中提取数据并直接解析为结果模型
+        请求的JSON schema由结果模型生成；回复有小问题时先在本地修复，修复后仍无法解析时才重新请求；
+        回复被max_tokens截断时不解析不完整的结果，加倍max_tokens重新请求
+        
+        Args:
+            prompt: 指导模型如何提取数据的提示
+            text: 要处理的文本内容
+            model: 结果模型类型（例如DischargeOCR）
+            build: 字段到结果模型的转换（例如处理器的from_extracted），默认为model.model_validate
+            deployment_name: 部署名称（模型），默认使用全局配置
+            temperature: 采样温度
+            max_tokens: 最大生成token数
+            max_attempts: 回复无法解析或被截断时的最大请求次数，默认使用structured_output.max_attempts
+        
+        Returns:
+            结果模型实例
+        
+        Raises:
+            StructuredOutputError: 所有请求的回复都无法解析或被截断
+        """
+        messages = _build_extraction_messages(prompt, text)
+        response_format = json_schema_response_format(model.__name__, extraction_schema(model))
+        error = None
+        for _ in range(max(1, max_attempts or STRUCTURED_OUTPUT_MAX_ATTEMPTS)):
+            response = self._structured_completion(
+                messages,
+                response_format,
+                deployment_name=deployment_name,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            if response["finish_reason"] == "length":
+                # 被截断的回复缺少后面的字段，不解析，加倍max_tokens重新请求
+                record_structured_output(parsed=False)
+                error = StructuredOutputError(f"Reply was truncated at max_tokens={max_tokens}")
+                max_tokens *= 2
+                continue
+            try:
+                result, repaired = parse_structured_output(response["content"] or "", model, build)
+            except StructuredOutputError as e:
+                record_structured_output(parsed=False)
+                error = e
+                continue
+            record_structured_output(parsed=True, repaired=repaired)
+            return result
+        raise error
+    
+    def extract_claim(self,
+                      prompt: str,
+                      documents: List[Tuple[str, str, str]],
+                      schema: Dict[str, Any],
+                      deployment_name: Optional[str] = None,
+                      temperature: float = 0.0,
+                      max_tokens: int = 4000) -> str:
+        """
+        在一次结构化请求中提取一个索赔的多个文档
+        
+        Args:
+            prompt: 提取提示
+            documents: (文档ID, 文档类型, 文档文本) 列表
+            schema: 响应的JSON schema，按文档ID给出每个文档的字段
+            deployment_name: 部署名称（模型），默认使用全局配置
+            temperature: 采样温度
+            max_tokens: 最大生成token数，应足够容纳所有文档的字段
+        
+        Returns:
+            模型返回的原始文本，由调用方解析
+        
+        Raises:
+            StructuredOutputError: 回复被max_tokens截断，调用方应按文档逐个提取
+        """
+        response = self._structured_completion(
+            _build_claim_extraction_messages(prompt, documents),
+            json_schema_response_format("claim_extraction", schema),
+            deployment_name=deployment_name,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        if response["finish_reason"] == "length":
+            raise StructuredOutputError(f"Whole-claim reply was truncated at max_tokens={max_tokens}")
+        
+        return response["content"].strip()
+    
     def classify_document(self,
                          prompt: str,
                          text: str,
@@ -145,14 +348,11 @@ class AzureOpenAIClient:
             text: 要分类的文档文本
             deployment_name: 部署名称（模型），默认使用全局配置
             temperature: 采样温度
-            
+        
         Returns:
             分类结果
         """
-        messages = [
-            {"role": "system", "content": "You are an expert document classifier. Respond only with the document type."},
-            {"role": "user", "content": f"{prompt}\n\nDocument text:\n{text}"}
-        ]
+        messages = _build_classification_messages(prompt, text)
         
         response = self.chat_completion(
             messages=messages,
@@ -160,4 +360,286 @@ class AzureOpenAIClient:
             temperature=temperature
         )
         
-        return response["content"].strip()
\ No newline at end of file
+        return response["content"].strip()
+    
+    def classify_documents(self,
+                           prompt: str,
+                           pages: List[Tuple[str, str]],
+                           deployment_name: Optional[str] = None,
+                           temperature: float = 0.1,
+                           max_tokens: int = 800) -> str:
+        """
+        在一次请求中对多个页面进行分类
+        
+        Args:
+            prompt: 批量分类提示，应要求模型按页面ID返回JSON数组
+            pages: (页面ID, 页面文本) 列表
+            deployment_name: 部署名称（模型），默认使用全局配置
+            temperature: 采样温度
+            max_tokens: 最大生成token数，应足够容纳每个页面的标签
+        
+        Returns:
+            模型返回的原始文本，由调用方解析；回复被max_tokens截断时同样原样返回，
+            缺少标签的页面由调用方逐页分类
+        """
+        response = self.chat_completion(
+            messages=_build_batch_classification_messages(prompt, pages),
+            deployment_name=deployment_name,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        
+        return response["content"].strip()
+
+class AsyncAzureOpenAIClient:
+    """
+    Azure OpenAI异步客户端
+    基于openai.AsyncAzureOpenAI，接口与AzureOpenAIClient一致
+    """
+    
+    def __init__(self):
+        """
+        初始化Azure OpenAI异步客户端
+        支持使用API密钥或托管身份进行身份验证
+        """
+        self.client = openai.AsyncAzureOpenAI(**_get_client_options())
+        
+        # 默认部署名称（模型）
+        self.default_deployment = OPENAI_MODEL
+        
+        # 部署是否支持json_schema回复格式，第一次被拒绝后改用json_object
+        self.json_schema_supported = True
+    
+    async def chat_completion(self, 
+                              messages: List[Dict[str, str]], 
+                              deployment_name: Optional[str] = None,
+                              temperature: float = 0.7,
+                              max_tokens: int = 800,
+                              **kwargs) -> Dict[str, Any]:
+        """
+        异步调用聊天完成API
+        
+        Args:
+            messages: 消息列表，包含角色和内容
+            deployment_name: 部署名称（模型），默认使用全局配置
+            temperature: 采样温度，控制输出随机性
+            max_tokens: 最大生成token数
+            **kwargs: 其他参数
+        
+        Returns:
+            API响应结果
+        """
+        if deployment_name is None:
+            deployment_name = self.default_deployment
+        
+        start = time.perf_counter()
+        raw_response = await self.client.chat.completions.with_raw_response.create(
+            model=deployment_name,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+        response = raw_response.parse()
+        
+        record_openai_usage(deployment_name, start, response.usage, raw_response.retries_taken)
+        
+        return _format_chat_response(response)
+    
+    async def _structured_completion(self, messages: List[Dict[str, str]], response_format: Dict[str, Any],
+                                     **kwargs) -> Dict[str, Any]:
+        """
+        异步以结构化输出调用聊天完成API；API版本或模型不支持json_schema时，
+        本客户端之后的请求都改用json_object
+        
+        Args:
+            messages: 消息列表
+            response_format: json_schema回复格式
+            **kwargs: chat_completion的其他参数
+        
+        Returns:
+            API响应结果
+        """
+        if self.json_schema_supported:
+            try:
+                return await self.chat_completion(messages=messages, response_format=response_format, **kwargs)
+            except openai.BadRequestError as e:
+                if not _is_response_format_error(e):
+                    raise
+                print(f"json_schema response format is not supported ({e}), falling back to json_object")
+                self.json_schema_supported = False
+        return await self.chat_completion(messages=messages, response_format=_JSON_OBJECT_RESPONSE_FORMAT, **kwargs)
+    
+    async def extract_json_data(self, 
+                                prompt: str, 
+                                text: str, 
+                                deployment_name: Optional[str] = None,
+                                temperature: float = 0.3) -> Dict[str, Any]:
+        """
+        异步从文本中提取结构化JSON数据
+        
+        Args:
+            prompt: 指导模型如何提取数据的提示
+            text: 要处理的文本内容
+            deployment_name: 部署名称（模型），默认使用全局配置
+            temperature: 采样温度
+        
+        Returns:
+            提取的JSON数据
+        """
+        return await self.chat_completion(
+            messages=_build_extraction_messages(prompt, text),
+            deployment_name=deployment_name,
+            temperature=temperature
+        )
+    
+    async def extract_model(self,
+                            prompt: str,
+                            text: str,
+                            model: Type[BaseModel],
+                            build: Optional[Callable[[Dict[str, Any]], BaseModel]] = None,
+                            deployment_name: Optional[str] = None,
+                            temperature: float = 0.0,
+                            max_tokens: int = 800,
+                            max_attempts: Optional[int] = None) -> BaseModel:
+        """
+        异步使用结构化输出从文本中提取数据并直接解析为结果模型
+        
+        Args:
+            prompt: 指导模型如何提取数据的提示
+            text: 要处理的文本内容
+            model: 结果模型类型（例如DischargeOCR）
+            build: 字段到结果模型的转换（例如处理器的from_extracted），默认为model.model_validate
+            deployment_name: 部署名称（模型），默认使用全局配置
+            temperature: 采样温度
+            max_tokens: 最大生成token数
+            max_attempts: 回复无法解析或被截断时的最大请求次数，默认使用structured_output.max_attempts
+        
+        Returns:
+            结果模型实例
+        
+        Raises:
+            StructuredOutputError: 所有请求的回复都无法解析或被截断
+        """
+        messages = _build_extraction_messages(prompt, text)
+        response_format = json_schema_response_format(model.__name__, extraction_schema(model))
+        error = None
+        for _ in range(max(1, max_attempts or STRUCTURED_OUTPUT_MAX_ATTEMPTS)):
+            response = await self._structured_completion(
+                messages,
+                response_format,
+                deployment_name=deployment_name,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            if response["finish_reason"] == "length":
+                # 被截断的回复缺少后面的字段，不解析，加倍max_tokens重新请求
+                record_structured_output(parsed=False)
+                error = StructuredOutputError(f"Reply was truncated at max_tokens={max_tokens}")
+                max_tokens *= 2
+                continue
+            try:
+                result, repaired = parse_structured_output(response["content"] or "", model, build)
+            except StructuredOutputError as e:
+                record_structured_output(parsed=False)
+                error = e
+                continue
+            record_structured_output(parsed=True, repaired=repaired)
+            return result
+        raise error
+    
+    async def extract_claim(self,
+                            prompt: str,
+                            documents: List[Tuple[str, str, str]],
+                            schema: Dict[str, Any],
+                            deployment_name: Optional[str] = None,
+                            temperature: float = 0.0,
+                            max_tokens: int = 4000) -> str:
+        """
+        异步在一次结构化请求中提取一个索赔的多个文档
+        
+        Args:
+            prompt: 提取提示
+            documents: (文档ID, 文档类型, 文档文本) 列表
+            schema: 响应的JSON schema，按文档ID给出每个文档的字段
+            deployment_name: 部署名称（模型），默认使用全局配置
+            temperature: 采样温度
+            max_tokens: 最大生成token数，应足够容纳所有文档的字段
+        
+        Returns:
+            模型返回的原始文本，由调用方解析
+        
+        Raises:
+            StructuredOutputError: 回复被max_tokens截断，调用方应按文档逐个提取
+        """
+        response = await self._structured_completion(
+            _build_claim_extraction_messages(prompt, documents),
+            json_schema_response_format("claim_extraction", schema),
+            deployment_name=deployment_name,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        if response["finish_reason"] == "length":
+            raise StructuredOutputError(f"Whole-claim reply was truncated at max_tokens={max_tokens}")
+        
+        return response["content"].strip()
+    
+    async def classify_document(self,
+                                prompt: str,
+                                text: str,
+                                deployment_name: Optional[str] = None,
+                                temperature: float = 0.1) -> str:
+        """
+        异步对文档进行分类
+        
+        Args:
+            prompt: 分类提示
+            text: 要分类的文档文本
+            deployment_name: 部署名称（模型），默认使用全局配置
+            temperature: 采样温度
+        
+        Returns:
+            分类结果
+        """
+        response = await self.chat_completion(
+            messages=_build_classification_messages(prompt, text),
+            deployment_name=deployment_name,
+            temperature=temperature
+        )
+        
+        return response["content"].strip()
+    
+    async def classify_documents(self,
+                                 prompt: str,
+                                 pages: List[Tuple[str, str]],
+                                 deployment_name: Optional[str] = None,
+                                 temperature: float = 0.1,
+                                 max_tokens: int = 800) -> str:
+        """
+        异步在一次请求中对多个页面进行分类
+        
+        Args:
+            prompt: 批量分类提示，应要求模型按页面ID返回JSON数组
+            pages: (页面ID, 页面文本) 列表
+            deployment_name: 部署名称（模型），默认使用全局配置
+            temperature: 采样温度
+            max_tokens: 最大生成token数，应足够容纳每个页面的标签
+        
+        Returns:
+            模型返回的原始文本，由调用方解析；回复被max_tokens截断时同样原样返回，
+            缺少标签的页面由调用方逐页分类
+        """
+        response = await self.chat_completion(
+            messages=_build_batch_classification_messages(prompt, pages),
+            deployment_name=deployment_name,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        
+        return response["content"].strip()
+    
+    async def close(self):
+        """
+        关闭底层HTTP连接
+        """
+        await self.client.close()
\ No newline at end of file
@@ -0,0 +1,324 @@
+"""
+性能记录工具
+在处理单个索赔期间收集各阶段、各文档耗时和OpenAI用量，生成PerformanceReport
+"""
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+from schemas.performance_report import (
+    PerformanceReport, StageTiming, DocumentTiming, OpenAICallUsage
+)
+
+# 当前索赔的性能记录器，通过上下文变量传递给服务和客户端
+_current_recorder: ContextVar[Optional["PerformanceRecorder"]] = ContextVar(
+    "performance_recorder", default=None
+)
+
+class PerformanceRecorder:
+    """
+    单个索赔的性能记录器（线程安全）
+    """
+    
+    def __init__(self):
+        """
+        初始化性能记录器
+        """
+        self.report = PerformanceReport()
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+    
+    @contextmanager
+    def stage(self, stage: str):
+        """
+        记录一个处理阶段的耗时
+        
+        Args:
+            stage: 阶段名称
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, _elapsed_ms(start))
+    
+    def record_stage(self, stage: str, wall_time_ms: float):
+        """
+        记录一个处理阶段的耗时（用于无法用单个上下文包裹的阶段，例如流式处理中交替执行的阶段）
+        
+        Args:
+            stage: 阶段名称
+            wall_time_ms: 耗时（毫秒）
+        """
+        with self._lock:
+            self.report.stages.append(StageTiming(stage=stage, wall_time_ms=round(wall_time_ms, 3)))
+    
+    def record_document(self, timing: DocumentTiming):
+        """
+        记录单个文档提取的耗时
+        
+        Args:
+            timing: 文档耗时
+        """
+        with self._lock:
+            self.report.documents.append(timing)
+    
+    def record_openai_call(self, usage: OpenAICallUsage):
+        """
+        记录单次OpenAI调用
+        
+        Args:
+            usage: 调用耗时和token用量
+        """
+        with self._lock:
+            self.report.openai_calls.append(usage)
+            self.report.retries += usage.retries
+            self.report.total_prompt_tokens += usage.prompt_tokens
+            self.report.total_completion_tokens += usage.completion_tokens
+    
+    def record_retry(self, count: int = 1):
+        """
+        记录不经过OpenAI调用统计的重试（例如其他服务的重试）
+        
+        Args:
+            count: 重试次数
+        """
+        with self._lock:
+            self.report.retries += count
+    
+    def record_concurrency_wait(self, wait_ms: float, throttled: bool = False):
+        """
+        记录一次外部服务调用等待并发槽位的时间
+        
+        Args:
+            wait_ms: 等待时间（毫秒）
+            throttled: 该调用是否收到429
+        """
+        with self._lock:
+            self.report.concurrency_wait_ms = round(self.report.concurrency_wait_ms + wait_ms, 3)
+            if throttled:
+                self.report.throttled_calls += 1
+    
+    def record_classification(self, pages: int, escalated: int, saved_ms: float):
+        """
+        记录级联分类器对一批页面的分类
+        
+        Args:
+            pages: 分类的页面数
+            escalated: 交给OpenAI分类的页面数
+            saved_ms: 未升级的页面节省的OpenAI调用时间（毫秒，估算值）
+        """
+        with self._lock:
+            self.report.classified_pages += pages
+            self.report.escalated_pages += escalated
+            self.report.classification_saved_ms = round(self.report.classification_saved_ms + saved_ms, 3)
+    
+    def record_template_hits(self, hits: int):
+        """
+        记录命中页面模板索引的页面数
+        
+        Args:
+            hits: 命中的页面数
+        """
+        with self._lock:
+            self.report.template_hits += hits
+    
+    def record_extraction_cache(self, hit: bool):
+        """
+        记录一次提取结果缓存查询
+        
+        Args:
+            hit: 是否命中
+        """
+        with self._lock:
+            if hit:
+                self.report.extraction_cache_hits += 1
+            else:
+                self.report.extraction_cache_misses += 1
+    
+    def record_structured_output(self, parsed: bool, repaired: bool = False):
+        """
+        记录一次结构化回复的解析结果
+        
+        Args:
+            parsed: 是否解析成功
+            repaired: 是否经过本地修复
+        """
+        with self._lock:
+            self.report.structured_outputs += 1
+            if not parsed:
+                self.report.structured_output_failures += 1
+            elif repaired:
+                self.report.structured_output_repairs += 1
+    
+    def finish(self) -> PerformanceReport:
+        """
+        结束记录并返回性能报告
+        
+        Returns:
+            PerformanceReport: 性能报告
+        """
+        with self._lock:
+            self.report.total_wall_time_ms = _elapsed_ms(self._start)
+            return self.report
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+def merge_performance_reports(reports: List[PerformanceReport]) -> PerformanceReport:
+    """
+    合并分别记录的性能报告（例如分阶段处理时各阶段在不同worker上记录的报告）
+    总耗时为各报告耗时之和，即实际处理时间，不包括在队列中等待的时间
+    
+    Args:
+        reports: 性能报告列表
+    
+    Returns:
+        PerformanceReport: 合并后的报告
+    """
+    merged = PerformanceReport()
+    for report in reports:
+        merged.total_wall_time_ms = round(merged.total_wall_time_ms + report.total_wall_time_ms, 3)
+        merged.stages.extend(report.stages)
+        merged.documents.extend(report.documents)
+        merged.openai_calls.extend(report.openai_calls)
+        merged.resumed_stages.extend(report.resumed_stages)
+        merged.retries += report.retries
+        merged.throttled_calls += report.throttled_calls
+        merged.concurrency_wait_ms = round(merged.concurrency_wait_ms + report.concurrency_wait_ms, 3)
+        merged.classified_pages += report.classified_pages
+        merged.escalated_pages += report.escalated_pages
+        merged.classification_saved_ms = round(merged.classification_saved_ms + report.classification_saved_ms, 3)
+        merged.template_hits += report.template_hits
+        merged.extraction_cache_hits += report.extraction_cache_hits
+        merged.extraction_cache_misses += report.extraction_cache_misses
+        merged.structured_outputs += report.structured_outputs
+        merged.structured_output_repairs += report.structured_output_repairs
+        merged.structured_output_failures += report.structured_output_failures
+        merged.total_prompt_tokens += report.total_prompt_tokens
+        merged.total_completion_tokens += report.total_completion_tokens
+    return merged
+
+def get_current_recorder() -> Optional[PerformanceRecorder]:
+    """
+    获取当前上下文中的性能记录器
+    
+    Returns:
+        性能记录器，不在索赔处理上下文中时返回None
+    """
+    return _current_recorder.get()
+
+@contextmanager
+def recording(recorder: PerformanceRecorder):
+    """
+    在上下文中激活性能记录器
+    
+    Args:
+        recorder: 性能记录器
+    """
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+def record_openai_usage(deployment: str, start: float, usage, retries: int = 0):
+    """
+    将一次OpenAI调用记录到当前性能记录器（如有）
+    
+    Args:
+        deployment: 部署名称（模型）
+        start: 调用开始时间（time.perf_counter）
+        usage: 响应中的usage对象，可以为None
+        retries: SDK内部的重试次数
+    """
+    recorder = get_current_recorder()
+    if recorder is None:
+        return
+    
+    recorder.record_openai_call(OpenAICallUsage(
+        deployment=deployment,
+        wall_time_ms=_elapsed_ms(start),
+        retries=retries,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        total_tokens=getattr(usage, "total_tokens", 0) or 0
+    ))
+
+def record_structured_output(parsed: bool, repaired: bool = False):
+    """
+    将一次结构化回复的解析结果记录到当前性能记录器（如有）
+    
+    Args:
+        parsed: 是否解析成功
+        repaired: 是否经过本地修复
+    """
+    recorder = get_current_recorder()
+    if recorder is not None:
+        recorder.record_structured_output(parsed, repaired)
+
+def emit_performance_report(claim_id: str, report: PerformanceReport):
+    """
+    通过LogManager将性能报告作为指标发送到Application Insights
+    未配置Application Insights时跳过
+    
+    Args:
+        claim_id: 索赔ID
+        report: 性能报告
+    """
+    try:
+        from utils.log_manager import LogManager
+        log_manager = LogManager()
+    except (ValueError, ImportError) as e:
+        print(f"Skipping performance metrics: {e}")
+        return
+    
+    properties = {"claim_id": claim_id}
+    log_manager.log_metric("claim_wall_time_ms", report.total_wall_time_ms, dict(properties))
+    log_manager.log_metric("claim_retries", report.retries, dict(properties))
+    log_manager.log_metric("claim_prompt_tokens", report.total_prompt_tokens, dict(properties))
+    log_manager.log_metric("claim_completion_tokens", report.total_completion_tokens, dict(properties))
+    log_manager.log_metric("claim_throttled_calls", report.throttled_calls, dict(properties))
+    log_manager.log_metric("claim_concurrency_wait_ms", report.concurrency_wait_ms, dict(properties))
+    if report.classified_pages:
+        log_manager.log_metric(
+            "claim_classification_escalation_rate", report.escalated_pages / report.classified_pages, dict(properties)
+        )
+        log_manager.log_metric("claim_classification_saved_ms", report.classification_saved_ms, dict(properties))
+    if report.template_hits:
+        log_manager.log_metric("claim_template_hits", report.template_hits, dict(properties))
+    extraction_cache_lookups = report.extraction_cache_hits + report.extraction_cache_misses
+    if extraction_cache_lookups:
+        log_manager.log_metric(
+            "claim_extraction_cache_hit_rate", report.extraction_cache_hits / extraction_cache_lookups, dict(properties)
+        )
+    if report.structured_outputs:
+        log_manager.log_metric(
+            "claim_structured_output_failure_rate",
+            report.structured_output_failures / report.structured_outputs, dict(properties)
+        )
+        log_manager.log_metric(
+            "claim_structured_output_repair_rate",
+            report.structured_output_repairs / report.structured_outputs, dict(properties)
+        )
+    
+    for stage in report.stages:
+        log_manager.log_metric(
+            "stage_wall_time_ms", stage.wall_time_ms, {**properties, "stage": stage.stage}
+        )
+    for document in report.documents:
+        log_manager.log_metric(
+            "document_wall_time_ms", document.wall_time_ms,
+            {**properties, "document_type": document.document_type, "document_id": document.document_id,
+             "queue_wait_ms": document.queue_wait_ms, "page_count": document.page_count}
+        )
+    
+    # 自适应并发限制器的当前状态
+    from utils.adaptive_concurrency import get_concurrency_limiters
+    for limiter in get_concurrency_limiters():
+        stats = limiter.stats()
+        service = {"service": stats.service}
+        log_manager.log_metric("concurrency_limit", stats.limit, dict(service))
+        log_manager.log_metric("concurrency_in_flight", stats.in_flight, dict(service))
+        log_manager.log_metric("concurrency_queue_depth", stats.queue_depth, dict(service))
\ No newline at end of file
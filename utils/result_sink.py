@@ -0,0 +1,623 @@
+"""
+索赔结果输出
+将ClaimResult写入输出容器：每个索赔一个JSON文件，或按大小和时间批量写出的压缩JSONL分段，
+以及供分析使用的扁平化字段列式（Parquet）导出
+"""
+import os
+import gzip
+import time
+import atexit
+import uuid
+import threading
+import importlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import TypeAdapter
+from schemas.claim_result import ClaimResult, ClaimBatchItem
+from config.settings import (
+    RESULT_SINK_FORMATS, RESULT_SINK_COMPRESSION, RESULT_SINK_MAX_SEGMENT_BYTES,
+    RESULT_SINK_MAX_SEGMENT_RECORDS, RESULT_SINK_MAX_SEGMENT_AGE_SECONDS, RESULT_SINK_MAX_COMMIT_WAIT_SECONDS
+)
+
+# pydantic v2的序列化由pydantic-core（Rust）实现，直接输出UTF-8字节，不经过dict和str
+_CLAIM_RESULT_ADAPTER = TypeAdapter(ClaimResult)
+_BATCH_ITEM_ADAPTER = TypeAdapter(ClaimBatchItem)
+
+class BaseResultOutput(ABC):
+    """
+    结果文件的写入目标抽象基类
+    """
+    
+    @abstractmethod
+    def put(self, name: str, data: bytes, content_type: str) -> None:
+        """
+        写入一个结果文件，已存在时覆盖
+        
+        Args:
+            name: 文件名（相对路径）
+            data: 文件内容
+            content_type: 内容类型
+        """
+        pass
+
+class LocalDirectoryOutput(BaseResultOutput):
+    """
+    本地目录输出，用于测试和本地开发
+    """
+    
+    def __init__(self, root_dir: str):
+        """
+        初始化本地目录输出
+        
+        Args:
+            root_dir: 输出根目录
+        """
+        self.root_dir = Path(root_dir)
+    
+    def put(self, name: str, data: bytes, content_type: str) -> None:
+        path = self.root_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # 先写临时文件再替换，读取方不会看到写了一半的文件
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+class BlobContainerOutput(BaseResultOutput):
+    """
+    Azure Blob Storage容器输出，用于生产环境
+    """
+    
+    def __init__(self, blob_storage_client, container_name: str):
+        """
+        初始化Blob容器输出
+        
+        Args:
+            blob_storage_client: AzureBlobStorageClient实例
+            container_name: 输出容器名称
+        """
+        self.blob_storage_client = blob_storage_client
+        self.container_name = container_name
+    
+    def put(self, name: str, data: bytes, content_type: str) -> None:
+        self.blob_storage_client.upload_blob_from_bytes(self.container_name, name, data, content_type=content_type)
+
+class BaseResultSink(ABC):
+    """
+    结果输出抽象基类，实现需要是线程安全的
+    """
+    
+    @abstractmethod
+    def write(self, blob_directory: str, result: ClaimResult) -> None:
+        """
+        输出单个索赔的处理结果
+        
+        Args:
+            blob_directory: 索赔目录
+            result: 处理结果
+        """
+        pass
+    
+    def write_durable(self, blob_directory: str, result: ClaimResult) -> None:
+        """
+        输出单个索赔的处理结果，并等待结果持久化后返回
+        调用方在此之后才能删除检查点或标记索赔已完成，否则进程退出时缓冲中的结果会丢失
+        
+        Args:
+            blob_directory: 索赔目录
+            result: 处理结果
+        """
+        self.write(blob_directory, result)
+        self.flush()
+    
+    def flush(self) -> None:
+        """
+        写出所有缓冲中的结果
+        """
+        pass
+    
+    def close(self) -> None:
+        """
+        写出缓冲中的结果并停止后台任务
+        """
+        self.flush()
+
+class JsonResultSink(BaseResultSink):
+    """
+    每个索赔写一个JSON文件，文件名由索赔目录决定，重复处理时覆盖
+    """
+    
+    def __init__(self, output: BaseResultOutput, prefix: str = "json"):
+        """
+        初始化JSON结果输出
+        
+        Args:
+            output: 写入目标
+            prefix: 文件名前缀
+        """
+        self.output = output
+        self.prefix = prefix
+    
+    def write(self, blob_directory: str, result: ClaimResult) -> None:
+        name = f"{self.prefix}/{blob_directory.strip('/')}.json"
+        self.output.put(name, _CLAIM_RESULT_ADAPTER.dump_json(result), "application/json")
+
+class _PendingSegment:
+    """
+    缓冲中的分段的写出状态，write_durable等待其中的结果写出
+    """
+    
+    def __init__(self):
+        self.written = threading.Event()
+        self.error: Optional[Exception] = None
+
+class _SegmentedResultSink(BaseResultSink):
+    """
+    分段批量输出的基类
+    结果先缓冲在内存中，未压缩大小、结果数或最早结果的等待时间达到阈值时写出为一个分段文件，
+    避免大量索赔产生大量小文件；等待时间由后台线程检查，没有新结果时也会按时写出。
+    write_durable按组提交：同一时间窗口内完成的索赔等待同一个分段写出，窗口结束时仍未写出则主动写出
+    """
+    
+    extension = ""
+    content_type = "application/octet-stream"
+    
+    def __init__(self,
+                 output: BaseResultOutput,
+                 prefix: str,
+                 max_segment_bytes: int = RESULT_SINK_MAX_SEGMENT_BYTES,
+                 max_segment_records: int = RESULT_SINK_MAX_SEGMENT_RECORDS,
+                 max_segment_age_seconds: float = RESULT_SINK_MAX_SEGMENT_AGE_SECONDS,
+                 max_commit_wait_seconds: float = RESULT_SINK_MAX_COMMIT_WAIT_SECONDS):
+        """
+        初始化分段输出
+        
+        Args:
+            output: 写入目标
+            prefix: 分段文件名前缀
+            max_segment_bytes: 分段未压缩大小上限（字节）
+            max_segment_records: 分段结果数上限
+            max_segment_age_seconds: 分段中最早结果的最长等待时间（秒）
+            max_commit_wait_seconds: write_durable等待其他结果加入同一分段的最长时间（秒）
+        """
+        self.output = output
+        self.prefix = prefix
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_records = max_segment_records
+        self.max_segment_age_seconds = max_segment_age_seconds
+        self.max_commit_wait_seconds = max_commit_wait_seconds
+        # 同一容器可能有多个worker写入，分段名包含实例ID避免冲突
+        self.instance_id = uuid.uuid4().hex[:12]
+        
+        self._lock = threading.Lock()
+        self._entries: List[Tuple[Any, int, bool]] = []  # (缓冲项, 估计大小, 是否有调用方等待写出)
+        self._segment = _PendingSegment()
+        self._pending_bytes = 0
+        self._opened_at: Optional[float] = None
+        self._sequence = 0
+        self._closed = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+        # 进程正常退出时写出剩余结果
+        atexit.register(self.close)
+    
+    @abstractmethod
+    def _prepare(self, item: ClaimBatchItem) -> Tuple[Any, int]:
+        """
+        将结果转换为缓冲项
+        
+        Args:
+            item: 索赔目录和处理结果
+        
+        Returns:
+            (缓冲项, 估计的未压缩大小)
+        """
+        pass
+    
+    @abstractmethod
+    def _encode(self, items: List[Any]) -> bytes:
+        """
+        将一组缓冲项编码为分段文件内容
+        
+        Args:
+            items: 缓冲项列表
+        
+        Returns:
+            分段文件内容
+        """
+        pass
+    
+    def write(self, blob_directory: str, result: ClaimResult) -> None:
+        self._append(blob_directory, result, durable=False)
+    
+    def write_durable(self, blob_directory: str, result: ClaimResult) -> None:
+        segment = self._append(blob_directory, result, durable=True)
+        if not segment.written.wait(self.max_commit_wait_seconds):
+            try:
+                self.flush()
+            except Exception:
+                # 写出失败的是哪个分段由segment.error判断
+                pass
+            segment.written.wait()
+        if segment.error is not None:
+            raise segment.error
+    
+    def _append(self, blob_directory: str, result: ClaimResult, durable: bool) -> _PendingSegment:
+        """
+        将结果加入缓冲区，达到阈值时写出
+        
+        Returns:
+            结果所在分段的写出状态
+        """
+        # 序列化在锁外进行，多个线程可以同时准备结果
+        item, size = self._prepare(ClaimBatchItem(blob_directory=blob_directory, result=result))
+        with self._lock:
+            if not self._entries:
+                self._opened_at = time.monotonic()
+            self._entries.append((item, size, durable))
+            self._pending_bytes += size
+            segment = self._segment
+            full = (self._pending_bytes >= self.max_segment_bytes
+                    or len(self._entries) >= self.max_segment_records)
+        
+        self._ensure_timer()
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                if not durable:
+                    raise
+        return segment
+    
+    def flush(self) -> None:
+        with self._lock:
+            entries = self._entries
+            if not entries:
+                return
+            segment = self._segment
+            self._entries = []
+            self._segment = _PendingSegment()
+            self._pending_bytes = 0
+            self._opened_at = None
+            self._sequence += 1
+            sequence = self._sequence
+        
+        name = self._segment_name(sequence)
+        try:
+            self.output.put(name, self._encode([item for item, _, _ in entries]), self.content_type)
+        except Exception as e:
+            # 写出失败时放回缓冲区，下次写出时重试；
+            # 等待写出的结果不放回，由调用方保留检查点并重试整个索赔，避免同一结果写出两次
+            retained = [entry for entry in entries if not entry[2]]
+            with self._lock:
+                self._entries = retained + self._entries
+                self._pending_bytes += sum(size for _, size, _ in retained)
+                if self._opened_at is None and self._entries:
+                    self._opened_at = time.monotonic()
+            segment.error = e
+            segment.written.set()
+            raise
+        segment.written.set()
+        print(f"Wrote {len(entries)} claim results to segment {name}")
+    
+    def close(self) -> None:
+        self._closed.set()
+        if self._timer is not None and self._timer is not threading.current_thread():
+            self._timer.join()
+        self.flush()
+    
+    def _segment_name(self, sequence: int) -> str:
+        now = datetime.now(timezone.utc)
+        return (f"{self.prefix}/{now:%Y/%m/%d}/"
+                f"{now:%H%M%S}-{self.instance_id}-{sequence:06d}{self.extension}")
+    
+    def _ensure_timer(self):
+        """
+        第一次写入时启动按时写出的后台线程
+        """
+        if self._timer is not None:
+            return
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._run_timer, name="result-sink-flush", daemon=True)
+                self._timer.start()
+    
+    def _run_timer(self):
+        interval = max(0.1, self.max_segment_age_seconds / 4)
+        while not self._closed.wait(interval):
+            with self._lock:
+                due = (self._opened_at is not None
+                       and time.monotonic() - self._opened_at >= self.max_segment_age_seconds)
+            if not due:
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Failed to flush result segment: {e}")
+
+class JsonlResultSink(_SegmentedResultSink):
+    """
+    压缩JSONL分段输出，每行是一个ClaimBatchItem（索赔目录和处理结果）
+    """
+    
+    content_type = "application/x-ndjson"
+    
+    def __init__(self, output: BaseResultOutput, prefix: str = "jsonl", compression: str = RESULT_SINK_COMPRESSION,
+                 **kwargs):
+        """
+        初始化JSONL分段输出
+        
+        Args:
+            output: 写入目标
+            prefix: 分段文件名前缀
+            compression: 压缩方式：gzip、zstd或none
+            **kwargs: 分段阈值，见_SegmentedResultSink
+        """
+        super().__init__(output, prefix, **kwargs)
+        self.compression = compression or "none"
+        if self.compression == "gzip":
+            self.extension = ".jsonl.gz"
+        elif self.compression == "zstd":
+            self._zstd = _import_optional("zstandard", "zstd compression")
+            self.extension = ".jsonl.zst"
+        elif self.compression == "none":
+            self.extension = ".jsonl"
+        else:
+            raise ValueError(f"Unsupported result compression: {compression}")
+    
+    def _prepare(self, item: ClaimBatchItem) -> Tuple[Any, int]:
+        line = _BATCH_ITEM_ADAPTER.dump_json(item) + b"\n"
+        return line, len(line)
+    
+    def _encode(self, items: List[Any]) -> bytes:
+        data = b"".join(items)
+        if self.compression == "gzip":
+            return gzip.compress(data, compresslevel=6)
+        if self.compression == "zstd":
+            return self._zstd.ZstdCompressor(level=3).compress(data)
+        return data
+
+# 扁平化结果的列及其类型，Parquet导出使用固定的schema，不同分段之间的列类型保持一致
+FLAT_RESULT_COLUMNS: List[Tuple[str, str]] = [
+    ("blob_directory", "string"),
+    ("claim_id", "string"),
+    ("policy_number", "string"),
+    ("overall_status", "string"),
+    ("processing_timestamp", "timestamp"),
+    ("pipeline_version", "string"),
+    # OCROutput
+    ("ocr_version", "string"),
+    ("claim_form_patient_name", "string"),
+    ("claim_form_claim_amount", "float"),
+    ("claim_form_claim_date", "date"),
+    ("claim_form_diagnosis_codes", "list<string>"),
+    ("discharge_count", "int"),
+    ("invoice_count", "int"),
+    ("invoice_total_amount", "float"),
+    ("receipt_count", "int"),
+    ("receipt_total_amount", "float"),
+    ("payment_proof_count", "int"),
+    ("payment_proof_total_amount", "float"),
+    ("id_card_count", "int"),
+    # NEROutput
+    ("ner_policy_number", "string"),
+    ("ner_patient_name", "string"),
+    ("ner_diagnosis_codes", "list<string>"),
+    ("ner_procedure_codes", "list<string>"),
+    ("ner_total_claimed_amount", "float"),
+    ("ner_provider_signature_verified", "bool"),
+    ("ner_hospital_name", "string"),
+    ("ner_service_dates", "list<string>"),
+    ("ner_version", "string"),
+    # RuleCheckOutput
+    ("rule_policy_valid", "bool"),
+    ("rule_coverage_active", "bool"),
+    ("rule_diagnosis_covered", "bool"),
+    ("rule_amount_within_limit", "bool"),
+    ("rule_missing_documents", "list<string>"),
+    ("rule_final_decision", "string"),
+    ("rule_rejection_reasons", "list<string>"),
+    ("rule_engine_version", "string"),
+    # PerformanceReport
+    ("total_wall_time_ms", "float"),
+    ("total_prompt_tokens", "int"),
+    ("total_completion_tokens", "int")
+]
+
+def flatten_claim_result(blob_directory: str, result: ClaimResult) -> Dict[str, Any]:
+    """
+    将处理结果扁平化为一行，列见FLAT_RESULT_COLUMNS
+    多份同类文档汇总为数量和金额合计
+    
+    Args:
+        blob_directory: 索赔目录
+        result: 处理结果
+    
+    Returns:
+        列名到值的映射
+    """
+    ocr, ner, rule = result.ocr, result.ner, result.rule_check
+    performance = result.performance
+    return {
+        "blob_directory": blob_directory,
+        "claim_id": result.claim_id,
+        "policy_number": result.policy_number,
+        "overall_status": result.overall_status,
+        "processing_timestamp": result.processing_timestamp,
+        "pipeline_version": result.pipeline_version,
+        "ocr_version": ocr.metadata.ocr_version,
+        "claim_form_patient_name": ocr.claim_form.patient_name,
+        "claim_form_claim_amount": ocr.claim_form.claim_amount,
+        "claim_form_claim_date": ocr.claim_form.claim_date,
+        "claim_form_diagnosis_codes": ocr.claim_form.diagnosis_codes,
+        "discharge_count": len(ocr.discharge),
+        "invoice_count": len(ocr.invoice),
+        "invoice_total_amount": sum(invoice.total_amount for invoice in ocr.invoice),
+        "receipt_count": len(ocr.receipt),
+        "receipt_total_amount": sum(receipt.payment_amount for receipt in ocr.receipt),
+        "payment_proof_count": len(ocr.payment_proof),
+        "payment_proof_total_amount": sum(proof.payment_amount for proof in ocr.payment_proof),
+        "id_card_count": len(ocr.id_card),
+        "ner_policy_number": ner.policy_number,
+        "ner_patient_name": ner.patient_name,
+        "ner_diagnosis_codes": ner.diagnosis_codes,
+        "ner_procedure_codes": ner.procedure_codes,
+        "ner_total_claimed_amount": ner.total_claimed_amount,
+        "ner_provider_signature_verified": ner.provider_signature_verified,
+        "ner_hospital_name": ner.hospital_name,
+        "ner_service_dates": ner.service_dates,
+        "ner_version": ner.ner_version,
+        "rule_policy_valid": rule.policy_valid,
+        "rule_coverage_active": rule.coverage_active,
+        "rule_diagnosis_covered": rule.diagnosis_covered,
+        "rule_amount_within_limit": rule.amount_within_limit,
+        "rule_missing_documents": rule.missing_documents,
+        "rule_final_decision": rule.final_decision,
+        "rule_rejection_reasons": rule.rejection_reasons,
+        "rule_engine_version": rule.rule_engine_version,
+        "total_wall_time_ms": performance.total_wall_time_ms if performance else None,
+        "total_prompt_tokens": performance.total_prompt_tokens if performance else None,
+        "total_completion_tokens": performance.total_completion_tokens if performance else None
+    }
+
+class ParquetResultSink(_SegmentedResultSink):
+    """
+    扁平化字段的Parquet分段输出，用于分析查询
+    需要安装pyarrow
+    """
+    
+    extension = ".parquet"
+    content_type = "application/vnd.apache.parquet"
+    
+    def __init__(self, output: BaseResultOutput, prefix: str = "parquet", **kwargs):
+        """
+        初始化Parquet分段输出
+        
+        Args:
+            output: 写入目标
+            prefix: 分段文件名前缀
+            **kwargs: 分段阈值，见_SegmentedResultSink
+        """
+        super().__init__(output, prefix, **kwargs)
+        self._pyarrow = _import_optional("pyarrow", "Parquet export")
+        self._parquet = _import_optional("pyarrow.parquet", "Parquet export")
+        self._schema = self._build_schema()
+    
+    def _build_schema(self):
+        pa = self._pyarrow
+        types = {
+            "string": pa.string(),
+            "float": pa.float64(),
+            "int": pa.int64(),
+            "bool": pa.bool_(),
+            "date": pa.date32(),
+            "timestamp": pa.timestamp("us"),
+            "list<string>": pa.list_(pa.string())
+        }
+        return pa.schema([(name, types[kind]) for name, kind in FLAT_RESULT_COLUMNS])
+    
+    def _prepare(self, item: ClaimBatchItem) -> Tuple[Any, int]:
+        row = flatten_claim_result(item.blob_directory, item.result)
+        # 按列数粗略估计未压缩大小
+        return row, 16 * len(row)
+    
+    def _encode(self, items: List[Any]) -> bytes:
+        table = self._pyarrow.Table.from_pylist(items, schema=self._schema)
+        sink = self._pyarrow.BufferOutputStream()
+        self._parquet.write_table(table, sink, compression="zstd")
+        return sink.getvalue().to_pybytes()
+
+class MultiResultSink(BaseResultSink):
+    """
+    同时输出到多个结果输出
+    """
+    
+    def __init__(self, sinks: List[BaseResultSink]):
+        self.sinks = sinks
+    
+    def write(self, blob_directory: str, result: ClaimResult) -> None:
+        for sink in self.sinks:
+            sink.write(blob_directory, result)
+    
+    def write_durable(self, blob_directory: str, result: ClaimResult) -> None:
+        for sink in self.sinks:
+            sink.write_durable(blob_directory, result)
+    
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
+    
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+def _import_optional(module_name: str, feature: str):
+    """
+    导入可选依赖，未安装时给出明确的错误信息
+    
+    Args:
+        module_name: 模块名
+        feature: 需要该依赖的功能
+    
+    Returns:
+        模块对象
+    """
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        raise ImportError(f"{feature} requires the '{module_name.split('.')[0]}' package: {e}") from e
+
+def create_result_output(blob_storage_client=None) -> Optional[BaseResultOutput]:
+    """
+    根据环境变量创建结果写入目标
+    - CLAIM_RESULT_CONTAINER: 写入Blob Storage容器
+    - CLAIM_RESULT_DIR: 写入本地目录
+    都未设置时返回None（不输出结果）
+    
+    Args:
+        blob_storage_client: AzureBlobStorageClient实例（使用Blob存储时必需）
+    
+    Returns:
+        写入目标或None
+    """
+    container_name = os.getenv("CLAIM_RESULT_CONTAINER")
+    if container_name and blob_storage_client is not None:
+        return BlobContainerOutput(blob_storage_client, container_name)
+    
+    root_dir = os.getenv("CLAIM_RESULT_DIR")
+    if root_dir:
+        return LocalDirectoryOutput(root_dir)
+    
+    return None
+
+def create_result_sink(blob_storage_client=None,
+                       formats: Optional[List[str]] = None) -> Optional[BaseResultSink]:
+    """
+    根据环境变量和performance.yaml中的result_sink配置创建结果输出
+    
+    Args:
+        blob_storage_client: AzureBlobStorageClient实例（使用Blob存储时必需）
+        formats: 输出格式列表（json、jsonl、parquet），默认使用配置
+    
+    Returns:
+        结果输出实例，未配置写入目标时返回None
+    """
+    output = create_result_output(blob_storage_client)
+    if output is None:
+        return None
+    
+    sinks = []
+    for output_format in formats or RESULT_SINK_FORMATS:
+        if output_format == "json":
+            sinks.append(JsonResultSink(output))
+        elif output_format == "jsonl":
+            sinks.append(JsonlResultSink(output))
+        elif output_format == "parquet":
+            sinks.append(ParquetResultSink(output))
+        else:
+            raise ValueError(f"Unsupported result format: {output_format}")
+    
+    if len(sinks) == 1:
+        return sinks[0]
+    return MultiResultSink(sinks)
\ No newline at end of file
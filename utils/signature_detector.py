@@ -9,6 +9,7 @@ from azure.storage.blob import ContentSettings
 from .azure_document_intelligence import AzureDocumentIntelligenceClient
 from .blob_storage import AzureBlobStorageClient
 from .log_manager import LogManager
+from .adaptive_concurrency import limit_client, SERVICE_DOCUMENT_INTELLIGENCE
 from schemas.ocr_output import SignatureInfo, SignatureType
 
 class SignatureDetector:
@@ -21,7 +22,9 @@ class SignatureDetector:
         """
         初始化签名检测器
         """
-        self.document_intelligence_client = AzureDocumentIntelligenceClient()
+        self.document_intelligence_client = limit_client(
+            AzureDocumentIntelligenceClient(), SERVICE_DOCUMENT_INTELLIGENCE
+        )
         self.blob_storage_client = AzureBlobStorageClient()
         self.log_manager = LogManager()
     
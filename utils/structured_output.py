@@ -0,0 +1,267 @@
+"""
+结构化输出
+由Pydantic结果模型生成请求的JSON schema，把模型的回复直接解析为结果模型；
+回复有小问题（代码块包裹、尾随逗号、被max_tokens截断、金额带货币符号等）时先在本地修复，
+修复后仍无法解析时才需要再次调用模型
+"""
+import re
+import json
+from typing import Any, Callable, Dict, Optional, Set, Tuple, Type, get_args, get_origin
+from pydantic import BaseModel, ValidationError
+
+# 由签名检测填充、不由模型提取的字段
+NON_EXTRACTED_FIELDS = ("signatures",)
+
+_DEFS_REF_PREFIX = "#/$defs/"
+_CODE_FENCE_PATTERN = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_NUMBER_NOISE_PATTERN = re.compile(r"[^\d.\-]")
+_CLOSERS = {"{": "}", "[": "]"}
+
+class StructuredOutputError(ValueError):
+    """
+    模型回复在本地修复后仍无法解析为结果模型
+    """
+    pass
+
+def _collect_refs(node: Any, found: Set[str]):
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith(_DEFS_REF_PREFIX):
+            found.add(ref[len(_DEFS_REF_PREFIX):])
+        for value in node.values():
+            _collect_refs(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _collect_refs(value, found)
+
+def _prune_defs(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    删除schema中不再被引用的$defs条目
+    """
+    defs = schema.pop("$defs", {})
+    reachable: Set[str] = set()
+    _collect_refs(schema, reachable)
+    frontier = set(reachable)
+    while frontier:
+        found: Set[str] = set()
+        for name in frontier:
+            _collect_refs(defs.get(name), found)
+        frontier = found - reachable
+        reachable |= frontier
+    kept = {name: definition for name, definition in defs.items() if name in reachable}
+    if kept:
+        schema["$defs"] = kept
+    return schema
+
+def extraction_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    生成结果模型中由模型提取的字段的JSON schema（去掉签名等不由模型提取的字段）
+    
+    Args:
+        model: 结果模型类型
+    
+    Returns:
+        JSON schema
+    """
+    schema = model.model_json_schema()
+    for field in NON_EXTRACTED_FIELDS:
+        schema.get("properties", {}).pop(field, None)
+        if field in schema.get("required", []):
+            schema["required"].remove(field)
+    return _prune_defs(schema)
+
+def json_schema_response_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    构建chat completions的response_format参数
+    结果模型中有自由格式的字段（例如发票的itemized_charges），不满足严格模式的要求，因此不启用strict
+    
+    Args:
+        name: schema名称
+        schema: JSON schema
+    
+    Returns:
+        response_format参数
+    """
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema}}
+
+def repair_json(content: str) -> str:
+    """
+    修复回复中常见的JSON问题：去掉代码块标记和JSON前后的说明文字、删除尾随逗号，
+    并补全被max_tokens截断的JSON；截断时回退到最外层最后一个完整的成员，
+    截断处的值（字符串、数字、字面量或未闭合的对象和数组）即使补全后可以解析也一律丢弃，
+    避免把不完整的值当作提取结果
+    
+    Args:
+        content: 模型回复的文本
+    
+    Returns:
+        修复后的JSON文本（不保证可以解析）
+    """
+    text = _CODE_FENCE_PATTERN.sub("", content.strip())
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        return text
+    
+    output = []
+    stack = []
+    # 最外层最后一个完整成员之后的位置，截断时回退到这里
+    checkpoint = 0
+    in_string = False
+    string_is_key = False
+    expect_key = False
+    escaped = False
+    for char in text[min(starts):]:
+        if in_string:
+            output.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                if len(stack) == 1 and not string_is_key:
+                    checkpoint = len(output)
+            continue
+        if char == '"':
+            in_string = True
+            string_is_key = expect_key
+            expect_key = False
+        elif char in _CLOSERS:
+            if not stack:
+                checkpoint = len(output) + 1
+            stack.append(_CLOSERS[char])
+            expect_key = char == "{"
+        elif char in "}]":
+            # 删除闭合括号前的尾随逗号
+            while output and (output[-1].isspace() or output[-1] == ","):
+                output.pop()
+            if stack:
+                stack.pop()
+            output.append(char)
+            if not stack:
+                # 忽略最外层JSON之后的说明文字
+                break
+            expect_key = False
+            if len(stack) == 1:
+                checkpoint = len(output)
+            continue
+        elif char == "," and stack:
+            if len(stack) == 1:
+                checkpoint = len(output)
+            expect_key = stack[-1] == "}"
+        output.append(char)
+    
+    if not stack:
+        return "".join(output)
+    output = output[:checkpoint]
+    while output and (output[-1].isspace() or output[-1] == ","):
+        output.pop()
+    return "".join(output) + stack[0]
+
+def load_json_object(content: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    把回复解析为JSON对象，直接解析失败时先本地修复
+    
+    Args:
+        content: 模型回复的文本
+    
+    Returns:
+        (JSON对象, 是否经过修复)
+    """
+    repaired = False
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        repaired = True
+        try:
+            data = json.loads(repair_json(content))
+        except json.JSONDecodeError as e:
+            raise StructuredOutputError(f"Reply is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise StructuredOutputError(f"Expected a JSON object, got {type(data).__name__}")
+    return data, repaired
+
+def _field_kinds(annotation: Any) -> Set[type]:
+    origin = get_origin(annotation)
+    if origin is None:
+        return {annotation}
+    if origin is list:
+        return {list}
+    kinds: Set[type] = set()
+    for arg in get_args(annotation):
+        kinds |= _field_kinds(arg)
+    return kinds
+
+def coerce_fields(data: Dict[str, Any], model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    按结果模型的字段类型修正常见的值问题：金额中的货币符号和千位分隔符、
+    列表字段返回了单个值或null、字符串"null"
+    
+    Args:
+        data: 回复中的字段
+        model: 结果模型类型
+    
+    Returns:
+        修正后的字段（新字典）
+    """
+    coerced = dict(data)
+    for name, field in model.model_fields.items():
+        if name not in coerced:
+            continue
+        value = coerced[name]
+        kinds = _field_kinds(field.annotation)
+        if isinstance(value, str) and value.strip().lower() in ("null", "none", "n/a"):
+            value = None
+        if list in kinds and not isinstance(value, list):
+            value = [] if value is None else [value]
+        elif kinds & {float, int} and isinstance(value, str):
+            number = _NUMBER_NOISE_PATTERN.sub("", value)
+            try:
+                value = float(number) if float in kinds else int(float(number))
+            except ValueError:
+                pass
+        coerced[name] = value
+    return coerced
+
+def build_model(data: Dict[str, Any],
+                model: Type[BaseModel],
+                build: Optional[Callable[[Dict[str, Any]], BaseModel]] = None) -> Tuple[BaseModel, bool]:
+    """
+    把回复中的字段转换为结果模型，校验失败时按字段类型修正后再试一次
+    
+    Args:
+        data: 回复中的字段
+        model: 结果模型类型
+        build: 字段到结果模型的转换（例如应用处理器的验证规则），默认为model.model_validate
+    
+    Returns:
+        (结果模型, 是否经过修正)
+    """
+    build = build or model.model_validate
+    try:
+        # 验证规则可能原地修改字段，传入副本以便修正时使用原始值
+        return build(dict(data)), False
+    except (ValidationError, ValueError, TypeError):
+        pass
+    try:
+        return build(coerce_fields(data, model)), True
+    except (ValidationError, ValueError, TypeError) as e:
+        raise StructuredOutputError(f"Reply does not match {model.__name__}: {e}") from e
+
+def parse_structured_output(content: str,
+                            model: Type[BaseModel],
+                            build: Optional[Callable[[Dict[str, Any]], BaseModel]] = None) -> Tuple[BaseModel, bool]:
+    """
+    把模型回复解析为结果模型，必要时在本地修复
+    
+    Args:
+        content: 模型回复的文本
+        model: 结果模型类型
+        build: 字段到结果模型的转换，默认为model.model_validate
+    
+    Returns:
+        (结果模型, 是否经过修复)
+    """
+    data, repaired_json = load_json_object(content)
+    result, repaired_fields = build_model(data, model, build)
+    return result, repaired_json or repaired_fields
\ No newline at end of file
@@ -0,0 +1,269 @@
+"""
+跨索赔的页面模板索引
+用SimHash指纹识别近似重复的页面（同一医院的发票、出院小结等模板，只有少数字段不同），
+命中已知模板的页面直接复用缓存的分类结果，不再调用分类器（以及可能的OpenAI升级）
+"""
+import os
+import re
+import json
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from schemas.classification_result import ClassificationResult
+from config.settings import (
+    TEMPLATE_INDEX_ENABLED, TEMPLATE_INDEX_MAX_ENTRIES, TEMPLATE_INDEX_MAX_DISTANCE, TEMPLATE_INDEX_MIN_TOKENS,
+    TEMPLATE_INDEX_MIN_CONFIDENCE, TEMPLATE_INDEX_PERSIST_EVERY, DOCUMENT_CLASSIFIER_VERSION,
+    CLASSIFIER_CASCADE_LOCAL_VERSION, CLASSIFIER_CASCADE_CONFIDENCE_THRESHOLD, CLASSIFIER_V2_WEIGHTS_PATH,
+    get_config_version
+)
+
+FINGERPRINT_BITS = 64
+
+# 分词：数字统一替换为0，使金额、日期、编号不同的同一模板页面得到相同的词
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_DIGIT_PATTERN = re.compile(r"[0-9]")
+
+# 把一个字节的8个比特展开到8个16位计数通道中，见simhash
+_LANE_BITS = 16
+_SPREAD_BYTE = [
+    sum(1 << (_LANE_BITS * bit) for bit in range(8) if byte >> bit & 1)
+    for byte in range(256)
+]
+
+def _shingles(text: str) -> Set[str]:
+    tokens = _TOKEN_PATTERN.findall(_DIGIT_PATTERN.sub("0", text.lower()))
+    shingles = set(tokens)
+    shingles.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    return shingles
+
+def simhash(text: str, min_tokens: int = 0) -> Optional[int]:
+    """
+    计算页面文本的64位SimHash指纹，特征为归一化后的单词和相邻词对
+    为避免对每个特征逐位累加64个计数器，把每个特征哈希的比特展开到一个大整数的64个16位通道中，
+    所有特征相加后每个通道即为该比特为1的特征数
+    
+    Args:
+        text: 页面文本
+        min_tokens: 特征数少于此值时返回None（文本太短，指纹不可靠）
+    
+    Returns:
+        指纹，文本太短时返回None
+    """
+    shingles = _shingles(text)
+    if not shingles or len(shingles) < min_tokens:
+        return None
+    
+    counts = 0
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for i, byte in enumerate(digest):
+            counts += _SPREAD_BYTE[byte] << (_LANE_BITS * 8 * i)
+    
+    fingerprint = 0
+    half = len(shingles) / 2
+    for bit in range(FINGERPRINT_BITS):
+        if (counts >> (_LANE_BITS * bit)) & 0xFFFF > half:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+def template_index_version() -> str:
+    """
+    模板中缓存的分类结果所依赖的版本：分类器版本、全局配置指纹，以及影响分类结果的级联阈值和本地分类器设置
+    版本变化后已保存的模板文件被丢弃
+    
+    Returns:
+        版本字符串
+    """
+    classification = json.dumps({
+        "cascade_local_version": CLASSIFIER_CASCADE_LOCAL_VERSION,
+        "cascade_confidence_threshold": CLASSIFIER_CASCADE_CONFIDENCE_THRESHOLD,
+        "v2_weights_path": CLASSIFIER_V2_WEIGHTS_PATH
+    }, sort_keys=True)
+    digest = hashlib.sha256(classification.encode("utf-8")).hexdigest()[:12]
+    return f"{DOCUMENT_CLASSIFIER_VERSION}-{get_config_version()}-{digest}"
+
+class TemplateIndex:
+    """
+    有界的页面模板索引（线程安全）
+    指纹按max_distance + 1个分段建立倒排表：汉明距离不超过max_distance的两个指纹至少有一个分段完全相同，
+    查找时只需比较分段相同的候选。超过max_entries时淘汰最久未命中的模板
+    """
+    
+    def __init__(self,
+                 max_entries: int = TEMPLATE_INDEX_MAX_ENTRIES,
+                 max_distance: int = TEMPLATE_INDEX_MAX_DISTANCE,
+                 min_tokens: int = TEMPLATE_INDEX_MIN_TOKENS,
+                 min_confidence: float = TEMPLATE_INDEX_MIN_CONFIDENCE,
+                 path: Optional[str] = None,
+                 persist_every: int = TEMPLATE_INDEX_PERSIST_EVERY,
+                 version: str = ""):
+        """
+        初始化模板索引，指定了path且文件存在时从文件加载
+        
+        Args:
+            max_entries: 最多保存的模板数
+            max_distance: 视为同一模板的最大汉明距离（64位中不同的比特数）
+            min_tokens: 生成指纹所需的最少特征数
+            min_confidence: 只缓存置信度不低于此值的分类结果
+            path: 持久化文件路径（可选）
+            persist_every: 每新增多少个模板保存一次
+            version: 分类器和配置版本，见template_index_version；文件中保存的版本不同时不加载
+        """
+        self.max_entries = max(1, max_entries)
+        self.max_distance = max(0, min(max_distance, FINGERPRINT_BITS // 2 - 1))
+        self.min_tokens = min_tokens
+        self.min_confidence = min_confidence
+        self.path = Path(path) if path else None
+        self.persist_every = max(1, persist_every)
+        self.version = version
+        
+        band_count = self.max_distance + 1
+        width = FINGERPRINT_BITS // band_count
+        self._bands = [
+            (i * width, FINGERPRINT_BITS - i * width if i == band_count - 1 else width)
+            for i in range(band_count)
+        ]
+        self._band_tables: List[Dict[int, Set[int]]] = [{} for _ in self._bands]
+        self._entries: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._added_since_save = 0
+        
+        if self.path is not None:
+            self.load()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+    
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> offset) & ((1 << width) - 1) for offset, width in self._bands]
+    
+    def _find(self, fingerprint: int) -> Optional[Tuple[int, int]]:
+        # 调用方持有锁；返回距离最近的已知指纹及其距离
+        best = None
+        for table, key in zip(self._band_tables, self._band_keys(fingerprint)):
+            for candidate in table.get(key, ()):
+                distance = bin(candidate ^ fingerprint).count("1")
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (candidate, distance)
+        return best
+    
+    def _insert(self, fingerprint: int, document_type: str, confidence: float):
+        # 调用方持有锁
+        self._entries[fingerprint] = (document_type, confidence)
+        for table, key in zip(self._band_tables, self._band_keys(fingerprint)):
+            table.setdefault(key, set()).add(fingerprint)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            for table, key in zip(self._band_tables, self._band_keys(evicted)):
+                members = table.get(key)
+                if members is not None:
+                    members.discard(evicted)
+                    if not members:
+                        del table[key]
+    
+    def match_many(self, texts: List[str]) -> Tuple[List[Optional[int]], List[Optional[ClassificationResult]]]:
+        """
+        为页面计算指纹并查找已知模板
+        
+        Args:
+            texts: 页面文本
+        
+        Returns:
+            (指纹列表, 命中模板时缓存的分类结果列表)，文本太短时指纹为None，未命中时结果为None
+        """
+        fingerprints = [simhash(text, self.min_tokens) for text in texts]
+        results: List[Optional[ClassificationResult]] = []
+        with self._lock:
+            for fingerprint in fingerprints:
+                match = self._find(fingerprint) if fingerprint is not None else None
+                if match is None:
+                    results.append(None)
+                    continue
+                self._entries.move_to_end(match[0])
+                document_type, confidence = self._entries[match[0]]
+                results.append(ClassificationResult(
+                    document_type=document_type, confidence=confidence, template_match=True
+                ))
+        return fingerprints, results
+    
+    def remember(self, fingerprints: List[Optional[int]], results: List[ClassificationResult]):
+        """
+        把分类结果登记为模板，跳过无指纹、置信度不足、来自模板或已有近似模板的页面
+        达到persist_every时保存到文件
+        
+        Args:
+            fingerprints: match_many返回的指纹
+            results: 对应的分类结果
+        """
+        save = False
+        with self._lock:
+            for fingerprint, result in zip(fingerprints, results):
+                if fingerprint is None or result.template_match or result.confidence < self.min_confidence:
+                    continue
+                if self._find(fingerprint) is not None:
+                    continue
+                self._insert(fingerprint, result.document_type, result.confidence)
+                self._added_since_save += 1
+            if self.path is not None and self._added_since_save >= self.persist_every:
+                self._added_since_save = 0
+                save = True
+        if save:
+            self.save()
+    
+    def save(self):
+        """
+        把模板按最近使用顺序保存到文件，先写临时文件再替换
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            payload = json.dumps({
+                "version": self.version,
+                "max_distance": self.max_distance,
+                "entries": [
+                    [format(fingerprint, "016x"), document_type, confidence]
+                    for fingerprint, (document_type, confidence) in self._entries.items()
+                ]
+            })
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, self.path)
+    
+    def load(self):
+        """
+        从文件加载模板，文件不存在、损坏或由其他分类器和配置版本生成时保持为空
+        """
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") != self.version:
+                print(f"Discarding template index {self.path} built for version {data.get('version')}, "
+                      f"current version is {self.version}")
+                return
+            entries = [(int(fingerprint, 16), document_type, float(confidence))
+                       for fingerprint, document_type, confidence in data["entries"]]
+        except FileNotFoundError:
+            return
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable template index {self.path}: {e}")
+            return
+        with self._lock:
+            for fingerprint, document_type, confidence in entries:
+                self._insert(fingerprint, document_type, confidence)
+        print(f"Loaded {len(entries)} page templates from {self.path}")
+
+def create_template_index() -> Optional[TemplateIndex]:
+    """
+    根据配置创建模板索引
+    设置了CLAIM_TEMPLATE_INDEX_PATH时持久化到该文件，重启后继续使用（分类器或配置版本变化后重新积累）
+    
+    Returns:
+        TemplateIndex，配置中关闭时返回None
+    """
+    if not TEMPLATE_INDEX_ENABLED:
+        return None
+    return TemplateIndex(path=os.getenv("CLAIM_TEMPLATE_INDEX_PATH"), version=template_index_version())
\ No newline at end of file
@@ -0,0 +1,13 @@
+"""
+提示词token数估算
+不依赖分词器，用于在调用OpenAI之前按token预算切分或合并文本
+"""
+
+# 英文文本平均每个token约4个字符
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的token数（约4个字符一个token）
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
\ No newline at end of file
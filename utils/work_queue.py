@@ -0,0 +1,340 @@
+"""
+阶段工作队列
+分阶段处理模式下连接各处理阶段的消息队列
+生产环境使用Azure Storage队列（与Functions的队列触发器配合），内存和SQLite队列用于测试和本地运行
+"""
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+class QueueMessage(BaseModel):
+    """
+    从队列中取出的消息，处理完成后需要删除，否则可见性超时后会被重新投递
+    """
+    queue_name: str
+    message_id: str
+    body: str
+    dequeue_count: int = 1  # 包括本次在内被取出的次数
+    receipt: Optional[str] = None  # 删除消息时使用的凭据
+
+class BaseWorkQueue(ABC):
+    """
+    工作队列抽象基类，语义与Azure Storage队列一致：至少投递一次，取出的消息在可见性超时内对其他消费者不可见
+    """
+    
+    @abstractmethod
+    def send(self, queue_name: str, body: str) -> None:
+        """
+        发送消息
+        
+        Args:
+            queue_name: 队列名称
+            body: 消息内容
+        """
+        pass
+    
+    @abstractmethod
+    def receive(self, queue_name: str, visibility_timeout_seconds: float = 300) -> Optional[QueueMessage]:
+        """
+        取出一条可见的消息
+        
+        Args:
+            queue_name: 队列名称
+            visibility_timeout_seconds: 消息在被删除前对其他消费者不可见的时间（秒）
+        
+        Returns:
+            消息，队列中没有可见消息时返回None
+        """
+        pass
+    
+    @abstractmethod
+    def delete(self, message: QueueMessage) -> None:
+        """
+        删除已处理的消息，凭据已失效（消息已被重新投递给其他消费者）时不做任何操作
+        
+        Args:
+            message: receive返回的消息
+        """
+        pass
+    
+    @abstractmethod
+    def release(self, message: QueueMessage, visibility_timeout_seconds: float = 0) -> None:
+        """
+        放回处理失败的消息，在指定时间后重新投递（与Functions队列触发器失败后的行为一致）
+        
+        Args:
+            message: receive返回的消息
+            visibility_timeout_seconds: 重新可见前的等待时间（秒）
+        """
+        pass
+    
+    @abstractmethod
+    def count(self, queue_name: str) -> int:
+        """
+        队列中的消息数（包括暂时不可见的消息）
+        
+        Args:
+            queue_name: 队列名称
+        
+        Returns:
+            消息数
+        """
+        pass
+
+class InMemoryWorkQueue(BaseWorkQueue):
+    """
+    进程内工作队列，用于测试和基准测试
+    """
+    
+    def __init__(self):
+        self._queues: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+    
+    def send(self, queue_name: str, body: str) -> None:
+        with self._lock:
+            self._queues.setdefault(queue_name, []).append({
+                "id": uuid.uuid4().hex,
+                "body": body,
+                "visible_at": 0.0,
+                "dequeue_count": 0,
+                "receipt": None
+            })
+    
+    def receive(self, queue_name: str, visibility_timeout_seconds: float = 300) -> Optional[QueueMessage]:
+        now = time.monotonic()
+        with self._lock:
+            for entry in self._queues.get(queue_name, []):
+                if entry["visible_at"] <= now:
+                    entry["visible_at"] = now + visibility_timeout_seconds
+                    entry["dequeue_count"] += 1
+                    entry["receipt"] = uuid.uuid4().hex
+                    return QueueMessage(
+                        queue_name=queue_name,
+                        message_id=entry["id"],
+                        body=entry["body"],
+                        dequeue_count=entry["dequeue_count"],
+                        receipt=entry["receipt"]
+                    )
+        return None
+    
+    def delete(self, message: QueueMessage) -> None:
+        with self._lock:
+            entries = self._queues.get(message.queue_name, [])
+            self._queues[message.queue_name] = [
+                entry for entry in entries
+                if not (entry["id"] == message.message_id and entry["receipt"] == message.receipt)
+            ]
+    
+    def release(self, message: QueueMessage, visibility_timeout_seconds: float = 0) -> None:
+        with self._lock:
+            for entry in self._queues.get(message.queue_name, []):
+                if entry["id"] == message.message_id and entry["receipt"] == message.receipt:
+                    entry["visible_at"] = time.monotonic() + visibility_timeout_seconds
+    
+    def count(self, queue_name: str) -> int:
+        with self._lock:
+            return len(self._queues.get(queue_name, []))
+
+class SQLiteWorkQueue(BaseWorkQueue):
+    """
+    基于本地SQLite文件的工作队列，可在同一台机器的多个进程间共享，用于本地运行和离线测试
+    """
+    
+    def __init__(self, db_path: str):
+        """
+        初始化SQLite工作队列
+        
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stage_queue ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "queue_name TEXT NOT NULL, "
+                "body TEXT NOT NULL, "
+                "visible_at REAL NOT NULL, "
+                "dequeue_count INTEGER NOT NULL DEFAULT 0, "
+                "receipt TEXT)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS stage_queue_visible ON stage_queue (queue_name, visible_at)"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        # 每次操作使用独立连接，可在多个线程和进程间安全使用
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def send(self, queue_name: str, body: str) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO stage_queue (queue_name, body, visible_at) VALUES (?, ?, 0)",
+                    (queue_name, body)
+                )
+        finally:
+            conn.close()
+    
+    def receive(self, queue_name: str, visibility_timeout_seconds: float = 300) -> Optional[QueueMessage]:
+        conn = self._connect()
+        try:
+            # 立即获取写锁，多个消费者不会取出同一条消息
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT id, body, dequeue_count FROM stage_queue "
+                "WHERE queue_name = ? AND visible_at <= ? ORDER BY id LIMIT 1",
+                (queue_name, now)
+            ).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            
+            message_id, body, dequeue_count = row
+            receipt = uuid.uuid4().hex
+            conn.execute(
+                "UPDATE stage_queue SET visible_at = ?, dequeue_count = ?, receipt = ? WHERE id = ?",
+                (now + visibility_timeout_seconds, dequeue_count + 1, receipt, message_id)
+            )
+            conn.commit()
+            return QueueMessage(
+                queue_name=queue_name,
+                message_id=str(message_id),
+                body=body,
+                dequeue_count=dequeue_count + 1,
+                receipt=receipt
+            )
+        finally:
+            conn.close()
+    
+    def delete(self, message: QueueMessage) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "DELETE FROM stage_queue WHERE id = ? AND receipt = ?",
+                    (int(message.message_id), message.receipt)
+                )
+        finally:
+            conn.close()
+    
+    def release(self, message: QueueMessage, visibility_timeout_seconds: float = 0) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE stage_queue SET visible_at = ? WHERE id = ? AND receipt = ?",
+                    (time.time() + visibility_timeout_seconds, int(message.message_id), message.receipt)
+                )
+        finally:
+            conn.close()
+    
+    def count(self, queue_name: str) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT COUNT(*) FROM stage_queue WHERE queue_name = ?", (queue_name,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+class AzureStorageWorkQueue(BaseWorkQueue):
+    """
+    Azure Storage队列，与Functions的队列触发器配合使用
+    消息以Base64编码，与队列触发器的默认格式一致；需要安装azure-storage-queue
+    """
+    
+    def __init__(self, connection_string: str):
+        """
+        初始化Azure Storage队列
+        
+        Args:
+            connection_string: 存储账户连接字符串
+        """
+        from azure.storage.queue import QueueServiceClient, TextBase64EncodePolicy, TextBase64DecodePolicy
+        
+        self.queue_service_client = QueueServiceClient.from_connection_string(
+            connection_string,
+            message_encode_policy=TextBase64EncodePolicy(),
+            message_decode_policy=TextBase64DecodePolicy()
+        )
+        self._created_queues = set()
+        self._lock = threading.Lock()
+    
+    def _get_queue_client(self, queue_name: str):
+        queue_client = self.queue_service_client.get_queue_client(queue_name)
+        with self._lock:
+            if queue_name not in self._created_queues:
+                from azure.core.exceptions import ResourceExistsError
+                try:
+                    queue_client.create_queue()
+                except ResourceExistsError:
+                    pass
+                self._created_queues.add(queue_name)
+        return queue_client
+    
+    def send(self, queue_name: str, body: str) -> None:
+        self._get_queue_client(queue_name).send_message(body)
+    
+    def receive(self, queue_name: str, visibility_timeout_seconds: float = 300) -> Optional[QueueMessage]:
+        message = self._get_queue_client(queue_name).receive_message(
+            visibility_timeout=int(visibility_timeout_seconds)
+        )
+        if message is None:
+            return None
+        return QueueMessage(
+            queue_name=queue_name,
+            message_id=message.id,
+            body=message.content,
+            dequeue_count=message.dequeue_count or 1,
+            receipt=message.pop_receipt
+        )
+    
+    def delete(self, message: QueueMessage) -> None:
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            self._get_queue_client(message.queue_name).delete_message(message.message_id, message.receipt)
+        except ResourceNotFoundError:
+            # 凭据已失效，消息已被重新投递
+            pass
+    
+    def release(self, message: QueueMessage, visibility_timeout_seconds: float = 0) -> None:
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            self._get_queue_client(message.queue_name).update_message(
+                message.message_id, message.receipt, visibility_timeout=int(visibility_timeout_seconds)
+            )
+        except ResourceNotFoundError:
+            pass
+    
+    def count(self, queue_name: str) -> int:
+        return self._get_queue_client(queue_name).get_queue_properties().approximate_message_count
+
+def create_work_queue() -> Optional[BaseWorkQueue]:
+    """
+    根据环境变量创建工作队列
+    - CLAIM_STAGE_QUEUE_DB: 本地SQLite数据库文件路径
+    - CLAIM_STAGE_QUEUE_CONNECTION: Azure Storage连接字符串，未设置时使用Functions的AzureWebJobsStorage
+    都未设置时返回None
+    
+    Returns:
+        工作队列实例或None
+    """
+    db_path = os.getenv("CLAIM_STAGE_QUEUE_DB")
+    if db_path:
+        return SQLiteWorkQueue(db_path)
+    
+    connection_string = os.getenv("CLAIM_STAGE_QUEUE_CONNECTION") or os.getenv("AzureWebJobsStorage")
+    if connection_string:
+        return AzureStorageWorkQueue(connection_string)
+    
+    return None
\ No newline at end of file